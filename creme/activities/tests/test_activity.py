@@ -28,7 +28,7 @@ try:
     from .. import constants
     from ..actions import BulkExportICalAction
     from ..models import ActivityType, ActivitySubType, Calendar, Status
-    from ..utils import check_activity_collisions
+    from ..utils import check_activity_collisions, get_busy_activities, get_first_free_slot
 
     if apps.is_installed('creme.assistants'):
         from creme.assistants.models import Alert, UserMessage
@@ -1629,6 +1629,118 @@ class ActivityTestCase(_ActivitiesTestCase):
                           busy=False, participants=[c1, c2]
                          )
 
+    def _create_busy_agenda(self, user):
+        "Contacts & activities used by the collisions tests."
+        create_activity = partial(Activity.objects.create, user=user,
+                                  type_id=constants.ACTIVITYTYPE_MEETING,
+                                 )
+        create_dt = partial(self.create_datetime, year=2010, month=10, day=1)
+        act01 = create_activity(title='meet01', busy=True,
+                                start=create_dt(hour=9,  minute=0),
+                                end=create_dt(hour=10, minute=30),
+                               )
+        act02 = create_activity(title='meet02',
+                                start=create_dt(hour=10, minute=0),
+                                end=create_dt(hour=11, minute=0),
+                               )
+        act03 = create_activity(title='meet03', busy=True,
+                                start=create_dt(hour=14, minute=0),
+                                end=create_dt(hour=15, minute=0),
+                               )
+        act04 = create_activity(title='meet04', is_deleted=True,
+                                start=create_dt(hour=11, minute=0),
+                                end=create_dt(hour=12, minute=0),
+                               )
+
+        create_contact = partial(Contact.objects.create, user=user)
+        c1 = create_contact(first_name='Spike', last_name='Spiegel')
+        c2 = create_contact(first_name='Jet',   last_name='Black')
+        c3 = create_contact(first_name='Faye',  last_name='Valentine')
+
+        create_rel = partial(Relation.objects.create, user=user,
+                             type_id=constants.REL_SUB_PART_2_ACTIVITY,
+                            )
+        create_rel(subject_entity=c1, object_entity=act01)
+        create_rel(subject_entity=c2, object_entity=act02)
+        create_rel(subject_entity=c2, object_entity=act03)
+        create_rel(subject_entity=c1, object_entity=act04)
+
+        return (c1, c2, c3), (act01, act02, act03)
+
+    @skipIfCustomContact
+    def test_collision02(self):
+        "Several participants => one query."
+        user = self.login()
+        (c1, c2, c3), (act01, act02, act03) = self._create_busy_agenda(user)
+        create_dt = partial(self.create_datetime, year=2010, month=10, day=1)
+        start = create_dt(hour=10, minute=15)
+        end   = create_dt(hour=14, minute=30)
+
+        with self.assertNumQueries(1):
+            collisions = check_activity_collisions(start, end, participants=[c1, c2, c3])
+
+        self.assertEqual(
+            [_('{participant} already participates to the activity '
+               '«{activity}» between {start} and {end}.'
+              ).format(participant=c1, activity=act01,
+                       start=time(10, 15), end=time(10, 30),
+                      ),
+             _('{participant} already participates to the activity '
+               '«{activity}» between {start} and {end}.'
+              ).format(participant=c2, activity=act03,  # The last one
+                       start=time(14, 0), end=time(14, 30),
+                      ),
+            ],
+            collisions
+        )
+
+        # Not busy
+        self.assertEqual([c1.id, c2.id],
+                         [a.participant_id for a in get_busy_activities([c1, c2.id, c3], start, end, busy=False)]
+                        )
+
+        # Excluded activity
+        self.assertEqual([(c2.id, act02.id)],
+                         [(a.participant_id, a.id)
+                            for a in get_busy_activities([c1, c2], start, end, exclude_activity_id=act03.id)
+                                if a.participant_id == c2.id
+                         ]
+                        )
+
+    @skipIfCustomContact
+    def test_first_free_slot(self):
+        user = self.login()
+        (c1, c2, c3), activities = self._create_busy_agenda(user)
+        create_dt = partial(self.create_datetime, year=2010, month=10, day=1)
+        start = create_dt(hour=8, minute=0)
+        end   = create_dt(hour=18, minute=0)
+
+        with self.assertNumQueries(1):
+            slot = get_first_free_slot([c1, c2], timedelta(hours=1), start, end)
+
+        self.assertEqual((create_dt(hour=8), create_dt(hour=9)), slot)
+
+        self.assertEqual((create_dt(hour=11), create_dt(hour=13)),
+                         get_first_free_slot([c1, c2], timedelta(hours=2), start, end)
+                        )
+        self.assertEqual((create_dt(hour=11), create_dt(hour=14)),
+                         get_first_free_slot([c1, c2], timedelta(hours=3), start, end)
+                        )
+        self.assertEqual((create_dt(hour=15), create_dt(hour=18)),
+                         get_first_free_slot([c1, c2], timedelta(hours=3), create_dt(hour=12), end)
+                        )
+        self.assertIsNone(get_first_free_slot([c1, c2], timedelta(hours=4), start, end))
+
+        # Not busy => meet02 is ignored
+        self.assertEqual((create_dt(hour=10, minute=30), create_dt(hour=13, minute=30)),
+                         get_first_free_slot([c1, c2], timedelta(hours=3), create_dt(hour=9), end, busy=False)
+                        )
+
+        # Free participant
+        self.assertEqual((create_dt(hour=9), create_dt(hour=13)),
+                         get_first_free_slot([c3], timedelta(hours=4), create_dt(hour=9), end)
+                        )
+
     def test_listviews(self):
         user = self.login()
         self.assertFalse(Activity.objects.all())
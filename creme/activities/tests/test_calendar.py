@@ -7,6 +7,7 @@ try:
 
     from django.contrib.contenttypes.models import ContentType
     from django.contrib.sessions.models import Session
+    from django.core.cache import cache
     from django.core.exceptions import ValidationError
     from django.core.management import call_command
     from django.urls import reverse
@@ -1036,6 +1037,96 @@ class CalendarTestCase(_ActivitiesTestCase):
             [(d['id'], d['calendar']) for d in response.json()]
         )
 
+    @skipIfCustomActivity
+    @override_settings(ACTIVITIES_DEFAULT_CALENDAR_IS_PUBLIC=True)
+    def test_activities_data05(self):
+        "Credentials for the edition (checked with one query)."
+        user = self.login(is_superuser=False, allowed_apps=['activities', 'persons'])
+        other_user = self.other_user
+
+        create_sc = partial(SetCredentials.objects.create, role=self.role)
+        create_sc(value=EntityCredentials.VIEW, set_type=SetCredentials.ESET_ALL)
+        create_sc(value=EntityCredentials.CHANGE, set_type=SetCredentials.ESET_OWN)
+
+        cal = Calendar.objects.get_default_calendar(user)
+        start = self.create_datetime(year=2013, month=4, day=1)
+
+        create = partial(Activity.objects.create, type_id=ACTIVITYTYPE_TASK,
+                         start=start + timedelta(days=1), end=start + timedelta(days=2),
+                        )
+        act1 = create(title='Act#1', user=user)
+        act2 = create(title='Act#2', user=other_user)
+
+        for act in (act1, act2):
+            act.calendars.set([cal])
+
+        response = self._get_cal_activities([cal], start=start.strftime('%s'))
+        self.assertEqual({act1.id: True, act2.id: False},
+                         {d['id']: d['editable'] for d in response.json()}
+                        )
+
+    @skipIfCustomActivity
+    def test_activities_data_etag(self):
+        "ETag: the data are not sent again if they have not changed."
+        user = self.login()
+        cal = Calendar.objects.get_default_calendar(user)
+        start = self.create_datetime(year=2013, month=4, day=1)
+
+        act = Activity.objects.create(user=user, type_id=ACTIVITYTYPE_TASK, title='Act#1',
+                                      start=start + timedelta(days=1), end=start + timedelta(days=2),
+                                     )
+        act.calendars.set([cal])
+
+        url = reverse('activities__calendars_activities')
+        data = {'calendar_id': [str(cal.id)], 'start': start.strftime('%s')}
+
+        response1 = self.assertGET200(url, data=data)
+        etag = response1['ETag']
+        self.assertTrue(etag)
+        self.assertIn('no-cache', response1['Cache-Control'])
+
+        response2 = self.client.get(url, data=data, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(304, response2.status_code)
+        self.assertFalse(response2.content)
+
+        act.title = 'Act#1 (edited)'
+        act.save()
+
+        response3 = self.client.get(url, data=data, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(200, response3.status_code)
+        self.assertNotEqual(etag, response3['ETag'])
+        self.assertEqual(['Act#1 (edited)'], [d['title'] for d in response3.json()])
+
+    @skipIfCustomActivity
+    @override_settings(ACTIVITIES_CALENDAR_CACHE_TIMEOUT=60)
+    def test_activities_data_cache(self):
+        "The data are cached per activity & invalidated by the modification."
+        user = self.login()
+        cal = Calendar.objects.get_default_calendar(user)
+        start = self.create_datetime(year=2013, month=4, day=1)
+
+        act = Activity.objects.create(user=user, type_id=ACTIVITYTYPE_TASK, title='Act#1',
+                                      start=start + timedelta(days=1), end=start + timedelta(days=2),
+                                     )
+        act.calendars.set([cal])
+
+        cache.clear()
+
+        def get_titles():
+            response = self._get_cal_activities([cal], start=start.strftime('%s'))
+            return [d['title'] for d in response.json()]
+
+        self.assertEqual(['Act#1'], get_titles())
+
+        # The date of modification is not changed => cached data
+        Activity.objects.filter(id=act.id).update(title='Act#1 (updated)')
+        self.assertEqual(['Act#1'], get_titles())
+
+        act = self.refresh(act)
+        act.title = 'Act#1 (edited)'
+        act.save()
+        self.assertEqual(['Act#1 (edited)'], get_titles())
+
     @override_settings(ACTIVITIES_DEFAULT_CALENDAR_IS_PUBLIC=False)
     def test_selected_calendars_in_session(self):
         user = self.login()
@@ -18,14 +18,15 @@
 #    along with this program.  If not, see <http://www.gnu.org/licenses/>.
 ################################################################################
 
+from django.db.models import F
 from django.db.models.query_utils import Q
 from django.utils.timezone import localtime
 from django.utils.translation import gettext as _
 
-from creme.creme_core.models import Relation, SettingValue
+from creme.creme_core.models import SettingValue
 
 from . import get_activity_model
-from .constants import REL_SUB_PART_2_ACTIVITY, NARROW, FLOATING_TIME
+from .constants import REL_OBJ_PART_2_ACTIVITY, NARROW, FLOATING_TIME
 from .setting_keys import auto_subjects_key
 
 
@@ -41,37 +42,56 @@ def get_last_day_of_a_month(date):
     return last_day
 
 
+def get_busy_activities(participants, start, end, busy=True, exclude_activity_id=None):
+    """Get the activities which make some participants busy during a period,
+    with only one query.
+
+    @param participants: Iterable of entities (generally Contacts) or IDs of entities.
+    @param start: Start of the period (datetime).
+    @param end: End of the period (datetime).
+    @param busy: Boolean ; if False, only the busy activities are returned
+           (ie: the period is not busy, so it collides only with busy activities).
+    @param exclude_activity_id: ID of an Activity which is ignored
+           (eg: the edited activity) ; <None> means no activity is ignored.
+    @return: A Queryset of Activities, annotated with "participant_id"
+             (an activity is returned once per participant), & ordered by
+             participant then by start (descending).
+    """
+    participant_ids = {p if isinstance(p, int) else p.id for p in participants}
+    activities = get_activity_model().objects.filter(
+        ~(Q(end__lte=start) | Q(start__gte=end)),
+        is_deleted=False,
+        floating_type__in=(NARROW, FLOATING_TIME),
+        relations__type=REL_OBJ_PART_2_ACTIVITY,
+        relations__object_entity__in=participant_ids,
+    ).annotate(participant_id=F('relations__object_entity'))
+
+    if not busy:
+        activities = activities.filter(busy=True)
+
+    if exclude_activity_id is not None:
+        activities = activities.exclude(id=exclude_activity_id)
+
+    return activities.order_by('participant_id', '-start', 'id')
+
+
 def check_activity_collisions(activity_start, activity_end, participants, busy=True, exclude_activity_id=None):
     if not activity_start:
         return
 
-    collision_test = ~(Q(end__lte=activity_start) | Q(start__gte=activity_end))
-    collisions     = []
+    participants = [*participants]
+    colliding_activities = {}  # Participant ID => Activity
+
+    # NB: the activities of all the participants are retrieved with one query.
+    for activity in get_busy_activities(participants, activity_start, activity_end,
+                                        busy=busy, exclude_activity_id=exclude_activity_id,
+                                       ):
+        colliding_activities.setdefault(activity.participant_id, activity)
+
+    collisions = []
 
     for participant in participants:
-        # Find activities of participant
-        activity_req = Relation.objects.filter(subject_entity=participant.id, type=REL_SUB_PART_2_ACTIVITY)
-
-        # Exclude current activity if asked
-        if exclude_activity_id is not None:
-            activity_req = activity_req.exclude(object_entity=exclude_activity_id)
-
-        # Get id of activities of participant
-        activity_ids = activity_req.values_list("object_entity__id", flat=True)
-
-        # Do collision request
-        # TODO: can be done with less queries ?
-        #       eg:  Activity.objects.filter(relations__object_entity=participant.id,
-        #                                    relations__object_entity__type=REL_OBJ_PART_2_ACTIVITY)
-        #                            .filter(collision_test)
-        busy_args = {} if busy else {'busy': True}
-        # TODO: test is_deleted=True
-        colliding_activity = get_activity_model().objects.filter(collision_test,
-                                                                 is_deleted=False,
-                                                                 pk__in=activity_ids,
-                                                                 floating_type__in=(NARROW, FLOATING_TIME),
-                                                                 **busy_args
-                                                                ).first()
+        colliding_activity = colliding_activities.get(participant.id)
 
         if colliding_activity is not None:
             collision_start = max(activity_start.time(), localtime(colliding_activity.start).time())
@@ -89,6 +109,37 @@ def check_activity_collisions(activity_start, activity_end, participants, busy=T
     return collisions
 
 
+def get_first_free_slot(participants, duration, start, end, busy=True, exclude_activity_id=None):
+    """Get the first period where some participants are all free.
+
+    @param participants: Iterable of entities (generally Contacts) or IDs of entities.
+    @param duration: Duration of the wanted period (timedelta).
+    @param start: Start of the window where the period is searched (datetime).
+    @param end: End of the window (datetime).
+    @param busy: Boolean ; if False, only the busy activities are taken into account
+           (see get_busy_activities()).
+    @param exclude_activity_id: See get_busy_activities().
+    @return: A tuple (start, end) of datetimes, or None if there is no free
+             period in the window.
+    """
+    slot_start = start
+
+    # NB: the busy intervals of all the participants are merged, so their
+    #     ordered starts are just walked through.
+    for busy_start, busy_end in get_busy_activities(participants, start, end,
+                                                    busy=busy, exclude_activity_id=exclude_activity_id,
+                                                   ).order_by('start') \
+                                                    .values_list('start', 'end'):
+        if busy_start - slot_start >= duration:
+            break
+
+        slot_start = max(slot_start, busy_end)
+
+    slot_end = slot_start + duration
+
+    return (slot_start, slot_end) if slot_end <= end else None
+
+
 def get_ical_date(date_time):
     date_time = localtime(date_time)
 
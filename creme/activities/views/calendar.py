@@ -19,22 +19,22 @@
 ################################################################################
 
 from collections import defaultdict
-from copy import copy
 from datetime import datetime, timedelta
-from functools import partial
 # from json import dumps as jsondumps
 import logging
 
 from django.contrib.contenttypes.models import ContentType
 from django.conf import settings
+from django.core.cache import cache
 from django.core.exceptions import PermissionDenied
 from django.db.models import Q, Prefetch
 from django.db.transaction import atomic
 from django.http import HttpResponse  # Http404
 from django.shortcuts import render  # get_object_or_404
 from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control, set_response_etag
 # from django.utils.html import escape
-from django.utils.timezone import now, make_naive, get_current_timezone
+from django.utils.timezone import now, make_naive, get_current_timezone, get_current_timezone_name
 from django.utils.translation import gettext_lazy as _, gettext
 
 # from creme.creme_core.auth import build_creation_perm as cperm
@@ -361,15 +361,27 @@ class ActivitiesData(CalendarsMixin, generic.CheckedView):
 
     calendar_ids_session_key = CalendarView.calendar_ids_session_key
 
+    # Prefix of the keys of the cached data of the activities (see get_activities_dicts()).
+    cache_key_prefix = 'activities-calendar_data'
+
     def get(self, request, *args, **kwargs):
-        return self.response_class(
+        response = self.response_class(
             self.get_activities_data(request),
             safe=False,  # Result is not a dictionary
         )
 
+        # NB: the browser revalidates its copy of the data with the ETag, so
+        #     unchanged data are not sent again (refreshing, navigation...).
+        patch_cache_control(response, private=True, no_cache=True)
+        set_response_etag(response)
+
+        return get_conditional_response(request, etag=response['ETag'], response=response)
+
     @staticmethod
-    def _activity_2_dict(activity, user):
-        "Returns a 'jsonifiable' dictionary."
+    def _activity_2_dict(activity):
+        """Returns a 'jsonifiable' dictionary with the data which depend only
+        on the activity (not on the calendar, the user...).
+        """
         tz = get_current_timezone()
         start = make_naive(activity.start, tz)
         end = make_naive(activity.end, tz)
@@ -381,9 +393,6 @@ class ActivitiesData(CalendarsMixin, generic.CheckedView):
         if start == end and not is_all_day:
             end += timedelta(seconds=1)
 
-        # NB: _get_one_activity_per_calendar() adds this 'attribute'
-        calendar = activity.calendar
-
         return {
             'id':    activity.id,
             # 'title': activity.get_title_for_calendar(),
@@ -394,14 +403,68 @@ class ActivitiesData(CalendarsMixin, generic.CheckedView):
             'allDay': is_all_day,
 
             'url': reverse('activities__view_activity_popup', args=(activity.id,)),
-
-            # 'calendar_color': '#{}'.format(calendar.get_color),
-            'color':    '#{}'.format(calendar.get_color),
-            'editable': user.has_perm_to_change(activity),
-            'calendar': calendar.id,
-            'type':     activity.type.name,
         }
 
+    def _get_cache_key(self, activity):
+        # NB: the date of modification is a part of the key, so the cached
+        #     data of an activity are invalidated when it's modified.
+        return '{}-{}-{}-{}'.format(
+            self.cache_key_prefix, activity.id,
+            activity.modified.timestamp(), get_current_timezone_name(),
+        )
+
+    def get_activities_dicts(self, activities):
+        """Get the data of some activities which do not depend on the calendar
+        or the user (see _activity_2_dict()).
+        The data are cached (see settings.ACTIVITIES_CALENDAR_CACHE_TIMEOUT).
+
+        @param activities: Sequence of Activities.
+        @return: Dictionary {activity_id: dictionary}.
+        """
+        timeout = settings.ACTIVITIES_CALENDAR_CACHE_TIMEOUT
+
+        if not timeout:
+            return {activity.id: self._activity_2_dict(activity) for activity in activities}
+
+        keys = {activity.id: self._get_cache_key(activity) for activity in activities}
+        cached = cache.get_many(keys.values())
+        dicts = {}
+        missing = {}
+
+        for activity in activities:
+            key = keys[activity.id]
+            activity_dict = cached.get(key)
+
+            if activity_dict is None:
+                missing[key] = activity_dict = self._activity_2_dict(activity)
+
+            dicts[activity.id] = activity_dict
+
+        if missing:
+            cache.set_many(missing, timeout)
+
+        return dicts
+
+    @staticmethod
+    def get_editable_ids(user, activities):
+        """Get the IDs of the activities which the user can change, with only
+        one query (instead of a user.has_perm_to_change() per activity).
+
+        @param user: Instance of get_user_model().
+        @param activities: Sequence of Activities (not deleted).
+        @return: A set of IDs.
+        """
+        ids = [activity.id for activity in activities]
+
+        if user.is_superuser or not ids:
+            return {*ids}
+
+        return {*EntityCredentials.filter(user,
+                                          Activity.objects.filter(id__in=ids),
+                                          perm=EntityCredentials.CHANGE,
+                                         ).values_list('id', flat=True)
+               }
+
     @staticmethod
     def _get_datetime(*, request, key):
         timestamp = request.GET.get(key)
@@ -412,15 +475,6 @@ class ActivitiesData(CalendarsMixin, generic.CheckedView):
             except Exception:
                 logger.exception('ActivitiesData._get_datetime(key=%s)', key)
 
-    @staticmethod
-    def _get_one_activity_per_calendar(activities):
-        for activity in activities:
-            # "concerned_calendars" is added by get_activities_data()
-            for calendar in activity.concerned_calendars:
-                copied = copy(activity)
-                copied.calendar = calendar
-                yield copied
-
     def get_activities_data(self, request):
         user = request.user
 
@@ -436,7 +490,7 @@ class ActivitiesData(CalendarsMixin, generic.CheckedView):
         end   = self.get_end(request=request, start=start)
 
         # TODO: label when no calendar related to the participant of an unavailability
-        activities = EntityCredentials.filter(
+        activities = [*EntityCredentials.filter(
             user,
             Activity.objects
                     .filter(is_deleted=False)
@@ -449,6 +503,7 @@ class ActivitiesData(CalendarsMixin, generic.CheckedView):
                             #    )
                            )
                     .distinct()
+                    .select_related('type')
                     # NB: we already filter by calendars ; maybe a future Django version
                     #     will allow us to annotate the calendar ID directly
                     #     (distinct() would have to be removed of course)
@@ -458,13 +513,21 @@ class ActivitiesData(CalendarsMixin, generic.CheckedView):
                                  to_attr='concerned_calendars',
                                 )
                      )
-        )
+        )]
 
-        activity_2_dict = partial(self._activity_2_dict, user=user)
+        activities_dicts = self.get_activities_dicts(activities)
+        editable_ids = self.get_editable_ids(user, activities)
 
         return [
-            activity_2_dict(activity=a)
-                for a in self._get_one_activity_per_calendar(activities)
+            {**activities_dicts[activity.id],
+             # 'calendar_color': '#{}'.format(calendar.get_color),
+             'color':    '#{}'.format(calendar.get_color),
+             'editable': activity.id in editable_ids,
+             'calendar': calendar.id,
+             'type':     activity.type.name,
+            } for activity in activities
+                  # NB: "concerned_calendars" is added by the Prefetch
+                  for calendar in activity.concerned_calendars
         ]
 
     @staticmethod
@@ -21,12 +21,13 @@
 from datetime import timedelta
 
 from django.conf import settings
+from django.contrib.auth import get_user_model
 from django.db.models import Q
 from django.utils.timezone import now, localtime
 from django.utils.translation import gettext as _
 
 from creme.creme_core.core.reminder import Reminder
-from creme.creme_core.models import SettingValue
+from creme.creme_core.models import CremeEntity, SettingValue
 
 from .models import Alert, ToDo
 from .setting_keys import todo_reminder_key
@@ -40,6 +41,34 @@ class AssistantReminder(Reminder):
 
         return [teammate.email for teammate in user.teammates.values()] if user.is_team else [user.email]
 
+    def get_emails_multi(self, objects):
+        # NB: the teammates of all the teams are retrieved with one query.
+        emails_per_user = {}
+        team_ids = set()
+
+        for obj in objects:
+            user = obj.user
+
+            if user.is_team:
+                team_ids.add(user.id)
+                emails_per_user[user.id] = []
+            else:
+                emails_per_user[user.id] = [user.email]
+
+        if team_ids:
+            for team_id, email in get_user_model().objects \
+                                                  .filter(teams_set__in=team_ids) \
+                                                  .values_list('teams_set', 'email'):
+                emails_per_user[team_id].append(email)
+
+        return [emails_per_user[obj.user_id] for obj in objects]
+
+    def get_queryset(self):
+        return super().get_queryset().select_related('user', 'entity')
+
+    def populate(self, objects):
+        CremeEntity.populate_real_entities([obj.entity for obj in objects])
+
 
 class ReminderAlert(AssistantReminder):
     id    = Reminder.generate_id('assistants', 'alert')
@@ -39,6 +39,7 @@ try:
     from ..constants import MIN_HOUR_4_TODO_REMINDER
     from ..function_fields import TodosField
     from ..models import ToDo, Alert
+    from ..reminders import ReminderTodo
 
     from .base import AssistantsTestCase
 except Exception as e:
@@ -514,6 +515,72 @@ class TodoTestCase(AssistantsTestCase, BrickTestCaseMixin):
                          {tuple(m.to) for m in messages}
                         )
 
+    def test_reminder05(self):
+        "Batches: one call to send_messages() per batch, on the same connection."
+        user = self.user
+        now_value = now()
+
+        create_user = get_user_model().objects.create
+        teammate = create_user(username='luffy',
+                               email='luffy@sunny.org', role=self.role,
+                               first_name='Luffy', last_name='Monkey D.',
+                              )
+        team = create_user(username='Team #1', is_team=True)
+        team.teammates = [teammate, user]
+
+        sv = self.get_object_or_fail(SettingValue, key_id=MIN_HOUR_4_TODO_REMINDER)
+        sv.value = max(localtime(now_value).hour - 1, 0)
+        sv.save()
+
+        reminder_ids = [*DateReminder.objects.values_list('id', flat=True)]
+
+        create_todo = partial(ToDo.objects.create, creme_entity=self.entity, user=user, deadline=now_value)
+        todos = [create_todo(title='Todo#1'),
+                 create_todo(title='Todo#2', user=team),
+                 create_todo(title='Todo#3'),
+                 create_todo(title='Todo#4', user=team),
+                 create_todo(title='Todo#5'),
+                ]
+
+        sent_messages = []
+        open_calls = []
+        original_open = EmailBackend.open
+
+        def send_messages(this, messages):
+            sent_messages.append([*messages])
+            return self.original_send_messages(this, messages)
+
+        def open_connection(this):
+            open_calls.append(this)
+            return original_open(this)
+
+        EmailBackend.send_messages = send_messages
+        EmailBackend.open = open_connection
+        ReminderTodo.batch_size = 2
+
+        try:
+            self.execute_reminder_job()
+        finally:
+            del ReminderTodo.batch_size
+            EmailBackend.open = original_open
+
+        self.assertEqual([2 + 1, 1 + 2, 1], [len(messages) for messages in sent_messages])
+        self.assertEqual(1, len({id(connection) for connection in open_calls}))
+
+        self.assertEqual(sorted([teammate.email, user.email, user.email]),
+                         sorted(m.to[0] for m in sent_messages[1])
+                        )
+        self.assertEqual([todos[2].title, todos[3].title, todos[3].title],
+                         [todo.title for m in sent_messages[1] for todo in todos if todo.title in m.body]
+                        )
+
+        self.assertFalse(ToDo.objects.filter(reminded=False))
+        self.assertEqual({todo.id for todo in todos},
+                         {*DateReminder.objects.exclude(id__in=reminder_ids)
+                                               .values_list('model_id', flat=True)
+                         }
+                        )
+
     def test_next_wakeup01(self):
         "Next wake is one day later + minimum hour"
         now_value = now()
@@ -74,11 +74,12 @@ class _LineMultipleAddForm(core_forms.CremeForm):
                               vat_value=cdata['vat'],
                              )
 
-        for item in cdata['items']:
-            create_item(related_item=item,
-                        unit_price=item.unit_price,
-                        unit=item.unit,
-                       )
+        with self.billing_document.lines_batch():
+            for item in cdata['items']:
+                create_item(related_item=item,
+                            unit_price=item.unit_price,
+                            unit=item.unit,
+                           )
 
 
 class ProductLineMultipleAddForm(_LineMultipleAddForm):
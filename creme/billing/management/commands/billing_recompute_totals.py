@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+
+################################################################################
+#    Creme is a free/open-source Customer Relationship Management software
+#    Copyright (C) 2019  Hybird
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+################################################################################
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Compute the totals of all the billing documents from their lines & their credit notes, ' \
+           'and fix the totals which are not consistent (they are generally updated incrementally). ' \
+           'Use --check to only list the inconsistent documents.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('-c', '--check', action='store_true', dest='check', default=False,
+                            help='Only check the totals, the documents are not modified. [default: %(default)s]',
+                           )
+
+    def handle(self, **options):
+        from creme.billing.core import BILLING_MODELS
+
+        verbosity = options.get('verbosity')
+        check = options.get('check')
+        inconsistent_count = 0
+
+        for model in BILLING_MODELS:
+            count = 0
+
+            for document in model._default_manager.order_by('id').iterator():
+                total_no_vat = document._get_total()
+                total_vat = document._get_total_with_tax()
+
+                if total_no_vat == document.total_no_vat and total_vat == document.total_vat:
+                    continue
+
+                count += 1
+
+                if verbosity >= 2:
+                    self.stdout.write(
+                        '{model} #{id} "{document}": {old_no_vat}/{old_vat} instead of {no_vat}/{vat}'.format(
+                            model=model._meta.label, id=document.id, document=document,
+                            old_no_vat=document.total_no_vat, old_vat=document.total_vat,
+                            no_vat=total_no_vat, vat=total_vat,
+                        )
+                    )
+
+                if not check:
+                    document.save()
+
+            if verbosity:
+                self.stdout.write('{}: {} inconsistent document(s){}'.format(
+                    model._meta.label, count, '' if check or not count else ' fixed',
+                ))
+
+            inconsistent_count += count
+
+        if check and inconsistent_count:
+            self.stderr.write('{} document(s) with inconsistent totals.'.format(inconsistent_count))
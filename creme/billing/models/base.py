@@ -18,15 +18,18 @@
 #    along with this program.  If not, see <http://www.gnu.org/licenses/>.
 ################################################################################
 
+from contextlib import contextmanager
 from datetime import date
 import logging
 
 from django.conf import settings
 from django.db.models import (CharField, TextField, ForeignKey, DateField,
         SET_NULL, PROTECT)
+from django.db.transaction import atomic
 from django.utils.translation import gettext_lazy as _
 
 from creme.creme_core.constants import DEFAULT_CURRENCY_PK
+from creme.creme_core.global_info import get_global_info, set_global_info
 from creme.creme_core.models import CremeEntity, Relation, Currency, CREME_REPLACE_NULL
 from creme.creme_core.models.fields import MoneyField
 
@@ -227,6 +230,103 @@ class Base(CremeEntity):
 
         return max(DEFAULT_DECIMAL, lines_total_with_tax - creditnotes_total)
 
+    @staticmethod
+    def _get_totals_deltas():
+        deltas = get_global_info('billing-totals_deltas')
+
+        if deltas is None:
+            deltas = {}
+            set_global_info(**{'billing-totals_deltas': deltas})
+
+        return deltas
+
+    def update_totals(self, delta_no_vat, delta_with_vat):
+        """Update the totals with the variation of the total of a line (or of
+        a credit note), without retrieving all the lines & the credit notes,
+        & save the document.
+        In a batch (see lines_batch()) the variations are just accumulated.
+        @param delta_no_vat: Variation of the total without VAT (Decimal).
+        @param delta_with_vat: Variation of the total with VAT (Decimal).
+        """
+        delta = self._get_totals_deltas().get(self.id)
+
+        if delta is not None:
+            delta[0] += delta_no_vat
+            delta[1] += delta_with_vat
+        elif delta_no_vat or delta_with_vat:
+            self._update_totals(delta_no_vat, delta_with_vat)
+
+    @atomic
+    def _update_totals(self, delta_no_vat, delta_with_vat):
+        # NB: we use the values stored in the DB, because this instance can
+        #     be outdated (another instance has been used to add a line...).
+        old_no_vat, old_vat = type(self)._default_manager \
+                                        .select_for_update() \
+                                        .filter(pk=self.pk) \
+                                        .values_list('total_no_vat', 'total_vat') \
+                                        .get()
+        total_no_vat = (old_no_vat or DEFAULT_DECIMAL) + delta_no_vat
+        total_vat    = (old_vat or DEFAULT_DECIMAL) + delta_with_vat
+
+        # NB: a total which is not strictly positive may have been clamped by
+        #     _get_total() (credit notes greater than the lines' total...), so
+        #     in this case we compute the totals the slow way.
+        if min(old_no_vat or DEFAULT_DECIMAL, old_vat or DEFAULT_DECIMAL,
+               total_no_vat, total_vat,
+              ) > DEFAULT_DECIMAL:
+            self.total_no_vat = total_no_vat
+            self.total_vat    = total_vat
+            self.save(update_totals=False)
+        else:
+            self.save()
+
+    @contextmanager
+    def lines_batch(self):
+        """Context manager which updates the totals only once, at the end,
+        when several lines (or credit notes) of the document are created,
+        modified or deleted. The whole block is run in a transaction.
+
+            with invoice.lines_batch():
+                for line in lines:
+                    line.save()
+        """
+        deltas = self._get_totals_deltas()
+        doc_id = self.id
+
+        if doc_id in deltas:  # Nested batch
+            yield
+            return
+
+        delta = deltas[doc_id] = [DEFAULT_DECIMAL, DEFAULT_DECIMAL]
+
+        try:
+            # NB: if an error occurs, the lines are not saved & the totals are
+            #     still consistent.
+            with atomic():
+                yield
+
+                if delta[0] or delta[1]:
+                    self._update_totals(*delta)
+        finally:
+            del deltas[doc_id]
+
+    def save_lines(self, lines=(), deleted_lines=()):
+        """Create/modify & delete several lines of the document, & update its
+        totals only once.
+        @param lines: Instances of Line to save ; they must be related to this
+               document (the new ones are automatically related).
+        @param deleted_lines: Instances of Line to delete.
+        """
+        with self.lines_batch():
+            for line in deleted_lines:
+                line.delete()
+
+            for line in lines:
+                if line.pk is None or line._related_document is False:
+                    line._related_document = self
+
+                line.save()
+
     def _pre_save_clone(self, source):
         if self.generate_number_in_create:
             self.generate_number(source.get_source())
@@ -252,8 +352,9 @@ class Base(CremeEntity):
     def _post_clone(self, source):
         source.invalidate_cache()
 
-        for line in source.iter_all_lines():
-            line.clone(self)
+        with self.lines_batch():
+            for line in source.iter_all_lines():
+                line.clone(self)
 
     # TODO: factorise with persons ??
     def _post_save_clone(self, source):
@@ -305,8 +406,13 @@ class Base(CremeEntity):
         logger.debug("=> Clone properties")
         self._copy_properties(template)
 
-    def save(self, *args, **kwargs):
-        if self.pk:
+    def save(self, *args, update_totals=True, **kwargs):
+        """Save the document.
+        @param update_totals: If True, the totals are fully computed from the
+               lines & the credit notes (use False if they have been computed
+               by another way, like update_totals()).
+        """
+        if self.pk and update_totals:
             self.invalidate_cache()
 
             self.total_vat    = self._get_total_with_tax()
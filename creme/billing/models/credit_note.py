@@ -75,7 +75,8 @@ class AbstractCreditNote(Base):
 
         return super().build(template)
 
-    def _update_linked_docs(self):
+    def _update_linked_docs(self, sign):
+        "Update the totals of the documents on which the credit note is applied."
         # TODO: factorise (Relation.get_real_objects() ??)
         relations = Relation.objects.filter(subject_entity=self.id,
                                             type=REL_SUB_CREDIT_NOTE_APPLIED,
@@ -84,15 +85,23 @@ class AbstractCreditNote(Base):
         Relation.populate_real_object_entities(relations)
 
         for rel in relations:
-            rel.object_entity.get_real_entity().save()
+            rel.object_entity.get_real_entity().update_totals(sign * (self.total_no_vat or 0),
+                                                              sign * (self.total_vat or 0),
+                                                             )
 
     def restore(self):
+        was_deleted = self.is_deleted
         super().restore()
-        self._update_linked_docs()
+
+        if was_deleted:
+            self._update_linked_docs(sign=-1)
 
     def trash(self):
+        was_deleted = self.is_deleted
         super().trash()
-        self._update_linked_docs()
+
+        if not was_deleted:
+            self._update_linked_docs(sign=1)
 
 
 class CreditNote(AbstractCreditNote):
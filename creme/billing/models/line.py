@@ -23,20 +23,19 @@ import logging
 
 from django.core.exceptions import ValidationError
 from django.db import models
+from django.db.models.base import DEFERRED
 from django.db.transaction import atomic
 from django.utils.translation import gettext_lazy as _, gettext
 
 from creme.creme_core.models import CremeEntity, Relation, Vat
 
 from .. import constants
+from ..constants import DEFAULT_DECIMAL
 from ..utils import round_to_2
 
 logger = logging.getLogger(__name__)
 
 
-# TODO: use a smart workflow engine to update the BillingModel only once when several lines are edited
-#       for the moment when have to re-save the model manually.
-
 class Line(CremeEntity):
     # NB: not blank (no related item => name is filled)
     on_the_fly_item = models.CharField(_('On-the-fly line'), max_length=100, null=True)
@@ -75,6 +74,10 @@ class Line(CremeEntity):
     _related_document = False
     _related_item = None
 
+    # Fields used to compute the prices (see get_prices()).
+    _PRICE_FIELDS = ('quantity', 'unit_price', 'discount', 'discount_unit', 'total_discount', 'vat_value_id')
+    _saved_price_values = None
+
     class Meta:
         abstract = True
         manager_inheritance_from_future = True
@@ -152,6 +155,39 @@ class Line(CremeEntity):
         vat = (total_ht * vat_value.value / 100) if vat_value else 0
         return round_to_2(total_ht + vat)
 
+    def get_prices(self, document=None):
+        """Get the prices exclusive & inclusive of tax.
+        @return: Tuple of 2 Decimals.
+        """
+        return self.get_price_exclusive_of_tax(document), self.get_price_inclusive_of_tax(document)
+
+    def _get_saved_prices(self, document):
+        "Get the prices of the line as it is stored in the DB (see get_prices())."
+        field_names = self._PRICE_FIELDS
+        values = self._saved_price_values
+
+        if values is None:
+            db_values = getattr(self, '_db_values', None)  # See CremeModel.from_db()
+
+            if db_values is not None:
+                values = dict(zip(*db_values))
+
+                if any(values.get(fname, DEFERRED) is DEFERRED for fname in field_names):
+                    values = None
+
+            if values is None:
+                values = type(self)._default_manager.filter(pk=self.pk).values(*field_names).first()
+
+                if values is None:
+                    return DEFAULT_DECIMAL, DEFAULT_DECIMAL
+
+        saved_line = type(self)(pk=self.pk, **{fname: values[fname] for fname in field_names})
+
+        if saved_line.vat_value_id == self.vat_value_id:
+            saved_line.vat_value = self.vat_value  # Avoid a query
+
+        return saved_line.get_prices(document)
+
     def get_raw_price(self):
         return round_to_2(self.quantity * self.unit_price)
 
@@ -228,12 +264,17 @@ class Line(CremeEntity):
 
     @atomic
     def save(self, *args, **kwargs):
+        """Save the line, & update the totals of the related document with the
+        variation of the line's prices (see Base.update_totals()).
+        """
         if not self.pk:  # Creation
             assert self._related_document, 'Line.related_document is required'
             assert bool(self._related_item) ^ bool(self.on_the_fly_item), \
                    'Line.related_item or Line.on_the_fly_item is required'
 
-            self.user = self._related_document.user
+            document = self._related_document
+            old_prices = (DEFAULT_DECIMAL, DEFAULT_DECIMAL)
+            self.user = document.user
 
             super().save(*args, **kwargs)
 
@@ -243,7 +284,14 @@ class Line(CremeEntity):
             if self._related_item:
                 create_relation(type_id=constants.REL_SUB_LINE_RELATED_ITEM, object_entity=self._related_item)
         else:
+            document = self.related_document
+            old_prices = self._get_saved_prices(document)
             super().save(*args, **kwargs)
 
-        # TODO: problem, if several lines are added/edited at once, lots of useless queries (workflow engine ??)
-        self.related_document.save()  # Update totals
+        self._saved_price_values = {fname: getattr(self, fname) for fname in self._PRICE_FIELDS}
+
+        if document is not None:
+            new_prices = self.get_prices(document)
+            document.update_totals(new_prices[0] - old_prices[0],
+                                   new_prices[1] - old_prices[1],
+                                  )
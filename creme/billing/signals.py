@@ -111,12 +111,25 @@ def handle_replace_statuses(sender, model_field, replacing_instance, **kwargs):
 def manage_linked_credit_notes(sender, instance, **kwargs):
     "The calculated totals of Invoices have to be refreshed."
     if instance.type_id == constants.REL_SUB_CREDIT_NOTE_APPLIED:
-        instance.object_entity.get_real_entity().save()
+        document = instance.object_entity.get_real_entity()
+        created = kwargs.get('created')
+
+        if created is False:  # Relation modified
+            document.save()
+        else:
+            credit_note = instance.subject_entity.get_real_entity()
+
+            if not credit_note.is_deleted:
+                sign = -1 if created else 1
+                document.update_totals(sign * (credit_note.total_no_vat or 0),
+                                       sign * (credit_note.total_vat or 0),
+                                      )
 
 
-# TODO: problem, if several lines are deleted at once, lots of useless queries (workflow engine ??)
 @receiver(signals.post_delete, sender=Relation)
 def manage_line_deletion(sender, instance, **kwargs):
     "The calculated totals (Invoice, Quote...) have to be refreshed."
     if instance.type_id == constants.REL_OBJ_HAS_LINE:
-        instance.object_entity.get_real_entity().save()
+        document = instance.object_entity.get_real_entity()
+        price_no_vat, price_with_vat = instance.subject_entity.get_real_entity().get_prices(document)
+        document.update_totals(-price_no_vat, -price_with_vat)
@@ -5,13 +5,18 @@ try:
     from functools import partial
     from json import dumps as json_dump
 
+    from io import StringIO
+
     from django.contrib.contenttypes.models import ContentType
     from django.core.exceptions import ValidationError
+    from django.core.management import call_command
     from django.urls import reverse
     from django.utils.translation import gettext as _
 
     from creme.creme_core.auth.entity_credentials import EntityCredentials
-    from creme.creme_core.models import Relation, SetCredentials, Vat, FakeOrganisation
+    from creme.creme_core.models import (Relation, SetCredentials, Vat, FakeOrganisation,
+        HistoryLine)
+    from creme.creme_core.models.history import TYPE_EDITION
 
     from creme.persons.models import Contact, Organisation
     from creme.persons.tests.base import skipIfCustomOrganisation
@@ -19,8 +24,10 @@ try:
     from creme.products.models import Product, Service, SubCategory
     from creme.products.tests.base import skipIfCustomProduct, skipIfCustomService
 
+    from creme.creme_core.utils.profiling import CaptureQueriesContext
+
     from ..constants import (
-        REL_SUB_HAS_LINE, REL_SUB_LINE_RELATED_ITEM,
+        REL_SUB_HAS_LINE, REL_SUB_LINE_RELATED_ITEM, REL_SUB_CREDIT_NOTE_APPLIED,
         DISCOUNT_PERCENT, DISCOUNT_LINE_AMOUNT, DISCOUNT_ITEM_AMOUNT,
     )
     from .base import (
@@ -1325,3 +1332,218 @@ class LineTestCase(_BillingTestCase):
         self.assertGET(400, build_url(pline, 'on_the_fly_item'))
         self.assertGET(400, build_url(pline, 'total_discount'))
         self.assertGET(400, build_url(pline, 'discount_unit'))
+
+    def _assertTotalsConsistent(self, document):
+        document = self.refresh(document)
+        self.assertEqual(document._get_total(),          document.total_no_vat)
+        self.assertEqual(document._get_total_with_tax(), document.total_vat)
+
+        return document
+
+    @skipIfCustomProductLine
+    def test_incremental_totals01(self):
+        "Creation, edition, deletion."
+        user = self.login()
+        invoice = self.create_invoice_n_orgas('Invoice001', discount=Decimal('10'))[0]
+        vat = Vat.objects.get_or_create(value=Decimal('20'))[0]
+
+        create_line = partial(ProductLine.objects.create, user=user, vat_value=vat,
+                              related_document=invoice,
+                             )
+        line1 = create_line(on_the_fly_item='Flyyy 1', unit_price=Decimal('10'), quantity=3)
+        line2 = create_line(on_the_fly_item='Flyyy 2', unit_price=Decimal('5.55'), quantity=2)
+        invoice = self._assertTotalsConsistent(invoice)
+        self.assertEqual(Decimal('36.99'), invoice.total_no_vat)  # (30 + 11.10) * 0.9
+
+        # Edition (line retrieved from the DB)
+        line2 = self.refresh(line2)
+        line2.quantity = 4
+        line2.save()
+        invoice = self._assertTotalsConsistent(invoice)
+        self.assertEqual(Decimal('46.98'), invoice.total_no_vat)
+
+        # Second edition of the same instance
+        line2.vat_value = Vat.objects.get_or_create(value=Decimal('5.5'))[0]
+        line2.save()
+        self._assertTotalsConsistent(invoice)
+
+        # Edition with an instance which has been partially retrieved from the DB
+        line1_copy = ProductLine.objects.only('quantity').get(id=line1.id)
+        line1_copy.quantity = 1
+        line1_copy.save()
+        invoice = self._assertTotalsConsistent(invoice)
+        self.assertEqual(Decimal('28.98'), invoice.total_no_vat)
+
+        # Deletion
+        self.refresh(line1).delete()
+        invoice = self._assertTotalsConsistent(invoice)
+        self.assertEqual(Decimal('19.98'), invoice.total_no_vat)
+
+    @skipIfCustomProductLine
+    def test_incremental_totals02(self):
+        "The number of queries does not depend on the number of lines."
+        user = self.login()
+        invoice = self.create_invoice_n_orgas('Invoice001', discount=0)[0]
+
+        create_line = partial(ProductLine.objects.create, user=user,
+                              vat_value=Vat.get_default_vat(),
+                              related_document=invoice, unit_price=Decimal('10'),
+                             )
+
+        def add_line(name):
+            with CaptureQueriesContext() as ctxt:
+                create_line(on_the_fly_item=name)
+
+            return len(ctxt.captured_queries)
+
+        add_line('Flyyy 1')
+        add_line('Flyyy 2')
+        queries = add_line('Flyyy 3')
+
+        for i in range(4, 8):
+            self.assertEqual(queries, add_line('Flyyy {}'.format(i)))
+
+        self._assertTotalsConsistent(invoice)
+
+    @skipIfCustomProductLine
+    def test_incremental_totals_outdated_instance(self):
+        "The totals stored in the DB are used, not the ones of the instance."
+        user = self.login()
+        invoice = self.create_invoice_n_orgas('Invoice001', discount=0)[0]
+
+        create_line = partial(ProductLine.objects.create, user=user,
+                              vat_value=Vat.get_default_vat(),
+                              unit_price=Decimal('10'),
+                             )
+        create_line(on_the_fly_item='Flyyy 1', related_document=invoice)
+        create_line(on_the_fly_item='Flyyy 2', related_document=self.refresh(invoice))
+        create_line(on_the_fly_item='Flyyy 3', related_document=invoice)  # Outdated totals
+
+        invoice = self._assertTotalsConsistent(invoice)
+        self.assertEqual(Decimal('30'), invoice.total_no_vat)
+
+    @skipIfCustomProductLine
+    def test_incremental_totals_credit_note(self):
+        "Credit notes: clamped totals are fully computed."
+        user = self.login()
+        invoice, source, target = self.create_invoice_n_orgas('Invoice001', discount=0)
+        vat = Vat.get_default_vat()
+
+        create_line = partial(ProductLine.objects.create, user=user, vat_value=vat)
+        create_line(related_document=invoice, on_the_fly_item='Flyyy 1', unit_price=Decimal('100'))
+
+        credit_note = self.create_credit_note('Credit Note', source, target)
+        create_line(related_document=credit_note, on_the_fly_item='Refund', unit_price=Decimal('30'))
+        credit_note = self.refresh(credit_note)
+        self.assertEqual(Decimal('30'), credit_note.total_no_vat)
+
+        Relation.objects.create(subject_entity=credit_note, object_entity=invoice,
+                                type_id=REL_SUB_CREDIT_NOTE_APPLIED, user=user,
+                               )
+        invoice = self._assertTotalsConsistent(invoice)
+        self.assertEqual(Decimal('70'), invoice.total_no_vat)
+
+        credit_note.trash()
+        invoice = self._assertTotalsConsistent(invoice)
+        self.assertEqual(Decimal('100'), invoice.total_no_vat)
+
+        credit_note.restore()
+        invoice = self._assertTotalsConsistent(invoice)
+        self.assertEqual(Decimal('70'), invoice.total_no_vat)
+
+        # Credit note greater than the lines => clamped total
+        line = self.refresh(invoice).get_lines(ProductLine)[0]
+        line.unit_price = Decimal('20')
+        line.save()
+        invoice = self._assertTotalsConsistent(invoice)
+        self.assertEqual(Decimal('0'), invoice.total_no_vat)
+
+        line.unit_price = Decimal('50')
+        line.save()
+        invoice = self._assertTotalsConsistent(invoice)
+        self.assertEqual(Decimal('20'), invoice.total_no_vat)
+
+    @skipIfCustomProductLine
+    @skipIfCustomServiceLine
+    def test_save_lines(self):
+        user = self.login()
+        invoice = self.create_invoice_n_orgas('Invoice001', discount=0)[0]
+        vat = Vat.get_default_vat()
+
+        create_line = partial(ProductLine.objects.create, user=user, vat_value=vat,
+                              related_document=invoice,
+                             )
+        line1 = create_line(on_the_fly_item='Flyyy 1', unit_price=Decimal('10'))
+        line2 = create_line(on_the_fly_item='Flyyy 2', unit_price=Decimal('20'))
+        invoice = self.refresh(invoice)
+
+        line1 = self.refresh(line1)
+        line1.quantity = 3
+        new_lines = [
+            ProductLine(user=user, vat_value=vat, on_the_fly_item='Flyyy {}'.format(i),
+                        unit_price=Decimal('5'),
+                       ) for i in range(3, 6)
+        ]
+        new_lines.append(ServiceLine(user=user, vat_value=vat, on_the_fly_item='Flyyy 6',
+                                     unit_price=Decimal('1'),
+                                    )
+                        )
+        old_hline_id = HistoryLine.objects.order_by('-id').first().id
+
+        invoice.save_lines(lines=[line1, *new_lines], deleted_lines=[self.refresh(line2)])
+        self.assertDoesNotExist(line2)
+
+        invoice = self._assertTotalsConsistent(invoice)
+        self.assertEqual(Decimal('46'), invoice.total_no_vat)  # 30 + 3 * 5 + 1
+        self.assertEqual(4, len(invoice.get_lines(ProductLine)))
+        self.assertEqual(1, len(invoice.get_lines(ServiceLine)))
+
+        # The document is saved only once
+        self.assertEqual(1, HistoryLine.objects.filter(entity=invoice.id, type=TYPE_EDITION,
+                                                       id__gt=old_hline_id,
+                                                      ).count()
+                        )
+
+    @skipIfCustomProductLine
+    def test_lines_batch_error(self):
+        "The lines & the totals are rolled back together."
+        user = self.login()
+        invoice = self.create_invoice_n_orgas('Invoice001', discount=0)[0]
+
+        create_line = partial(ProductLine.objects.create, user=user,
+                              vat_value=Vat.get_default_vat(),
+                              related_document=invoice, unit_price=Decimal('10'),
+                             )
+        create_line(on_the_fly_item='Flyyy 1')
+
+        with self.assertRaises(ValueError):
+            with invoice.lines_batch():
+                create_line(on_the_fly_item='Flyyy 2')
+                raise ValueError('Invalid line')
+
+        invoice = self._assertTotalsConsistent(invoice)
+        self.assertEqual(Decimal('10'), invoice.total_no_vat)
+        self.assertEqual(1, len(invoice.get_lines(ProductLine)))
+
+    @skipIfCustomProductLine
+    def test_recompute_totals_command(self):
+        user = self.login()
+        invoice = self.create_invoice_n_orgas('Invoice001', discount=0)[0]
+        ProductLine.objects.create(user=user, vat_value=Vat.get_default_vat(),
+                                   related_document=invoice, unit_price=Decimal('10'),
+                                   on_the_fly_item='Flyyy',
+                                  )
+
+        Invoice.objects.filter(id=invoice.id).update(total_no_vat=Decimal('12'))
+
+        stdout = StringIO()
+        stderr = StringIO()
+        call_command('billing_recompute_totals', check=True, stdout=stdout, stderr=stderr)
+        self.assertEqual(Decimal('12'), self.refresh(invoice).total_no_vat)
+        self.assertIn('{}: 1 inconsistent document(s)'.format(Invoice._meta.label), stdout.getvalue())
+        self.assertIn('1 document(s) with inconsistent totals', stderr.getvalue())
+
+        stdout = StringIO()
+        call_command('billing_recompute_totals', stdout=stdout)
+        self.assertEqual(Decimal('10'), self.refresh(invoice).total_no_vat)
+        self.assertIn('{}: 1 inconsistent document(s) fixed'.format(Invoice._meta.label), stdout.getvalue())
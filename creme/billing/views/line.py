@@ -239,7 +239,9 @@ def multi_save_lines(request, document_id):
         return render(request, 'billing/frags/lines-errors.html', context={'errors': errors}, status=409)
 
     # Save all formset now that we haven't detect any errors
-    for formset in formset_to_save:
-        formset.save()
+    # NB: the totals of the document are updated only once.
+    with b_entity.lines_batch():
+        for formset in formset_to_save:
+            formset.save()
 
     return HttpResponse()
@@ -321,6 +321,11 @@ class CremeCoreConfig(CremeAppConfig):
         self.hook_datetime_widgets()
         self.hook_multiselection_widgets()
 
+        # NB: connects the signal handlers which invalidate the cached counts.
+        from .core import entities_count  # NOQA
+
+        self.register_config_cache()
+
         if settings.TESTS_ON:
             from .tests.fake_apps import ready
             ready()
@@ -610,6 +615,23 @@ class CremeCoreConfig(CremeAppConfig):
         forms.MultipleChoiceField.widget = forms.ModelMultipleChoiceField.widget = \
              widgets.UnorderedMultipleChoiceWidget
 
+    @staticmethod
+    def register_config_cache():
+        from . import models
+        from .core.config_cache import config_cache
+
+        config_cache.register(
+            models.FieldsConfig,
+            models.SettingValue,
+            models.SearchConfigItem,
+            models.BrickDetailviewLocation,
+            models.ButtonMenuItem,
+            models.HeaderFilter,
+            # Used by the cells of HeaderFilter
+            models.CustomField,
+            models.RelationType,
+        )
+
     @staticmethod
     def tag_ctype():
         from django.contrib.contenttypes.models import ContentType
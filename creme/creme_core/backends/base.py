@@ -56,6 +56,10 @@ class ExportBackend:
     verbose_name = "OVERLOAD ME"
     help_text = "OVERLOAD ME"
 
+    # <True> means the rows can be sent to the client as soon as they are
+    # generated, without building the whole file in memory (see stream()).
+    streamable = False
+
     def writerow(self, row):
         """
         Appends a row.
@@ -69,3 +73,23 @@ class ExportBackend:
         @param filename: file name
         """
         raise NotImplementedError
+
+    def stream(self, rows, filename):
+        """
+        Builds a streaming response (self.response) which consumes the rows lazily.
+        Only meaningful if the attribute 'streamable' is True.
+        @param rows: Iterable of rows (lists).
+        @param filename: file name
+        """
+        raise NotImplementedError
+
+    def save_in_file(self, rows, filename, user=None):
+        """
+        Writes the rows in a temporary file (the content is not kept in memory
+        if it's possible).
+        @param rows: Iterable of rows (lists).
+        @param filename: file name (without extension).
+        @param user: Owner of the file.
+        @return: A creme_core.models.FileRef instance.
+        """
+        raise NotImplementedError
@@ -19,29 +19,74 @@
 ################################################################################
 
 import csv
+from os.path import join, basename
 
-from django.http import HttpResponse
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
 from django.template.defaultfilters import slugify
 from django.utils.translation import gettext_lazy as _
 
+from ..models import FileRef
+from ..utils.file_handling import FileCreator
+
 from .base import ExportBackend
 
 
+class _EchoBuffer:
+    "Pseudo-buffer which returns the written string instead of storing it."
+    def write(self, value):
+        return value
+
+
 class CSVExportBackend(ExportBackend):
     id = 'csv'
     verbose_name = _("CSV File (delimiter: ',')")
     delimiter = ','
     help_text = ''
+    streamable = True
+    dir_parts = ('csv',)  # Sub-directory under {settings.MEDIA_ROOT}/upload
 
     def __init__(self):
         self.response = HttpResponse(content_type='text/csv')
-        self.writer = csv.writer(self.response, quoting=csv.QUOTE_ALL, delimiter=self.delimiter)
+        self.writer = self._build_writer(self.response)
+
+    def _build_writer(self, output):
+        return csv.writer(output, quoting=csv.QUOTE_ALL, delimiter=self.delimiter)
+
+    def _set_filename(self, filename):
+        self.response['Content-Disposition'] = 'attachment; filename={}.csv'.format(slugify(filename))
 
     def writerow(self, row):
         return self.writer.writerow(row)
 
     def save(self, filename):
-        self.response['Content-Disposition'] = 'attachment; filename={}.csv'.format(slugify(filename))
+        self._set_filename(filename)
+
+    def stream(self, rows, filename):
+        writerow = self._build_writer(_EchoBuffer()).writerow
+        self.response = StreamingHttpResponse((writerow(row) for row in rows),
+                                              content_type='text/csv',
+                                             )
+        self._set_filename(filename)
+
+    def save_in_file(self, rows, filename, user=None):
+        name = '{}.csv'.format(slugify(filename))
+        path = FileCreator(dir_path=join(settings.MEDIA_ROOT, 'upload', *self.dir_parts),
+                           name=name,
+                          ).create()
+
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writerow = self._build_writer(f).writerow
+
+            for row in rows:
+                writerow(row)
+
+        return FileRef.objects.create(user=user,
+                                      basename=name,
+                                      filedata='upload/{}/{}'.format('/'.join(self.dir_parts),
+                                                                     basename(path),
+                                                                    ),
+                                     )
 
 
 class SemiCSVExportBackend(CSVExportBackend):
@@ -43,16 +43,30 @@ class XLSExportBackend(XlwtWriter, ExportBackend):
         super().__init__(encoding=encoding)
         self.dir_path = join(settings.MEDIA_ROOT, 'upload', *self.dir_parts)
 
-    def save(self, filename):
+    def _save_fileref(self, filename, user=None):
         name = '{}.{}'.format(slugify(filename), self.id)
         path = FileCreator(dir_path=self.dir_path, name=name).create()
-        fileref = FileRef.objects.create(#  user=user,  TODO
+        fileref = FileRef.objects.create(user=user,
                                          basename=name,
                                          filedata='upload/{}/{}'.format(
                                                         '/'.join(self.dir_parts),
                                                         basename(path),
                                                     ),
                                         )
+        super().save(path)
+
+        return fileref
+
+    def save(self, filename):
+        fileref = self._save_fileref(filename)  # user=user,  TODO
         self.response = HttpResponseRedirect(reverse('creme_core__dl_file', args=(fileref.filedata,)))
 
-        super().save(path)
+    # NB: the XLS format needs the whole workbook in memory ; the file can be
+    #     generated in a job at least (see creme_jobs.mass_export).
+    def save_in_file(self, rows, filename, user=None):
+        writerow = self.writerow
+
+        for row in rows:
+            writerow(row)
+
+        return self._save_fileref(filename, user=user)
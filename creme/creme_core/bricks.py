@@ -389,6 +389,22 @@ class MassImportJobErrorsBrick(JobErrorsBrick):
     template_name = 'creme_core/bricks/massimport-errors.html'
 
 
+class MassExportFileBrick(Brick):
+    id_           = Brick.generate_id('creme_core', 'mass_export_file')
+    dependencies  = (Job,)
+    verbose_name  = 'Mass export file'
+    template_name = 'creme_core/bricks/massexport-file.html'
+    configurable  = False
+
+    def detailview_display(self, context):
+        job = context['job']
+
+        return self._render(self.get_template_context(
+                    context, job=job,
+                    fileref=job.type.get_fileref(job),
+        ))
+
+
 class JobsBrick(QuerysetBrick):
     id_           = QuerysetBrick.generate_id('creme_core', 'jobs')
     dependencies  = (Job,)
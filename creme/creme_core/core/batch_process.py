@@ -185,6 +185,10 @@ class BatchAction:
 
         return False
 
+    @property
+    def field_name(self):
+        return self._field_name
+
     def __str__(self):
         op = self._operator
         field = self._model._meta.get_field(self._field_name).verbose_name
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+
+################################################################################
+#    Creme is a free/open-source Customer Relationship Management software
+#    Copyright (C) 2019  Hybird
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+################################################################################
+
+import logging
+from threading import Lock
+from time import monotonic
+
+from django.db import connections, DEFAULT_DB_ALIAS
+from django.db.transaction import on_commit
+from django.db.models.signals import post_save, post_delete
+
+from ..global_info import get_per_request_cache
+from .versioned_cache import VersionedCache
+
+logger = logging.getLogger(__name__)
+
+
+class ConfigCache(VersionedCache):
+    """Cache for the instances of the configuration models (FieldsConfig,
+    SettingValue...) which are read by (nearly) each request, but which are
+    rarely modified.
+
+    The values are stored in the memory of the process (so they are shared by
+    the requests), and are related to a global generation stored in a shared
+    cache backend (see VersionedCache). The generation is changed when an instance of a registered
+    model is saved or deleted ; each process checks the generation once per
+    request (it's stored in the per-request cache) & clears its values when
+    it has changed.
+    The generation is changed again when the transaction is committed.
+    Modifications which do not send signals (eg: QuerySet.update()) are taken
+    into account only when the values expire.
+
+    BEWARE: the cached values are shared by the requests (& the threads), so
+    they must be considered as read-only.
+    """
+    key_prefix = 'creme_core-config_cache'
+    timeout_setting = 'CONFIG_CACHE_TIMEOUT'
+
+    def __init__(self, timeout=None, cache=None):
+        "See VersionedCache.__init__()."
+        super().__init__(timeout=timeout, cache=cache)
+        self.models = set()
+
+        self._values = {}
+        self._generation = None
+        self._expiration = 0
+        self._lock = Lock()
+
+    def _get_generation(self):
+        rcache = get_per_request_cache()
+        key = self.version_key()
+        generation = rcache.get(key)
+
+        if generation is None:
+            rcache[key] = generation = self.get_version()
+
+        return generation
+
+    def _get_values(self):
+        "Get the dictionary of values, which is cleared if it is outdated."
+        generation = self._get_generation()
+
+        with self._lock:
+            now = monotonic()
+
+            if generation != self._generation or now > self._expiration:
+                if self._values:
+                    logger.debug('ConfigCache: values are outdated (generation=%s)', generation)
+
+                self._values = {}
+                self._generation = generation
+                self._expiration = now + self.timeout
+
+            return self._values
+
+    def get(self, key, default=None):
+        """Get a cached value.
+        @param key: String.
+        @param default: Value returned if there is no value for this key (or
+               if the cache is disabled).
+        """
+        if not self.enabled:
+            return default
+
+        return self._get_values().get(key, default)
+
+    def get_many(self, keys):
+        """Get several cached values.
+        @param keys: Iterable of strings.
+        @return: A dictionary ; the missing keys are not present.
+        """
+        if not self.enabled:
+            return {}
+
+        values = self._get_values()
+
+        return {key: values[key] for key in keys if key in values}
+
+    def set(self, key, value):
+        self.set_many({key: value})
+
+    def set_many(self, values):
+        """Store several values.
+        @param values: Dictionary (keys are strings).
+        """
+        if values and self.enabled:
+            self._get_values().update(values)
+
+    def invalidate(self):
+        "Clear the values of all the processes."
+        if not self.enabled:
+            return
+
+        generation = self.new_version()
+        get_per_request_cache()[self.version_key()] = generation
+
+        with self._lock:
+            self._values = {}
+            self._generation = generation
+            self._expiration = monotonic() + self.timeout
+
+    def register(self, *models):
+        """Register the models which invalidate the cache when one of their
+        instances is saved or deleted.
+        @param models: Classes inheriting <django.db.models.Model>.
+        """
+        for model in models:
+            if model not in self.models:
+                self.models.add(model)
+                post_save.connect(self._invalidate_on_signal, sender=model)
+                post_delete.connect(self._invalidate_on_signal, sender=model)
+
+    def _invalidate_on_signal(self, sender, using=None, **kwargs):
+        self.invalidate()
+
+        # NB: other processes could have cached the old values (retrieved
+        #     before the end of the transaction) with the new generation.
+        if connections[using or DEFAULT_DB_ALIAS].in_atomic_block:
+            on_commit(self.invalidate, using=using)
+
+
+config_cache = ConfigCache()
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+
+################################################################################
+#    Creme is a free/open-source Customer Relationship Management software
+#    Copyright (C) 2019  Hybird
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+################################################################################
+
+from functools import partial
+from json import loads as json_load
+import logging
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import EmptyResultSet
+from django.db import connections, DatabaseError, DEFAULT_DB_ALIAS
+from django.db.models.signals import post_save, post_delete
+from django.db.transaction import on_commit
+from django.dispatch import receiver
+
+from ..models import CremeEntity, Relation, CremeProperty
+from ..signals import post_update_in_bulk
+
+from .versioned_cache import VersionedCache
+
+logger = logging.getLogger(__name__)
+
+
+class EntityTypeVersionedCache(VersionedCache):
+    """Versioned cache with a version per type of entity (the scope is the
+    ID of the ContentType).
+    """
+    # Models related to the entities, which invalidate the values related to
+    # the type of their entity ; sequence of tuples (model, name_of_the_FK).
+    related_models = [
+        (Relation,      'subject_entity'),
+        (CremeProperty, 'creme_entity'),
+    ]
+
+    def invalidate(self, model, using=None):
+        """Invalidate the values related to a type of entity.
+        If a transaction is in progress, the values are invalidated again
+        when it's committed.
+
+        @param model: Class inheriting <creme_core.models.CremeEntity>, or
+               instance of ContentType, or ContentType's ID.
+        @param using: Alias of the database used by the modification.
+        """
+        if isinstance(model, int):
+            ctype_id = model
+        elif isinstance(model, ContentType):
+            ctype_id = model.id
+        else:
+            ctype_id = ContentType.objects.get_for_model(model).id
+
+        self.new_version(ctype_id)
+
+        # NB: other processes could have cached the old values (retrieved
+        #     before the end of the transaction) with the new version.
+        if connections[using or DEFAULT_DB_ALIAS].in_atomic_block:
+            on_commit(partial(self.new_version, ctype_id), using=using)
+
+    def invalidate_4_instance(self, instance, using=None):
+        """Invalidate the values related to an instance (entity or instance of
+        one of the related models) which has been modified.
+        @param using: See invalidate().
+        """
+        if isinstance(instance, CremeEntity):
+            ctype_id = instance.entity_type_id
+        else:
+            for model, fk_name in self.related_models:
+                if isinstance(instance, model):
+                    ctype_id = self._get_entity_ctype_id(instance, fk_name)
+                    break
+            else:
+                return
+
+        if ctype_id is not None:
+            self.invalidate(ctype_id, using=using)
+
+    @staticmethod
+    def _get_entity_ctype_id(instance, fk_name):
+        field = type(instance)._meta.get_field(fk_name)
+
+        if field.is_cached(instance):
+            return getattr(instance, fk_name).entity_type_id
+
+        return CremeEntity.objects.filter(id=getattr(instance, field.attname)) \
+                                  .values_list('entity_type', flat=True) \
+                                  .first()
+
+
+class EntitiesCountCache(EntityTypeVersionedCache):
+    """Cache for the numbers of entities returned by queries (like the ones
+    of the list-views), which can be slow to compute with big tables.
+
+    The keys of the cached values are built with the SQL query, so they depend
+    on the filter, the search, the credentials of the user...
+    The values related to a type of entity are invalidated when an entity of
+    this type (or one of its Relations/CremeProperties) is saved/deleted.
+    Changes which do not send signals (eg: QuerySet.update()) are taken into
+    account only when the values expire.
+    """
+    key_prefix = 'creme_core-entities_count'
+    timeout_setting = 'ENTITIES_COUNT_CACHE_TIMEOUT'
+
+    def count(self, model, queryset):
+        """Get the number of instances returned by a QuerySet.
+
+        @param model: Class inheriting <creme_core.models.CremeEntity> ; the
+               invalidation of the value is related to this model.
+        @param queryset: QuerySet to count (not necessarily on "model" ; eg: on CremeEntity).
+        @return: Integer.
+        """
+        timeout = self.timeout
+
+        if not timeout:
+            return queryset.count()
+
+        try:
+            sql, params = queryset.query.sql_with_params()
+        except EmptyResultSet:
+            return 0
+
+        key = self.build_key(ContentType.objects.get_for_model(model).id,
+                             queryset.db, sql, params,
+                            )
+        cache = self.cache
+        count = cache.get(key)
+
+        if count is None:
+            count = queryset.count()
+            cache.set(key, count, timeout)
+
+        return count
+
+
+entities_count_cache = EntitiesCountCache()
+
+
+def estimate_count(queryset):
+    """Get the number of rows of a QuerySet estimated by the planner of the DBMS.
+    It's far faster than a real COUNT() with big tables, but it can be very inaccurate.
+
+    @param queryset: QuerySet instance.
+    @return: An integer, or <None> if the DBMS cannot give an estimation (eg: SQLite).
+    """
+    connection = connections[queryset.db]
+    vendor = connection.vendor
+
+    if vendor not in ('postgresql', 'mysql'):
+        return None
+
+    try:
+        sql, params = queryset.query.sql_with_params()
+    except EmptyResultSet:
+        return 0
+
+    try:
+        with connection.cursor() as cursor:
+            if vendor == 'postgresql':
+                cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+                plan = cursor.fetchone()[0]
+
+                if isinstance(plan, str):
+                    plan = json_load(plan)
+
+                return int(plan[0]['Plan']['Plan Rows'])
+
+            cursor.execute('EXPLAIN ' + sql, params)
+            row = cursor.fetchone()
+            columns = [col[0] for col in cursor.description]
+
+            # NB: estimation for the first table of the query.
+            return None if row is None or row[columns.index('rows')] is None else \
+                   int(row[columns.index('rows')])
+    except (DatabaseError, KeyError, IndexError, ValueError) as e:
+        logger.warning('estimate_count(): the estimation failed (%s)', e)
+
+        return None
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def _invalidate_entities_count(sender, instance, using=None, **kwargs):
+    if not settings.ENTITIES_COUNT_CACHE_TIMEOUT:
+        return
+
+    entities_count_cache.invalidate_4_instance(instance, using=using)
+
+
+@receiver(post_update_in_bulk)
+def _invalidate_entities_count_4_bulk(sender, **kwargs):
+    if settings.ENTITIES_COUNT_CACHE_TIMEOUT and issubclass(sender, CremeEntity):
+        entities_count_cache.invalidate(sender)
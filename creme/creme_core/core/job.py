@@ -25,13 +25,14 @@ import logging
 from uuid import uuid1
 
 from django.conf import settings
+from django.db import close_old_connections
 from django.db.models import Q
 from django.utils.formats import date_format
 from django.utils.timezone import now, localtime
 from django.utils.translation import gettext_lazy as _, gettext, activate
 
 from ..creme_jobs.base import JobType
-from ..global_info import set_global_info
+from ..global_info import set_global_info, clear_global_info
 from ..models import Job
 from ..utils.dates import make_aware_dt
 from ..utils.imports import import_apps_sub_modules
@@ -153,6 +154,21 @@ class _BaseJobManagerQueue:
 
     # def stop_job(self, job): TODO ?
 
+    def dispatch_job(self, job):
+        """Send the given Job to the pool of workers (see JobWorker) which
+        will run it.
+        Abstract method ; should be overridden.
+        @param job: Instance of creme_core.models.Job.
+        """
+        raise NotImplementedError
+
+    def get_dispatched_job(self, timeout):
+        """Retrieve the ID of a Job sent with dispatch_job().
+        @param timeout: Integer, in seconds.
+        @return: An integer (Job's ID) or None (which means "time out").
+        """
+        raise NotImplementedError
+
     def get_command(self, timeout):
         """Retrieved the sent command.
         @param timeout: Integer, in seconds.
@@ -182,11 +198,13 @@ if settings.TESTS_ON:
         def __init__(self):
             self.started_jobs = []
             self.refreshed_jobs = []
+            self.dispatched_jobs = []
 
         def clear(self):
             "Useful for test cases ; clear the internal lists."
             self.started_jobs.clear()
             self.refreshed_jobs.clear()
+            self.dispatched_jobs.clear()
 
         def start_job(self, job):
             self.started_jobs.append(job)
@@ -199,6 +217,14 @@ if settings.TESTS_ON:
             self.refreshed_jobs.append((job, data))
             return False
 
+        def dispatch_job(self, job):
+            self.dispatched_jobs.append(job)
+
+        def get_dispatched_job(self, timeout):
+            dispatched_jobs = self.dispatched_jobs
+
+            return dispatched_jobs.pop(0).id if dispatched_jobs else None
+
         def get_command(self, timeout):
             pass  # TODO: use in test
 
@@ -264,13 +290,14 @@ else:
     class JobManagerQueue(_BaseJobManagerQueue):
         verbose_name = _('Redis queue')
         JOBS_COMMANDS_KEY = 'creme_jobs'
+        JOBS_WORKERS_KEY = 'creme_jobs_workers'
         JOBS_PONG_KEY_PREFIX = 'creme_jobs_pong'
 
         def __init__(self):
             self._redis = StrictRedis.from_url(settings.JOBMANAGER_BROKER)
 
         def clear(self):
-            self._redis.delete(self.JOBS_COMMANDS_KEY)
+            self._redis.delete(self.JOBS_COMMANDS_KEY, self.JOBS_WORKERS_KEY)
             # print(dir(self._redis))
 
         @_redis_errors_2_bool
@@ -290,6 +317,23 @@ else:
             # self._redis.lpush(self.JOBS_COMMANDS_KEY, '{}-{}-{}'.format(CMD_REFRESH, job.id, json_dump(data)))
             self._redis.lpush(self.JOBS_COMMANDS_KEY, '{}-{}-{}'.format(CMD_REFRESH, job.id, json_encode(data)))
 
+        def dispatch_job(self, job):
+            logger.info('Job manager queue: dispatch "%s" to workers', job)
+            self._redis.lpush(self.JOBS_WORKERS_KEY, job.id)
+
+        def get_dispatched_job(self, timeout):
+            # NB: can raise RedisError (like get_command())
+            job_id = None
+            result = self._redis.brpop(self.JOBS_WORKERS_KEY, timeout)
+
+            if result is not None:  # None == timeout
+                try:
+                    job_id = int(result[1])
+                except ValueError:
+                    logger.warning('Job manager queue: invalid dispatched job "%s"', result)
+
+            return job_id
+
         def get_command(self, timeout):
             # NB: can raise RedisError (ConnectionError, TimeoutError, other ?!)
             # TODO: wrap in _BaseJobManagerQueue.Error ??
@@ -342,6 +386,85 @@ else:
             self._redis.setex(self._build_pong_key(ping_value), value=1, time=10)  # TODO: '10' in settings ?
 
 
+class JobWorker:
+    """Long-lived process which runs the Jobs dispatched by the JobManager
+    (see settings.JOBMANAGER_WORKERS) ; so django is set up once for all the
+    jobs run by the worker, & not once per job.
+
+    A worker stops itself after having run a given number of jobs, or when its
+    memory usage exceeds a ceiling ; the JobManager replaces it by a new one.
+    """
+    def __init__(self, max_jobs=None, max_memory=None):
+        """Constructor.
+        @param max_jobs: Number of jobs after which the worker stops.
+               <None> means "settings.JOBMANAGER_WORKER_MAX_JOBS".
+               0 means "no limit".
+        @param max_memory: Maximum memory usage (in MB) of the process ;
+               when it is reached, the worker stops (checked between jobs ;
+               POSIX only).
+               <None> means "settings.JOBMANAGER_WORKER_MAX_MEMORY".
+               0 means "no limit".
+        """
+        self._queue = JobManagerQueue.get_main_queue()
+        self._max_jobs = settings.JOBMANAGER_WORKER_MAX_JOBS if max_jobs is None else max_jobs
+        self._max_memory = settings.JOBMANAGER_WORKER_MAX_MEMORY if max_memory is None else max_memory
+        self.processed_jobs_count = 0
+
+    @staticmethod
+    def _memory_usage():
+        "@return: The peak of memory used by the process in MB, or None if it's unknown."
+        try:
+            import resource
+        except ImportError:  # Not a POSIX platform
+            return None
+
+        # NB: ru_maxrss is in kilobytes on Linux.
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024
+
+    @property
+    def should_be_recycled(self):
+        max_jobs = self._max_jobs
+        if max_jobs and self.processed_jobs_count >= max_jobs:
+            return True
+
+        max_memory = self._max_memory
+        if max_memory:
+            memory = self._memory_usage()
+
+            if memory is not None and memory >= max_memory:
+                return True
+
+        return False
+
+    def run_job(self, job_id):
+        logger.info('JobWorker: run job id=%s', job_id)
+        close_old_connections()
+
+        try:
+            job_type_registry(job_id)
+        except Exception:
+            logger.exception('JobWorker: error when running the job id=%s', job_id)
+        finally:
+            # The next job must not see the user/cache of this one.
+            clear_global_info()
+            close_old_connections()
+            self.processed_jobs_count += 1
+
+    def start(self, timeout=10):
+        logger.info('Job worker starts')
+
+        get_dispatched_job = self._queue.get_dispatched_job
+        run_job = self.run_job
+
+        while not self.should_be_recycled:
+            job_id = get_dispatched_job(timeout)
+
+            if job_id is not None:
+                run_job(job_id)
+
+        logger.info('Job worker stops: %s job(s) processed', self.processed_jobs_count)
+
+
 class JobManager:
     """Job scheduler ; it should run it its own process (see 'creme_job_manager'
     command), receive command (START...) from an inter-process queue, and spawn
@@ -361,11 +484,21 @@ class JobManager:
     The "period" of pseudo-periodic is computed each time they are run. But
     the manager runs them regularly (see settings.PSEUDO_PERIOD) in order to
     reduce the aftermath of a redis/... connection problem.
+
+    If settings.JOBMANAGER_WORKERS is not 0, the jobs are not run in a new
+    process each ; they are dispatched to a pool of pre-started processes
+    (see JobWorker), which are replaced when they stop (see
+    settings.JOBMANAGER_WORKER_MAX_JOBS & JOBMANAGER_WORKER_MAX_MEMORY).
     """
+    # Maximum time (in seconds) between 2 checks of the workers' liveness.
+    workers_check_period = 10
+
     def __init__(self):
         self._max_user_jobs = settings.MAX_USER_JOBS
         self._queue = JobManagerQueue.get_main_queue()
         self._procs = {}  # key: job.id; value: subprocess.Popen instance
+        self._workers_count = settings.JOBMANAGER_WORKERS
+        self._workers = []  # subprocess.Popen instances
 
         self._system_jobs = []  # Heap, which elements are (wakeup_date, job_instance) => closer wakeup in the first element.
         self._system_jobs_starts = {}
@@ -464,11 +597,41 @@ class JobManager:
     def _start_job(self, job):
         logger.info('JobManager: start %s', repr(job))
 
-        self._procs[job.id] = python_subprocess('import django; '
-                                                'django.setup(); '
-                                                'from creme.creme_core.core.job import job_type_registry; '
-                                                'job_type_registry({})'.format(job.id)
-                                               )
+        if self._workers_count:
+            self._queue.dispatch_job(job)
+        else:
+            self._procs[job.id] = python_subprocess('import django; '
+                                                    'django.setup(); '
+                                                    'from creme.creme_core.core.job import job_type_registry; '
+                                                    'job_type_registry({})'.format(job.id)
+                                                   )
+
+    def _start_worker(self):
+        return python_subprocess('import django; '
+                                 'django.setup(); '
+                                 'from creme.creme_core.core.job import JobWorker; '
+                                 'JobWorker().start()'
+                                )
+
+    def _check_workers(self):
+        "Replace the workers which have stopped (recycling, crash...)."
+        workers = self._workers
+
+        for i, worker in enumerate(workers):
+            return_code = worker.poll()
+
+            if return_code is not None:
+                if return_code:
+                    logger.warning('JobManager: worker (pid=%s) has stopped with code %s',
+                                   worker.pid, return_code,
+                                  )
+                else:
+                    logger.info('JobManager: worker (pid=%s) has been recycled', worker.pid)
+
+                workers[i] = self._start_worker()
+
+        for i in range(self._workers_count - len(workers)):
+            workers.append(self._start_worker())
 
     def _end_job(self, job):
         logger.info('JobManager: end %s', repr(job))
@@ -478,6 +641,10 @@ class JobManager:
 
     def _handle_kill(self, *args):
         logger.info('Job manager stops: %d running job(s)', len(self._procs))
+
+        for worker in self._workers:
+            worker.terminate()
+
         exit()
 
     def _handle_command_end(self, cmd):
@@ -593,6 +760,10 @@ class JobManager:
 
         enable_exit_handler(self._handle_kill)
 
+        workers_count = self._workers_count
+        if workers_count:
+            self._check_workers()
+
         users_jobs = self._users_jobs
         system_jobs = self._system_jobs
         system_jobs_starts = self._system_jobs_starts
@@ -624,6 +795,9 @@ class JobManager:
             else:
                 print('No user job at the moment.')
 
+            if workers_count:
+                print('Jobs are run by a pool of {} worker(s).'.format(workers_count))
+
             print('\nQuit the server with CTRL-BREAK.')
 
         MAX_USER_JOBS = self._max_user_jobs
@@ -634,9 +808,14 @@ class JobManager:
             CMD_START:   self._handle_command_start,
         }.get
 
+        workers_check_period = self.workers_check_period
+
         while True:
             now_value = now()
 
+            if workers_count:
+                self._check_workers()
+
             if system_jobs:
                 wakeup = system_jobs[0][0]
                 timeout = int((wakeup - now_value).total_seconds())
@@ -668,6 +847,10 @@ class JobManager:
                 # No timeout (because we do not need to be woken up by a time-out -- user-jobs are not periodic)
                 timeout = 0
 
+            if workers_count:
+                # We have to wake up regularly to replace the stopped workers.
+                timeout = min(timeout, workers_check_period) if timeout else workers_check_period
+
             while len(running_userjob_ids) <= MAX_USER_JOBS and users_jobs:
                 job = users_jobs.pop()
                 self._start_job(job)
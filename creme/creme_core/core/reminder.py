@@ -22,6 +22,7 @@ import logging
 # import warnings
 
 from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
 from django.core.mail import EmailMessage, get_connection
 from django.db.transaction import atomic
 from django.utils.timezone import now
@@ -37,6 +38,10 @@ class Reminder:
     id    = None  # Overload with a str object ; use generate_id()
     model = None  # Overload with a CremeModel
 
+    # Number of instances processed together by execute()
+    # (e-mails sent with one call to send_messages(), DateReminders created with one query...)
+    batch_size = 256
+
     def __init__(self):
         pass
 
@@ -55,29 +60,59 @@ class Reminder:
 
         return addresses
 
+    def get_emails_multi(self, objects):
+        """Get the addresses for several instances.
+        Override this method to avoid some queries per instance
+        (the default implementation calls get_emails() on each instance).
+
+        @param objects: Sequence of instances of <self.model>.
+        @return: A list of lists of addresses ; one list per instance, in the
+                 same order.
+        """
+        return [self.get_emails(obj) for obj in objects]
+
     def generate_email_subject(self, object):
         pass
 
     def generate_email_body(self, object):
         pass
 
-    def get_Q_filter(self):  # TODO: get_queryset instead ????
+    def get_Q_filter(self):
+        pass
+
+    def get_queryset(self):
+        "Instances to remind."
+        return self.model.objects.filter(self.get_Q_filter()).exclude(reminded=True)
+
+    def populate(self, objects):
+        """Hook called on each batch of instances before the e-mails are
+        generated ; override it to retrieve the related data with few queries.
+
+        @param objects: Sequence of instances of <self.model>.
+        """
         pass
 
     def ok_for_continue(self):
         return True
 
-    def send_mails(self, instance, job):
-        body    = self.generate_email_body(instance)
-        subject = self.generate_email_subject(instance)
-
+    def _build_messages(self, objects):
         EMAIL_SENDER = settings.EMAIL_SENDER
-        messages = [EmailMessage(subject, body, EMAIL_SENDER, [email])
-                        for email in self.get_emails(instance)
-                   ]
 
+        return [EmailMessage(self.generate_email_subject(obj),
+                             self.generate_email_body(obj),
+                             EMAIL_SENDER, [email],
+                            )
+                    for obj, emails in zip(objects, self.get_emails_multi(objects))
+                        for email in emails
+               ]
+
+    def _send_messages(self, messages, job, connection=None):
         try:
-            with get_connection() as connection:
+            if connection is None:
+                with get_connection() as connection:
+                    connection.send_messages(messages)
+            else:
+                connection.open()  # Does nothing if the connection is already opened.
                 connection.send_messages(messages)
         except Exception as e:
             logger.critical('Error while sending reminder emails (%s)', e)
@@ -91,27 +126,83 @@ class Reminder:
                 ],
             )
 
+            if connection is not None:
+                # NB: the connection may be broken ; it will be re-opened by the next batch.
+                self._close_connection(connection)
+
             return False
 
         return True  # Means 'OK'
 
+    @staticmethod
+    def _close_connection(connection):
+        try:
+            connection.close()
+        except Exception as e:
+            logger.warning('Error while closing the connection of reminder emails (%s)', e)
+
+    def send_mails(self, instance, job):
+        return self._send_messages(self._build_messages([instance]), job)
+
+    def send_mails_multi(self, instances, job, connection=None):
+        """Send the e-mails related to several instances with one call to
+        send_messages().
+
+        @param instances: Sequence of instances of <self.model>.
+        @param job: Job instance (used to store the errors).
+        @param connection: E-mail backend instance (see django.core.mail.get_connection()) ;
+               it's opened if needed, & it's not closed (excepted on error).
+               <None> means a new connection is used (& closed).
+        @return: True if there is no error.
+        """
+        return self._send_messages(self._build_messages(instances), job, connection)
+
     def execute(self, job):
+        """Send the e-mails for the instances to remind, & mark them as reminded.
+
+        The instances are processed by batches (see the attribute 'batch_size') ;
+        for each batch, the e-mails are sent with one call to send_messages()
+        (the same connection is used for the whole run), & the instances of
+        DateReminder & the field "reminded" are respectively created/updated
+        with one query.
+        Notice that the method save() of the instances is not called.
+        """
         if not self.ok_for_continue():
             return
 
         dt_now = now().replace(microsecond=0, second=0)
+        model = self.model
+        ctype = ContentType.objects.get_for_model(model)
+        queryset = self.get_queryset().order_by('id')
+        batch_size = self.batch_size
+        connection = get_connection()
+        last_id = None
 
-        for instance in self.model.objects.filter(self.get_Q_filter()).exclude(reminded=True):
-            self.send_mails(instance, job)
-
-            with atomic():
-                DateReminder.objects.create(date_of_remind=dt_now,
-                                            ident=FIRST_REMINDER,
-                                            object_of_reminder=instance,
-                                           )
-
-                instance.reminded = True
-                instance.save()
+        try:
+            while True:
+                # NB: the instances are paginated with their ID, because the
+                #     reminded instances are removed from the queryset.
+                batch = [*(queryset if last_id is None else queryset.filter(id__gt=last_id))[:batch_size]]
+
+                if not batch:
+                    break
+
+                last_id = batch[-1].id
+                self.populate(batch)
+                self.send_mails_multi(batch, job, connection)
+
+                with atomic():
+                    DateReminder.objects.bulk_create([
+                        DateReminder(date_of_remind=dt_now,
+                                     ident=FIRST_REMINDER,
+                                     model_content_type=ctype,
+                                     model_id=instance.id,
+                                    ) for instance in batch
+                    ])
+                    model.objects.filter(id__in=[instance.id for instance in batch]) \
+                                 .update(reminded=True)
+        finally:
+            self._close_connection(connection)
 
     def next_wakeup(self, now_value):
         """Returns the next time when the job manager should wake up in order
@@ -18,14 +18,145 @@
 #    along with this program.  If not, see <http://www.gnu.org/licenses/>.
 ################################################################################
 
+from collections import defaultdict
 from functools import reduce
 from operator import or_
+import re
+from unicodedata import combining, normalize
 
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Case, When, Value, IntegerField, Sum, Subquery, OuterRef
 from django.db.models.query import Q
+from django.db.transaction import atomic
 
-from ..models import SearchConfigItem, FieldsConfig
+from ..models import SearchConfigItem, SearchIndexEntry, FieldsConfig
+from ..utils.meta import FieldInfo
 from ..utils.string import smart_split
 
+_WORD_RE = re.compile(r'\w+')
+
+
+def tokenize(text):
+    """Split a string in normalized words, as they are stored in the search index.
+    Words are in lower case, without accent, & truncated if they are too long.
+
+    @param text: String.
+    @return: List of strings (can be empty).
+
+    >> tokenize('Élodie Dupont-Martin')
+    ['elodie', 'dupont', 'martin']
+    """
+    max_length = SearchIndexEntry._meta.get_field('token').max_length
+    text = ''.join(c for c in normalize('NFKD', text) if not combining(c))
+
+    return [word[:max_length] for word in _WORD_RE.findall(text.lower())]
+
+
+class SearchIndexer:
+    """Maintain the search index, ie the instances of SearchIndexEntry.
+
+    The indexed fields of a model are all the fields used by its search
+    configurations (whatever the role) ; so the index must be rebuilt when
+    these configurations are modified (see rebuild()).
+    """
+    def get_field_names(self, model):
+        """Get the names of the fields which are indexed for a model.
+
+        @param model: Class inheriting <creme_core.models.CremeEntity>.
+        @return: Sorted list of field names (can be deep, like "sector__title").
+        """
+        ctype = ContentType.objects.get_for_model(model)
+        sc_items = [*SearchConfigItem.objects.filter(content_type=ctype)] or \
+                   [SearchConfigItem(content_type=ctype)]  # Default configuration
+
+        return sorted({sfield.name
+                            for sci in sc_items
+                                if not sci.disabled
+                                    for sfield in sci.searchfields
+                      })
+
+    @staticmethod
+    def _iter_strings(value):
+        if value is None:
+            return
+
+        if isinstance(value, list):  # ManyToManyField
+            for sub_value in value:
+                yield from SearchIndexer._iter_strings(sub_value)
+        else:
+            yield str(value)
+
+    def _build_entries(self, model, entities):
+        ctype = ContentType.objects.get_for_model(model)
+        iter_strings = self._iter_strings
+        fields_info = [(field_name, FieldInfo(model, field_name))
+                            for field_name in self.get_field_names(model)
+                      ]
+
+        for entity in entities:
+            for field_name, field_info in fields_info:
+                tokens = {token
+                            for string in iter_strings(field_info.value_from(entity))
+                                for token in tokenize(string)
+                         }
+
+                for token in tokens:
+                    yield SearchIndexEntry(entity_id=entity.id, entity_ctype=ctype,
+                                           field=field_name, token=token,
+                                          )
+
+    def update_entities(self, entities):
+        """Update the entries of some entities.
+
+        @param entities: Iterable of instances of <creme_core.models.CremeEntity>
+               (real entities, not base CremeEntity instances).
+        """
+        entities_per_model = defaultdict(list)
+
+        for entity in entities:
+            entities_per_model[type(entity)].append(entity)
+
+        for model, model_entities in entities_per_model.items():
+            entries = [*self._build_entries(model, model_entities)]
+
+            with atomic():
+                SearchIndexEntry.objects.filter(entity__in=[e.id for e in model_entities]).delete()
+                SearchIndexEntry.objects.bulk_create(entries)
+
+    def rebuild(self, model, chunk_size=256):
+        """Build the entries of all the instances of a model.
+
+        @param model: Class inheriting <creme_core.models.CremeEntity>.
+        @param chunk_size: Number of entities retrieved by query.
+        @return: Number of indexed entities.
+        """
+        # Related instances are retrieved by chunk too
+        related_names = {field_name.split('__', 1)[0]
+                            for field_name in self.get_field_names(model)
+                                if '__' in field_name
+                        }
+        queryset = model.objects.order_by('id').prefetch_related(*related_names)
+        count = 0
+        last_id = None
+
+        SearchIndexEntry.objects.filter(entity_ctype=ContentType.objects.get_for_model(model)).delete()
+
+        while True:
+            entities = [*(queryset if last_id is None else queryset.filter(id__gt=last_id))[:chunk_size]]
+
+            if not entities:
+                break
+
+            SearchIndexEntry.objects.bulk_create(self._build_entries(model, entities))
+            count += len(entities)
+            last_id = entities[-1].id
+
+        return count
+
+
+search_index = SearchIndexer()
+
 
 class Searcher:
     """Build QuerySets to search strings contained in instances of some given models.
@@ -33,14 +164,21 @@ class Searcher:
     The search configuration (see the model SearchConfigItem) is used to know
     which fields to use.
     Hidden fields (see model FieldsConfig) are ignored.
+
+    When the search index is used (see settings.SEARCH_INDEX & SearchIndexer),
+    the searched words must be prefixes of words of the entities, & the
+    QuerySets are annotated with a "search_rank" (integer ; greater is better),
+    and ordered by relevance.
     """
-    def __init__(self, models, user):
+    def __init__(self, models, user, use_index=None):
         """Constructor.
 
         @param models: Iterable of classes inheriting <django.db.models.Model>.
         @param user: Instance of <django.contrib.auth.get_user_model()>.
+        @param use_index: Boolean ; <None> means the value of settings.SEARCH_INDEX is used.
         """
         self.user = user
+        self.use_index = settings.SEARCH_INDEX if use_index is None else use_index
         self._search_map = search_map = {}
         models = [*models]  # Several iterations
         fconfigs = FieldsConfig.get_4_models(models)
@@ -77,6 +215,30 @@ class Searcher:
 
         return result_q
 
+    @staticmethod
+    def _search_in_index(model, tokens, fields):
+        entries = SearchIndexEntry.objects.filter(
+            entity_ctype=ContentType.objects.get_for_model(model),
+            field__in=[field.name for field in fields],
+        )
+        matching_entries = entries.filter(reduce(or_, (Q(token__startswith=token) for token in tokens)))
+
+        # Exact words are better than prefixes
+        rank_qs = matching_entries.filter(entity=OuterRef('pk')) \
+                                  .values('entity') \
+                                  .annotate(rank=Sum(Case(When(token__in=tokens, then=Value(2)),
+                                                          default=Value(1),
+                                                          output_field=IntegerField(),
+                                                         ))) \
+                                  .values('rank')
+
+        # Each word must be contained in (at least) one field.
+        return model.objects.filter(*[Q(pk__in=entries.filter(token__startswith=token).values('entity'))
+                                          for token in tokens
+                                     ]) \
+                            .annotate(search_rank=Subquery(rank_qs, output_field=IntegerField())) \
+                            .order_by('-search_rank', 'id')
+
     def get_fields(self, model):
         """Get the list of SearchFields instances used to search in 'model'.
 
@@ -102,6 +264,12 @@ class Searcher:
 
         strings = smart_split(research)
 
+        if searchfields and self.use_index:
+            tokens = [*dict.fromkeys(token for string in strings for token in tokenize(string))]
+
+            if tokens:
+                return self._search_in_index(model, tokens, searchfields)
+
         # TODO: distinct() only if there is a JOIN...
         # return model.objects.filter(self._build_query(research, searchfields)).distinct() \
         #        if searchfields else None
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+
+################################################################################
+#    Creme is a free/open-source Customer Relationship Management software
+#    Copyright (C) 2019  Hybird
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+################################################################################
+
+from hashlib import sha1
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache as default_cache
+
+
+class VersionedCache:
+    """Base class for the caches whose values are related to versions stored
+    in a shared cache backend (so all the processes use the same versions).
+    Changing a version invalidates all the values which are related to it.
+
+    The versions are random (& not counters), so old values are not retrieved
+    if a version has been evicted from the shared cache.
+    """
+    # Prefix of the keys used by the cache (version & values).
+    key_prefix = 'creme_core-versioned'
+
+    # Name of the setting which gives the validity duration of the values.
+    timeout_setting = None
+
+    def __init__(self, timeout=None, cache=None):
+        """Constructor.
+
+        @param timeout: Validity duration of the values (in seconds) ; 0 means
+               "no cache" ; <None> means that the setting named by the attribute
+               "timeout_setting" is used.
+        @param cache: Instance of <django.core.cache.backends.base.BaseCache>
+               which stores the versions ; <None> means the default cache.
+        """
+        self._timeout = timeout
+        self.cache = default_cache if cache is None else cache
+
+    @property
+    def timeout(self):
+        timeout = self._timeout
+        return getattr(settings, self.timeout_setting) if timeout is None else timeout
+
+    @property
+    def enabled(self):
+        return bool(self.timeout)
+
+    def version_key(self, scope=None):
+        """Get the key of a version in the shared cache.
+        @param scope: Object which identifies a group of values (eg: the ID
+               of a ContentType) ; <None> means that the cache uses only one version.
+        """
+        key = '{}-version'.format(self.key_prefix)
+
+        return key if scope is None else '{}-{}'.format(key, scope)
+
+    def get_version(self, scope=None):
+        "Get the current version (a new one is created if needed)."
+        return self.cache.get_or_set(self.version_key(scope), lambda: uuid4().hex, None)
+
+    def new_version(self, scope=None):
+        "Change the version, & so invalidate the values related to it ; the new version is returned."
+        version = uuid4().hex
+        self.cache.set(self.version_key(scope), version, None)
+
+        return version
+
+    def build_key(self, scope, *parts):
+        """Build the key of a value related to the current version.
+        @param scope: See version_key().
+        @param parts: Objects which identify the value (they are converted to strings).
+        @return: A string.
+        """
+        return '{}-{}-{}'.format(
+            self.key_prefix, scope,
+            sha1('#'.join(str(part) for part in (self.get_version(scope), *parts))
+                    .encode()
+                ).hexdigest(),
+        )
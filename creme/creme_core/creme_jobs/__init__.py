@@ -2,6 +2,7 @@ from .temp_files_cleaner import temp_files_cleaner_type
 from .deletor import deletor_type
 from .batch_process import batch_process_type
 from .mass_import import mass_import_type
+from .mass_export import mass_export_type
 from .reminder import reminder_type
 
 
@@ -10,5 +11,6 @@ jobs = (
     deletor_type,
     batch_process_type,
     mass_import_type,
+    mass_export_type,
     reminder_type,
 )
@@ -18,18 +18,24 @@
 #    along with this program.  If not, see <http://www.gnu.org/licenses/>.
 ################################################################################
 
-from functools import partial
 import logging
 
+from django.conf import settings
 # TODO: move in function to do lazy loading ?
 from django.contrib.contenttypes.models import ContentType
 from django.core.exceptions import ValidationError, NON_FIELD_ERRORS
 from django.db.transaction import atomic
+from django.utils.timezone import now
 from django.utils.translation import gettext_lazy as _, ngettext, gettext
 
 from ..core.batch_process import BatchAction
 from ..core.paginator import FlowPaginator
 from ..models import EntityFilter, EntityCredentials, EntityJobResult
+from ..models.entity import _SEARCH_FIELD_MAX_LENGTH
+from ..models.history import _HLTEntityEdition
+from ..signals import post_update_in_bulk
+from ..utils.chunktools import iter_as_chunk
+from ..utils.db import can_update_in_bulk
 from .base import JobType, JobProgress
 
 logger = logging.getLogger(__name__)
@@ -39,6 +45,27 @@ class _BatchProcessType(JobType):
     id           = JobType.generate_id('creme_core', 'batch_process')
     verbose_name = _('Batch process')
 
+    # Number of entities updated by query in the set-based mode.
+    chunk_size = 256
+
+    @staticmethod
+    def _can_update_in_bulk(model, actions):
+        """Can the entities be modified with some bulk UPDATE queries (instead
+        of a .save() per entity) ?
+        It's not possible when a modified field is unique, or when the model
+        has some business logic (see creme_core.utils.db.can_update_in_bulk()).
+        """
+        meta = model._meta
+
+        for action in actions:
+            fname = action.field_name
+
+            if meta.get_field(fname).unique or \
+               any(fname in fnames for fnames in meta.unique_together):
+                return False
+
+        return can_update_in_bulk(model)
+
     def _get_actions(self, model, job_data):
         for kwargs in job_data['actions']:
             yield BatchAction(model, **kwargs)
@@ -94,36 +121,102 @@ class _BatchProcessType(JobType):
                                   key='id', per_page=1024,
                                  )
         actions = [*self._get_actions(model, job_data)]
-        create_result = partial(EntityJobResult.objects.create, job=job)
 
-        for entities_page in paginator.pages():
-            for entity in entities_page.object_list:
-                if entity.id in already_processed:
+        if self._can_update_in_bulk(model, actions):
+            for entities_page in paginator.pages():
+                entity_ids = [entity.id for entity in entities_page.object_list
+                                  if entity.id not in already_processed
+                             ]
+
+                for ids_chunk in iter_as_chunk(entity_ids, self.chunk_size):
+                    self._update_in_bulk(job, model, actions, ids_chunk)
+        else:
+            for entities_page in paginator.pages():
+                for entity in entities_page.object_list:
+                    if entity.id not in already_processed:
+                        self._update_one_by_one(job, model, actions, entity.id)
+
+    def _update_in_bulk(self, job, model, actions, entity_ids):
+        """Modify a chunk of entities with bulk_update() ; the results & the
+        lines of history are created in bulk too.
+        """
+        with atomic():
+            # NB: the new values are computed (& validated) in Python, & these
+            #     exact values are written ; as in the edition view, we perform
+            #     a select_for_update() to avoid overriding other fields.
+            entities = [*model.objects.select_for_update().filter(id__in=entity_ids)]
+            field_names = [field.name for field in model._meta.fields]
+            results = []
+            modified_entities = []
+            modified_fnames = set()
+
+            for entity in entities:
+                changed_fnames = {action.field_name for action in actions if action(entity)}
+
+                if not changed_fnames:
                     continue
 
-                changed = False
-
-                with atomic():
-                    try:
-                        final_entity = model.objects.select_for_update().get(id=entity.id)
-                    except model.DoesNotExist:
-                        continue
-
-                    for action in actions:
-                        if action(final_entity):
-                            changed = True
-
-                    if changed:
-                        try:
-                            final_entity.full_clean()
-                        except ValidationError as e:
-                            create_result(
-                                entity=final_entity,
-                                messages=self._humanize_validation_error(final_entity, e)
-                            )
-                        else:
-                            final_entity.save()
-                            create_result(entity=final_entity)
+                try:
+                    # NB: the other fields are not modified, so they are not validated
+                    entity.full_clean(exclude=[fname for fname in field_names
+                                                   if fname not in changed_fnames
+                                              ])
+                except ValidationError as e:
+                    results.append(EntityJobResult(
+                        job=job, entity=entity,
+                        messages=self._humanize_validation_error(entity, e),
+                    ))
+                else:
+                    results.append(EntityJobResult(job=job, entity=entity))
+                    modified_entities.append(entity)
+                    modified_fnames.update(changed_fnames)
+
+            if modified_entities:
+                modified = now()
+                modified_fnames.update(('modified', 'header_filter_search_field'))
+
+                for entity in modified_entities:
+                    entity.modified = modified
+                    entity.header_filter_search_field = \
+                        entity._search_field_value()[:_SEARCH_FIELD_MAX_LENGTH]
+
+                model.objects.bulk_update(modified_entities, [*modified_fnames])
+
+                _HLTEntityEdition.create_lines_multi(modified_entities)
+
+                if settings.SEARCH_INDEX:
+                    from ..core.search import search_index
+                    search_index.update_entities(modified_entities)
+
+            EntityJobResult.objects.bulk_create(results)
+
+        if modified_entities:
+            post_update_in_bulk.send(sender=model, instance_ids=[e.id for e in modified_entities])
+
+    def _update_one_by_one(self, job, model, actions, entity_id):
+        changed = False
+
+        with atomic():
+            try:
+                final_entity = model.objects.select_for_update().get(id=entity_id)
+            except model.DoesNotExist:
+                return
+
+            for action in actions:
+                if action(final_entity):
+                    changed = True
+
+            if changed:
+                try:
+                    final_entity.full_clean()
+                except ValidationError as e:
+                    EntityJobResult.objects.create(
+                        job=job, entity=final_entity,
+                        messages=self._humanize_validation_error(final_entity, e)
+                    )
+                else:
+                    final_entity.save()
+                    EntityJobResult.objects.create(job=job, entity=final_entity)
 
     def progress(self, job):
         count = EntityJobResult.objects.filter(job=job).count()
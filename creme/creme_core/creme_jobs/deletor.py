@@ -20,12 +20,18 @@
 
 from collections import Counter
 
-from django.db.models import ProtectedError, F
+from django.conf import settings
+from django.db.models import Model, ProtectedError, F
 from django.db.transaction import atomic
+from django.utils.timezone import now
 from django.utils.translation import gettext_lazy as _, gettext, ngettext
 
-from ..models import DeletionCommand, JobResult, FieldsConfig
-from ..signals import pre_replace_and_delete
+from ..models import CremeEntity, DeletionCommand, JobResult, FieldsConfig
+from ..models.entity import _SEARCH_FIELD_MAX_LENGTH
+from ..models.history import _HLTEntityEdition
+from ..signals import pre_replace_and_delete, post_update_in_bulk
+from ..utils.chunktools import iter_as_chunk
+from ..utils.db import can_update_in_bulk
 from ..utils.translation import get_model_verbose_name
 
 from .base import JobType, JobProgress
@@ -37,9 +43,111 @@ class _DeletorType(JobType):
     id           = JobType.generate_id('creme_core', 'deletor')
     verbose_name = _('Replace & delete')
 
-    def _execute(self, job):
+    # Number of instances updated by query in the set-based mode.
+    chunk_size = 256
+
+    @staticmethod
+    def _can_update_in_bulk(model_field):
+        """Can the instances referencing the deleted instance be updated with
+        some UPDATE queries (instead of a .save() per instance) ?
+        See creme_core.utils.db.can_update_in_bulk().
+        """
+        if model_field.many_to_many:
+            return False
+
+        model = model_field.model
+
+        # NB: the field is inherited by all types of entity (we need the real
+        #     entities to compute the search fields).
+        if model is CremeEntity:
+            return False
+
+        # Auxiliary entities (Address...) are ignored to keep their History simple.
+        if hasattr(model, 'get_related_entity'):
+            return False
+
+        return can_update_in_bulk(model)
+
+    def _update_in_bulk(self, dcom, model_field, old_value, new_value):
+        model = model_field.model
+        rel_mngr = model._default_manager
+        field_name = model_field.name
+        is_entity = issubclass(model, CremeEntity)
+        new_pk = new_value.pk if isinstance(new_value, Model) else new_value
+        updated_pks = rel_mngr.filter(**{field_name: old_value}).values_list('pk', flat=True)
+
+        updated_ids = []
+
+        for pks in iter_as_chunk(updated_pks, self.chunk_size):
+            with atomic():
+                if is_entity:
+                    # NB: we retrieve the instances to build the HistoryLines &
+                    #     the search fields ; as in the edition view, we perform
+                    #     a select_for_update() to avoid overriding other fields.
+                    entities = [*rel_mngr.select_for_update()
+                                         .filter(pk__in=pks, **{field_name: old_value})
+                               ]
+                    modified = now()
+                    count = rel_mngr.filter(pk__in=[e.pk for e in entities]) \
+                                    .update(**{field_name: new_value, 'modified': modified})
+
+                    search_changed = []
+                    for entity in entities:
+                        setattr(entity, field_name, new_value)
+                        entity.modified = modified
+
+                        search_value = entity._search_field_value()[:_SEARCH_FIELD_MAX_LENGTH]
+                        if search_value != entity.header_filter_search_field:
+                            entity.header_filter_search_field = search_value
+                            search_changed.append(entity)
+
+                    if search_changed:
+                        rel_mngr.bulk_update(search_changed, ['header_filter_search_field'])
+
+                    _HLTEntityEdition.create_lines_4_update(entities, model_field,
+                                                            old_value=old_value,
+                                                            new_value=new_pk,
+                                                           )
+
+                    if settings.SEARCH_INDEX:
+                        from ..core.search import search_index
+                        search_index.update_entities(entities)
+                else:
+                    count = rel_mngr.filter(pk__in=pks, **{field_name: old_value}) \
+                                    .update(**{field_name: new_value})
+
+                DeletionCommand.objects.filter(pk=dcom.pk) \
+                                       .update(updated_count=F('updated_count') + count)
+
+            updated_ids.extend(pks)
+
+        if updated_ids:
+            post_update_in_bulk.send(sender=model, instance_ids=updated_ids)
+
+    def _update_one_by_one(self, dcom, model_field, old_value, new_value):
         dcom_mngr = DeletionCommand.objects
-        dcom = dcom_mngr.get(job=job)
+        rel_mngr   = model_field.model._default_manager
+        field_name = model_field.name
+
+        for pk in rel_mngr.filter(**{field_name: old_value}).values_list('pk', flat=True):
+            # NB1: we perform a .save(), not an .update() in order to:
+            #       - let the model compute it's business logic (if there is one).
+            #       - get an HistoryLine for entities.
+            # NB2: as in edition view, we perform a select_for_update() to avoid
+            #      overriding other fields (if there are concurrent accesses)
+            with atomic():
+                related_instance = rel_mngr.select_for_update().filter(pk=pk).first()
+                if related_instance is not None:
+                    if model_field.many_to_many:
+                        getattr(related_instance, field_name).add(new_value)
+                    else:
+                        setattr(related_instance, field_name, new_value)
+                        related_instance.save()
+
+                dcom_mngr.filter(pk=dcom.pk).update(updated_count=F('updated_count') + 1)
+
+    def _execute(self, job):
+        dcom = DeletionCommand.objects.get(job=job)
         instance_2_del = dcom.content_type \
                              .model_class() \
                              ._default_manager \
@@ -49,32 +157,17 @@ class _DeletorType(JobType):
         # TODO: regroup by same CType & update several fields at once when its possible
         for replacer in dcom.replacers:
             new_value = replacer.get_value()
-
             model_field = replacer.model_field
-            rel_mngr   = model_field.model._default_manager
-            field_name = model_field.name
 
             pre_replace_and_delete.send_robust(sender=instance_2_del,
                                                model_field=model_field,
                                                replacing_instance=new_value,
                                               )
 
-            for pk in rel_mngr.filter(**{field_name: instance_2_del.pk}).values_list('pk', flat=True):
-                # NB1: we perform a .save(), not an .update() in order to:
-                #       - let the model compute it's business logic (if there is one).
-                #       - get an HistoryLine for entities.
-                # NB2: as in edition view, we perform a select_for_update() to avoid
-                #      overriding other fields (if there are concurrent accesses)
-                with atomic():
-                    related_instance = rel_mngr.select_for_update().filter(pk=pk).first()
-                    if related_instance is not None:
-                        if model_field.many_to_many:
-                            getattr(related_instance, field_name).add(new_value)
-                        else:
-                            setattr(related_instance, field_name, new_value)
-                            related_instance.save()
-
-                    dcom_mngr.filter(pk=dcom.pk).update(updated_count=F('updated_count') + 1)
+            update = self._update_in_bulk \
+                     if self._can_update_in_bulk(model_field) else \
+                     self._update_one_by_one
+            update(dcom, model_field, old_value=instance_2_del.pk, new_value=new_value)
 
         try:
             instance_2_del.delete()
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+
+################################################################################
+#    Creme is a free/open-source Customer Relationship Management software
+#    Copyright (C) 2020  Hybird
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+################################################################################
+
+import logging
+
+from django.contrib.contenttypes.models import ContentType
+from django.http import HttpRequest, QueryDict
+from django.utils.translation import gettext_lazy as _, gettext
+
+from ..models import FileRef
+
+from .base import JobType
+
+logger = logging.getLogger(__name__)
+
+
+class _MassExportType(JobType):
+    """Export a list of entities in a file (CSV, XLS...) outside the request
+    cycle ; it's useful for the big lists.
+    The parameters of the export are the GET arguments of the view
+    creme_core.views.mass_export.MassExport.
+    """
+    id           = JobType.generate_id('creme_core', 'mass_export')
+    verbose_name = _('Mass export')
+
+    def _build_view(self, job):
+        from ..views.mass_export import MassExport
+
+        request = HttpRequest()
+        request.GET = QueryDict(job.data['GET'])
+        request.user = job.user
+
+        view = MassExport()
+        view.setup(request)
+
+        return view
+
+    def _get_ctype(self, job_data):
+        return ContentType.objects.get_for_id(job_data['ctype'])
+
+    def _execute(self, job):
+        fileref = self._build_view(job).save_in_file()
+
+        job_data = job.data
+        job_data['fileref'] = fileref.id
+        job.data = job_data  # NB: saved by JobType.execute()
+
+    def get_fileref(self, job):
+        "@return: The FileRef containing the exported file, or None if the job is not finished."
+        fileref_id = job.data.get('fileref')
+
+        return FileRef.objects.filter(id=fileref_id).first() if fileref_id else None
+
+    @property
+    def results_bricks(self):
+        from ..bricks import JobErrorsBrick, MassExportFileBrick
+        return [MassExportFileBrick(), JobErrorsBrick()]
+
+    def get_description(self, job):
+        try:
+            desc = [
+                gettext('Export «{model}»').format(
+                    model=self._get_ctype(job.data).model_class()._meta.verbose_name_plural,
+                ),
+            ]
+        except Exception:
+            logger.exception('Error in _MassExportType.get_description')
+            desc = ['?']
+
+        return desc
+
+
+mass_export_type = _MassExportType()
@@ -18,11 +18,13 @@
 #    along with this program.  If not, see <http://www.gnu.org/licenses/>.
 ################################################################################
 
+from collections import defaultdict, OrderedDict
 from functools import partial
 from itertools import zip_longest
 import logging
 from os.path import splitext
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.contenttypes.models import ContentType
 from django.core import validators
@@ -58,6 +60,7 @@ from ..models import (
     CustomField, CustomFieldValue, CustomFieldEnumValue,
     MassImportJobResult,
 )
+from ..utils.chunktools import iter_as_chunk
 from ..utils.meta import ModelFieldEnumerator
 from ..utils.url import TemplateURLBuilder
 from .base import CremeForm, CremeModelForm, FieldBlockManager, _CUSTOM_NAME
@@ -69,6 +72,158 @@ logger = logging.getLogger(__name__)
 Document = get_document_model()
 
 
+class LookupCache:
+    """Cache for the instances retrieved by the extractors during an import ;
+    it avoids to perform a query for each line when the same values are used
+    in many lines.
+    The keys are tuples (model, field_name, value) ; the values are lists of
+    the instances which match (ie: model.objects.filter(**{field_name: value}),
+    in the order of QuerySet.first()). So a cache can be shared by extractors
+    which have different rules (get(), filter(), first() + credentials...).
+    The cache is bounded ; the least recently used entries are removed first.
+
+    The instances created by the extractors must be added with add() ; if the
+    line is finally not imported (i.e. the save point is rolled back) rollback()
+    must be called (commit() must be called in the other case).
+    The instances created/modified by other ways (eg: the imported entities)
+    must invalidate the entries related to their model with invalidate().
+    """
+    def __init__(self, max_size=None):
+        """Constructor.
+        @param max_size: Maximum number of entries ;
+               <None> means <settings.MASS_IMPORT_CACHE_SIZE>.
+        """
+        self._max_size = max(settings.MASS_IMPORT_CACHE_SIZE if max_size is None else max_size, 1)
+        self._entries = OrderedDict()
+        self._created = []  # Created instances which are not committed yet
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _build_queryset(model):
+        qs = model.objects.all()
+
+        return qs if qs.ordered else qs.order_by('pk')  # See QuerySet.first()
+
+    def _set(self, key, instances):
+        entries = self._entries
+        entries[key] = instances
+        entries.move_to_end(key)
+
+        if len(entries) > self._max_size:
+            entries.popitem(last=False)
+
+    def get(self, model, field_name, value):
+        """Get the instances matching a value (a query is performed if the
+        value is not in the cache).
+        @param model: Model class.
+        @param field_name: Name of the searched field.
+        @param value: String.
+        @return: A list of instances (can be empty).
+        @raise: Exceptions related to the query (bad value...).
+        """
+        key = (model, field_name, value)
+        instances = self._entries.get(key)
+
+        if instances is None:
+            instances = [*self._build_queryset(model).filter(**{field_name: value})]
+            self._set(key, instances)
+        else:
+            self._entries.move_to_end(key)
+
+        return instances
+
+    def prefetch(self, model, field_name, values):
+        """Retrieve with one query the instances matching several values.
+        @param model: Model class.
+        @param field_name: Name of the searched field.
+        @param values: Iterable of strings.
+        """
+        entries = self._entries
+        values = {value for value in values if value and (model, field_name, value) not in entries}
+
+        if not values:
+            return
+
+        try:
+            attname = model._meta.get_field(field_name).attname
+        except FieldDoesNotExist:
+            logger.warning('Mass import: cannot prefetch the field "%s" of %s', field_name, model)
+            return
+
+        found = defaultdict(list)
+        try:
+            for instance in self._build_queryset(model).filter(**{'{}__in'.format(field_name): values}):
+                found[str(getattr(instance, attname))].append(instance)
+        except Exception as e:
+            # get() will raise the error (for the line with the invalid value)
+            logger.warning('Mass import: error when prefetching the field "%s" of %s: %s',
+                           field_name, model, e,
+                          )
+            return
+
+        # NB: values which are not found are not stored, because they can be
+        #     found with a different string representation (by get()).
+        for value, instances in found.items():
+            if value in values:
+                self._set((model, field_name, value), instances)
+
+    def add(self, model, field_name, value, instance):
+        "Add a created instance which matches the given value."
+        key = (model, field_name, value)
+        instances = self._entries.get(key)
+
+        if instances is None:
+            self._set(key, [instance])
+        else:
+            instances.append(instance)
+
+        self._created.append(instance)
+
+    def invalidate(self, model):
+        """Remove the entries related to a model (or to one of its parent
+        classes), because an instance of this model has been created or
+        modified (so the next searches perform a query).
+        """
+        entries = self._entries
+
+        for key in [key for key in entries if issubclass(model, key[0])]:
+            del entries[key]
+
+    def commit(self):
+        "The instances added since the last commit()/rollback() are kept."
+        self._created.clear()
+
+    def rollback(self):
+        "The instances added since the last commit()/rollback() are removed."
+        created = self._created
+
+        if created:
+            # NB: the instances can have been retrieved with other keys too.
+            for instances in self._entries.values():
+                instances[:] = [i for i in instances if i not in created]
+
+            created.clear()
+
+
+def _get_unique(model, instances):
+    "Get the only instance of a list (the errors of QuerySet.get() are raised)."
+    count = len(instances)
+
+    if count == 1:
+        return instances[0]
+
+    if not count:
+        raise model.DoesNotExist(
+            '{} matching query does not exist.'.format(model._meta.object_name)
+        )
+
+    raise model.MultipleObjectsReturned(
+        'get() returned more than one {} -- it returned {}!'.format(model._meta.object_name, count)
+    )
+
+
 def get_backend(filedata):
     filename = filedata.name
     pathname, extension = splitext(filename)
@@ -149,6 +304,7 @@ class Extractor:
         self._fk_model = None
         self._m2m = None
         self._fk_form = None
+        self._lookup_cache = LookupCache()
 
     def set_subfield_search(self, subfield_search, subfield_model, multiple, create_if_unfound):
         self._subfield_search = str(subfield_search)
@@ -158,6 +314,27 @@ class Extractor:
         if create_if_unfound:
             self._fk_form = modelform_factory(subfield_model, fields='__all__')  # TODO: creme_config form ??
 
+    def set_lookup_cache(self, cache):
+        "@param cache: Instance of LookupCache (can be shared by several extractors)."
+        self._lookup_cache = cache
+
+    def prefetch(self, lines):
+        """Retrieve with one query the instances referenced by a group of
+        lines (see set_subfield_search()) ; so extract_value() does not
+        perform a query for each line.
+        @param lines: Sequence of lines (lists of strings).
+        """
+        index = self._column_index
+        subfield_search = self._subfield_search
+
+        if index and subfield_search:
+            self._lookup_cache.prefetch(
+                model=self._fk_model,
+                field_name=subfield_search,
+                # NB: the short lines are ignored (the error is reported by extract_value())
+                values=(line[index - 1] for line in lines if len(line) >= index),
+            )
+
     def extract_value(self, line):
         value = self._default_value
         err_msg = None
@@ -166,13 +343,15 @@ class Extractor:
             line_value = line[self._column_index - 1]
 
             if line_value:
-                if self._subfield_search:
-                    data = {self._subfield_search: line_value}
-                    retriever = self._fk_model.objects.filter if self._m2m else \
-                                self._fk_model.objects.get
+                subfield_search = self._subfield_search
+
+                if subfield_search:
+                    model = self._fk_model
+                    data = {subfield_search: line_value}
 
                     try:
-                        value = retriever(**data)
+                        found = self._lookup_cache.get(model, subfield_search, line_value)
+                        value = found if self._m2m else _get_unique(model, found)
                     except Exception as e:
                         fk_form = self._fk_form
 
@@ -183,6 +362,7 @@ class Extractor:
                                 creator.save()
 
                                 value = creator.instance
+                                self._lookup_cache.add(model, subfield_search, line_value, value)
                             else:
                                 err_msg = gettext('Error while extracting value: tried to retrieve '
                                                   'and then build «{value}» (column {column}) on {model}. '
@@ -420,6 +600,30 @@ class EntityExtractor:
     def __init__(self, extraction_cmds):
         "@params extraction_cmds: List of EntityExtractionCommands."
         self._commands = extraction_cmds
+        self._lookup_cache = LookupCache()
+
+    def set_lookup_cache(self, cache):
+        "@param cache: Instance of LookupCache (can be shared by several extractors)."
+        self._lookup_cache = cache
+
+    def prefetch(self, lines):
+        """Retrieve with one query per command the entities referenced by a
+        group of lines ; so extract_value() does not perform a query for
+        each line.
+        @param lines: Sequence of lines (lists of strings).
+        """
+        prefetch = self._lookup_cache.prefetch
+
+        for cmd in self._commands:
+            index = cmd.column_index
+
+            if index:
+                prefetch(
+                    model=cmd.model,
+                    field_name=cmd.field_name,
+                    # NB: the short lines are ignored (the error is reported by _extract_entity())
+                    values=(line[index - 1] for line in lines if len(line) >= index),
+                )
 
     def _extract_entity(self, line, user, command):
         index = command.column_index
@@ -433,12 +637,13 @@ class EntityExtractor:
             return None, None
 
         model = command.model
+        field_name = command.field_name
         error_msg = None
         extracted = None
-        kwargs = {command.field_name: value}
+        kwargs = {field_name: value}
 
         try:
-            extracted = model.objects.get(**kwargs)
+            extracted = _get_unique(model, self._lookup_cache.get(model, field_name, value))
         except Exception as e:
             if command.create:
                 created = model(user=user, **kwargs)
@@ -455,6 +660,7 @@ class EntityExtractor:
                     )
                 else:
                     extracted = created
+                    self._lookup_cache.add(model, field_name, value, created)
             else:
                 error_msg = _('Error while extracting value [{raw_error}]: '
                               'tried to retrieve «{value}» on {model}').format(
@@ -624,9 +830,27 @@ class RelationExtractor:
         self._subfield_search = str(subfield_search)
         self._related_model   = related_model
         self._related_form    = modelform_factory(related_model, fields='__all__') if create_if_unfound else None
+        self._lookup_cache = LookupCache()
 
     related_model = property(lambda self: self._related_model)
 
+    def set_lookup_cache(self, cache):
+        "@param cache: Instance of LookupCache (can be shared by several extractors)."
+        self._lookup_cache = cache
+
+    def prefetch(self, lines):
+        """Retrieve with one query the entities referenced by a group of lines ;
+        so extract_value() does not perform a query for each line.
+        @param lines: Sequence of lines (lists of strings).
+        """
+        index = self._column_index
+        self._lookup_cache.prefetch(
+            model=self._related_model,
+            field_name=self._subfield_search,
+            # NB: the short lines are ignored (the error is reported by extract_value())
+            values=(line[index - 1] for line in lines if len(line) >= index),
+        )
+
     def create_if_unfound(self):
         return self._related_form is not None
 
@@ -640,9 +864,17 @@ class RelationExtractor:
         if value:
             data = {self._subfield_search: value}
             model = self._related_model
+            has_perm = user.has_perm_to_view
 
             try:
-                object_entity = EntityCredentials.filter(user, model.objects.filter(**data)).first()
+                # NB: like EntityCredentials.filter(user, ...).first()
+                object_entity = next(
+                    (entity
+                        for entity in self._lookup_cache.get(model, self._subfield_search, value)
+                            if has_perm(entity)
+                    ),
+                    None
+                )
             except Exception as e:
                 err_msg = gettext('Error while extracting value to build a Relation: '
                                   'tried to retrieve {field}=«{value}» (column {column}) on {model}. '
@@ -661,6 +893,7 @@ class RelationExtractor:
 
                         if creator.is_valid():
                             object_entity = creator.save()
+                            self._lookup_cache.add(model, self._subfield_search, value, object_entity)
                         else:
                             err_msg = gettext('Error while extracting value: '
                                               'tried to build {model} with data={data} '
@@ -687,6 +920,14 @@ class MultiRelationsExtractor:
     def __init__(self, extractors):
         self._extractors = extractors
 
+    def set_lookup_cache(self, cache):
+        for extractor in self._extractors:
+            extractor.set_lookup_cache(cache)
+
+    def prefetch(self, lines):
+        for extractor in self._extractors:
+            extractor.prefetch(lines)
+
     def extract_value(self, line, user):
         for extractor in self._extractors:
             yield extractor.extract_value(line, user)
@@ -1088,7 +1329,140 @@ class ImportForm(CremeModelForm):
     def _pre_instance_save(self, instance, line):  # Overload me
         pass
 
+    def _prefetch(self, lines):
+        """Hook called before the processing of each group of lines ; it's
+        useful to retrieve the data needed by the whole group with a few queries.
+        @param lines: List of lines (list of strings).
+        """
+        for extractor in self._get_lookup_extractors():
+            extractor.prefetch(lines)
+
+    def _post_lines_processing(self, lines, job_results):
+        """Hook called after the processing of each group of lines (within
+        the transaction of the group) ; it's useful to save the data of the
+        whole group with a few queries.
+        @param lines: List of lines (list of strings).
+        @param job_results: List of MassImportJobResults related to the lines ;
+               they are not saved yet, so errors can be added to their messages.
+        """
+        pass
+
+    def _get_lookup_extractors(self):
+        "Generator of the cleaned extractors which can use a LookupCache."
+        for cleaned in self.cleaned_data.values():
+            if isinstance(cleaned, (Extractor, EntityExtractor, MultiRelationsExtractor)):
+                yield cleaned
+
+    def _process_line(self, line, *, job, regular_fields, extractor_fields, key_fields, lookup_cache):
+        """Create/update an instance from a line.
+        @param lookup_cache: Instance of LookupCache used by the extractors ;
+               the instances created by them are removed if the line is not imported.
+        @return: An instance of MassImportJobResult (not saved).
+        """
+        model_class = self._meta.model
+        get_cleaned = self.cleaned_data.get
+        append_error = self.append_error
+        is_empty_value = lambda s: s is None or isinstance(s, str) and not s.strip()
+        job_result = MassImportJobResult(job=job, line=line)
+
+        try:
+            with atomic():
+                instance = model_class()
+                updated = False  # 'True' means: object has been updated, not created from scratch
+
+                extr_values = []
+                for fname, extractor in extractor_fields:
+                    extr_value, err_msg = extractor.extract_value(line)
+
+                    # TODO: Extractor.extract_value() should return a ExtractedValue
+                    #       instead of a tuple (an so we could remove the ugly following line...)
+                    is_empty = not extractor._column_index or is_empty_value(line[extractor._column_index - 1])
+                    extr_values.append((fname, extr_value, is_empty))
+
+                    append_error(err_msg)
+
+                if key_fields:
+                    # We avoid using exception within 'atomic' block
+                    found = self._find_existing_instances(
+                        model=model_class,
+                        field_names=key_fields,
+                        extracted_values=extr_values,
+                    )[:2]
+
+                    if found:
+                        if len(found) == 1:
+                            try:
+                                instance = model_class.objects.select_for_update().get(pk=found[0].pk)
+                            except model_class.DoesNotExist:
+                                pass
+                            else:
+                                job_result.updated = updated = True
+                        else:
+                            append_error(gettext(
+                                'Several entities corresponding to the search have been found. '
+                                'So a new entity have been created to avoid errors.'
+                            ))
+
+                for fname, cleaned_value in regular_fields:
+                    setattr(instance, fname, cleaned_value)
+
+                for fname, extr_value, is_empty in extr_values:
+                    if updated and is_empty:
+                        continue
+
+                    setattr(instance, fname, extr_value)
+
+                self._pre_instance_save(instance, line)
+
+                instance.full_clean()
+                instance.save()
+
+                # NB: the next lines can search the imported instance (eg: the
+                #     Relations of a Contact to another Contact of the file).
+                lookup_cache.invalidate(model_class)
+
+                self._post_instance_creation(instance, line, updated)
+
+                for m2m in self._meta.model._meta.many_to_many:
+                    extractor = get_cleaned(m2m.name)  # Can be a regular_field ????
+                    if extractor:
+                        # TODO: factorise
+                        extr_value, err_msg = extractor.extract_value(line)
+                        getattr(instance, m2m.name).set(extr_value)
+                        append_error(err_msg)
+
+                job_result.entity = instance
+                if self.import_errors:
+                    job_result.messages = self.import_errors
+        except Exception as e:
+            logger.exception('Exception in Mass importing')
+            lookup_cache.rollback()
+
+            try:
+                for messages in e.message_dict.values():
+                    for message in messages:
+                        append_error(str(message))
+            except:
+                append_error(str(e))
+
+            job_result.messages = self.import_errors
+        else:
+            lookup_cache.commit()
+
+        self.import_errors.clear()
+
+        return job_result
+
     def process(self, job):
+        """Import the lines of the file.
+        The lines are processed by groups (see settings.MASS_IMPORT_BATCH_SIZE) ;
+        each group is imported in its own transaction (with a save point per
+        line, so an error in a line does not cancel the other lines), the
+        referenced instances are retrieved for the whole group (see _prefetch())
+        & the results are inserted in bulk.
+        The extractors share a LookupCache during the whole job, so a value
+        which is used by several lines is retrieved (or created) only once.
+        """
         model_class = self._meta.model
         get_cleaned = self.cleaned_data.get
 
@@ -1122,96 +1496,30 @@ class ImportForm(CremeModelForm):
                 next(lines)
 
             # Resuming
+            # NB: a group of lines & its results are committed together, so
+            #     the number of results is the number of processed lines.
             for i in range(MassImportJobResult.objects.filter(job=job).count()):
                 next(lines)
 
-            append_error = self.append_error
-            key_fields = frozenset(get_cleaned('key_fields'))
-            is_empty_value = lambda s: s is None or isinstance(s, str) and not s.strip()
+            lookup_cache = LookupCache()
+            for extractor in self._get_lookup_extractors():
+                extractor.set_lookup_cache(lookup_cache)
 
-            for i, line in enumerate(filter(None, lines), start=1):
-                job_result = MassImportJobResult(job=job, line=line)
-
-                try:
-                    with atomic():
-                        instance = model_class()
-                        updated = False  # 'True' means: object has been updated, not created from scratch
-
-                        extr_values = []
-                        for fname, extractor in extractor_fields:
-                            extr_value, err_msg = extractor.extract_value(line)
-
-                            # TODO: Extractor.extract_value() should return a ExtractedValue
-                            #       instead of a tuple (an so we could remove the ugly following line...)
-                            is_empty = not extractor._column_index or is_empty_value(line[extractor._column_index - 1])
-                            extr_values.append((fname, extr_value, is_empty))
-
-                            append_error(err_msg)
-
-                        if key_fields:
-                            # We avoid using exception within 'atomic' block
-                            found = self._find_existing_instances(
-                                model=model_class,
-                                field_names=key_fields,
-                                extracted_values=extr_values,
-                            )[:2]
-
-                            if found:
-                                if len(found) == 1:
-                                    try:
-                                        instance = model_class.objects.select_for_update().get(pk=found[0].pk)
-                                    except model_class.DoesNotExist:
-                                        pass
-                                    else:
-                                        job_result.updated = updated = True
-                                else:
-                                    append_error(gettext(
-                                        'Several entities corresponding to the search have been found. '
-                                        'So a new entity have been created to avoid errors.'
-                                    ))
-
-                        for fname, cleaned_value in regular_fields:
-                            setattr(instance, fname, cleaned_value)
-
-                        for fname, extr_value, is_empty in extr_values:
-                            if updated and is_empty:
-                                continue
-
-                            setattr(instance, fname, extr_value)
-
-                        self._pre_instance_save(instance, line)
-
-                        instance.full_clean()
-                        instance.save()
-
-                        self._post_instance_creation(instance, line, updated)
-
-                        for m2m in self._meta.model._meta.many_to_many:
-                            extractor = get_cleaned(m2m.name)  # Can be a regular_field ????
-                            if extractor:
-                                # TODO: factorise
-                                extr_value, err_msg = extractor.extract_value(line)
-                                getattr(instance, m2m.name).set(extr_value)
-                                append_error(err_msg)
-
-                        job_result.entity = instance
-                        if self.import_errors:
-                            job_result.messages = self.import_errors
-                        job_result.save()
-                except Exception as e:
-                    logger.exception('Exception in Mass importing')
-
-                    try:
-                        for messages in e.message_dict.values():
-                            for message in messages:
-                                append_error(str(message))
-                    except:
-                        append_error(str(e))
+            process_line = partial(self._process_line,
+                                   job=job,
+                                   regular_fields=regular_fields,
+                                   extractor_fields=extractor_fields,
+                                   key_fields=frozenset(get_cleaned('key_fields')),
+                                   lookup_cache=lookup_cache,
+                                  )
 
-                    job_result.messages = self.import_errors
-                    job_result.save()
+            for lines_chunk in iter_as_chunk(filter(None, lines), max(settings.MASS_IMPORT_BATCH_SIZE, 1)):
+                self._prefetch(lines_chunk)
 
-                self.import_errors.clear()
+                with atomic():
+                    job_results = [process_line(line) for line in lines_chunk]
+                    self._post_lines_processing(lines_chunk, job_results)
+                    MassImportJobResult.objects.bulk_create(job_results)
 
 
 class ImportForm4CremeEntity(ImportForm):
@@ -1240,6 +1548,9 @@ class ImportForm4CremeEntity(ImportForm):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        # The Relations of a group of lines are created together (see _post_lines_processing())
+        self._line_relations = []  # Relations of the current line
+        self._relations = []  # Tuples (job_result, relations) of the imported lines of the current group
         user = self.user
         fields = self.fields
         ct = ContentType.objects.get_for_model(self._meta.model)
@@ -1276,6 +1587,37 @@ class ImportForm4CremeEntity(ImportForm):
 
         return extractors
 
+    def _process_line(self, line, **kwargs):
+        self._line_relations = []
+        job_result = super()._process_line(line, **kwargs)
+
+        if job_result.entity_id is not None:  # The line has been imported
+            self._relations.append((job_result, self._line_relations))
+
+        return job_result
+
+    def _post_lines_processing(self, lines, job_results):
+        super()._post_lines_processing(lines, job_results)
+
+        lines_relations, self._relations = self._relations, []
+        bulk_link = Relation.objects.bulk_link
+
+        # NB: bulk_link() uses its own save point, so an error does not cancel
+        #     the whole group of lines.
+        try:
+            bulk_link(relation for __, relations in lines_relations for relation in relations)
+        except Exception:
+            logger.exception('Error when linking a group of lines in mass import ; '
+                             'the lines are linked one by one.'
+                            )
+
+            for job_result, relations in lines_relations:
+                try:
+                    bulk_link(relations)
+                except Exception as e:
+                    logger.exception('Error when linking a line in mass import')
+                    job_result.messages = [*(job_result.messages or ()), str(e)]
+
     def _find_existing_instances(self, model, field_names, extracted_values):
         qs = super()._find_existing_instances(
             model=model, field_names=field_names, extracted_values=extracted_values
@@ -1329,7 +1671,7 @@ class ImportForm4CremeEntity(ImportForm):
                                           user=user,
                                 ))
 
-        Relation.objects.safe_multi_save(relations)
+        self._line_relations.extend(relations)
 
 
 def extractorfield_factory(modelfield, header_dict, choices):
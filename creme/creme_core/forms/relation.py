@@ -214,7 +214,7 @@ class _RelationsCreateForm(CremeForm):
     def save(self):
         user = self.user
 
-        Relation.objects.safe_multi_save(
+        Relation.objects.bulk_link(
             Relation(
                 user=user,
                 subject_entity=subject,
@@ -26,51 +26,243 @@
 
 # See  middleware.global_info.GlobalInfoMiddleware
 
+from collections import OrderedDict
+from contextlib import contextmanager
 from functools import wraps
-from collections import defaultdict
+from threading import Lock, local
+
+from django.conf import settings
 
 try:
-    from threading import currentThread
-except ImportError:
-    from dummy_threading import currentThread
+    from contextvars import ContextVar
+except ImportError:  # Python < 3.7
+    class ContextVar:
+        "Minimal implementation of contextvars.ContextVar, which stores the value per thread."
+        def __init__(self, name, *, default=None):
+            self.name = name
+            self._default = default
+            self._local = local()
+
+        def get(self):
+            return getattr(self._local, 'value', self._default)
+
+        def set(self, value):
+            token = (self.get(),)
+            self._local.value = value
 
+            return token
 
-_globals = defaultdict(dict)
+        def reset(self, token):
+            self._local.value = token[0]
+
+# NB: a context variable is safe with threads (each thread has its own context)
+#     & asyncio (each task runs in a copy of the context of its creator).
+#     The stored dictionary is never replaced in place by a scope, so a value
+#     leaked by a scope which has not been closed is never seen by the next one.
+_globals = ContextVar('creme_global_info', default=None)
 
 
 def get_global_info(key):
-    """Get a global value, safely because stored in a per-thread way.
+    """Get a global value, safely because stored in a per-context way
+    (see contextvars).
 
     @param key: Hashable object (typically a string) as usual.
     @return The value corresponding to the key.
             <None> is returned if the key is not found.
     """
-    thread_globals = _globals.get(currentThread())
-    return thread_globals and thread_globals.get(key)
+    context_globals = _globals.get()
+    return None if context_globals is None else context_globals.get(key)
 
 
 def set_global_info(**kwargs):
-    """Set some global values, safely because stored in a per-thread way.
+    """Set some global values, safely because stored in a per-context way.
 
     @param kwargs: Each key-value are sored as global data.
     """
-    _globals[currentThread()].update(kwargs)
+    context_globals = _globals.get()
+
+    if context_globals is None:
+        context_globals = {}
+        _globals.set(context_globals)
+
+    context_globals.update(kwargs)
 
 
 def clear_global_info():
-    # Don't use del _globals[currentThread()], it causes problems with dev server.
-    _globals.pop(currentThread(), None)
+    _globals.set(None)
+
+
+@contextmanager
+def global_info_scope(**kwargs):
+    """Context manager which creates a new set of global values (with a new
+    per-request cache), & restores the previous one at exit (even if an
+    exception is raised).
+
+    @param kwargs: Initial global values.
+
+        with global_info_scope(user=request.user):
+            [...]
+    """
+    token = _globals.set({'per_request_cache': PerRequestCache(), **kwargs})
+
+    try:
+        yield
+    finally:
+        _globals.reset(token)
+
+
+def bind_global_info(function):
+    """Get a function which uses the global values of the current context,
+    even if it's called in another thread (eg: by a pool of threads).
+    Notice that the values (& so the per-request cache) are shared, not copied.
+
+        render = bind_global_info(render_brick)
+        executor.submit(render, brick)
+
+    @param function: Callable.
+    @return: A callable which takes the same arguments than 'function'.
+    """
+    context_globals = _globals.get()
+
+    @wraps(function)
+    def _aux(*args, **kwargs):
+        token = _globals.set(context_globals)
+
+        try:
+            return function(*args, **kwargs)
+        finally:
+            _globals.reset(token)
+
+    return _aux
+
+
+class PerRequestCache:
+    """Dictionary-like cache (get(), [], in...) with a bounded size per
+    namespace, & which counts the hits/misses of each namespace.
+
+    The namespace of a key is the key without its last part (the parts are
+    separated by "-") ; eg: "creme_core-fields_config" for the key
+    "creme_core-fields_config-12". When a namespace is full, its least recently
+    used value is removed.
+    """
+    def __init__(self, max_size=None, max_sizes=None):
+        """Constructor.
+
+        @param max_size: Default maximum number of values per namespace
+               (0 means "no limit"). Default value: settings.PER_REQUEST_CACHE_MAX_SIZE.
+        @param max_sizes: Dictionary <namespace: maximum size> for specific namespaces.
+               Default value: settings.PER_REQUEST_CACHE_MAX_SIZES.
+        """
+        self.max_size = settings.PER_REQUEST_CACHE_MAX_SIZE if max_size is None else max_size
+        self.max_sizes = settings.PER_REQUEST_CACHE_MAX_SIZES if max_sizes is None else max_sizes
+        self._namespaces = {}  # Namespace => OrderedDict
+        self._stats = {}  # Namespace => [hits, misses]
+        self._lock = Lock()
+
+    def __contains__(self, key):
+        values = self._namespaces.get(self.namespace(key))
+        return values is not None and key in values
+
+    def __delitem__(self, key):
+        with self._lock:
+            del self._namespaces[self.namespace(key)][key]
+
+    def __getitem__(self, key):
+        namespace = self.namespace(key)
+
+        with self._lock:
+            stats = self._stats.get(namespace)
+            if stats is None:
+                self._stats[namespace] = stats = [0, 0]
+
+            values = self._namespaces.get(namespace)
+
+            if values is None or key not in values:
+                stats[1] += 1
+                raise KeyError(key)
+
+            stats[0] += 1
+            values.move_to_end(key)
+
+            return values[key]
+
+    def __len__(self):
+        return sum(len(values) for values in self._namespaces.values())
+
+    def __setitem__(self, key, value):
+        namespace = self.namespace(key)
+
+        with self._lock:
+            values = self._namespaces.get(namespace)
+            if values is None:
+                self._namespaces[namespace] = values = OrderedDict()
+
+            values[key] = value
+            values.move_to_end(key)
+
+            max_size = self.max_sizes.get(namespace, self.max_size)
+            if max_size:
+                while len(values) > max_size:
+                    values.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._namespaces.clear()
+            self._stats.clear()
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    @staticmethod
+    def namespace(key):
+        if not isinstance(key, str):
+            return key
+
+        return key.rpartition('-')[0] or key
+
+    def pop(self, key, *default):
+        with self._lock:
+            values = self._namespaces.get(self.namespace(key))
+
+            if values is None:
+                if default:
+                    return default[0]
+
+                raise KeyError(key)
+
+            return values.pop(key, *default)
+
+    @property
+    def stats(self):
+        """Statistics of the cache.
+        @return A dictionary <namespace: {'hits': int, 'misses': int, 'size': int}>.
+        """
+        with self._lock:
+            namespaces = self._namespaces
+
+            return {
+                namespace: {'hits': stats[0],
+                            'misses': stats[1],
+                            'size': len(namespaces.get(namespace, ())),
+                           }
+                    for namespace, stats in self._stats.items()
+            }
 
 
 def get_per_request_cache():
-    """Get a special global data, which is a dictionary used as a per-request cache.
+    """Get a special global data, which is a dictionary-like object used as a
+    per-request cache (see PerRequestCache).
 
-    @return: A dictionary.
+    @return: A PerRequestCache instance (or a dictionary if a dictionary has
+             been given explicitly to set_global_info()).
     """
     cache = get_global_info('per_request_cache')
 
     if cache is None:
-        cache = {}
+        cache = PerRequestCache()
         set_global_info(per_request_cache=cache)
 
     return cache
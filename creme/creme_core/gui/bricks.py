@@ -112,7 +112,13 @@ class Brick:
     #  to be reloaded (but it is still reloaded when the dependant bricks are reloaded of course).
     read_only = False
 
+    # 'False' means that the brick must be rendered in the thread of the request, & not concurrently
+    # with the other bricks of the page (see settings.BRICKS_RENDERING_THREADS) ; it's useful when
+    # the brick uses some data which are not thread-safe, or which are shared with other bricks.
+    concurrent_rendering = True
+
     template_name = 'OVERLOAD_ME.html'  # Used to render the brick of course
+    deferred_template_name = 'creme_core/bricks/deferred.html'  # Used to render the placeholder
     context_class = _BrickContext  # Class of the instance which stores the context in the session.
 
     # ATTRIBUTES USED BY THE CONFIGURATION GUI FOR THE BRICKS (ie: in creme_config) ------------------------------------
@@ -155,6 +161,17 @@ class Brick:
     def _render(self, template_context):
         return get_template(self.template_name).render(template_context)
 
+    def deferred_display(self, context):
+        """Render a placeholder for the brick ; its real content is retrieved
+        later by the client with a reloading query.
+        See {% brick_display %} (argument 'deferred').
+        """
+        return get_template(self.deferred_template_name).render(
+            Brick._build_template_context(self, context, self.id_, brick_context=None,
+                                          verbose_name=self.verbose_name,
+                                         )
+        )
+
     def _simple_detailview_display(self, context):
         """Helper method to build a basic detailview_display() method for classes that inherit Brick."""
         return self._render(self.get_template_context(context))
@@ -97,6 +97,11 @@ class MassExportHeaderButton(MassExportButton):
     template_name = 'creme_core/listview/buttons/mass-export-header.html'
 
 
+class MassExportJobButton(MassExportButton):
+    "The file is generated by a job (useful for big lists)."
+    template_name = 'creme_core/listview/buttons/mass-export-job.html'
+
+
 class MassImportButton(ListViewButton):
     template_name = 'creme_core/listview/buttons/mass-import.html'
 
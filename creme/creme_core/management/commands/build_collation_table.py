@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+
+################################################################################
+#    Creme is a free/open-source Customer Relationship Management software
+#    Copyright (C) 2019  Hybird
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+################################################################################
+
+from django.core.management.base import BaseCommand
+
+from creme.creme_core.utils.unicode_collation import DEFAULT_SOURCE, DEFAULT_TABLE, build_table
+
+
+class Command(BaseCommand):
+    help = 'Build the precomputed table used by the Unicode collation (sort of strings) ' \
+           'from the file allkeys.txt. It should be run at install time (& after an upgrade).'
+
+    requires_system_checks = False
+
+    def add_arguments(self, parser):
+        parser.add_argument('--source', default=DEFAULT_SOURCE,
+                            help='Path of the source file [default: %(default)s].',
+                           )
+        parser.add_argument('--table', default=DEFAULT_TABLE,
+                            help='Path of the built table [default: %(default)s].',
+                           )
+
+    def handle(self, **options):
+        single, multi = build_table(source=options['source'], table=options['table'])
+
+        if options['verbosity']:
+            self.stdout.write('Collation table built: {} ({} elements, {} contractions).'.format(
+                options['table'], len(single), len(multi),
+            ))
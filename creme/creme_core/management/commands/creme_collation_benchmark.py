@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+
+################################################################################
+#    Creme is a free/open-source Customer Relationship Management software
+#    Copyright (C) 2019  Hybird
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+################################################################################
+
+import random
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+
+from creme.creme_core.utils.unicode_collation import (
+    DEFAULT_SOURCE, DEFAULT_TABLE,
+    _Collator, parse_table, load_table,
+)
+
+
+class Command(BaseCommand):
+    help = 'Measure the time needed to load the Unicode collation table (parsing ' \
+           'of allkeys.txt vs precomputed table), & the number of sort keys ' \
+           'computed per second (without & with memorisation).'
+
+    requires_system_checks = False
+
+    def add_arguments(self, parser):
+        parser.add_argument('-n', '--number', type=int, default=100000,
+                            help='Number of sorted strings [default: %(default)s].',
+                           )
+        parser.add_argument('-d', '--distinct', type=int, default=1000,
+                            help='Number of distinct strings [default: %(default)s].',
+                           )
+
+    @staticmethod
+    def _build_strings(number, distinct):
+        rand = random.Random(42)
+        letters = 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZéèêàâçôûùïÉÀ -'
+        words = [''.join(rand.choice(letters) for _i in range(rand.randint(3, 20)))
+                    for _j in range(distinct)
+                ]
+
+        return [rand.choice(words) for _i in range(number)]
+
+    def handle(self, **options):
+        number = options['number']
+        distinct = options['distinct']
+
+        if number <= 0 or distinct <= 0:
+            raise CommandError('The numbers of strings must be positive')
+
+        write = self.stdout.write
+
+        start = perf_counter()
+        parse_table(DEFAULT_SOURCE)
+        write('{:<30} {:>10.1f} ms'.format('Parsing of allkeys.txt', (perf_counter() - start) * 1000))
+
+        load_table(DEFAULT_SOURCE, DEFAULT_TABLE)  # Build the table if needed
+        start = perf_counter()
+        load_table(DEFAULT_SOURCE, DEFAULT_TABLE)
+        write('{:<30} {:>10.1f} ms'.format('Loading of the table', (perf_counter() - start) * 1000))
+
+        strings = self._build_strings(number, distinct)
+        collator = _Collator()
+        collator.sort_key('')  # Load the table
+
+        for name, sort_key in [('Sort without memorisation', collator._sort_key),
+                               ('Sort with memorisation',    collator.sort_key),
+                              ]:
+            start = perf_counter()
+            sorted(strings, key=sort_key)
+            duration = perf_counter() - start
+
+            write('{:<30} {:>10.0f} keys/s'.format(name, number / duration))
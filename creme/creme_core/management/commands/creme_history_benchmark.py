@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+
+################################################################################
+#    Creme is a free/open-source Customer Relationship Management software
+#    Copyright (C) 2019  Hybird
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+################################################################################
+
+from contextlib import contextmanager
+from time import perf_counter
+import tracemalloc
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models.signals import post_init
+
+
+def _copy_dict(sender, instance, **kwargs):
+    "Old behaviour: a copy of the values of each instance is made when it is built."
+    if hasattr(instance, 'get_related_entity') or getattr(instance, 'entity_type_id', None):
+        instance._instance_backup = backup = instance.__dict__.copy()
+        del backup['_state']
+
+
+@contextmanager
+def _lazy_snapshot():
+    yield
+
+
+@contextmanager
+def _eager_copy():
+    post_init.connect(_copy_dict)
+
+    try:
+        yield
+    finally:
+        post_init.disconnect(_copy_dict)
+
+
+class Command(BaseCommand):
+    help = 'Measure the time & the memory used to load some instances, depending ' \
+           'on the way the history snapshots are made: copy of each instance ' \
+           '(old behaviour), lazy snapshot (default behaviour) & read-only mode ' \
+           '(see creme_core.models.read_only_instances()). ' \
+           'The results are given per 10,000 instances.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', nargs='?', default='creme_core.CremeEntity',
+                            help='Model of the loaded instances, like "persons.contact" '
+                                 '[default: %(default)s].',
+                           )
+        parser.add_argument('-n', '--number', type=int, default=10000,
+                            help='Number of instances to load ; the existing '
+                                 'instances are loaded several times if needed '
+                                 '[default: %(default)s].',
+                           )
+
+    def _load(self, model, number):
+        instances = []
+        qs = model.objects.all()
+
+        while len(instances) < number:
+            size = len(instances)
+            instances.extend(qs[:number - size])
+
+            if len(instances) == size:
+                raise CommandError('There is no instance of "{}"'.format(model._meta.label))
+
+        return instances
+
+    def _measure(self, model, number):
+        tracemalloc.start()
+        try:
+            start = perf_counter()
+            instances = self._load(model, number)
+            duration = perf_counter() - start
+            memory = tracemalloc.get_traced_memory()[0]
+        finally:
+            tracemalloc.stop()
+
+        del instances
+
+        return duration, memory
+
+    def handle(self, model, **options):
+        from creme.creme_core.models import CremeModel, read_only_instances
+
+        try:
+            model = apps.get_model(model)
+        except (LookupError, ValueError) as e:
+            raise CommandError(str(e)) from e
+
+        if not issubclass(model, CremeModel):
+            raise CommandError('"{}" is not a CremeModel'.format(model._meta.label))
+
+        number = options['number']
+        if number <= 0:
+            raise CommandError('The number of instances must be positive')
+
+        self._load(model, number)  # Warm up (queries cache, ContentTypes...)
+        ratio = 10000 / number
+
+        for name, ctxt_manager in [('eager copy', _eager_copy),
+                                   ('lazy snapshot', _lazy_snapshot),
+                                   ('read-only', read_only_instances),
+                                  ]:
+            with ctxt_manager():
+                duration, memory = self._measure(model, number)
+
+            self.stdout.write('{name:<15} {duration:>8.3f} s  {memory:>10.1f} KiB'.format(
+                name=name,
+                duration=duration * ratio,
+                memory=memory * ratio / 1024,
+            ))
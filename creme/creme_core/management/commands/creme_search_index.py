@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+
+################################################################################
+#    Creme is a free/open-source Customer Relationship Management software
+#    Copyright (C) 2019  Hybird
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+################################################################################
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the search index (see settings.SEARCH_INDEX) of all the '\
+           'searchable types of entity, or only of the given types.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('args', metavar='models', nargs='*',
+                            help='Optionally one or more model, like "persons.contact".',
+                           )
+
+    def handle(self, *model_labels, **options):
+        from creme.creme_core.core.search import search_index
+        from creme.creme_core.models import CremeEntity
+        from creme.creme_core.registry import creme_registry
+
+        verbosity = options.get('verbosity')
+
+        if model_labels:
+            try:
+                models = [apps.get_model(label) for label in model_labels]
+            except (LookupError, ValueError) as e:
+                raise CommandError(str(e)) from e
+
+            for model in models:
+                if not issubclass(model, CremeEntity):
+                    raise CommandError('"{}" is not a type of entity'.format(model._meta.label))
+        else:
+            models = [*creme_registry.iter_entity_models()]
+
+        for model in models:
+            count = search_index.rebuild(model)
+
+            if verbosity:
+                self.stdout.write('{}: {} entities indexed'.format(model._meta.label, count))
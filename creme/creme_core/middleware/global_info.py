@@ -24,17 +24,36 @@
 #
 ################################################################################
 
-from django.utils.deprecation import MiddlewareMixin
+import logging
 
-from ..global_info import set_global_info, clear_global_info
+from ..global_info import (set_global_info, clear_global_info,
+        get_per_request_cache, PerRequestCache)
 
+logger = logging.getLogger(__name__)
 
-class GlobalInfoMiddleware(MiddlewareMixin):
-    def process_request(self, request):
-        set_global_info(user=request.user,
-                        per_request_cache={},
-                       )
 
-    def process_response(self, request, response):
+class GlobalInfoMiddleware:
+    """Set the global information (user, per-request cache) during each request
+    (see creme_core.global_info).
+    The information is removed at the end of the request, even if an error
+    occurred ; & the information leaked by some code executed outside a
+    request is never seen by the request.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
         clear_global_info()
+        set_global_info(user=request.user, per_request_cache=PerRequestCache())
+
+        try:
+            response = self.get_response(request)
+
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('Per-request cache of "%s": %s',
+                             request.path, get_per_request_cache().stats,
+                            )
+        finally:
+            clear_global_info()
+
         return response
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+
+from django.db import migrations, models
+from django.db.models.deletion import CASCADE
+
+from creme.creme_core.models.fields import CTypeForeignKey
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('creme_core', '0061_v2_1__set_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchIndexEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entity', models.ForeignKey(editable=False, on_delete=CASCADE, related_name='+', to='creme_core.CremeEntity')),
+                ('entity_ctype', CTypeForeignKey(editable=False, on_delete=CASCADE, related_name='+', to='contenttypes.ContentType')),
+                ('field', models.CharField(editable=False, max_length=100)),
+                ('token', models.CharField(db_index=True, editable=False, max_length=50)),
+            ],
+            options={
+                'index_together': {('entity_ctype', 'token')},
+            },
+        ),
+    ]
@@ -6,7 +6,7 @@ from .auth import CremeUser, EntityCredentials, UserRole, SetCredentials, Sandbo
 
 from .file_ref import FileRef  # NOQA
 
-from .base import CremeModel  # NOQA
+from .base import CremeModel, read_only_instances  # NOQA
 from .entity import CremeEntity  # NOQA
 
 from .setting_value import SettingValue  # NOQA
@@ -32,7 +32,7 @@ from .reminder import DateReminder  # NOQA
 
 from .history import HistoryLine, HistoryConfigItem  # NOQA
 from .imprint import Imprint  # NOQA
-from .search import SearchConfigItem  # NOQA
+from .search import SearchConfigItem, SearchIndexEntry  # NOQA
 
 from .job import Job, JobResult, EntityJobResult, MassImportJobResult  # NOQA
 from .deletion import DeletionCommand, CREME_REPLACE_NULL, CREME_REPLACE  # NOQA
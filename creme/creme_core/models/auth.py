@@ -23,6 +23,8 @@ from functools import reduce
 import logging
 from operator import or_ as or_op
 from re import compile as re_compile
+from threading import Lock
+from time import monotonic
 import uuid
 
 import pytz
@@ -33,12 +35,17 @@ from django.contrib.auth.models import BaseUserManager, AbstractBaseUser, _user_
 from django.contrib.contenttypes.models import ContentType
 from django.core.exceptions import PermissionDenied
 from django.core.validators import RegexValidator
-from django.db import models
+from django.db import models, connections, DEFAULT_DB_ALIAS
 from django.db.models.query_utils import Q
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.db.transaction import on_commit
+from django.dispatch import receiver
 from django.utils.timezone import now
 from django.utils.translation import gettext_lazy as _, gettext
 
 from ..auth.entity_credentials import EntityCredentials
+from ..core.versioned_cache import VersionedCache
+from ..global_info import get_per_request_cache
 from ..utils import split_filter
 from ..utils.unicode_collation import collator
 
@@ -47,6 +54,98 @@ from .fields import CTypeForeignKey
 logger = logging.getLogger(__name__)
 
 
+class _FilteringPlansCache(VersionedCache):
+    """In-process cache for the Q instances built by SetCredentials to filter
+    the entities (see SetCredentials.filter() & filter_entities()).
+
+    The keys contain the SetCredentials' values, so modifying the credentials
+    of a role gives new keys. The plans are related to a generation stored in
+    the shared cache (see VersionedCache) ; it's changed when a
+    SetCredentials/UserRole/EntityFilter/team is modified, & each process
+    checks it once per request (it's stored in the per-request cache) & clears
+    its plans when it has changed. The plans expire after
+    settings.ENTITY_CREDENTIALS_CACHE_TIMEOUT seconds.
+    """
+    key_prefix = 'creme_core-credentials_plans'
+    timeout_setting = 'ENTITY_CREDENTIALS_CACHE_TIMEOUT'
+    max_size = 1024
+
+    def __init__(self, timeout=None, cache=None):
+        super().__init__(timeout=timeout, cache=cache)
+        self._plans = OrderedDict()
+        self._lock = Lock()
+        self._generation = None
+
+    def _get_generation(self):
+        rcache = get_per_request_cache()
+        key = self.version_key()
+        generation = rcache.get(key)
+
+        if generation is None:
+            rcache[key] = generation = self.get_version()
+
+        return generation
+
+    def clear(self, using=None):
+        "Clear the plans of all the processes."
+        generation = self.new_version()
+        get_per_request_cache()[self.version_key()] = generation
+
+        with self._lock:
+            self._plans.clear()
+            self._generation = generation
+
+        # NB: other processes could have cached plans built with the old data
+        #     (retrieved before the end of the transaction) with the new generation.
+        if connections[using or DEFAULT_DB_ALIAS].in_atomic_block:
+            on_commit(self.new_version, using=using)
+
+    def get(self, key, builder):
+        """Get a plan from the cache, or build it.
+
+        @param key: Hashable object.
+        @param builder: Callable without argument which returns the plan.
+        @return: The plan.
+        """
+        timeout = self.timeout
+
+        if not timeout:
+            return builder()
+
+        plans = self._plans
+        lock = self._lock
+        generation = self._get_generation()
+
+        with lock:
+            if generation != self._generation:
+                plans.clear()
+                self._generation = generation
+
+            item = plans.get(key)
+
+            if item is not None:
+                if item[0] > monotonic():
+                    plans.move_to_end(key)
+                    return item[1]
+
+                del plans[key]
+
+        plan = builder()
+
+        with lock:
+            # NB: the plan could be outdated if the cache has been cleared during its building.
+            if generation == self._generation:
+                plans[key] = (monotonic() + timeout, plan)
+
+                while len(plans) > self.max_size:
+                    plans.popitem(last=False)
+
+        return plan
+
+
+_filtering_plans = _FilteringPlansCache()
+
+
 class UserRole(models.Model):
     name              = models.CharField(_('Name'), max_length=100, unique=True)
     # superior         = ForeignKey('self', verbose_name=_('Superior'), null=True) #related_name='subordinates'
@@ -408,7 +507,29 @@ class SetCredentials(models.Model):
         return allowed_found
 
     @classmethod
-    def _aux_filter(cls, model, sc_sequence, user, queryset, perm):
+    def _get_filtering_plan(cls, sc_sequence, user, perm, target, builder):
+        ESET_ALL = cls.ESET_ALL
+        key = (
+            user.id,
+            # NB: teams are used by ESET_OWN & maybe by the EntityFilters (operand "current user")
+            tuple(team.id for team in user.teams)
+            if any(sc.set_type != ESET_ALL for sc in sc_sequence) else
+            (),
+            perm,
+            target,
+            tuple((sc.id, sc.value, sc.set_type, sc.ctype_id, sc.forbidden, sc.efilter_id)
+                      for sc in sc_sequence
+                 ),
+        )
+
+        return _filtering_plans.get(key, builder)
+
+    @classmethod
+    def _aux_build_plan(cls, model, sc_sequence, user, perm):
+        """Build the Q instances which filter a model.
+        @return: <None> if all the entities are forbidden, or a tuple
+                 (Q-instance-to-filter-or-None, tuple-of-Q-instances-to-exclude).
+        """
         get_ct = ContentType.objects.get_for_model
         allowed_ctype_ids = {None, get_ct(CremeEntity).id, get_ct(model).id}
         ESET_ALL = cls.ESET_ALL
@@ -425,16 +546,16 @@ class SetCredentials(models.Model):
         )
 
         if not allowed:
-            return queryset.none()
+            return None
 
         if any(f.set_type == ESET_ALL for f in forbidden):
-            return queryset.none()
+            return None
 
-        def user_filtering_kwargs():  # TODO: cache/lazy
+        def user_filtering_q():
             teams = user.teams
-            return {'user__in': [user, *teams]} if teams else {'user': user}
+            return Q(user__in=[user, *teams]) if teams else Q(user=user)
 
-        filtered_qs = queryset
+        filter_q = None
 
         q = Q()
         for cred in allowed:
@@ -444,18 +565,42 @@ class SetCredentials(models.Model):
                 break
 
             if set_type == ESET_OWN:
-                q |= Q(**user_filtering_kwargs())
+                q |= user_filtering_q()
             else:  # SetCredentials.ESET_FILTER
                 # TODO: distinct ? (see EntityFilter.filter())
                 q |= cred.efilter.get_q(user=user)
         else:
-            filtered_qs = filtered_qs.filter(q)
+            filter_q = q
+
+        return (
+            filter_q,
+            tuple(user_filtering_q() if cred.set_type == ESET_OWN else  # Else SetCredentials.ESET_FILTER
+                  cred.efilter.get_q(user=user)
+                      for cred in forbidden
+                 ),
+        )
 
-        for cred in forbidden:
-            if cred.set_type == ESET_OWN:
-                filtered_qs = filtered_qs.exclude(**user_filtering_kwargs())
-            else:  # SetCredentials.ESET_FILTER
-                filtered_qs = filtered_qs.exclude(cred.efilter.get_q(user=user))
+    @classmethod
+    def _aux_filter(cls, model, sc_sequence, user, queryset, perm):
+        plan = cls._get_filtering_plan(
+            sc_sequence=sc_sequence, user=user, perm=perm,
+            target=ContentType.objects.get_for_model(model).id,
+            builder=lambda: cls._aux_build_plan(model=model, sc_sequence=sc_sequence,
+                                                user=user, perm=perm,
+                                               ),
+        )
+
+        if plan is None:
+            return queryset.none()
+
+        filter_q, exclude_qs = plan
+        filtered_qs = queryset
+
+        if filter_q is not None:
+            filtered_qs = filtered_qs.filter(filter_q)
+
+        for exclude_q in exclude_qs:
+            filtered_qs = filtered_qs.exclude(exclude_q)
 
         return filtered_qs
 
@@ -537,66 +682,67 @@ class SetCredentials(models.Model):
                           )
         _check_efilters(sorted_sc)
 
-        # NB: some explanations on the algorithm :
-        #  we try to regroup ContentTypes (corresponding to CremeEntity sub_classes)
-        #  which have the same filtering rules ; so we can generate a Query which looks like
-        #    entity_type__in=[...] OR (entity_type__in=[...] AND user__exact=current-user) OR
-        #    (entity_type__in=[...] AND field1__startswith='foo')
-
-        OWN_FILTER_ID = 0  # Fake EntityFilter ID corresponding to ESET_OWN.
-
-        ESET_ALL = cls.ESET_ALL
-        ESET_OWN = cls.ESET_OWN
-        ESET_FILTER = cls.ESET_FILTER
-
-        def _extract_filter_ids(set_creds):
-            for sc in set_creds:
-                if sc.set_type == ESET_OWN:
-                    yield OWN_FILTER_ID
-                    break  # Avoid several OWN_FILTER_ID (should not happen)
-
-            for sc in set_creds:
-                if sc.set_type == ESET_FILTER:
-                    yield sc.efilter_id
-
-        # Map of EntityFilters to apply on ContentTypes groups
-        #   key = tuple containing 2 tuples of filter IDs: forbidden rules & allowed ones.
-        #   value = list of ContentType IDs.
-        #  Note: special values for EntityFilter ID:
-        #    None: means ESET_ALL (no filtering)
-        #    OWN_FILTER_ID: means ESET_OWN (a virtual EntityFilter on "user" field).
-        ctypes_filtering = defaultdict(list)
-
-        efilters_per_id = {sc.efilter_id: sc.efilter for sc in sc_sequence}
-
-        for model in models:
-            ct_id = get_for_model(model).id
-            model_ct_ids = (None, entity_ct_id, ct_id)   # <None> == CremeEntity too
-
-            forbidden, allowed = split_filter(
-                lambda sc: sc.forbidden,
-                (sc for sc in sorted_sc
-                    if sc.ctype_id in model_ct_ids and sc.value & perm
+        def build_plan():
+            # NB: some explanations on the algorithm :
+            #  we try to regroup ContentTypes (corresponding to CremeEntity sub_classes)
+            #  which have the same filtering rules ; so we can generate a Query which looks like
+            #    entity_type__in=[...] OR (entity_type__in=[...] AND user__exact=current-user) OR
+            #    (entity_type__in=[...] AND field1__startswith='foo')
+
+            OWN_FILTER_ID = 0  # Fake EntityFilter ID corresponding to ESET_OWN.
+
+            ESET_ALL = cls.ESET_ALL
+            ESET_OWN = cls.ESET_OWN
+            ESET_FILTER = cls.ESET_FILTER
+
+            def _extract_filter_ids(set_creds):
+                for sc in set_creds:
+                    if sc.set_type == ESET_OWN:
+                        yield OWN_FILTER_ID
+                        break  # Avoid several OWN_FILTER_ID (should not happen)
+
+                for sc in set_creds:
+                    if sc.set_type == ESET_FILTER:
+                        yield sc.efilter_id
+
+            # Map of EntityFilters to apply on ContentTypes groups
+            #   key = tuple containing 2 tuples of filter IDs: forbidden rules & allowed ones.
+            #   value = list of ContentType IDs.
+            #  Note: special values for EntityFilter ID:
+            #    None: means ESET_ALL (no filtering)
+            #    OWN_FILTER_ID: means ESET_OWN (a virtual EntityFilter on "user" field).
+            ctypes_filtering = defaultdict(list)
+
+            efilters_per_id = {sc.efilter_id: sc.efilter for sc in sc_sequence}
+
+            for model in models:
+                ct_id = get_for_model(model).id
+                model_ct_ids = (None, entity_ct_id, ct_id)   # <None> == CremeEntity too
+
+                forbidden, allowed = split_filter(
+                    lambda sc: sc.forbidden,
+                    (sc for sc in sorted_sc
+                        if sc.ctype_id in model_ct_ids and sc.value & perm
+                    )
                 )
-            )
 
-            if allowed:
-                if forbidden and forbidden[0].set_type == ESET_ALL:
-                    continue
+                if allowed:
+                    if forbidden and forbidden[0].set_type == ESET_ALL:
+                        continue
 
-                allowed_filter_ids = [None] if allowed[0].set_type == ESET_ALL else \
-                                     [*_extract_filter_ids(allowed)]
-                forbidden_filter_ids = [*_extract_filter_ids(forbidden)]
+                    allowed_filter_ids = [None] if allowed[0].set_type == ESET_ALL else \
+                                         [*_extract_filter_ids(allowed)]
+                    forbidden_filter_ids = [*_extract_filter_ids(forbidden)]
 
-                ctypes_filtering[(
-                    tuple(forbidden_filter_ids),
-                    tuple(allowed_filter_ids),
-                )].append(ct_id)
+                    ctypes_filtering[(
+                        tuple(forbidden_filter_ids),
+                        tuple(allowed_filter_ids),
+                    )].append(ct_id)
 
-        if not ctypes_filtering:
-            queryset = queryset.none()
-        else:
-            def _user_filtering_q():  # TODO: cached/lazy ?
+            if not ctypes_filtering:
+                return None
+
+            def _user_filtering_q():
                 teams = user.teams
                 return Q(**{'user__in': [user, *teams]} if teams else {'user': user})
 
@@ -624,9 +770,15 @@ class SetCredentials(models.Model):
                     & ~_efilter_ids_to_Q(forbidden_filter_ids)
                 )
 
-            queryset = queryset.filter(q)
+            return q
 
-        return queryset
+        q = cls._get_filtering_plan(
+            sc_sequence=sorted_sc, user=user, perm=perm,
+            target=tuple(get_for_model(model).id for model in models),
+            builder=build_plan,
+        )
+
+        return queryset.none() if q is None else queryset.filter(q)
 
     def save(self, *args, **kwargs):
         if self.set_type == self.ESET_FILTER:
@@ -1094,4 +1246,13 @@ class Sandbox(models.Model):
         return sandbox_type_registry.get(self)
 
 
+@receiver([post_save, post_delete], sender=UserRole)
+@receiver([post_save, post_delete], sender=SetCredentials)
+@receiver([post_save, post_delete], sender='creme_core.EntityFilter')
+@receiver([post_save, post_delete], sender='creme_core.EntityFilterCondition')
+@receiver(m2m_changed, sender=CremeUser.teammates_set.through)
+def _clear_filtering_plans(sender, using=None, **kwargs):
+    _filtering_plans.clear(using=using)
+
+
 from .entity import CremeEntity
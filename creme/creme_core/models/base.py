@@ -18,6 +18,7 @@
 #    along with this program.  If not, see <http://www.gnu.org/licenses/>.
 ################################################################################
 
+from contextlib import contextmanager
 from itertools import chain
 import logging
 
@@ -25,9 +26,28 @@ from django.db.models import Model, FileField
 from django.db.transaction import atomic
 from django.utils.translation import gettext_lazy as _
 
+from ..global_info import get_global_info, set_global_info
 from .file_ref import FileRef
 
 logger = logging.getLogger(__name__)
+_READ_ONLY_KEY = 'creme_core-read_only_instances'
+
+
+@contextmanager
+def read_only_instances():
+    """Context manager ; the instances of CremeModel retrieved from the DB
+    within it are considered as read-only: no snapshot of their values is kept
+    (see CremeModel.from_db()), so saving them does not create any HistoryLine
+    of edition.
+    Useful when a lot of instances are loaded (exports, reports...).
+    """
+    previous = get_global_info(_READ_ONLY_KEY)
+    set_global_info(**{_READ_ONLY_KEY: True})
+
+    try:
+        yield
+    finally:
+        set_global_info(**{_READ_ONLY_KEY: previous})
 
 
 class CremeModel(Model):
@@ -41,6 +61,19 @@ class CremeModel(Model):
     class Meta:
         abstract = True
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+
+        # Lazy snapshot of the values retrieved from the DB, used to build the
+        # history of the modifications (see creme_core.models.history).
+        # NB: the values are only referenced (no copy) ; the snapshot is built
+        #     only when the instance is saved.
+        if not get_global_info(_READ_ONLY_KEY):
+            instance._db_values = (field_names, values)
+
+        return instance
+
     def _pre_delete(self):
         """Called just before deleting the model.
         It is useful for cleaning, within the delete() transaction.
@@ -268,7 +268,8 @@ class CremeEntity(CremeModel):
         relations = Relation.objects.filter(subject_entity__in=[e.id for e in entities],
                                             type__in=relation_type_ids,
                                            )\
-                                    .select_related('object_entity')
+                                    .select_related('object_entity')\
+                                    .order_by('id')  # NB: like get_relations()
         Relation.populate_real_object_entities(relations)
 
         # { Subject_Entity -> { RelationType ->[Relation list] } }
@@ -26,6 +26,7 @@ from django.contrib.contenttypes.models import ContentType
 from django.db.models import TextField, FieldDoesNotExist
 from django.utils.translation import gettext_lazy as _, gettext
 
+from ..core.config_cache import config_cache
 from ..core.entity_cell import EntityCellRegularField
 from ..global_info import get_per_request_cache
 from ..utils.serializers import json_encode
@@ -245,20 +246,46 @@ class FieldsConfig(CremeModel):
             else:
                 result[model] = fc
 
-        # Step 2: fill 'result' with configs in DB
-        for fc in cls.objects.filter(content_type__in=not_cached_ctypes):
-            ct = fc.content_type
-            result[ct.model_class()] = cache[cache_key_fmt(ct.id)] = fc
+        # Step 2: fill 'result' with configs cached by the process
+        if not_cached_ctypes:
+            keys = [cache_key_fmt(ct.id) for ct in not_cached_ctypes]
+            process_cached = config_cache.get_many(keys)
 
-        # Step 3: fill 'result' with empty configs for remaining models
+            if process_cached:
+                for ct, key in zip(not_cached_ctypes, keys):
+                    fc = process_cached.get(key)
+
+                    if fc is not None:
+                        result[ct.model_class()] = cache[key] = fc
+
+                not_cached_ctypes = [ct for ct, key in zip(not_cached_ctypes, keys)
+                                        if key not in process_cached
+                                    ]
+
+        # Step 3: fill 'result' with configs in DB
+        retrieved = {}
+
+        if not_cached_ctypes:
+            for fc in cls.objects.filter(content_type__in=not_cached_ctypes):
+                ct = fc.content_type
+                result[ct.model_class()] = cache[cache_key_fmt(ct.id)] = \
+                    retrieved[cache_key_fmt(ct.id)] = fc
+
+        # Step 4: fill 'result' with empty configs for remaining models
         for model in models:
             if model not in result:
                 ct = get_ct(model)
-                result[model] = cache[cache_key_fmt(ct.id)] = cls(
+                key = cache_key_fmt(ct.id)
+                result[model] = cache[key] = cls(
                     content_type=ct,
                     descriptions=(),
                 )
 
+                if ct in not_cached_ctypes:
+                    retrieved[key] = result[model]
+
+        config_cache.set_many(retrieved)
+
         return result
 
     @property
@@ -27,6 +27,7 @@ from django.db.models.query_utils import Q
 from django.urls import reverse
 from django.utils.translation import gettext_lazy as _, gettext, pgettext_lazy
 
+from ..core.config_cache import config_cache
 from ..utils.serializers import json_encode
 
 from .fields import CremeUserForeignKey, CTypeForeignKey
@@ -40,7 +41,22 @@ class HeaderFilterList(list):
     Indeed, it's a cache.
     """
     def __init__(self, content_type, user):
-        super().__init__(HeaderFilter.get_for_user(user, content_type))
+        # NB: the views of all the users are retrieved (& cached per process) ;
+        #     the ones of the user are selected in Python (see HeaderFilter.get_for_user()).
+        cache_key = 'creme_core-header_filters-{}'.format(content_type.id)
+        hfilters = config_cache.get(cache_key)
+
+        if hfilters is None:
+            hfilters = [*HeaderFilter.objects.filter(entity_type=content_type)]
+            config_cache.set(cache_key, hfilters)
+
+        if not user.is_staff:
+            assert not user.is_team
+
+            user_ids = {user.id, *(team.id for team in user.teams)}
+            hfilters = [hf for hf in hfilters if not hf.is_private or hf.user_id in user_ids]
+
+        super().__init__(hfilters)
         self._selected = None
 
     @property
@@ -18,20 +18,24 @@
 #    along with this program.  If not, see <http://www.gnu.org/licenses/>.
 ################################################################################
 
+from collections import defaultdict
 from datetime import date, time, datetime
 from decimal import Decimal
 from functools import partial
 from json import loads as json_load, JSONEncoder
 import logging
+from threading import local
 
+from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
+from django.db import connections, router
 from django.db.models import (Model, PositiveSmallIntegerField, CharField, TextField,
         ForeignKey, OneToOneField, SET_NULL, CASCADE, FieldDoesNotExist)
 from django.db.models.base import ModelState
-from django.db.models.signals import post_save, post_init, pre_delete
-from django.db.transaction import atomic
+from django.db.models.signals import post_save, pre_delete
+from django.db.transaction import atomic, on_commit
 from django.dispatch import receiver
 from django.utils.formats import date_format, number_format
 from django.utils.timezone import localtime  # make_naive, utc
@@ -207,7 +211,7 @@ class _HistoryLineType:
     @classmethod
     def _build_fields_modifs(cls, instance):
         modifs = []
-        backup = getattr(instance, '_instance_backup', None)
+        backup = cls._get_backup(instance)
 
         if backup is not None:
             backup['_state'] = ModelState()
@@ -221,13 +225,14 @@ class _HistoryLineType:
                 if fname in excluded_fields or not field.get_tag('viewable'):
                     continue
 
-                old_value = getattr(old_instance, fname)
-                new_value = getattr(instance, fname)
-
                 if isinstance(field, ForeignKey):
-                    old_value = old_value and old_value.pk
-                    new_value = new_value and new_value.pk
+                    # NB: the IDs are compared, in order to avoid a query per instance
+                    old_value = getattr(old_instance, field.attname)
+                    new_value = getattr(instance, field.attname)
                 else:
+                    old_value = getattr(old_instance, fname)
+                    new_value = getattr(instance, fname)
+
                     try:
                         # Sometimes a form sets a unicode representing an int in an IntegerField (for example)
                         # => the type difference leads to a useless log like: Set field “My field” from “X” to “X”
@@ -256,6 +261,27 @@ class _HistoryLineType:
         entity._instance_backup = backup = entity.__dict__.copy()
         del backup['_state']
 
+    @staticmethod
+    def _get_backup(instance):
+        """Get the values of the instance before its modification.
+        @return A dictionary (attribute name -> value), or None if the
+                modifications of the instance must not be logged.
+        """
+        backup = getattr(instance, '_instance_backup', None)
+
+        if backup is None:
+            # Lazy snapshot of the values retrieved from the DB (see CremeModel.from_db())
+            db_values = getattr(instance, '_db_values', None)
+
+            if db_values is not None:
+                if not hasattr(instance, 'get_related_entity'):
+                    if not isinstance(instance, CremeEntity) or not _final_entity(instance):
+                        return None
+
+                backup = dict(zip(*db_values))
+
+        return backup
+
     def _get_printer(self, field):
         return _PRINTERS.get(field.get_internal_type(), _basic_printer)
 
@@ -318,13 +344,65 @@ class _HLTEntityEdition(_HistoryLineType):
         modifs = _HistoryLineType._build_fields_modifs(entity)
 
         if modifs:
-            hline = HistoryLine._create_line_4_instance(entity, cls.type_id,
-                                                        date=entity.modified,
-                                                        modifs=modifs,
-                                                       )
-            _HLTRelatedEntity.create_lines(entity, hline)
+            hline = HistoryLine._build_line_4_instance(entity, cls.type_id,
+                                                       date=entity.modified,
+                                                       modifs=modifs,
+                                                      )
+            HistoryLine._save_lines(hline, *_HLTRelatedEntity.build_lines(entity, hline))
             cls._create_entity_backup(entity)
 
+    @classmethod
+    def create_lines_4_update(cls, entities, field, old_value, new_value):
+        """Create the lines of some entities whose field has been modified with
+        an UPDATE query (so _log_creation_edition() is not called).
+        @param entities: Instances of the same model, with their new value &
+               their new modification date.
+        @param field: Instance of django.db.models.Field.
+        @param old_value: Old value (primary key for ForeignKeys) ; must be the
+               same for all the entities.
+        @param new_value: New value (primary key for ForeignKeys).
+        """
+        fname = field.name
+
+        if fname in _EXCLUDED_FIELDS or not field.get_tag('viewable') or old_value == new_value:
+            return
+
+        if field.get_internal_type() not in _SERIALISABLE_FIELDS:
+            modif = (fname,)
+        elif old_value:
+            modif = (fname, old_value, new_value)
+        else:
+            modif = (fname, new_value)
+
+        hlines = [HistoryLine._build_line_4_instance(entity, cls.type_id,
+                                                     date=entity.modified,
+                                                     modifs=[modif],
+                                                    )
+                    for entity in entities
+                 ]
+        HistoryLine._save_lines(*hlines, *_HLTRelatedEntity.build_lines_multi(hlines))
+
+    @classmethod
+    def create_lines_multi(cls, entities):
+        """Create the lines of some entities which have been modified with
+        UPDATE queries (so _log_creation_edition() is not called).
+        @param entities: Instances retrieved from the DB (their old values are
+               known), with their new values & their new modification date.
+        """
+        hlines = []
+
+        for entity in entities:
+            modifs = cls._build_fields_modifs(entity)
+
+            if modifs:
+                hlines.append(HistoryLine._build_line_4_instance(entity, cls.type_id,
+                                                                 date=entity.modified,
+                                                                 modifs=modifs,
+                                                                ))
+
+        if hlines:
+            HistoryLine._save_lines(*hlines, *_HLTRelatedEntity.build_lines_multi(hlines))
+
 
 @TYPES_MAP(TYPE_DELETION)
 class _HLTEntityDeletion(_HistoryLineType):
@@ -332,11 +410,11 @@ class _HLTEntityDeletion(_HistoryLineType):
 
     @classmethod
     def create_line(cls, entity):
-        HistoryLine.objects.create(entity_ctype=entity.entity_type,
-                                   entity_owner=entity.user,
-                                   type=cls.type_id,
-                                   value=HistoryLine._encode_attrs(entity),
-                                  )
+        HistoryLine._save_lines(HistoryLine(entity_ctype=entity.entity_type,
+                                            entity_owner=entity.user,
+                                            type=cls.type_id,
+                                            value=HistoryLine._encode_attrs(entity),
+                                           ))
 
 
 @TYPES_MAP(TYPE_RELATED)
@@ -345,22 +423,50 @@ class _HLTRelatedEntity(_HistoryLineType):
     has_related_line = True
 
     @classmethod
-    def create_lines(cls, entity, related_line):
+    def build_lines(cls, entity, related_line):
+        """Build the (not saved) lines of the entities related to an edited entity.
+        @param entity: Edited entity.
+        @param related_line: Line of the edition (saved or not).
+        @return: List of HistoryLines.
+        """
+        return cls.build_lines_multi([related_line], entities=[entity])
+
+    @classmethod
+    def build_lines_multi(cls, related_lines, entities=None):
+        """Build the (not saved) lines of the entities related to several
+        edited entities, with a fixed number of queries.
+        @param related_lines: Lines of edition (saved or not).
+        @param entities: Edited entities (same order as 'related_lines') ;
+               by default, the field 'entity' of the lines is used.
+        @return: List of HistoryLines.
+        """
+        if entities is None:
+            entities = [hline.entity for hline in related_lines]
+
+        if not entities:
+            return []
+
         items = HistoryConfigItem.objects.values_list('relation_type', flat=True)  # TODO: cache ??
-        relations = Relation.objects.filter(subject_entity=entity.id, type__in=items) \
+        relations = Relation.objects.filter(subject_entity__in=[e.id for e in entities], type__in=items) \
                                     .select_related('object_entity')
 
-        if relations:
-            object_entities = [r.object_entity for r in relations]
-            create_line = partial(HistoryLine._create_line_4_instance,
-                                  ltype=cls.type_id, date=entity.modified,
-                                  related_line_id=related_line.id,
-                                 )
+        if not relations:
+            return []
 
-            CremeEntity.populate_real_entities(object_entities)  # Optimisation
+        CremeEntity.populate_real_entities([r.object_entity for r in relations])  # Optimisation
 
-            for related_entity in object_entities:
-                create_line(related_entity.get_real_entity())
+        objects_per_subject = defaultdict(list)
+        for relation in relations:
+            objects_per_subject[relation.subject_entity_id].append(relation.object_entity)
+
+        return [
+            HistoryLine._build_line_4_instance(related_entity.get_real_entity(),
+                                               ltype=cls.type_id, date=entity.modified,
+                                               related_line=related_line,
+                                              )
+                for entity, related_line in zip(entities, related_lines)
+                    for related_entity in objects_per_subject[entity.id]
+        ]
 
 
 @TYPES_MAP(TYPE_PROP_ADD)
@@ -406,16 +512,15 @@ class _HLTRelation(_HistoryLineType):
 
     @classmethod
     def _create_lines(cls, relation, sym_cls, date=None):
-        create_line = partial(HistoryLine._create_line_4_instance, date=date)
-        hline     = create_line(relation.subject_entity, cls.type_id)
-        hline_sym = create_line(relation.object_entity, sym_cls.type_id,
-                                modifs=[relation.type.symmetric_type_id],
-                                related_line_id=hline.id,
-                               )
-        hline.value = HistoryLine._encode_attrs(hline.entity, modifs=[relation.type_id],
-                                                related_line_id=hline_sym.id
-                                               )
-        hline.save()
+        build_line = partial(HistoryLine._build_line_4_instance, date=date)
+        hline = build_line(relation.subject_entity, cls.type_id, modifs=[relation.type_id])
+        hline_sym = build_line(relation.object_entity, sym_cls.type_id,
+                               modifs=[relation.type.symmetric_type_id],
+                               related_line=hline,
+                              )
+        hline._related_line = hline_sym
+
+        HistoryLine._save_lines(hline, hline_sym)
 
     @classmethod
     def create_lines(cls, relation, created):
@@ -424,6 +529,42 @@ class _HLTRelation(_HistoryLineType):
                               _HLTSymRelation, relation.created,
                              )
 
+    @classmethod
+    def create_lines_4_new_relations(cls, relations):
+        """Create the lines of several new Relations with bulk queries
+        (see RelationManager.bulk_link()).
+        @param relations: Iterable of saved Relations ; their attribute
+               "symmetric_relation" must be set, & their entities should be
+               retrieved (real entities).
+        """
+        build_line = HistoryLine._build_line_4_instance
+        lines = []
+
+        for relation in relations:
+            sym_relation = relation.symmetric_relation
+
+            if '-subject_' not in relation.type_id:
+                relation, sym_relation = sym_relation, relation
+
+            if getattr(relation, '_hline_disabled', False) or \
+               getattr(sym_relation, '_hline_disabled', False):
+                continue
+
+            date = relation.created
+            hline = build_line(relation.subject_entity, cls.type_id, date=date,
+                               modifs=[relation.type_id],
+                              )
+            hline_sym = build_line(relation.object_entity, _HLTSymRelation.type_id, date=date,
+                                   modifs=[sym_relation.type_id], related_line=hline,
+                                  )
+            hline._related_line = hline_sym
+
+            lines.append(hline)
+            lines.append(hline_sym)
+
+        if lines:
+            HistoryLine._save_lines(*lines)
+
     def verbose_modifications(self, modifications, entity_ctype, user):
         rtype_id = modifications[0]
 
@@ -771,24 +912,126 @@ class HistoryLine(Model):
         return self._related_line
 
     @classmethod
-    def _create_line_4_instance(cls, instance, ltype, date=None, modifs=(), related_line_id=None):
-        """Builder.
+    def _build_line_4_instance(cls, instance, ltype, date=None, modifs=(), related_line=None):
+        """Builder of a line which is not saved.
         @param ltype: See TYPE_*
         @param date: If not given, will be 'now'.
         @param modifs: List of tuples containing JSONifiable values.
-        @param related_line_id: HistoryLine.id.
+        @param related_line: HistoryLine instance (saved or not) ; its ID is
+               stored when the line is saved (see _save_lines()).
         """
         kwargs = {'entity': instance,
                   'entity_ctype': instance.entity_type,
-                  'entity_owner': instance.user,
+                  'entity_owner_id': instance.user_id,
                   'type': ltype,
-                  'value': cls._encode_attrs(instance, modifs=modifs,
-                                             related_line_id=related_line_id,
-                                            ),
+                  'value': cls._encode_attrs(instance, modifs=modifs),
                  }
         if date: kwargs['date'] = date
 
-        return cls.objects.create(**kwargs)
+        line = cls(**kwargs)
+
+        if related_line is not None:
+            line._related_line = related_line
+
+        return line
+
+    @classmethod
+    def _create_line_4_instance(cls, instance, ltype, date=None, modifs=(), related_line_id=None):
+        """Builder.
+        @param ltype: See TYPE_*
+        @param date: If not given, will be 'now'.
+        @param modifs: List of tuples containing JSONifiable values.
+        @param related_line_id: HistoryLine.id.
+        @return: The line ; notice that its ID is None if the line is buffered
+                 (see _save_lines()).
+        """
+        line = cls._build_line_4_instance(instance, ltype, date=date, modifs=modifs)
+
+        if related_line_id:
+            line.value = cls._encode_attrs(instance, modifs=modifs, related_line_id=related_line_id)
+
+        cls._save_lines(line)
+
+        return line
+
+    @classmethod
+    def _save_lines(cls, *lines):
+        """Save some new lines.
+        Within a transaction, the lines are buffered, & inserted when the
+        transaction is committed (see settings.HISTORY_BUFFERED) ; the lines
+        created within a savepoint which is rolled back are discarded.
+        The attribute "_related_line" of a line can reference another new line
+        (see related_line) ; the ID of the related line is stored in the value
+        of the line when they are inserted.
+        """
+        if not cls.ENABLED:
+            return
+
+        user = get_global_info('user')
+        username = user.username if user else ''
+
+        for line in lines:
+            line.username = username
+
+        using = router.db_for_write(cls)
+
+        if settings.HISTORY_BUFFERED and connections[using].in_atomic_block:
+            _history_buffer.add(lines, using=using)
+        else:
+            cls._insert_lines(lines, using=using)
+
+    @classmethod
+    def _insert_lines(cls, lines, using):
+        """Insert some new lines with a minimum number of queries.
+        See _save_lines() for the related lines.
+        """
+        encode = _JSONEncoder().encode
+
+        def link(line):
+            "Store the ID of the related line in the value ; False means the related line has no ID yet."
+            related_line = line._related_line
+
+            if related_line:
+                if related_line.id is None:
+                    return False
+
+                value = json_load(line.value)
+                value.insert(1, related_line.id)
+                line.value = encode(value)
+
+            return True
+
+        targets = {id(line._related_line) for line in lines if line._related_line}
+        target_lines = []
+        other_lines = []
+
+        for line in lines:
+            (target_lines if id(line) in targets else other_lines).append(line)
+
+        manager = cls.objects.using(using)
+
+        # The lines referenced by other lines need IDs
+        not_linked_lines = [line for line in target_lines if not link(line)]
+
+        if target_lines:
+            if connections[using].features.can_return_ids_from_bulk_insert:
+                manager.bulk_create(target_lines)
+            else:
+                for line in target_lines:
+                    super(HistoryLine, line).save(using=using)
+
+        if other_lines:
+            for line in other_lines:
+                link(line)
+
+            manager.bulk_create(other_lines)
+
+        # Lines referencing each other (eg: the 2 lines of a Relation)
+        if not_linked_lines:
+            for line in not_linked_lines:
+                link(line)
+
+            manager.bulk_update(not_linked_lines, ['value'])
 
     def save(self, *args, **kwargs):
         if self.ENABLED:
@@ -820,27 +1063,6 @@ def _final_entity(entity):
     return entity.entity_type_id == _get_ct(entity).id
 
 
-@receiver(post_init)
-def _prepare_log(sender, instance, **kwargs):
-    if hasattr(instance, 'get_related_entity'):
-        _HistoryLineType._create_entity_backup(instance)
-    elif isinstance(instance, CremeEntity) and instance.id and _final_entity(instance):
-        _HistoryLineType._create_entity_backup(instance)
-    # XXX: following billing lines problem should not exist anymore
-    #      (several inheritance levels are avoided).
-    # TODO: replace with this code
-    #      problem with billing lines : the update view does not retrieve
-    #      final class, so 'instance.entity_type_id == _get_ct(instance).id'
-    #      test avoid the creation of a line --> find a better way to test if a final object is alive ?
-    # if isinstance(instance, CremeEntity):
-    #     if not instance.id or instance.entity_type_id != _get_ct(instance).id:
-    #         return
-    # elif not hasattr(instance, 'get_related_entity'):
-    #     return
-    #
-    # _HistoryLineType._create_entity_backup(instance)
-
-
 @receiver(post_save)
 def _log_creation_edition(sender, instance, created, **kwargs):
     if getattr(instance, '_hline_disabled', False):  # see HistoryLine.disable
@@ -854,6 +1076,8 @@ def _log_creation_edition(sender, instance, created, **kwargs):
         elif hasattr(instance, 'get_related_entity'):
             if created:
                 _HLTAuxCreation.create_line(instance)
+                # The next modifications of this instance are logged
+                _HistoryLineType._create_entity_backup(instance)
             else:
                 _HLTAuxEdition.create_line(instance)
         elif isinstance(instance, CremeEntity):
@@ -908,6 +1132,70 @@ def _log_deletion(sender, instance, **kwargs):
         logger.exception('Error in _log_deletion() ; HistoryLine may not be created.')
 
 
+class _HistoryLinesBatch:
+    def __init__(self, using):
+        self.using = using
+        self.lines = []
+
+    def flush(self):
+        lines, self.lines = self.lines, []
+        using = self.using
+
+        try:
+            # Lines of entities which have been deleted since the lines were built
+            entities_ids = {line.entity_id for line in lines if line.entity_id}
+            if entities_ids:
+                existing_ids = {*CremeEntity.objects.using(using)
+                                                    .filter(id__in=entities_ids)
+                                                    .values_list('id', flat=True)
+                               }
+
+                for line in lines:
+                    if line.entity_id and line.entity_id not in existing_ids:
+                        line.entity = None
+
+            HistoryLine._insert_lines(lines, using=using)
+        except Exception:
+            logger.exception('Error in _HistoryLinesBatch.flush() ; HistoryLines have not been created.')
+
+
+class _HistoryBuffer(local):
+    """Collects the new HistoryLines created within a transaction ; they are
+    inserted (with bulk queries) when the transaction is committed.
+
+    The lines are grouped by savepoint, like the callbacks of on_commit():
+    the lines created within a savepoint which is rolled back are discarded.
+    NB: the buffer is per thread, like the connections to the DB.
+    """
+    def __init__(self):
+        self._batches = {}  # Key: (DB alias, IDs of the savepoints)
+
+    @staticmethod
+    def _is_registered(batch, connection):
+        flush = batch.flush
+
+        return any(entry[1] == flush for entry in connection.run_on_commit)
+
+    def add(self, lines, using):
+        connection = connections[using]
+        key = (using, tuple(connection.savepoint_ids))
+        batches = self._batches
+        batch = batches.get(key)
+
+        if batch is None or not self._is_registered(batch, connection):
+            # Batches of the committed/rolled back transactions are removed
+            self._batches = batches = {
+                k: b for k, b in batches.items() if self._is_registered(b, connections[b.using])
+            }
+            batches[key] = batch = _HistoryLinesBatch(using)
+            on_commit(batch.flush, using=using)
+
+        batch.lines.extend(lines)
+
+
+_history_buffer = _HistoryBuffer()
+
+
 class HistoryConfigItem(Model):
     relation_type = OneToOneField(RelationType, on_delete=CASCADE)
 
@@ -19,18 +19,21 @@
 ################################################################################
 
 from collections import defaultdict
+from functools import partial
 import logging
 import warnings
 
 from django.contrib.contenttypes.models import ContentType
 from django.db import models, IntegrityError
 from django.db.models.query_utils import Q
+from django.db.models.signals import post_save
 from django.db.transaction import atomic
 from django.dispatch import receiver
 from django.http import Http404
 from django.utils.translation import gettext_lazy as _, gettext
 
 from ..signals import pre_merge_related
+from ..utils.chunktools import iter_as_chunk
 
 from . import fields as creme_fields
 from .base import CremeModel
@@ -155,6 +158,177 @@ class RelationManager(models.Manager):
 
         return count
 
+    def bulk_link(self, relations, check_existing=True, batch_size=500):
+        """Create several Relations (& their symmetrical instances) with a few
+        queries per batch, instead of several queries per Relation like
+        safe_multi_save() does.
+          - The UNIQUE constraint on ('type', 'subject_entity', 'object_entity')
+            is respected: duplicates & existing Relations are ignored (even if
+            they are created by another transaction meanwhile).
+          - The HistoryLines are created in bulk.
+          - The signal "post_save" is sent (with <created=True>) for each
+            created instance, once the 2 symmetrical instances are linked ;
+            the signal "pre_save" is not sent.
+
+        The instances which are inserted get an ID & their attribute
+        "symmetric_relation" is set ; the ID of the other instances remains 'None'.
+        If an error occurs, the instances are reset (so they can be linked again).
+
+        @param relations: An iterable of Relations (not save yet).
+        @param check_existing: Perform a query (per batch) to check existing
+               Relations. You can pass False for newly created entities in
+               order to avoid queries.
+        @param batch_size: Maximum number of Relations inserted per query.
+        @return: Number of Relations inserted in base.
+                 NB: the symmetrical instances are not counted.
+        """
+        relations = [*relations]
+
+        if not relations:
+            return 0
+
+        sym_type_ids = dict(
+            RelationType.objects.filter(id__in={r.type_id for r in relations})
+                                .values_list('id', 'symmetric_type')
+        )
+        unique_relations = {}
+
+        for relation in relations:
+            subject_id = relation.subject_entity_id
+            object_id  = relation.object_entity_id
+
+            # NB: a Relation & its symmetrical are the same link, so only the
+            #     first one of the batch is kept.
+            if (sym_type_ids[relation.type_id], object_id, subject_id) not in unique_relations:
+                unique_relations.setdefault((relation.type_id, subject_id, object_id), relation)
+
+        count = 0
+
+        try:
+            with atomic(using=self.db):
+                for signatures in iter_as_chunk(unique_relations, batch_size):
+                    count += self._bulk_link_batch(
+                        {sig: unique_relations[sig] for sig in signatures},
+                        sym_type_ids=sym_type_ids,
+                        check_existing=check_existing,
+                    )
+        except Exception:
+            for relation in unique_relations.values():
+                relation.id = None
+                relation.symmetric_relation = None
+
+            raise
+
+        return count
+
+    def _bulk_link_batch(self, relations, sym_type_ids, check_existing):
+        from .history import _HLTRelation
+
+        def signatures_q(signatures):
+            return Q(type__in={sig[0] for sig in signatures},
+                     subject_entity__in={sig[1] for sig in signatures},
+                     object_entity__in={sig[2] for sig in signatures},
+                    )
+
+        if check_existing:
+            # NB: the symmetrical instances are searched too, in order to
+            #     detect an inconsistent Relation (ie: existing in one direction only).
+            existing = {*self.filter(signatures_q(relations) |
+                                     signatures_q([(sym_type_ids[type_id], object_id, subject_id)
+                                                       for type_id, subject_id, object_id in relations
+                                                  ])
+                                    )
+                             .values_list('type', 'subject_entity', 'object_entity')
+                       }
+
+            for sig in [*relations]:
+                type_id, subject_id, object_id = sig
+
+                if sig in existing or (sym_type_ids[type_id], object_id, subject_id) in existing:
+                    del relations[sig]
+
+            if not relations:
+                return 0
+
+        # NB: the Relations inserted by another transaction meanwhile are
+        #     ignored, so we retrieve the IDs of the inserted instances
+        #     (they are the only ones without symmetrical instance yet).
+        self.bulk_create(relations.values(), ignore_conflicts=True)
+
+        inserted = []
+        for rel_id, *sig in self.filter(signatures_q(relations), symmetric_relation__isnull=True) \
+                                .values_list('id', 'type', 'subject_entity', 'object_entity'):
+            relation = relations.get(tuple(sig))
+
+            if relation is not None:
+                relation.id = rel_id
+                inserted.append(relation)
+
+        if not inserted:
+            return 0
+
+        self._populate_entities(inserted)
+
+        sym_relations = [
+            self.model(user_id=relation.user_id,
+                       created=relation.created,
+                       type_id=sym_type_ids[relation.type_id],
+                       symmetric_relation=relation,
+                       subject_entity=relation.object_entity,
+                       object_entity=relation.subject_entity,
+                      ) for relation in inserted
+        ]
+        # NB: no conflict is possible with consistent data (the 2 symmetrical
+        #     instances are always created in the same transaction).
+        self.bulk_create(sym_relations)
+
+        if any(sym_relation.id is None for sym_relation in sym_relations):  # Backend without RETURNING
+            sym_ids = dict(self.filter(symmetric_relation__in=[r.id for r in inserted])
+                               .values_list('symmetric_relation', 'id')
+                          )
+
+            for sym_relation in sym_relations:
+                sym_relation.id = sym_ids[sym_relation.symmetric_relation_id]
+
+        for relation, sym_relation in zip(inserted, sym_relations):
+            relation.symmetric_relation = sym_relation
+
+        self.bulk_update(inserted, ['symmetric_relation'])
+
+        _HLTRelation.create_lines_4_new_relations(inserted)
+
+        send_signal = partial(post_save.send, sender=self.model, created=True,
+                              update_fields=None, raw=False, using=self.db,
+                             )
+
+        for relation, sym_relation in zip(inserted, sym_relations):
+            send_signal(instance=relation)
+            send_signal(instance=sym_relation)
+
+        return len(inserted)
+
+    @staticmethod
+    def _populate_entities(relations):
+        "Retrieve the entities which are not cached by the Relations (with a few queries)."
+        is_subject_cached = Relation.subject_entity.field.is_cached
+        is_object_cached  = Relation.object_entity.field.is_cached
+
+        entity_ids = {
+            *(r.subject_entity_id for r in relations if not is_subject_cached(r)),
+            *(r.object_entity_id for r in relations if not is_object_cached(r)),
+        }
+
+        if entity_ids:
+            entities = CremeEntity.objects.in_bulk(entity_ids)
+            CremeEntity.populate_real_entities([*entities.values()])
+
+            for relation in relations:
+                if not is_subject_cached(relation):
+                    relation.subject_entity = entities[relation.subject_entity_id].get_real_entity()
+
+                if not is_object_cached(relation):
+                    relation.object_entity = entities[relation.object_entity_id].get_real_entity()
+
 
 class RelationType(CremeModel):
     """Type of Relations.
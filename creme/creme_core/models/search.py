@@ -21,16 +21,21 @@
 from collections import defaultdict
 import logging
 
+from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
 from django.db import models
-from django.db.models import TextField, ForeignKey, BooleanField, Q, FieldDoesNotExist, CASCADE
+from django.db.models import TextField, CharField, ForeignKey, BooleanField, FieldDoesNotExist, CASCADE
+from django.db.models.signals import post_save
+from django.dispatch import receiver
 from django.utils.translation import gettext_lazy as _, gettext, pgettext_lazy
 
+from ..core.config_cache import config_cache
 from ..utils import find_first
 from ..utils.meta import FieldInfo, ModelFieldEnumerator
 from .auth import UserRole
 from .base import CremeModel
-from .fields import EntityCTypeForeignKey, DatePeriodField
+from .entity import CremeEntity
+from .fields import CTypeForeignKey, EntityCTypeForeignKey, DatePeriodField
 
 logger = logging.getLogger(__name__)
 
@@ -198,14 +203,15 @@ class SearchConfigItem(CremeModel):
         get_ct = ContentType.objects.get_for_model
         ctypes = [get_ct(model) for model in models]
 
-        role_query = Q(role__isnull=True)
+        # NB: the items of all the roles are retrieved (& cached) ; these ones
+        #     of the user are selected in Python.
         if user.is_superuser:
-            role_query |= Q(superuser=True)
+            role_func = lambda sci: sci.role_id is None
             filter_func = lambda sci: sci.superuser
         else:
-            role = user.role
-            role_query |= Q(role=role)
-            filter_func = lambda sci: sci.role == role
+            role_id = user.role_id
+            role_func = lambda sci: sci.role_id is None or sci.role_id == role_id
+            filter_func = lambda sci: sci.role_id == role_id
 
 # TODO: use a similar way if superuser is a role
 #       (PG does not return a cool result if we do a ".order_by('role', 'superuser')")
@@ -218,12 +224,32 @@ class SearchConfigItem(CremeModel):
 #
 #        for ctype in ctypes:
 #            yield sc_items.get(ctype) or SearchConfigItem(content_type=ctype)
-        sc_items_per_ctid = defaultdict(list)
-        for sci in SearchConfigItem.objects.filter(content_type__in=ctypes).filter(role_query):
-            sc_items_per_ctid[sci.content_type_id].append(sci)
+        cache_key_fmt = 'creme_core-search_config-{}'.format
+        cached_items = config_cache.get_many(cache_key_fmt(ct.id) for ct in ctypes)
+        sc_items_per_ctid = {}
+        not_cached_ctypes = []
 
         for ctype in ctypes:
-            sc_items = sc_items_per_ctid.get(ctype.id)
+            sc_items = cached_items.get(cache_key_fmt(ctype.id))
+
+            if sc_items is None:
+                not_cached_ctypes.append(ctype)
+            else:
+                sc_items_per_ctid[ctype.id] = sc_items
+
+        if not_cached_ctypes:
+            retrieved_items = defaultdict(list)
+            for sci in SearchConfigItem.objects.filter(content_type__in=not_cached_ctypes):
+                retrieved_items[sci.content_type_id].append(sci)
+
+            retrieved_items = {ct.id: retrieved_items[ct.id] for ct in not_cached_ctypes}
+            config_cache.set_many({cache_key_fmt(ct_id): sc_items
+                                       for ct_id, sc_items in retrieved_items.items()
+                                  })
+            sc_items_per_ctid.update(retrieved_items)
+
+        for ctype in ctypes:
+            sc_items = [*filter(role_func, sc_items_per_ctid[ctype.id])]
 
             if sc_items:
                 try:
@@ -238,3 +264,38 @@ class SearchConfigItem(CremeModel):
             raise ValueError('"role" must be NULL if "superuser" is True')
 
         super().save(*args, **kwargs)
+
+
+class SearchIndexEntry(models.Model):
+    """Token (normalized word) contained by a searchable field of an entity.
+    These instances are used by the search when settings.SEARCH_INDEX is True
+    (see creme_core.core.search) ; they are updated when entities are saved
+    (& deleted with them).
+    """
+    entity       = ForeignKey(CremeEntity, related_name='+', on_delete=CASCADE, editable=False)
+    entity_ctype = CTypeForeignKey(related_name='+', editable=False)
+    field        = CharField(max_length=100, editable=False)
+    token        = CharField(max_length=50, db_index=True, editable=False)
+
+    class Meta:
+        app_label = 'creme_core'
+        index_together = [('entity_ctype', 'token')]
+
+    def __str__(self):
+        return 'SearchIndexEntry(entity_id={}, field="{}", token="{}")'.format(
+            self.entity_id, self.field, self.token,
+        )
+
+
+@receiver(post_save)
+def _update_search_index(sender, instance, **kwargs):
+    # NB: instances of CremeEntity (not real entities) are ignored, because
+    #     they do not contain the indexed values.
+    if settings.SEARCH_INDEX and isinstance(instance, CremeEntity) and \
+       sender is not CremeEntity and not kwargs.get('raw'):
+        from ..core.search import search_index
+
+        try:
+            search_index.update_entities([instance])
+        except Exception:
+            logger.exception('Error in _update_search_index() ; the search index may be outdated.')
@@ -22,6 +22,7 @@ import logging
 
 from django.db import models
 
+from ..core.config_cache import config_cache
 from ..core.setting_key import setting_key_registry
 from ..global_info import get_per_request_cache
 
@@ -42,7 +43,8 @@ class SettingValueManager(models.Manager):
         self.key_registry = skey_registry
 
     def get_4_key(self, key, **kwargs):
-        """Get the SettingValue corresponding to a SettingKey. Results are cached (per request).
+        """Get the SettingValue corresponding to a SettingKey. Results are
+        cached (per request, & per process -- see core.config_cache).
 
         @param key: A SettingKey instance, or an ID of SettingKey (string).
         @param default: (optional) If given & the SettingValue does not exist,
@@ -91,7 +93,7 @@ class SettingValueManager(models.Manager):
         """Get several SettingValue corresponding to several SettingKeys at once.
          It's faster than calling 'get_4_key()' several times, because only one
          SQL query is performed (in the worst case)
-         Results are cached (per request).
+         Results are cached (per request, & per process -- see core.config_cache).
 
         @param values_info: Each argument must be dictionary with these keys:
                "key": A SettingKey instance, or an ID of SettingKey (string).
@@ -137,8 +139,18 @@ class SettingValueManager(models.Manager):
         if uncached_info:
             retrieved_svalues = {
                 svalue.key_id: svalue
-                    for svalue in self.filter(key_id__in=[i[0] for i in uncached_info])
+                    for svalue in config_cache.get_many(i[1] for i in uncached_info).values()
             }
+            missing_key_ids = [i[0] for i in uncached_info if i[0] not in retrieved_svalues]
+
+            if missing_key_ids:
+                svalues_from_db = {svalue.key_id: svalue
+                                       for svalue in self.filter(key_id__in=missing_key_ids)
+                                  }
+                config_cache.set_many({format_cache_key(key_id): svalue
+                                           for key_id, svalue in svalues_from_db.items()
+                                      })
+                retrieved_svalues.update(svalues_from_db)
 
             for key_id, cache_key, value_info in uncached_info:
                 try:
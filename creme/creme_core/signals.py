@@ -35,6 +35,10 @@ pre_replace_related = Signal(providing_args=['old_instance', 'new_instance'])
 # <sender> is the instance to delete.
 pre_replace_and_delete = Signal(providing_args=['model_field', 'replacing_instance'])
 
+# Sent (the sender is the model) when some instances have been modified with
+# UPDATE queries, which do not send "post_save" (see utils.db.can_update_in_bulk()).
+post_update_in_bulk = Signal(providing_args=['instance_ids'])
+
 pre_uninstall_flush  = Signal(providing_args=['content_types', 'verbosity',
                                               'stdout_write', 'stderr_write', 'style',
                                              ],
@@ -815,6 +815,10 @@ creme.bricks.Brick = creme.component.Component.sub({
         return this.isBound() && (this._element.attr('data-brick-readonly') === 'true');
     },
 
+    isDeferred: function() {
+        return this.isBound() && (this._element.attr('data-brick-deferred') === 'true');
+    },
+
     reloadingInfo: function() {
         if (!this.isBound()) {
             return {};
@@ -924,6 +928,14 @@ creme.bricks.BricksReloader.prototype = {
         return this;
     },
 
+    deferred: function() {
+        this._brickFilter = function(brick) {
+            return brick.isDeferred();
+        };
+
+        return this;
+    },
+
     sourceBrick: function(brick) {
         this.containerFromNode(brick._element);
         var src_deps = brick.dependencies();
@@ -1037,6 +1049,11 @@ creme.bricks.BricksReloader.prototype = {
     }
 };
 
+// The placeholders of the deferred bricks (see {% brick_display ... deferred=True %}) are
+// replaced by the real bricks, which are retrieved with only one reloading query.
+creme.bricks.loadDeferredBricks = creme.utils.debounce(function() {
+    new creme.bricks.BricksReloader().deferred().action().start();
+}, 0);
 
 creme.bricks.BrickLauncher = creme.widget.declare('brick', {
     _create: function(element, options, cb, sync, args) {
@@ -1046,6 +1063,10 @@ creme.bricks.BrickLauncher = creme.widget.declare('brick', {
 
         element.addClass('widget-ready');
         brick.trigger('ready', [options]);
+
+        if (brick.isDeferred()) {
+            creme.bricks.loadDeferredBricks();
+        }
     },
 
     _destroy: function(element) {
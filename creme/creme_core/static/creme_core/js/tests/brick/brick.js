@@ -252,6 +252,15 @@ QUnit.test('creme.bricks.Brick.readOnly', function(assert) {
     equal(true, new Brick().bind($('<div data-brick-readonly="true"></div>')).readOnly());
 });
 
+QUnit.test('creme.bricks.Brick.isDeferred', function(assert) {
+    var Brick = creme.bricks.Brick;
+
+    equal(false, new Brick().isDeferred());
+    equal(false, new Brick().bind($('<div></div>')).isDeferred());
+    equal(false, new Brick().bind($('<div data-brick-deferred="false"></div>')).isDeferred());
+    equal(true, new Brick().bind($('<div data-brick-deferred="true"></div>')).isDeferred());
+});
+
 QUnit.test('creme.bricks.Brick.dependencies', function(assert) {
     var Brick = creme.bricks.Brick;
 
@@ -885,4 +894,50 @@ QUnit.test('creme.bricks.Brick.refresh (wildcard deps)', function(assert) {
     ], this.mockBackendUrlCalls('mock/brick/all/reload'));
 });
 
+QUnit.test('creme.bricks.Brick.refresh (deferred)', function(assert) {
+    var htmlA = '<div class="brick ui-creme-widget" widget="brick" id="brick-A" data-brick-deferred="true"></div>';
+    var htmlB = '<div class="brick ui-creme-widget" widget="brick" id="brick-B"></div>';
+    var htmlC = '<div class="brick ui-creme-widget" widget="brick" id="brick-C" data-brick-deferred="true"></div>';
+    var elementA = $(htmlA).appendTo(this.qunitFixture());
+    var elementB = $(htmlB).appendTo(this.qunitFixture());
+    var elementC = $(htmlC).appendTo(this.qunitFixture());
+
+    creme.widget.create(elementA);
+    creme.widget.create(elementB);
+    creme.widget.create(elementC);
+
+    new creme.bricks.BricksReloader().deferred().action().start();
+
+    // Only the deferred bricks are retrieved, with one query
+    deepEqual([
+        ['GET', {"brick_id": ["brick-A", "brick-C"], "extra_data": "{}"}]
+    ], this.mockBackendUrlCalls('mock/brick/all/reload'));
+
+    // The placeholders have been replaced
+    this.resetMockBackendCalls();
+    new creme.bricks.BricksReloader().deferred().action().start();
+    deepEqual([], this.mockBackendUrlCalls('mock/brick/all/reload'));
+});
+
+QUnit.test('creme.bricks.BrickLauncher (deferred)', function(assert) {
+    var self = this;
+    var htmlA = '<div class="brick ui-creme-widget" widget="brick" id="brick-A" data-brick-deferred="true"></div>';
+    var htmlB = '<div class="brick ui-creme-widget" widget="brick" id="brick-B" data-brick-deferred="true"></div>';
+
+    creme.widget.create($(htmlA).appendTo(this.qunitFixture()));
+    creme.widget.create($(htmlB).appendTo(this.qunitFixture()));
+
+    deepEqual([], this.mockBackendUrlCalls('mock/brick/all/reload'));
+
+    stop(1);
+
+    setTimeout(function() {
+        deepEqual([
+            ['GET', {"brick_id": ["brick-A", "brick-B"], "extra_data": "{}"}]
+        ], self.mockBackendUrlCalls('mock/brick/all/reload'));
+
+        start();
+    }, 50);
+});
+
 }(jQuery));
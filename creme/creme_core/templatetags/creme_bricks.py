@@ -875,16 +875,32 @@ def brick_display(context, *bricks, **kwargs):
     Possible values are:
        - 'detail'  => detailview_display() (default value)
        - 'home'    => home_display()
+
+    The keyword argument 'deferred' can be used to render some placeholders instead
+    of the bricks (see Brick.deferred_display()) ; the client retrieves the content
+    of all the deferred bricks of the page with one reloading query. So the
+    bricks must be retrieved by the reloading view of the page (see the template
+    variable "bricks_reload_url").
+
+        {% brick_display my_brick1 my_brick2 deferred=True %}
+
+    Notice that the bricks are rendered concurrently if it's possible (see
+    settings.BRICKS_RENDERING_THREADS).
     """
-    from creme.creme_core.views.bricks import render_detailview_brick, render_home_brick
+    from creme.creme_core.views.bricks import (
+        render_detailview_brick, render_home_brick, render_deferred_brick,
+        bricks_renderer,
+    )
 
     context_dict = context.flatten()
     render_type = kwargs.get('render', 'detail')
 
     if render_type == 'detail':
         render = render_detailview_brick
+        method_name = 'detailview_display'
     elif render_type == 'home':
         render = render_home_brick
+        method_name = 'home_display'
     else:
         raise ValueError(
             '{% brick_display %}: "render" argument must be in {detail|home}.'
@@ -917,10 +933,22 @@ def brick_display(context, *bricks, **kwargs):
             bricks_to_render.append(brick_or_seq)
 
     # NB: the context is copied is order to a 'fresh' one for each brick, & so avoid annoying side-effects.
+    if kwargs.get('deferred', False):
+        # NB: the bricks which cannot be rendered are ignored like with a regular rendering.
+        return mark_safe(
+            ''.join(render_deferred_brick(brick, context={**context_dict})
+                        for brick in bricks_to_render
+                            if hasattr(brick, method_name)
+                   )
+        )
+
     return mark_safe(
         ''.join(filter(None,
-                       (render(brick, context={**context_dict})
-                           for brick in bricks_to_render
+                       (brick_render
+                           for brick, brick_render in bricks_renderer.render(bricks_to_render,
+                                                                             context=context_dict,
+                                                                             brick_render_function=render,
+                                                                            )
                        )
     )))
 
@@ -21,6 +21,7 @@
 from django.db.models import Q
 from django.template import Library
 
+from ..core.config_cache import config_cache
 from ..gui.button_menu import button_registry
 from ..gui.menu import creme_menu
 from ..models import ButtonMenuItem
@@ -37,12 +38,18 @@ def menu_display(context):
 @register.inclusion_tag('creme_core/templatetags/menu_buttons.html', takes_context=True)
 def menu_buttons_display(context):
     entity = context['object']
-    bmi = ButtonMenuItem.objects.filter(Q(content_type=entity.entity_type) |
-                                        Q(content_type__isnull=True)
-                                       ) \
-                                .exclude(button_id='') \
-                                .order_by('order') \
-                                .values_list('button_id', flat=True)
+    cache_key = 'creme_core-menu_buttons-{}'.format(entity.entity_type_id)
+    bmi = config_cache.get(cache_key)
+
+    if bmi is None:
+        bmi = [*ButtonMenuItem.objects.filter(Q(content_type=entity.entity_type) |
+                                              Q(content_type__isnull=True)
+                                             )
+                                      .exclude(button_id='')
+                                      .order_by('order')
+                                      .values_list('button_id', flat=True)
+              ]
+        config_cache.set(cache_key, bmi)
 
     button_ctxt = context.flatten()
     # TODO: pass the registry in the context ?
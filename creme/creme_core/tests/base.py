@@ -6,12 +6,14 @@ from os.path import basename
 from tempfile import NamedTemporaryFile
 from unittest import skipIf
 from unittest.util import safe_repr
+from uuid import uuid4
 import warnings
 
 from bleach._vendor import html5lib
 from django.apps import apps
 from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
+from django.core.cache.backends.locmem import LocMemCache
 from django.core.management import call_command
 from django.db.models.query_utils import Q
 from django.forms.formsets import BaseFormSet
@@ -530,6 +532,13 @@ class _CremeTestCase:
     def refresh(obj):
         return obj.__class__.objects.get(pk=obj.pk)
 
+    @staticmethod
+    def build_versioned_cache(cache_class, timeout=60):
+        """Build an instance of a class inheriting <creme_core.core.versioned_cache.VersionedCache>
+        which uses its own local-memory backend (so the values of other tests are not retrieved).
+        """
+        return cache_class(timeout=timeout, cache=LocMemCache(uuid4().hex, {}))
+
     @staticmethod
     def build_inneredit_url(entity, fieldname):
         return reverse('creme_core__inner_edition',
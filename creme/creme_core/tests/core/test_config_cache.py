@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+
+try:
+    from time import sleep
+
+    from django.contrib.contenttypes.models import ContentType
+    from django.core.cache.backends.locmem import LocMemCache
+    from django.test.utils import override_settings
+
+    from creme.creme_core.core.config_cache import ConfigCache, config_cache
+    from creme.creme_core.core.setting_key import SettingKey, setting_key_registry
+    from creme.creme_core.global_info import global_info_scope
+    from creme.creme_core.models import FieldsConfig, SettingValue, HeaderFilter
+    from creme.creme_core.models.header_filter import HeaderFilterList
+    from creme.creme_core.tests.base import CremeTestCase
+    from creme.creme_core.tests.fake_models import FakeContact, FakeSector
+    from creme.creme_core.utils.profiling import CaptureQueriesContext
+except Exception as e:
+    print('Error in <{}>: {}'.format(__name__, e))
+
+
+class ConfigCacheTestCase(CremeTestCase):
+    def test_get_set(self):
+        cache = self.build_versioned_cache(ConfigCache)
+        self.assertEqual(60, cache.timeout)
+        self.assertTrue(cache.enabled)
+
+        with global_info_scope():
+            self.assertIsNone(cache.get('creme_core-foo'))
+            self.assertEqual(12, cache.get('creme_core-foo', 12))
+
+            cache.set('creme_core-foo', 1)
+            cache.set_many({'creme_core-bar': 2, 'creme_core-baz': 3})
+            self.assertEqual(1, cache.get('creme_core-foo'))
+            self.assertEqual({'creme_core-bar': 2, 'creme_core-baz': 3},
+                             cache.get_many(['creme_core-bar', 'creme_core-baz', 'creme_core-unknown'])
+                            )
+
+        # Values are shared by the requests
+        with global_info_scope():
+            self.assertEqual(1, cache.get('creme_core-foo'))
+
+    def test_disabled(self):
+        cache = self.build_versioned_cache(ConfigCache, timeout=0)
+        self.assertFalse(cache.enabled)
+
+        cache.set('creme_core-foo', 1)
+        self.assertIsNone(cache.get('creme_core-foo'))
+        self.assertEqual({}, cache.get_many(['creme_core-foo']))
+
+    @override_settings(CONFIG_CACHE_TIMEOUT=0)
+    def test_settings(self):
+        self.assertEqual(0, ConfigCache().timeout)
+
+        with override_settings(CONFIG_CACHE_TIMEOUT=120):
+            self.assertEqual(120, ConfigCache().timeout)
+
+    def test_expiration(self):
+        cache = self.build_versioned_cache(ConfigCache, timeout=0.05)
+
+        cache.set('creme_core-foo', 1)
+        self.assertEqual(1, cache.get('creme_core-foo'))
+
+        sleep(0.1)
+        self.assertIsNone(cache.get('creme_core-foo'))
+
+    def test_invalidate(self):
+        "The generation is shared by the processes (we use 2 instances to simulate it)."
+        shared_cache = LocMemCache('test_config_cache', {})
+        cache1 = ConfigCache(timeout=60, cache=shared_cache)
+        cache2 = ConfigCache(timeout=60, cache=shared_cache)
+
+        with global_info_scope():
+            cache1.set('creme_core-foo', 1)
+            cache2.set('creme_core-foo', 2)
+
+        with global_info_scope():
+            cache1.invalidate()
+            self.assertIsNone(cache1.get('creme_core-foo'))
+
+        with global_info_scope():
+            self.assertIsNone(cache2.get('creme_core-foo'))
+
+    def test_generation_per_request(self):
+        "The generation is retrieved once per request."
+        shared_cache = LocMemCache('test_config_cache', {})
+        cache = ConfigCache(timeout=60, cache=shared_cache)
+
+        with global_info_scope():
+            cache.set('creme_core-foo', 1)
+            shared_cache.set(cache.version_key(), 'other', None)
+            self.assertEqual(1, cache.get('creme_core-foo'))
+
+        with global_info_scope():
+            self.assertIsNone(cache.get('creme_core-foo'))
+
+    def test_register(self):
+        cache = self.build_versioned_cache(ConfigCache)
+        cache.register(FakeSector)
+        self.assertEqual({FakeSector}, cache.models)
+
+        with global_info_scope():
+            cache.set('creme_core-foo', 1)
+            sector = FakeSector.objects.create(title='Bounty hunting')
+            self.assertIsNone(cache.get('creme_core-foo'))
+
+            cache.set('creme_core-foo', 1)
+            sector.delete()
+            self.assertIsNone(cache.get('creme_core-foo'))
+
+    @override_settings(CONFIG_CACHE_TIMEOUT=60)
+    def test_fields_config(self):
+        config_cache.invalidate()  # NB: values from other tests
+
+        with global_info_scope():
+            self.assertFalse(FieldsConfig.get_4_model(FakeContact).is_fieldname_hidden('phone'))
+
+        with global_info_scope():
+            with CaptureQueriesContext() as ctxt:
+                fconf = FieldsConfig.get_4_model(FakeContact)
+            self.assertFalse(ctxt.captured_queries)
+            self.assertFalse(fconf.is_fieldname_hidden('phone'))
+
+        FieldsConfig.create(FakeContact,
+                            descriptions=[('phone', {FieldsConfig.HIDDEN: True})],
+                           )
+
+        with global_info_scope():
+            self.assertTrue(FieldsConfig.get_4_model(FakeContact).is_fieldname_hidden('phone'))
+
+    @override_settings(CONFIG_CACHE_TIMEOUT=60)
+    def test_setting_value(self):
+        config_cache.invalidate()  # NB: values from other tests
+
+        sk = SettingKey(id='creme_core-test_config_cache',
+                        description='Page size', app_label='creme_core',
+                        type=SettingKey.INT,
+                       )
+        setting_key_registry.register(sk)
+
+        try:
+            sv = SettingValue.objects.create(key=sk, value=10)
+
+            with global_info_scope():
+                self.assertEqual(10, SettingValue.objects.get_4_key(sk).value)
+
+            with global_info_scope():
+                with CaptureQueriesContext() as ctxt:
+                    self.assertEqual(10, SettingValue.objects.get_4_key(sk).value)
+                self.assertFalse(ctxt.captured_queries)
+
+            sv.value = 20
+            sv.save()
+
+            with global_info_scope():
+                self.assertEqual(20, SettingValue.objects.get_4_key(sk).value)
+        finally:
+            setting_key_registry.unregister(sk)
+
+    @override_settings(CONFIG_CACHE_TIMEOUT=60)
+    def test_header_filters(self):
+        "The private filters are filtered per user."
+        user = self.login()
+        other_user = self.other_user
+        config_cache.invalidate()  # NB: values from other tests
+
+        ctype = ContentType.objects.get_for_model(FakeContact)
+        create_hf = HeaderFilter.create
+        hf1 = create_hf(pk='creme_core-test_config_cache1', name='Public view', model=FakeContact)
+        hf2 = create_hf(pk='creme_core-test_config_cache2', name='Private view', model=FakeContact,
+                        is_custom=True, user=other_user, is_private=True,
+                       )
+
+        with global_info_scope():
+            hf_ids = {hf.id for hf in HeaderFilterList(ctype, other_user)}
+            self.assertIn(hf1.id, hf_ids)
+            self.assertIn(hf2.id, hf_ids)
+
+        user.teams  # NOQA: the teams are cached by the instance
+
+        with global_info_scope():
+            with CaptureQueriesContext() as ctxt:
+                hf_ids = {hf.id for hf in HeaderFilterList(ctype, user)}
+            self.assertFalse(ctxt.captured_queries)
+            self.assertIn(hf1.id, hf_ids)
+            self.assertNotIn(hf2.id, hf_ids)
+
+        hf2.delete()
+
+        with global_info_scope():
+            self.assertNotIn(hf2.id, {hf.id for hf in HeaderFilterList(ctype, other_user)})
@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+
+try:
+    from functools import partial
+
+    from django.contrib.contenttypes.models import ContentType
+    from django.db import connection
+    from django.test.utils import override_settings
+
+    from creme.creme_core.core.entities_count import (
+        EntitiesCountCache,
+        entities_count_cache,
+        estimate_count,
+    )
+    from creme.creme_core.models import (
+        CremeEntity,
+        RelationType, Relation,
+        CremePropertyType, CremeProperty,
+    )
+    from creme.creme_core.signals import post_update_in_bulk
+    from creme.creme_core.tests.base import CremeTestCase
+    from creme.creme_core.tests.fake_models import FakeContact, FakeOrganisation
+    from creme.creme_core.utils.profiling import CaptureQueriesContext
+except Exception as e:
+    print('Error in <{}>: {}'.format(__name__, e))
+
+
+class EntitiesCountCacheTestCase(CremeTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.login()
+
+        # NB: values from other tests
+        entities_count_cache.invalidate(FakeContact)
+        entities_count_cache.invalidate(FakeOrganisation)
+
+    def _create_contacts(self, *last_names):
+        create_contact = partial(FakeContact.objects.create, user=self.user, first_name='Spike')
+
+        return [create_contact(last_name=last_name) for last_name in last_names]
+
+    def _assertCount(self, count, count_cache, queryset, queries=0):
+        with CaptureQueriesContext() as ctxt:
+            self.assertEqual(count, count_cache.count(FakeContact, queryset))
+
+        self.assertEqual(queries, len(ctxt.captured_queries))
+
+    def test_no_cache(self):
+        self._create_contacts('Spiegel', 'Black')
+
+        count_cache = self.build_versioned_cache(EntitiesCountCache, timeout=0)
+        self.assertEqual(0, count_cache.timeout)
+
+        qs = FakeContact.objects.all()
+        self._assertCount(2, count_cache, qs, queries=1)
+        self._assertCount(2, count_cache, qs, queries=1)
+
+    def test_cache(self):
+        self._create_contacts('Spiegel', 'Black')
+
+        count_cache = self.build_versioned_cache(EntitiesCountCache)
+        self.assertEqual(60, count_cache.timeout)
+
+        qs = FakeContact.objects.all()
+        self._assertCount(2, count_cache, qs, queries=1)
+        self._assertCount(2, count_cache, qs)
+
+        # Other query
+        qs2 = FakeContact.objects.filter(last_name='Black')
+        self._assertCount(1, count_cache, qs2, queries=1)
+        self._assertCount(1, count_cache, qs2)
+
+        self._create_contacts('Valentine')
+        self._assertCount(2, count_cache, qs)  # Not invalidated
+
+        count_cache.invalidate(FakeContact)
+        self._assertCount(3, count_cache, qs, queries=1)
+        self._assertCount(1, count_cache, qs2, queries=1)
+
+    def test_cache_empty_query(self):
+        count_cache = self.build_versioned_cache(EntitiesCountCache)
+        self._assertCount(0, count_cache, FakeContact.objects.filter(pk__in=[]))
+
+    @override_settings(ENTITIES_COUNT_CACHE_TIMEOUT=0)
+    def test_settings(self):
+        self.assertEqual(0, EntitiesCountCache().timeout)
+
+        with override_settings(ENTITIES_COUNT_CACHE_TIMEOUT=120):
+            self.assertEqual(120, EntitiesCountCache().timeout)
+
+    @override_settings(ENTITIES_COUNT_CACHE_TIMEOUT=60)
+    def test_signals_entity(self):
+        spike, jet = self._create_contacts('Spiegel', 'Black')
+        orga = FakeOrganisation.objects.create(user=self.user, name='Bebop')
+
+        qs = FakeContact.objects.filter(is_deleted=False)
+        orga_qs = FakeOrganisation.objects.all()
+        count = entities_count_cache.count
+        self.assertEqual(2, count(FakeContact, qs))
+        self.assertEqual(1, count(FakeOrganisation, orga_qs))
+
+        self._create_contacts('Valentine')
+        self._assertCount(3, entities_count_cache, qs, queries=1)
+
+        jet.is_deleted = True
+        jet.save()
+        self._assertCount(2, entities_count_cache, qs, queries=1)
+
+        spike.delete()
+        self._assertCount(1, entities_count_cache, qs, queries=1)
+
+        # Other type of entity => not invalidated
+        orga.delete()
+        self._assertCount(1, entities_count_cache, qs)
+
+    @override_settings(ENTITIES_COUNT_CACHE_TIMEOUT=60)
+    def test_signals_relation(self):
+        spike, jet = self._create_contacts('Spiegel', 'Black')
+        orga = FakeOrganisation.objects.create(user=self.user, name='Bebop')
+        rtype = RelationType.create(('test-subject_pilots', 'pilots'),
+                                    ('test-object_pilots',  'is piloted by'),
+                                   )[0]
+
+        qs = FakeContact.objects.filter(relations__type=rtype)
+        self.assertEqual(0, entities_count_cache.count(FakeContact, qs))
+
+        relation = Relation.objects.create(user=self.user, subject_entity=spike,
+                                           type=rtype, object_entity=orga,
+                                          )
+        self._assertCount(1, entities_count_cache, qs, queries=1)
+
+        # Subject not retrieved
+        Relation.objects.get(id=relation.id).delete()
+        self._assertCount(0, entities_count_cache, qs, queries=1)
+
+    @override_settings(ENTITIES_COUNT_CACHE_TIMEOUT=60)
+    def test_signals_property(self):
+        spike = self._create_contacts('Spiegel')[0]
+        ptype = CremePropertyType.create(str_pk='test-prop_cowboy', text='is a cowboy')
+
+        qs = FakeContact.objects.filter(properties__type=ptype)
+        self.assertEqual(0, entities_count_cache.count(FakeContact, qs))
+
+        CremeProperty.objects.create(type=ptype, creme_entity=spike)
+        self._assertCount(1, entities_count_cache, qs, queries=1)
+
+    @override_settings(ENTITIES_COUNT_CACHE_TIMEOUT=60)
+    def test_signals_transaction(self):
+        "The values are invalidated again when the transaction is committed."
+        self._create_contacts('Spiegel')
+        qs = FakeContact.objects.filter(is_deleted=False)
+        self.assertEqual(1, entities_count_cache.count(FakeContact, qs))
+
+        # NB: the tests are run in a transaction
+        callbacks_count = len(connection.run_on_commit)
+        self._create_contacts('Black')
+        callbacks = connection.run_on_commit[callbacks_count:]
+        self.assertTrue(callbacks)
+
+        # Another request caches the value (computed before the commit) with the new version
+        self._assertCount(2, entities_count_cache, qs, queries=1)
+        self._assertCount(2, entities_count_cache, qs)
+
+        for __, callback in callbacks:
+            callback()
+
+        self._assertCount(2, entities_count_cache, qs, queries=1)
+
+    @override_settings(ENTITIES_COUNT_CACHE_TIMEOUT=60)
+    def test_signals_update_in_bulk(self):
+        spike, jet = self._create_contacts('Spiegel', 'Black')
+
+        qs = FakeContact.objects.filter(first_name='Spike')
+        self.assertEqual(2, entities_count_cache.count(FakeContact, qs))
+
+        FakeContact.objects.filter(id=jet.id).update(first_name='Jet')
+        self._assertCount(2, entities_count_cache, qs)  # No signal
+
+        # Other type of entity => not invalidated
+        post_update_in_bulk.send(sender=FakeOrganisation, instance_ids=[])
+        self._assertCount(2, entities_count_cache, qs)
+
+        post_update_in_bulk.send(sender=FakeContact, instance_ids=[jet.id])
+        self._assertCount(1, entities_count_cache, qs, queries=1)
+
+    @override_settings(ENTITIES_COUNT_CACHE_TIMEOUT=60)
+    def test_base_entity_queryset(self):
+        "QuerySet on CremeEntity (see list-view)."
+        self._create_contacts('Spiegel', 'Black')
+
+        qs = CremeEntity.objects.filter(entity_type=ContentType.objects.get_for_model(FakeContact))
+        self._assertCount(2, entities_count_cache, qs, queries=1)
+        self._assertCount(2, entities_count_cache, qs)
+
+        self._create_contacts('Valentine')
+        self._assertCount(3, entities_count_cache, qs, queries=1)
+
+    def test_estimate_count(self):
+        self._create_contacts('Spiegel', 'Black')
+
+        estimation = estimate_count(FakeContact.objects.all())
+
+        if connection.vendor in ('postgresql', 'mysql'):
+            self.assertIsInstance(estimation, int)
+        else:
+            self.assertIsNone(estimation)
+
+        self.assertEqual(0, estimate_count(FakeContact.objects.filter(pk__in=[])) or 0)
@@ -8,7 +8,9 @@ try:
 
     from ..base import CremeTestCase
 
-    from creme.creme_core.core.job import JobManager, _JobTypeRegistry
+    from creme.creme_core.core.job import (
+        JobManager, JobManagerQueue, JobWorker, _JobTypeRegistry,
+    )
     from creme.creme_core.core.reminder import Reminder, reminder_registry
     from creme.creme_core.creme_jobs import reminder_type
     from creme.creme_core.creme_jobs.base import JobType
@@ -164,3 +166,64 @@ class JobManagerTestCase(CremeTestCase):
         self.assertEqual(rounded_hour + timedelta(hours=1),
                          JobManager()._next_wakeup(job)
                         )
+
+    @override_settings(JOBMANAGER_WORKERS=2)
+    def test_start_job(self):
+        "Workers mode."
+        queue = JobManagerQueue.get_main_queue()
+        queue.clear()
+
+        job = Job.objects.get(type_id=reminder_type.id)
+
+        manager = JobManager()
+        manager._start_job(job)
+        self.assertEqual([job], queue.dispatched_jobs)
+        self.assertFalse(manager._procs)
+
+        self.assertEqual(job.id, queue.get_dispatched_job(timeout=1))
+        self.assertIsNone(queue.get_dispatched_job(timeout=1))
+
+
+class JobWorkerTestCase(CremeTestCase):
+    def setUp(self):
+        super().setUp()
+        JobManagerQueue.get_main_queue().clear()
+
+    @override_settings(JOBMANAGER_WORKER_MAX_JOBS=3, JOBMANAGER_WORKER_MAX_MEMORY=0)
+    def test_recycling01(self):
+        "Max number of jobs."
+        worker = JobWorker()
+        self.assertFalse(worker.should_be_recycled)
+
+        worker.processed_jobs_count = 2
+        self.assertFalse(worker.should_be_recycled)
+
+        worker.processed_jobs_count = 3
+        self.assertTrue(worker.should_be_recycled)
+
+        worker = JobWorker(max_jobs=0)
+        worker.processed_jobs_count = 1000
+        self.assertFalse(worker.should_be_recycled)
+
+    def test_recycling02(self):
+        "Max memory."
+        memory = JobWorker._memory_usage()
+        if memory is None:
+            self.skipTest('Memory usage is not available on this platform.')
+
+        self.assertFalse(JobWorker(max_jobs=0, max_memory=memory + 1024).should_be_recycled)
+        self.assertTrue(JobWorker(max_jobs=0, max_memory=max(memory, 1)).should_be_recycled)
+
+    def test_run_jobs(self):
+        "Jobs are retrieved from the queue, & the worker stops after its limit."
+        queue = JobManagerQueue.get_main_queue()
+        job = Job.objects.get(type_id=reminder_type.id)
+        queue.dispatch_job(job)
+        queue.dispatch_job(job)
+
+        worker = JobWorker(max_jobs=2, max_memory=0)
+        worker.start(timeout=1)
+
+        self.assertEqual(2, worker.processed_jobs_count)
+        self.assertFalse(queue.dispatched_jobs)
+        self.assertEqual(Job.STATUS_OK, self.refresh(job).status)
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+
+try:
+    from functools import partial
+    from io import StringIO
+
+    from django.contrib.contenttypes.models import ContentType
+    from django.core.management import call_command
+    from django.core.management.base import CommandError
+    from django.test.utils import override_settings
+
+    from creme.creme_core.core.search import tokenize, search_index, Searcher
+    from creme.creme_core.models import SearchConfigItem, SearchIndexEntry
+    from creme.creme_core.tests.base import CremeTestCase
+    from creme.creme_core.tests.fake_models import FakeContact, FakeOrganisation, FakeSector
+except Exception as e:
+    print('Error in <{}>: {}'.format(__name__, e))
+
+
+class SearchIndexTestCase(CremeTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls._sci_backup = [*SearchConfigItem.objects.all()]
+        SearchConfigItem.objects.all().delete()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+
+        SearchConfigItem.objects.all().delete()
+        SearchConfigItem.objects.bulk_create(cls._sci_backup)
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.login()
+
+        SearchConfigItem.create_if_needed(FakeContact, ['first_name', 'last_name', 'sector__title'])
+        SearchConfigItem.create_if_needed(FakeOrganisation, ['name'])
+
+    def _get_tokens(self, entity, field=None):
+        entries = SearchIndexEntry.objects.filter(entity=entity.id)
+
+        if field is not None:
+            entries = entries.filter(field=field)
+
+        return {*entries.values_list('token', flat=True)}
+
+    def test_tokenize(self):
+        self.assertEqual([], tokenize(''))
+        self.assertEqual(['linus', 'torvalds'], tokenize('Linus Torvalds'))
+        self.assertEqual(['elodie', 'dupont', 'martin'], tokenize('Élodie Dupont-Martin'))
+        self.assertEqual(['john', 'doe', 'example', 'org'], tokenize('john.DOE@example.org'))
+        self.assertEqual(['a' * 50], tokenize('a' * 60))
+
+    def test_get_field_names(self):
+        self.assertEqual(['first_name', 'last_name', 'sector__title'],
+                         search_index.get_field_names(FakeContact)
+                        )
+
+        role = self.get_object_or_fail(SearchConfigItem, content_type=ContentType.objects.get_for_model(FakeContact))
+        role.id = None
+        role.superuser = True
+        role.searchfields = ['email']
+        role.save()
+        self.assertEqual(['email', 'first_name', 'last_name', 'sector__title'],
+                         search_index.get_field_names(FakeContact)
+                        )
+
+    def test_get_field_names_default(self):
+        "No configuration => all fields."
+        SearchConfigItem.objects.filter(content_type=ContentType.objects.get_for_model(FakeContact)).delete()
+
+        field_names = search_index.get_field_names(FakeContact)
+        self.assertIn('first_name', field_names)
+        self.assertIn('email', field_names)
+        self.assertNotIn('birthday', field_names)
+
+    def test_signal(self):
+        sector = FakeSector.objects.create(title='Linux dev')
+
+        with override_settings(SEARCH_INDEX=False):
+            linus = FakeContact.objects.create(user=self.user, first_name='Linus', last_name='Torvalds')
+
+        self.assertFalse(self._get_tokens(linus))
+
+        with override_settings(SEARCH_INDEX=True):
+            linus.sector = sector
+            linus.save()
+
+        self.assertEqual({'linus'},    self._get_tokens(linus, 'first_name'))
+        self.assertEqual({'torvalds'}, self._get_tokens(linus, 'last_name'))
+        self.assertEqual({'linux', 'dev'}, self._get_tokens(linus, 'sector__title'))
+
+        with override_settings(SEARCH_INDEX=True):
+            linus.first_name = 'Linus Benedict'
+            linus.save()
+
+        self.assertEqual({'linus', 'benedict'}, self._get_tokens(linus, 'first_name'))
+        self.assertEqual(5, SearchIndexEntry.objects.filter(entity=linus.id).count())
+
+        linus_id = linus.id
+        linus.delete()
+        self.assertFalse(SearchIndexEntry.objects.filter(entity=linus_id))
+
+    def test_rebuild(self):
+        create_contact = partial(FakeContact.objects.create, user=self.user)
+        linus = create_contact(first_name='Linus', last_name='Torvalds')
+        alan  = create_contact(first_name='Alan',  last_name='Cox')
+        orga = FakeOrganisation.objects.create(user=self.user, name='Linux Foundation')
+
+        SearchIndexEntry.objects.create(entity=linus,
+                                        entity_ctype=ContentType.objects.get_for_model(FakeContact),
+                                        field='last_name', token='outdated',
+                                       )
+
+        self.assertEqual(2, search_index.rebuild(FakeContact, chunk_size=1))
+        self.assertEqual({'linus', 'torvalds'}, self._get_tokens(linus))
+        self.assertEqual({'alan', 'cox'},       self._get_tokens(alan))
+        self.assertFalse(self._get_tokens(orga))
+
+    def test_command(self):
+        linus = FakeContact.objects.create(user=self.user, first_name='Linus', last_name='Torvalds')
+
+        stdout = StringIO()
+        call_command('creme_search_index', 'creme_core.FakeContact', stdout=stdout)
+        self.assertEqual({'linus', 'torvalds'}, self._get_tokens(linus))
+        self.assertIn('creme_core.FakeContact: 1 entities indexed', stdout.getvalue())
+
+        with self.assertRaises(CommandError):
+            call_command('creme_search_index', 'creme_core.FakeSector', verbosity=0)
+
+        with self.assertRaises(CommandError):
+            call_command('creme_search_index', 'creme_core.Unknown', verbosity=0)
+
+    def _build_contacts(self):
+        sector = FakeSector.objects.create(title='Linux dev')
+
+        create_contact = partial(FakeContact.objects.create, user=self.user)
+        self.linus  = create_contact(first_name='Linus',  last_name='Torvalds')
+        self.alan   = create_contact(first_name='Alan',   last_name='Cox')
+        self.andrew = create_contact(first_name='Andrew', last_name='Morton', sector=sector)
+        self.linux  = create_contact(first_name='Linux',  last_name='Linuxfan', description='Linus')
+
+        search_index.rebuild(FakeContact)
+
+    def test_search(self):
+        self._build_contacts()
+
+        searcher = Searcher([FakeContact], self.user, use_index=True)
+        self.assertTrue(searcher.use_index)
+
+        qs = searcher.search(FakeContact, 'linus')
+        self.assertEqual([self.linus], [*qs])
+
+        # Prefix ; exact words are ranked first ; description is not indexed
+        qs = searcher.search(FakeContact, 'LIN')
+        self.assertEqual({self.linus, self.linux, self.andrew}, {*qs})
+
+        qs = searcher.search(FakeContact, 'linux')
+        self.assertEqual([self.linux, self.andrew], [*qs])
+        self.assertEqual([3, 2], [c.search_rank for c in qs])
+
+        # Each word must be found
+        self.assertEqual([self.andrew], [*searcher.search(FakeContact, 'lin mort')])
+        self.assertFalse(searcher.search(FakeContact, 'linus cox'))
+
+        # Accents
+        self.assertEqual([self.alan], [*searcher.search(FakeContact, 'Àlan')])
+
+    def test_search_fields(self):
+        "Only the fields of the user's configuration are used."
+        self._build_contacts()
+
+        sci = self.get_object_or_fail(SearchConfigItem, content_type=ContentType.objects.get_for_model(FakeContact))
+        sci.searchfields = ['last_name']
+        sci.save()
+
+        searcher = Searcher([FakeContact], self.user, use_index=True)
+        self.assertFalse(searcher.search(FakeContact, 'linus'))
+        self.assertEqual([self.linus], [*searcher.search(FakeContact, 'torv')])
+
+    def test_search_no_token(self):
+        "Searched string without word => no index."
+        FakeContact.objects.create(user=self.user, first_name='Foo', last_name='%-%')
+
+        searcher = Searcher([FakeContact], self.user, use_index=True)
+        qs = searcher.search(FakeContact, '%-%')
+        self.assertEqual(1, len(qs))
+        self.assertNotIn('search_rank', qs.query.annotations)
+
+    @override_settings(SEARCH_INDEX=False)
+    def test_search_settings(self):
+        self._build_contacts()
+
+        searcher = Searcher([FakeContact], self.user)
+        self.assertFalse(searcher.use_index)
+
+        # Sub-string (not prefix)
+        self.assertEqual([self.linus], [*searcher.search(FakeContact, 'nus')])
+
+        with override_settings(SEARCH_INDEX=True):
+            searcher = Searcher([FakeContact], self.user)
+
+        self.assertTrue(searcher.use_index)
+        self.assertFalse(searcher.search(FakeContact, 'nus'))
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+
+try:
+    from django.test.utils import override_settings
+
+    from creme.creme_core.core.versioned_cache import VersionedCache
+    from creme.creme_core.tests.base import CremeTestCase
+except Exception as e:
+    print('Error in <{}>: {}'.format(__name__, e))
+
+
+class TestVersionedCache(VersionedCache):
+    key_prefix = 'creme_core-test_versioned'
+    timeout_setting = 'ENTITIES_COUNT_CACHE_TIMEOUT'
+
+
+class VersionedCacheTestCase(CremeTestCase):
+    @override_settings(ENTITIES_COUNT_CACHE_TIMEOUT=0)
+    def test_timeout(self):
+        self.assertEqual(0, TestVersionedCache().timeout)
+        self.assertFalse(TestVersionedCache().enabled)
+
+        with override_settings(ENTITIES_COUNT_CACHE_TIMEOUT=120):
+            self.assertEqual(120, TestVersionedCache().timeout)
+            self.assertTrue(TestVersionedCache().enabled)
+
+        vcache = TestVersionedCache(timeout=60)
+        self.assertEqual(60, vcache.timeout)
+        self.assertTrue(vcache.enabled)
+
+    def test_version(self):
+        vcache = self.build_versioned_cache(TestVersionedCache)
+        self.assertEqual('creme_core-test_versioned-version', vcache.version_key())
+        self.assertEqual('creme_core-test_versioned-version-12', vcache.version_key(12))
+
+        version = vcache.get_version()
+        self.assertIsInstance(version, str)
+        self.assertEqual(version, vcache.get_version())
+        self.assertEqual(version, vcache.cache.get(vcache.version_key()))
+        self.assertNotEqual(version, vcache.get_version(12))
+
+        new_version = vcache.new_version()
+        self.assertNotEqual(version, new_version)
+        self.assertEqual(new_version, vcache.get_version())
+
+    def test_build_key(self):
+        vcache = self.build_versioned_cache(TestVersionedCache)
+
+        key = vcache.build_key(12, 'foo', 1)
+        self.assertTrue(key.startswith('creme_core-test_versioned-12-'))
+        self.assertEqual(key, vcache.build_key(12, 'foo', 1))
+        self.assertNotEqual(key, vcache.build_key(12, 'foo', 2))
+        self.assertNotEqual(key, vcache.build_key(13, 'foo', 1))
+
+        # Other scope => not invalidated
+        vcache.new_version(13)
+        self.assertEqual(key, vcache.build_key(12, 'foo', 1))
+
+        vcache.new_version(12)
+        self.assertNotEqual(key, vcache.build_key(12, 'foo', 1))
+
+    def test_shared_versions(self):
+        "The versions are shared by the processes (we use 2 instances to simulate it)."
+        vcache1 = self.build_versioned_cache(TestVersionedCache)
+        vcache2 = TestVersionedCache(timeout=60, cache=vcache1.cache)
+
+        key = vcache1.build_key(12, 'foo')
+        self.assertEqual(key, vcache2.build_key(12, 'foo'))
+
+        vcache2.new_version(12)
+        self.assertNotEqual(key, vcache1.build_key(12, 'foo'))
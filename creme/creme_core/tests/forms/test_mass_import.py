@@ -1,20 +1,24 @@
 # -*- coding: utf-8 -*-
 
 try:
+    from functools import partial
+
     from django.core.exceptions import ValidationError
     from django.forms import CharField
     from django.forms.widgets import TextInput
+    from django.test.utils import override_settings
     from django.utils.translation import gettext as _
 
     # from .base import FieldTestCase
     from ..base import CremeTestCase
 
     from creme.creme_core.models import (
-        CustomField,
-        FakeContact, FakeSector,
+        CremeEntity, CustomField,
+        FakeContact, FakeOrganisation, FakeSector,
     )
     from creme.creme_core.forms.mass_import import (
-        Extractor, CustomFieldExtractor,
+        LookupCache,
+        Extractor, CustomFieldExtractor, EntityExtractionCommand, EntityExtractor,
         ExtractorWidget, CustomFieldExtractorWidget,
         ExtractorField, CustomfieldExtractorField,
     )
@@ -131,11 +135,194 @@ class ExtractorTestCase(CremeTestCase):
         sector = self.get_object_or_fail(FakeSector, title=title)
         self.assertEqual(sector, value)
 
+    def test_prefetch(self):
+        "Sub-field search + prefetch()."
+        extractor = Extractor(
+            column_index=3,
+            default_value=None,
+            value_castor=int,
+        )
+        extractor.set_subfield_search(
+            subfield_search='title',
+            subfield_model=FakeSector,
+            multiple=False,
+            create_if_unfound=False,
+        )
+
+        sector1, sector2 = FakeSector.objects.all()[:2]
+        line1 = ['Claus', 'Valca', sector1.title]
+        line2 = ['Lavie', 'Head',  sector2.title]
+        line3 = ['Alvis', 'Hamilton', '']
+
+        with self.assertNumQueries(1):
+            extractor.prefetch([line1, line2, line3])
+
+        with self.assertNumQueries(0):
+            self.assertEqual((sector1, None), extractor.extract_value(line1))
+            self.assertEqual((sector2, None), extractor.extract_value(line2))
+            self.assertEqual((None, None),    extractor.extract_value(line3))
+
+        # Not prefetched line => query
+        sector3 = FakeSector.objects.exclude(id__in=[sector1.id, sector2.id]).first()
+        with self.assertNumQueries(1):
+            self.assertEqual((sector3, None), extractor.extract_value(['Alex', 'Row', sector3.title]))
+
+    def test_lookup_cache(self):
+        "Sub-field search + create_if_unfound=True + shared cache."
+        extractor1 = Extractor(column_index=3, default_value=None, value_castor=int)
+        extractor1.set_subfield_search(
+            subfield_search='title',
+            subfield_model=FakeSector,
+            multiple=False,
+            create_if_unfound=True,
+        )
+
+        extractor2 = Extractor(column_index=2, default_value=None, value_castor=int)
+        extractor2.set_subfield_search(
+            subfield_search='title',
+            subfield_model=FakeSector,
+            multiple=False,
+            create_if_unfound=True,
+        )
+
+        cache = LookupCache()
+        extractor1.set_lookup_cache(cache)
+        extractor2.set_lookup_cache(cache)
+
+        title = 'Planes'
+        line = ['Claus', title, title]
+        value1, err_msg1 = extractor1.extract_value(line)
+        self.assertIsNone(err_msg1)
+
+        sector = self.get_object_or_fail(FakeSector, title=title)
+        self.assertEqual(sector, value1)
+
+        with self.assertNumQueries(0):
+            value2, err_msg2 = extractor2.extract_value(line)
+            value3, err_msg3 = extractor1.extract_value(['Lavie', 'Head', title])
+
+        self.assertEqual(sector, value2)
+        self.assertEqual(sector, value3)
+        self.assertEqual(1, FakeSector.objects.filter(title=title).count())
+
     # TODO: creation error
     # TODO: multiple=True
     # TODO: value_castor + ValidationError
 
 
+class EntityExtractorTestCase(CremeTestCase):
+    def test_lookup_cache(self):
+        user = self.login()
+
+        cmd = EntityExtractionCommand(
+            model=FakeOrganisation, field_name='name', column_index='2', create=True,
+        )
+        cmd.build_column_index()
+        extractor = EntityExtractor([cmd])
+
+        name = 'Nerv'
+        line1 = ['Rei', name]
+        orga, err_msg = extractor.extract_value(line1, user)
+        self.assertIsNone(err_msg)
+        self.assertEqual(name, orga.name)
+
+        with self.assertNumQueries(0):
+            orga2, err_msg2 = extractor.extract_value(['Asuka', name], user)
+
+        self.assertEqual(orga, orga2)
+        self.assertEqual(1, FakeOrganisation.objects.filter(name=name).count())
+
+
+class LookupCacheTestCase(CremeTestCase):
+    def test_get(self):
+        sector1, sector2 = FakeSector.objects.all()[:2]
+        cache = LookupCache()
+
+        with self.assertNumQueries(1):
+            self.assertListEqual([sector1], cache.get(FakeSector, 'title', sector1.title))
+
+        with self.assertNumQueries(0):
+            self.assertListEqual([sector1], cache.get(FakeSector, 'title', sector1.title))
+
+        with self.assertNumQueries(1):
+            self.assertListEqual([], cache.get(FakeSector, 'title', 'Unknown'))
+
+        with self.assertNumQueries(0):
+            self.assertListEqual([], cache.get(FakeSector, 'title', 'Unknown'))
+
+    def test_prefetch(self):
+        sector1, sector2 = FakeSector.objects.all()[:2]
+        cache = LookupCache()
+
+        with self.assertNumQueries(1):
+            cache.prefetch(FakeSector, 'title', [sector1.title, sector2.title, 'Unknown', ''])
+
+        self.assertEqual(2, len(cache))
+
+        with self.assertNumQueries(0):
+            self.assertListEqual([sector1], cache.get(FakeSector, 'title', sector1.title))
+            self.assertListEqual([sector2], cache.get(FakeSector, 'title', sector2.title))
+
+            # Already in the cache => no query
+            cache.prefetch(FakeSector, 'title', [sector1.title])
+
+    @override_settings(MASS_IMPORT_CACHE_SIZE=2)
+    def test_lru(self):
+        sector1, sector2, sector3 = FakeSector.objects.all()[:3]
+        cache = LookupCache()
+        get = partial(cache.get, FakeSector, 'title')
+
+        get(sector1.title)
+        get(sector2.title)
+        get(sector1.title)
+        get(sector3.title)  # <sector2> is removed
+        self.assertEqual(2, len(cache))
+
+        with self.assertNumQueries(0):
+            self.assertListEqual([sector1], get(sector1.title))
+            self.assertListEqual([sector3], get(sector3.title))
+
+        with self.assertNumQueries(1):
+            self.assertListEqual([sector2], get(sector2.title))
+
+    def test_rollback(self):
+        cache = LookupCache()
+        title1 = 'Planes'
+        title2 = 'Ships'
+        self.assertListEqual([], cache.get(FakeSector, 'title', title1))
+
+        sector1 = FakeSector.objects.create(title=title1)
+        cache.add(FakeSector, 'title', title1, sector1)
+        cache.commit()
+
+        sector2 = FakeSector.objects.create(title=title2)
+        cache.add(FakeSector, 'title', title2, sector2)
+        cache.rollback()
+
+        with self.assertNumQueries(0):
+            self.assertListEqual([sector1], cache.get(FakeSector, 'title', title1))
+            self.assertListEqual([], cache.get(FakeSector, 'title', title2))
+
+
+    def test_invalidate(self):
+        user = self.login()
+        cache = LookupCache()
+        sector = FakeSector.objects.first()
+        self.assertListEqual([sector], cache.get(FakeSector, 'title', sector.title))
+        self.assertListEqual([], cache.get(FakeContact, 'last_name', 'Ikari'))
+        self.assertListEqual([], cache.get(CremeEntity, 'id', '0'))
+
+        shinji = FakeContact.objects.create(user=user, first_name='Shinji', last_name='Ikari')
+        cache.invalidate(FakeContact)
+        self.assertEqual(1, len(cache))  # The entries of the parent model are removed too
+
+        with self.assertNumQueries(1):
+            self.assertListEqual([shinji], cache.get(FakeContact, 'last_name', 'Ikari'))
+
+        with self.assertNumQueries(0):
+            self.assertListEqual([sector], cache.get(FakeSector, 'title', sector.title))
+
+
 class CustomFieldExtractorTestCase(CremeTestCase):
     def test_extract01(self):
         cfield = CustomField.objects.create(
@@ -29,7 +29,10 @@ try:
         EntityFilter,
         FakeContact, FakeOrganisation, FakeInvoice, FakeInvoiceLine,
     )
+    from creme.creme_core.global_info import global_info_scope
+    from creme.creme_core.models.auth import _filtering_plans
     from creme.creme_core.sandboxes import OnlySuperusersType
+    from creme.creme_core.utils.profiling import CaptureQueriesContext
 
     from creme.creme_config.models import FakeConfigEntity
 
@@ -2224,6 +2227,160 @@ class CredentialsTestCase(CremeTestCase):
         self.assertFalse(user.has_perm_to_link(contact))
         self.assertTrue(user.has_perm_to_unlink(contact))
 
+    def _build_filtered_role(self):
+        user = self.user
+        efilter = EntityFilter.objects.create(
+            id='creme_core-test_auth',
+            entity_type=FakeContact,
+            filter_type=EF_CREDENTIALS,
+        )
+        efilter.set_conditions(
+            [condition_handler.RegularFieldConditionHandler.build_condition(
+                model=FakeContact,
+                operator=operators.EQUALS,
+                field_name='last_name', values=['Miyamoto'],
+                filter_type=EF_CREDENTIALS,
+             ),
+            ],
+            check_cycles=False, check_privacy=False,
+        )
+
+        self._create_role(
+            'Coder', ['creme_core'], users=[user],
+            set_creds=[
+                SetCredentials(value=EntityCredentials.VIEW,
+                               set_type=SetCredentials.ESET_FILTER,
+                               ctype=FakeContact,
+                               efilter=efilter,
+                              ),
+            ],
+        )
+
+        return efilter
+
+    def _filter_contacts(self, perm=EntityCredentials.VIEW):
+        "Filter with a new instance of user (like in a new request)."
+        user = self.refresh(self.user)
+        user.role._get_setcredentials()
+        user.teams  # NB: cached by the user instance
+        qs = self._build_contact_qs()
+
+        with CaptureQueriesContext() as ctxt:
+            qs = EntityCredentials.filter(user, qs, perm=perm)
+
+        return {*qs}, len(ctxt.captured_queries)
+
+    @override_settings(ENTITY_CREDENTIALS_CACHE_TIMEOUT=60)
+    def test_filter_cache01(self):
+        "Filter is cached."
+        self._build_filtered_role()
+
+        contacts, queries_count = self._filter_contacts()
+        self.assertEqual({self.contact1}, contacts)
+        self.assertGreater(queries_count, 0)
+
+        contacts, queries_count = self._filter_contacts()
+        self.assertEqual({self.contact1}, contacts)
+        self.assertEqual(0, queries_count)
+
+        # Other permission
+        contacts, queries_count = self._filter_contacts(perm=EntityCredentials.CHANGE)
+        self.assertFalse(contacts)
+
+        # Other user
+        other_user = self.other_user
+        other_user.role = self.user.role
+        other_user.save()
+
+        self.assertEqual({self.contact1},
+                         {*EntityCredentials.filter(self.refresh(other_user), self._build_contact_qs())}
+                        )
+
+    @override_settings(ENTITY_CREDENTIALS_CACHE_TIMEOUT=60)
+    def test_filter_cache02(self):
+        "Invalidation."
+        efilter = self._build_filtered_role()
+        self.assertEqual({self.contact1}, self._filter_contacts()[0])
+
+        # Conditions are modified
+        efilter.set_conditions(
+            [condition_handler.RegularFieldConditionHandler.build_condition(
+                model=FakeContact,
+                operator=operators.EQUALS,
+                field_name='last_name', values=['Sasaki'],
+                filter_type=EF_CREDENTIALS,
+             ),
+            ],
+            check_cycles=False, check_privacy=False,
+        )
+        self.assertEqual({self.contact2}, self._filter_contacts()[0])
+
+        # Credentials are modified
+        sc = self.user.role.credentials.get()
+        sc.set_type = SetCredentials.ESET_ALL
+        sc.efilter = None
+        sc.save()
+        self.assertEqual({self.contact1, self.contact2}, self._filter_contacts()[0])
+
+    @override_settings(ENTITY_CREDENTIALS_CACHE_TIMEOUT=60)
+    def test_filter_cache03(self):
+        "Teams."
+        user = self.user
+        other_user = self.other_user
+
+        self._create_role(
+            'Coder', ['creme_core'], users=[user],
+            set_creds=[
+                SetCredentials(value=EntityCredentials.VIEW,
+                               set_type=SetCredentials.ESET_OWN,
+                              ),
+            ],
+        )
+        contact3 = FakeContact.objects.create(user=other_user, first_name='Sekishusai', last_name='Yagyu')
+        qs = self._build_contact_qs(contact3)
+
+        self.assertEqual({self.contact1},
+                         {*EntityCredentials.filter(self.refresh(user), qs)}
+                        )
+
+        team = CremeUser.objects.create(username='Samurais', is_team=True)
+        team.teammates = [user]
+        contact3.user = team
+        contact3.save()
+        self.assertEqual({self.contact1, contact3},
+                         {*EntityCredentials.filter(self.refresh(user), qs)}
+                        )
+
+    @override_settings(ENTITY_CREDENTIALS_CACHE_TIMEOUT=60)
+    def test_filter_cache_other_process(self):
+        "The plans are invalidated by the modifications made in other processes."
+        self._build_filtered_role()
+
+        with global_info_scope():
+            self._filter_contacts()
+            self.assertEqual(0, self._filter_contacts()[1])
+
+        # Another process modifies the credentials (ie: the shared version is changed)
+        _filtering_plans.new_version()
+
+        with global_info_scope():
+            contacts, queries_count = self._filter_contacts()
+        self.assertEqual({self.contact1}, contacts)
+        self.assertGreater(queries_count, 0)
+
+        with global_info_scope():
+            self.assertEqual(0, self._filter_contacts()[1])
+
+    @override_settings(ENTITY_CREDENTIALS_CACHE_TIMEOUT=0)
+    def test_filter_cache04(self):
+        "No cache."
+        self._build_filtered_role()
+        self._filter_contacts()
+
+        contacts, queries_count = self._filter_contacts()
+        self.assertEqual({self.contact1}, contacts)
+        self.assertGreater(queries_count, 0)
+
     def test_filter_entities01(self):
         "Super user."
         user = self.user
@@ -10,8 +10,12 @@ try:
     from creme.creme_core.core.deletion import FixedValueReplacer, SETReplacer
     from creme.creme_core.creme_jobs import deletor_type
     from creme.creme_core.models import (Job, DeletionCommand, JobResult,
+        HistoryLine, HistoryConfigItem, RelationType, Relation,
+        CustomField, CustomFieldEnumValue, CremeProperty,
         FakeContact, FakeOrganisation, FakeCivility, FakeSector,
-        FakeTicket, FakeTicketPriority)
+        FakeTicket, FakeTicketPriority, FakeAddress, FakeImage)
+    from creme.creme_core.models.history import TYPE_EDITION, TYPE_RELATED
+    from creme.creme_core.signals import post_update_in_bulk
     from creme.creme_core.utils.translation import get_model_verbose_name
 
     from ..base import CremeTestCase
@@ -344,4 +348,149 @@ class DeletionCommandTestCase(CremeTestCase):
              )),
             ],
             jresult.messages
-        )
\ No newline at end of file
+        )
+
+    def test_deletor_job_bulk01(self):
+        "Set-based mode for entities: several chunks, HistoryLines, search field."
+        user = self.login()
+
+        civ = FakeCivility.objects.first()
+        civ2del = FakeCivility.objects.create(title='Kun')
+        other_civ = FakeCivility.objects.create(title='Sama')
+
+        create_contact = partial(FakeContact.objects.create, user=user, civility=civ2del)
+        contacts = [create_contact(last_name='Hattori', first_name=first_name)
+                        for first_name in ('Genzo', 'Hanzo', 'Kenzo')
+                   ]
+        other_contact = create_contact(last_name='Sarutobi', civility=other_civ)
+
+        rtype = RelationType.create(('test-subject_leads', 'leads'),
+                                    ('test-object_leads',  'is lead by'),
+                                   )[0]
+        HistoryConfigItem.objects.create(relation_type=rtype)
+        clan = FakeOrganisation.objects.create(user=user, name='Hattori clan')
+        Relation.objects.create(user=user, subject_entity=contacts[0], type=rtype, object_entity=clan)
+
+        model_field = FakeContact._meta.get_field('civility')
+        self.assertTrue(deletor_type._can_update_in_bulk(model_field))
+
+        job = Job.objects.create(type_id=deletor_type.id, user=user)
+        DeletionCommand.objects.create(
+            job=job,
+            instance_to_delete=civ2del,
+            replacers=[FixedValueReplacer(model_field=model_field, value=civ)],
+            total_count=3,
+        )
+
+        old_hline_id = HistoryLine.objects.order_by('-id').first().id
+        chunk_size = deletor_type.chunk_size
+        deletor_type.chunk_size = 2
+        signal_calls = []
+
+        def _receiver(sender, instance_ids, **kwargs):
+            signal_calls.append((sender, {*instance_ids}))
+
+        post_update_in_bulk.connect(_receiver)
+
+        try:
+            deletor_type.execute(job)
+        finally:
+            deletor_type.chunk_size = chunk_size
+            post_update_in_bulk.disconnect(_receiver)
+
+        self.assertDoesNotExist(civ2del)
+        self.assertEqual(3, DeletionCommand.objects.get(job=job).updated_count)
+
+        # The caches (count of entities, graphs...) are invalidated
+        self.assertEqual([(FakeContact, {c.id for c in contacts})], signal_calls)
+
+        for contact in contacts:
+            refreshed_contact = self.refresh(contact)
+            self.assertEqual(civ, refreshed_contact.civility)
+            self.assertEqual(str(refreshed_contact), refreshed_contact.header_filter_search_field)
+            self.assertGreater(refreshed_contact.modified, contact.modified)
+
+            hline = self.get_object_or_fail(HistoryLine, entity=contact.id, id__gt=old_hline_id)
+            self.assertEqual(TYPE_EDITION, hline.type)
+            self.assertEqual([['civility', civ2del.id, civ.id]], hline.modifications)
+
+        self.assertEqual(other_civ, self.refresh(other_contact).civility)
+        self.assertFalse(HistoryLine.objects.filter(entity=other_contact.id, id__gt=old_hline_id))
+
+        hline = self.get_object_or_fail(HistoryLine, entity=clan.id, id__gt=old_hline_id)
+        self.assertEqual(TYPE_RELATED, hline.type)
+        self.assertEqual(contacts[0].id, hline.related_line.entity_id)
+
+    def test_deletor_job_bulk02(self):
+        "Set-based mode for entities: replacement by NULL."
+        user = self.login()
+
+        image = FakeImage.objects.create(user=user, name='Hattori clan')
+        image_field = FakeContact._meta.get_field('image')
+        self.assertTrue(deletor_type._can_update_in_bulk(image_field))
+
+        create_contact = partial(FakeContact.objects.create, user=user, image=image)
+        contact1 = create_contact(last_name='Hattori', first_name='Genzo')
+        contact2 = create_contact(last_name='Hattori', first_name='Hanzo')
+
+        job = Job.objects.create(type_id=deletor_type.id, user=user)
+        DeletionCommand.objects.create(
+            job=job,
+            instance_to_delete=image,
+            replacers=[FixedValueReplacer(model_field=image_field, value=None)],
+            total_count=2,
+        )
+
+        deletor_type.execute(job)
+        self.assertDoesNotExist(image)
+        self.assertIsNone(self.refresh(contact1).image)
+        self.assertIsNone(self.refresh(contact2).image)
+        self.assertEqual(2, DeletionCommand.objects.get(job=job).updated_count)
+
+    def test_deletor_job_bulk03(self):
+        "Set-based mode for not entities."
+        user = self.login()
+
+        create_cfield = partial(CustomField.objects.create,
+                                content_type=ContentType.objects.get_for_model(FakeContact),
+                                field_type=CustomField.ENUM,
+                               )
+        cfield1 = create_cfield(name='Clan')
+        cfield2 = create_cfield(name='Family')
+
+        create_evalue = partial(CustomFieldEnumValue.objects.create, custom_field=cfield2)
+        evalue1 = create_evalue(value='Hattori')
+        evalue2 = create_evalue(value='Fuma')
+
+        model_field = CustomFieldEnumValue._meta.get_field('custom_field')
+        self.assertTrue(deletor_type._can_update_in_bulk(model_field))
+
+        job = Job.objects.create(type_id=deletor_type.id, user=user)
+        DeletionCommand.objects.create(
+            job=job,
+            instance_to_delete=cfield2,
+            replacers=[FixedValueReplacer(model_field=model_field, value=cfield1)],
+            total_count=2,
+        )
+
+        deletor_type.execute(job)
+        self.assertDoesNotExist(cfield2)
+        self.assertEqual(cfield1, self.refresh(evalue1).custom_field)
+        self.assertEqual(cfield1, self.refresh(evalue2).custom_field)
+        self.assertEqual(2, DeletionCommand.objects.get(job=job).updated_count)
+
+    def test_can_update_in_bulk(self):
+        get_field = FakeContact._meta.get_field
+        can_update = deletor_type._can_update_in_bulk
+        self.assertTrue(can_update(get_field('sector')))
+        self.assertTrue(can_update(FakeTicket._meta.get_field('priority')))
+
+        # ManyToManyField
+        self.assertFalse(can_update(get_field('languages')))
+
+        # Auxiliary models
+        self.assertFalse(can_update(FakeAddress._meta.get_field('entity')))
+        self.assertFalse(can_update(CremeProperty._meta.get_field('type')))
+
+        # Field of CremeEntity
+        self.assertFalse(can_update(FakeContact._meta.get_field('user')))
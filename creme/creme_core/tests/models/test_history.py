@@ -3,10 +3,17 @@
 try:
     from datetime import date, time
     from decimal import Decimal
+    from functools import partial
+    from io import StringIO
     from time import sleep
 
     from django.contrib.auth import get_user_model
     from django.contrib.contenttypes.models import ContentType
+    from django.core.management import call_command
+    from django.core.management.base import CommandError
+    from django.db import connection
+    from django.db.transaction import atomic
+    from django.test.utils import override_settings
     from django.urls import reverse
     from django.utils.formats import date_format, number_format
     from django.utils.timezone import now
@@ -16,13 +23,15 @@ try:
     from ..fake_constants import FAKE_PERCENT_UNIT, FAKE_AMOUNT_UNIT
     from ..fake_models import (FakeContact, FakeImage, FakeOrganisation, FakeAddress,
             FakeSector, FakeLegalForm, FakeInvoice, FakeInvoiceLine, FakeActivity, FakeActivityType)
-    from creme.creme_core.models import (CremeProperty, CremePropertyType,
-            Relation, RelationType, HistoryLine, HistoryConfigItem)
+    from creme.creme_core.models import (CremeEntity, CremeProperty, CremePropertyType,
+            Relation, RelationType, HistoryLine, HistoryConfigItem, read_only_instances)
     from creme.creme_core.models.history import (TYPE_CREATION, TYPE_EDITION, TYPE_DELETION,
             TYPE_AUX_CREATION, TYPE_AUX_EDITION, TYPE_AUX_DELETION,
             TYPE_RELATED, TYPE_PROP_ADD, TYPE_PROP_DEL,
             TYPE_RELATION, TYPE_SYM_RELATION, TYPE_RELATION_DEL, TYPE_SYM_REL_DEL)
+    from creme.creme_core.global_info import set_global_info, clear_global_info
     from creme.creme_core.utils.dates import dt_to_ISO8601
+    from creme.creme_core.utils.profiling import CaptureQueriesContext
 except Exception as e:
     print('Error in <{}>: {}'.format(__name__, e))
 
@@ -860,6 +869,212 @@ about this fantastic animation studio."""
                       vmodifs[2]
                      )
 
+    def test_edition_lazy_snapshot(self):
+        "No copy of the values is made when the instance is retrieved."
+        gainax = FakeOrganisation.objects.create(user=self.user, name='Gainax', capital=12000)
+        old_count = HistoryLine.objects.count()
+
+        gainax = self.refresh(gainax)
+        self.assertFalse(hasattr(gainax, '_instance_backup'))
+
+        gainax.capital = 24000
+        gainax.save()
+
+        hlines = self._get_hlines()
+        self.assertEqual(old_count + 1, len(hlines))
+        self.assertEqual(TYPE_EDITION, hlines[-1].type)
+        self.assertEqual([['capital', 12000, 24000]], hlines[-1].modifications)
+
+        # Backup is updated
+        gainax.capital = 36000
+        gainax.save()
+        self.assertEqual([['capital', 24000, 36000]], self._get_hlines()[-1].modifications)
+
+    def test_edition_deferred_fields(self):
+        gainax = FakeOrganisation.objects.create(user=self.user, name='Gainax', capital=12000)
+        old_count = HistoryLine.objects.count()
+
+        gainax = FakeOrganisation.objects.only('name').get(id=gainax.id)
+        gainax.name = 'Gainax corp'
+        gainax.save()
+
+        hlines = self._get_hlines()
+        self.assertEqual(old_count + 1, len(hlines))
+        self.assertEqual([['name', 'Gainax', 'Gainax corp']], hlines[-1].modifications)
+
+    def test_edition_not_final_entity(self):
+        gainax = FakeOrganisation.objects.create(user=self.user, name='Gainax')
+        old_count = HistoryLine.objects.count()
+
+        entity = CremeEntity.objects.get(id=gainax.id)
+        entity.description = 'Anime studio'
+        entity.save()
+        self.assertEqual(old_count, HistoryLine.objects.count())
+
+    def test_edition_read_only(self):
+        gainax = FakeOrganisation.objects.create(user=self.user, name='Gainax', capital=12000)
+        nerv = FakeOrganisation.objects.create(user=self.user, name='Nerv', capital=1000)
+        old_count = HistoryLine.objects.count()
+
+        with read_only_instances():
+            gainax = self.refresh(gainax)
+
+        nerv = self.refresh(nerv)
+
+        self.assertFalse(hasattr(gainax, '_db_values'))
+        self.assertTrue(hasattr(nerv, '_db_values'))
+
+        gainax.capital = 24000
+        gainax.save()
+        self.assertEqual(old_count, HistoryLine.objects.count())
+
+        nerv.capital = 2000
+        nerv.save()
+        self.assertEqual(old_count + 1, HistoryLine.objects.count())
+
+    def test_benchmark_command(self):
+        create_orga = partial(FakeOrganisation.objects.create, user=self.user)
+        create_orga(name='Gainax')
+        create_orga(name='Nerv')
+
+        stdout = StringIO()
+        call_command('creme_history_benchmark', 'creme_core.FakeOrganisation', number=5, stdout=stdout)
+
+        output = stdout.getvalue()
+        self.assertIn('eager copy', output)
+        self.assertIn('lazy snapshot', output)
+        self.assertIn('read-only', output)
+
+        with self.assertRaises(CommandError):
+            call_command('creme_history_benchmark', 'contenttypes.ContentType', verbosity=0)
+
+        with self.assertRaises(CommandError):
+            call_command('creme_history_benchmark', 'creme_core.FakeOrganisation', number=0)
+
+    def _run_commit_hooks(self):
+        "The transaction of the test is never committed => call the on_commit() callbacks manually."
+        callbacks = connection.run_on_commit
+        connection.run_on_commit = []
+
+        for entry in callbacks:
+            entry[1]()
+
+    @override_settings(HISTORY_BUFFERED=True)
+    def test_buffered01(self):
+        user = self.user
+        old_count = HistoryLine.objects.count()
+        set_global_info(user=user)
+
+        gainax = FakeOrganisation.objects.create(user=user, name='Gainax')
+        hideaki = FakeContact.objects.create(user=user, first_name='Hideaki', last_name='Anno')
+
+        ptype = CremePropertyType.create(str_pk='test-prop_make_animes', text='Make animes')
+        CremeProperty.objects.create(type=ptype, creme_entity=gainax)
+
+        rtype, srtype = RelationType.create(('test-subject_works', 'works for'),
+                                            ('test-object_works',  'employs'),
+                                           )
+        Relation.objects.create(user=user, subject_entity=hideaki, object_entity=gainax, type=rtype)
+        self.assertEqual(old_count, HistoryLine.objects.count())
+
+        clear_global_info()  # The user is retrieved when the lines are built
+
+        with CaptureQueriesContext() as ctxt:
+            self._run_commit_hooks()
+
+        hlines = self._get_hlines()
+        self.assertEqual(old_count + 5, len(hlines))
+        self.assertEqual([TYPE_CREATION, TYPE_CREATION, TYPE_PROP_ADD, TYPE_RELATION, TYPE_SYM_RELATION],
+                         [hline.type for hline in hlines[-5:]]
+                        )
+        self.assertEqual(user.username, hlines[-1].username)
+
+        # 1 INSERT for the creations & the property, 1 or 2 for the relationship (depends on the DBMS)
+        inserts = [q for q in ctxt.captured_queries if q['sql'].startswith('INSERT')]
+        self.assertLessEqual(len(inserts), 3)
+
+        rel_hline = hlines[-2]
+        self.assertEqual(hideaki.id, rel_hline.entity.id)
+        self.assertEqual([rtype.id], rel_hline.modifications)
+
+        sym_hline = hlines[-1]
+        self.assertEqual(gainax.id, sym_hline.entity.id)
+        self.assertEqual([srtype.id], sym_hline.modifications)
+        self.assertEqual(sym_hline, rel_hline.related_line)
+        self.assertEqual(rel_hline, sym_hline.related_line)
+
+    @override_settings(HISTORY_BUFFERED=True)
+    def test_buffered_related_edition(self):
+        user = self.user
+        ghibli = FakeOrganisation.objects.create(user=user, name='Ghibli')
+        hayao = FakeContact.objects.create(user=user, first_name='Hayao', last_name='Miyazaki')
+
+        rtype = RelationType.create(('test-subject_employed', 'is employed'),
+                                    ('test-object_employed', 'employs'),
+                                   )[0]
+        Relation.objects.create(user=user, subject_entity=hayao, object_entity=ghibli, type=rtype)
+        HistoryConfigItem.objects.create(relation_type=rtype)
+        self._run_commit_hooks()
+
+        old_count = HistoryLine.objects.count()
+        hayao = self.refresh(hayao)
+        hayao.description = 'A great animation movie maker'
+        hayao.save()
+        self._run_commit_hooks()
+
+        hlines = self._get_hlines()
+        self.assertEqual(old_count + 2, len(hlines))
+
+        edition_hline = hlines[-2]
+        self.assertEqual(TYPE_EDITION, edition_hline.type)
+
+        hline = hlines[-1]
+        self.assertEqual(TYPE_RELATED,     hline.type)
+        self.assertEqual(ghibli.id,        hline.entity.id)
+        self.assertEqual(edition_hline.id, hline.related_line.id)
+
+    @override_settings(HISTORY_BUFFERED=True)
+    def test_buffered_rollback(self):
+        "Lines created in a savepoint which is rolled back are discarded."
+        user = self.user
+        old_count = HistoryLine.objects.count()
+
+        try:
+            with atomic():
+                FakeOrganisation.objects.create(user=user, name='Nerv')
+                raise ValueError('Rollback')
+        except ValueError:
+            pass
+
+        gainax = FakeOrganisation.objects.create(user=user, name='Gainax')
+        self._run_commit_hooks()
+
+        hlines = self._get_hlines()
+        self.assertEqual(old_count + 1, len(hlines))
+        self.assertEqual(gainax.id, hlines[-1].entity_id)
+
+    @override_settings(HISTORY_BUFFERED=True)
+    def test_buffered_deleted_entity(self):
+        gainax = FakeOrganisation.objects.create(user=self.user, name='Gainax')
+        old_count = HistoryLine.objects.count()
+
+        gainax.delete()
+        self._run_commit_hooks()
+
+        hlines = self._get_hlines()
+        self.assertEqual(old_count + 2, len(hlines))
+
+        creation_hline = hlines[-2]
+        self.assertEqual(TYPE_CREATION, creation_hline.type)
+        self.assertIsNone(creation_hline.entity)
+        self.assertEqual(TYPE_DELETION, hlines[-1].type)
+
+    def test_not_buffered(self):
+        "Synchronous mode (default mode of the tests)."
+        old_count = HistoryLine.objects.count()
+        FakeOrganisation.objects.create(user=self.user, name='Gainax')
+        self.assertEqual(old_count + 1, HistoryLine.objects.count())
+
     def test_delete_auxiliary(self):
         "Auxiliary: Address"
         user = self.user
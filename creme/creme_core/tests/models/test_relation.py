@@ -5,11 +5,13 @@ try:
 
     from django.contrib.auth import get_user_model
     from django.contrib.contenttypes.models import ContentType
+    from django.db.models.signals import post_save
 
     from ..base import CremeTestCase
 
     from creme.creme_core.models import (CremeEntity, RelationType, Relation,
-            FakeContact, FakeOrganisation)
+            HistoryLine, FakeContact, FakeOrganisation)
+    from creme.creme_core.models.history import TYPE_RELATION, TYPE_SYM_RELATION
     from creme.creme_core.utils.profiling import CaptureQueriesContext
 except Exception as e:
     print('Error in <{}>: {}'.format(__name__, e))
@@ -486,3 +488,247 @@ class RelationsTestCase(CremeTestCase):
         self.assertRelationCount(1, subject_entity=ryuko, type_id=rtype2.id, object_entity=satsuki)
 
         self.assertEqual(len(ctxt1), len(ctxt2) + 1)
+
+    def _build_rtypes_n_contacts(self):
+        self.rtype1, self.srtype1 = RelationType.create(
+            ('test-subject_challenge', 'challenges'),
+            ('test-object_challenge',  'is challenged by')
+        )
+        self.rtype2, self.srtype2 = RelationType.create(
+            ('test-subject_foobar', 'loves'),
+            ('test-object_foobar',  'is loved by')
+        )
+
+        create_contact = partial(FakeContact.objects.create, user=self.user)
+        self.ryuko   = create_contact(first_name='Ryuko',   last_name='Matoi')
+        self.satsuki = create_contact(first_name='Satsuki', last_name='Kiryuin')
+
+    def test_manager_bulk_link01(self):
+        "Create several relations (& their symmetrical instances)."
+        self._build_rtypes_n_contacts()
+        user = self.user
+        ryuko = self.ryuko
+        satsuki = self.satsuki
+        rtype1 = self.rtype1
+        old_hline_ids = [*HistoryLine.objects.values_list('id', flat=True)]
+
+        rel1 = Relation(user=user, subject_entity=ryuko, type=rtype1, object_entity=satsuki)
+        rel2 = Relation(user=user, subject_entity=ryuko, type_id=self.srtype2.id, object_entity=satsuki)
+        count = Relation.objects.bulk_link([rel1, rel2])
+        self.assertEqual(2, count)
+
+        self.assertIsNotNone(rel1.id)
+        self.assertIsNotNone(rel1.symmetric_relation_id)
+        self.assertEqual(rel1, rel1.symmetric_relation.symmetric_relation)
+
+        rel1 = self.refresh(rel1)
+        self.assertEqual(ryuko.id,   rel1.subject_entity_id)
+        self.assertEqual(satsuki.id, rel1.object_entity_id)
+        self.assertEqual(user.id,    rel1.user_id)
+
+        sym_rel1 = rel1.symmetric_relation
+        self.assertEqual(self.srtype1,  sym_rel1.type)
+        self.assertEqual(satsuki.id,    sym_rel1.subject_entity_id)
+        self.assertEqual(ryuko.id,      sym_rel1.object_entity_id)
+        self.assertEqual(user.id,       sym_rel1.user_id)
+        self.assertEqual(rel1.id,       sym_rel1.symmetric_relation_id)
+        self.assertEqual(rel1.created,  sym_rel1.created)
+
+        sym_rel2 = self.refresh(rel2).symmetric_relation
+        self.assertEqual(self.rtype2.id, sym_rel2.type_id)
+        self.assertEqual(satsuki.id,     sym_rel2.subject_entity_id)
+
+        self.assertEqual(4, Relation.objects.filter(subject_entity__in=[ryuko.id, satsuki.id]).count())
+
+        # History
+        hlines = [*HistoryLine.objects.exclude(id__in=old_hline_ids).order_by('id')]
+        self.assertEqual(4, len(hlines))
+
+        hline1 = next(hline for hline in hlines if hline.modifications == [rtype1.id])
+        self.assertEqual(TYPE_RELATION, hline1.type)
+        self.assertEqual(ryuko.id,      hline1.entity_id)
+        self.assertEqual(user,          hline1.entity_owner)
+        self.assertEqual(str(ryuko),    hline1.entity_repr)
+
+        hline2 = hline1.related_line
+        self.assertEqual(TYPE_SYM_RELATION,     hline2.type)
+        self.assertEqual(satsuki.id,            hline2.entity_id)
+        self.assertEqual([self.srtype1.id],     hline2.modifications)
+        self.assertEqual(hline1,                hline2.related_line)
+
+        # The subject side is used (like Relation.save())
+        hline3 = next(hline for hline in hlines if hline.modifications == [self.rtype2.id])
+        self.assertEqual(TYPE_RELATION, hline3.type)
+        self.assertEqual(satsuki.id,    hline3.entity_id)
+
+    def test_manager_bulk_link02(self):
+        "De-duplicates arguments & avoid creating existing relations."
+        self._build_rtypes_n_contacts()
+        user = self.user
+        build_rel = partial(Relation, user=user, subject_entity=self.ryuko, object_entity=self.satsuki)
+
+        rel1 = build_rel(type=self.rtype1)
+        rel1.save()
+
+        dup_rel1 = build_rel(type=self.rtype1)
+        rel2 = build_rel(type=self.rtype2)
+        dup_rel2 = build_rel(type=self.rtype2)
+
+        with self.assertNoException():
+            count = Relation.objects.bulk_link([dup_rel1, rel2, dup_rel2])
+
+        self.assertEqual(1, count)
+        self.assertIsNone(dup_rel1.id)
+        self.assertIsNotNone(rel2.id)
+        self.assertIsNone(dup_rel2.id)
+
+        self.assertStillExists(rel1)
+        self.assertRelationCount(1, subject_entity=self.ryuko, type_id=self.rtype1.id, object_entity=self.satsuki)
+        self.assertRelationCount(1, subject_entity=self.ryuko, type_id=self.rtype2.id, object_entity=self.satsuki)
+        self.assertRelationCount(1, subject_entity=self.satsuki, type_id=self.srtype2.id, object_entity=self.ryuko)
+
+        # Existing relations are ignored even without check
+        with self.assertNoException():
+            count = Relation.objects.bulk_link([build_rel(type=self.rtype2)], check_existing=False)
+
+        self.assertEqual(0, count)
+        self.assertRelationCount(1, subject_entity=self.ryuko, type_id=self.rtype2.id, object_entity=self.satsuki)
+
+    def test_manager_bulk_link03(self):
+        "No query if no relations."
+        with self.assertNumQueries(0):
+            count = Relation.objects.bulk_link([])
+
+        self.assertEqual(0, count)
+
+    def test_manager_bulk_link04(self):
+        "The number of queries does not depend on the number of relations."
+        rtype = RelationType.create(('test-subject_foobar', 'loves'),
+                                    ('test-object_foobar',  'is loved by'),
+                                   )[0]
+        user = self.user
+        create_orga = partial(FakeOrganisation.objects.create, user=user)
+        orga = create_orga(name='Honnouji')
+
+        def link(count):
+            entities = [create_orga(name='Club #{}'.format(i)) for i in range(count)]
+
+            with CaptureQueriesContext() as ctxt:
+                Relation.objects.bulk_link(
+                    Relation(user=user, subject_entity=entity, type=rtype, object_entity=orga)
+                        for entity in entities
+                )
+
+            self.assertEqual(count, Relation.objects.filter(type=rtype, subject_entity__in=entities).count())
+
+            # NB: the HistoryLines referenced by other lines are inserted one
+            #     by one by the backends which cannot return the IDs of a bulk insert.
+            return len([query for query in ctxt.captured_queries
+                            if 'creme_core_historyline' not in query['sql']
+                       ])
+
+        self.assertEqual(link(3), link(30))
+
+        # Batches
+        entities = [create_orga(name='Team #{}'.format(i)) for i in range(5)]
+        count = Relation.objects.bulk_link(
+            [Relation(user=user, subject_entity=entity, type=rtype, object_entity=orga)
+                 for entity in entities
+            ],
+            batch_size=2,
+        )
+        self.assertEqual(5, count)
+        self.assertEqual(5, orga.relations.filter(type=rtype.symmetric_type, object_entity__in=entities).count())
+
+    def test_manager_bulk_link05(self):
+        "Signal 'post_save' & entities given by their ID."
+        self._build_rtypes_n_contacts()
+        saved = []
+
+        def receiver(sender, instance, created, **kwargs):
+            saved.append((instance.type_id, created, instance.symmetric_relation_id,
+                          instance.subject_entity.get_real_entity(),
+                         ))
+
+        post_save.connect(receiver, sender=Relation)
+
+        try:
+            Relation.objects.bulk_link([
+                Relation(user=self.user, subject_entity_id=self.ryuko.id,
+                         type_id=self.rtype1.id, object_entity_id=self.satsuki.id,
+                        ),
+            ])
+        finally:
+            post_save.disconnect(receiver, sender=Relation)
+
+        rel = self.get_object_or_fail(Relation, type=self.rtype1)
+        self.assertEqual(
+            [(self.rtype1.id,  True, rel.symmetric_relation_id, self.ryuko),
+             (self.srtype1.id, True, rel.id,                    self.satsuki),
+            ],
+            saved
+        )
+
+    def test_manager_bulk_link06(self):
+        "History disabled for a relation."
+        self._build_rtypes_n_contacts()
+        old_count = HistoryLine.objects.count()
+
+        rel = Relation(user=self.user, subject_entity=self.ryuko, type=self.rtype1, object_entity=self.satsuki)
+        HistoryLine.disable(rel)
+
+        self.assertEqual(1, Relation.objects.bulk_link([rel]))
+        self.assertEqual(old_count, HistoryLine.objects.count())
+
+    def test_manager_bulk_link07(self):
+        "Symmetrical relations in the same call, or already existing."
+        self._build_rtypes_n_contacts()
+        user = self.user
+        ryuko = self.ryuko
+        satsuki = self.satsuki
+
+        rel1 = Relation(user=user, subject_entity=ryuko, type=self.rtype1, object_entity=satsuki)
+        sym_rel1 = Relation(user=user, subject_entity=satsuki, type=self.srtype1, object_entity=ryuko)
+
+        with self.assertNoException():
+            count = Relation.objects.bulk_link([rel1, sym_rel1])
+
+        self.assertEqual(1, count)
+        self.assertIsNotNone(rel1.id)
+        self.assertIsNone(sym_rel1.id)
+        self.assertRelationCount(1, subject_entity=ryuko,   type_id=self.rtype1.id,  object_entity=satsuki)
+        self.assertRelationCount(1, subject_entity=satsuki, type_id=self.srtype1.id, object_entity=ryuko)
+
+        # Symmetrical of an existing relation
+        rel2 = Relation(user=user, subject_entity=satsuki, type=self.srtype1, object_entity=ryuko)
+
+        with self.assertNoException():
+            count = Relation.objects.bulk_link([rel2])
+
+        self.assertEqual(0, count)
+        self.assertIsNone(rel2.id)
+        self.assertEqual(2, Relation.objects.filter(type__in=[self.rtype1, self.srtype1]).count())
+
+    def test_manager_bulk_link08(self):
+        "Error => the instances are reset & can be linked again."
+        self._build_rtypes_n_contacts()
+        rel = Relation(user=self.user, subject_entity=self.ryuko, type=self.rtype1, object_entity=self.satsuki)
+
+        def receiver(sender, instance, **kwargs):
+            raise ValueError('Invalid relationship')
+
+        post_save.connect(receiver, sender=Relation)
+
+        try:
+            with self.assertRaises(ValueError):
+                Relation.objects.bulk_link([rel])
+        finally:
+            post_save.disconnect(receiver, sender=Relation)
+
+        self.assertIsNone(rel.id)
+        self.assertIsNone(rel.symmetric_relation)
+        self.assertFalse(Relation.objects.filter(type__in=[self.rtype1, self.srtype1]).exists())
+
+        self.assertEqual(1, Relation.objects.bulk_link([rel]))
+        self.assertIsNotNone(rel.id)
+        self.assertRelationCount(1, subject_entity=self.satsuki, type_id=self.srtype1.id, object_entity=self.ryuko)
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+
+try:
+    import asyncio
+    from threading import Thread
+
+    from django.test.utils import override_settings
+
+    from .base import CremeTestCase
+
+    from creme.creme_core.global_info import (
+        get_global_info, set_global_info, clear_global_info, global_info_scope,
+        get_per_request_cache, cached_per_request, PerRequestCache,
+        bind_global_info,
+    )
+except Exception as e:
+    print('Error in <{}>: {}'.format(__name__, e))
+
+
+class GlobalInfoTestCase(CremeTestCase):
+    def test_get_set_clear(self):
+        self.assertIsNone(get_global_info('foo'))
+
+        set_global_info(foo=1, bar='baz')
+        self.assertEqual(1,     get_global_info('foo'))
+        self.assertEqual('baz', get_global_info('bar'))
+
+        set_global_info(foo=2)
+        self.assertEqual(2,     get_global_info('foo'))
+        self.assertEqual('baz', get_global_info('bar'))
+
+        clear_global_info()
+        self.assertIsNone(get_global_info('foo'))
+        self.assertIsNone(get_global_info('bar'))
+
+    def test_scope(self):
+        set_global_info(foo=1)
+
+        with global_info_scope(bar=2):
+            self.assertIsNone(get_global_info('foo'))
+            self.assertEqual(2, get_global_info('bar'))
+            self.assertIsInstance(get_per_request_cache(), PerRequestCache)
+
+            set_global_info(foo=3)
+            self.assertEqual(3, get_global_info('foo'))
+
+        self.assertEqual(1, get_global_info('foo'))
+        self.assertIsNone(get_global_info('bar'))
+
+    def test_scope_error(self):
+        "Values are removed even if an exception is raised."
+        with self.assertRaises(ValueError):
+            with global_info_scope(foo=1):
+                raise ValueError('Error in the request')
+
+        self.assertIsNone(get_global_info('foo'))
+
+    def test_thread(self):
+        set_global_info(foo=1)
+        values = []
+
+        def run():
+            values.append(get_global_info('foo'))
+            set_global_info(foo=2)
+            values.append(get_global_info('foo'))
+
+        thread = Thread(target=run)
+        thread.start()
+        thread.join()
+
+        self.assertEqual([None, 2], values)
+        self.assertEqual(1, get_global_info('foo'))
+
+    def test_asyncio(self):
+        async def request(user_id):
+            with global_info_scope(user=user_id):
+                await asyncio.sleep(0)
+                return get_global_info('user')
+
+        async def main():
+            return await asyncio.gather(*[request(i) for i in range(5)])
+
+        loop = asyncio.new_event_loop()
+        try:
+            self.assertEqual([0, 1, 2, 3, 4], loop.run_until_complete(main()))
+        finally:
+            loop.close()
+
+        self.assertIsNone(get_global_info('user'))
+
+    def test_bind(self):
+        "The values of the current context are used in another thread."
+        values = []
+
+        def run():
+            values.append(get_global_info('foo'))
+            set_global_info(bar=2)
+
+        with global_info_scope(foo=1):
+            thread = Thread(target=bind_global_info(run))
+            thread.start()
+            thread.join()
+
+            self.assertEqual(2, get_global_info('bar'))  # Shared values
+
+        self.assertEqual([1], values)
+
+    def test_middleware(self):
+        user = self.login()
+        set_global_info(foo=1)
+
+        self.assertGET200(user.get_absolute_url())
+
+        # Values are removed
+        self.assertIsNone(get_global_info('foo'))
+        self.assertIsNone(get_global_info('user'))
+
+
+class PerRequestCacheTestCase(CremeTestCase):
+    def test_dict_api(self):
+        cache = PerRequestCache()
+        self.assertEqual(0, len(cache))
+        self.assertNotIn('creme_core-foo-1', cache)
+        self.assertIsNone(cache.get('creme_core-foo-1'))
+        self.assertEqual(12, cache.get('creme_core-foo-1', 12))
+
+        with self.assertRaises(KeyError):
+            cache['creme_core-foo-1']  # NOQA
+
+        cache['creme_core-foo-1'] = 'a'
+        cache['creme_core-bar-1'] = 'b'
+        self.assertEqual(2, len(cache))
+        self.assertIn('creme_core-foo-1', cache)
+        self.assertEqual('a', cache['creme_core-foo-1'])
+        self.assertEqual('b', cache.get('creme_core-bar-1'))
+
+        self.assertEqual('a', cache.pop('creme_core-foo-1'))
+        self.assertNotIn('creme_core-foo-1', cache)
+        self.assertIsNone(cache.pop('creme_core-foo-1', None))
+
+        del cache['creme_core-bar-1']
+        self.assertEqual(0, len(cache))
+
+    def test_namespace(self):
+        namespace = PerRequestCache.namespace
+        self.assertEqual('creme_core-fields_config', namespace('creme_core-fields_config-12'))
+        self.assertEqual('persons-organisation',     namespace('persons-organisation-all_managed'))
+        self.assertEqual('foo',                      namespace('foo'))
+        self.assertEqual(12,                         namespace(12))
+
+    def test_max_size(self):
+        cache = PerRequestCache(max_size=2, max_sizes={'app-big': 3})
+        self.assertEqual(2, cache.max_size)
+
+        cache['app-small-1'] = 1
+        cache['app-small-2'] = 2
+        cache['app-small-1']  # NOQA: 1 becomes the most recently used
+        cache['app-small-3'] = 3
+        self.assertIn('app-small-1', cache)
+        self.assertNotIn('app-small-2', cache)
+        self.assertIn('app-small-3', cache)
+
+        for i in range(4):
+            cache['app-big-{}'.format(i)] = i
+
+        self.assertNotIn('app-big-0', cache)
+        self.assertIn('app-big-1', cache)
+        self.assertEqual(5, len(cache))
+
+    def test_no_limit(self):
+        cache = PerRequestCache(max_size=0)
+
+        for i in range(2000):
+            cache['app-foo-{}'.format(i)] = i
+
+        self.assertEqual(2000, len(cache))
+
+    @override_settings(PER_REQUEST_CACHE_MAX_SIZE=3, PER_REQUEST_CACHE_MAX_SIZES={'app-foo': 1})
+    def test_settings(self):
+        cache = PerRequestCache()
+        self.assertEqual(3, cache.max_size)
+        self.assertEqual({'app-foo': 1}, cache.max_sizes)
+
+    def test_stats(self):
+        cache = PerRequestCache()
+        self.assertEqual({}, cache.stats)
+
+        cache.get('app-foo-1')
+        cache['app-foo-1'] = 1
+        cache.get('app-foo-1')
+        cache['app-foo-1']  # NOQA
+        self.assertIn('app-foo-1', cache)  # Not counted
+        cache.get('app-bar-1')
+
+        self.assertEqual({'app-foo': {'hits': 2, 'misses': 1, 'size': 1},
+                          'app-bar': {'hits': 0, 'misses': 1, 'size': 0},
+                         },
+                         cache.stats
+                        )
+
+        cache.clear()
+        self.assertEqual({}, cache.stats)
+        self.assertEqual(0, len(cache))
+
+    def test_cached_per_request(self):
+        calls = []
+
+        @cached_per_request('creme_core-test-value')
+        def compute():
+            calls.append(1)
+            return 42
+
+        with global_info_scope():
+            self.assertEqual(42, compute())
+            self.assertEqual(42, compute())
+            self.assertEqual(1, len(calls))
+            self.assertEqual({'hits': 1, 'misses': 1, 'size': 1},
+                             get_per_request_cache().stats['creme_core-test']
+                            )
+
+        with global_info_scope():
+            self.assertEqual(42, compute())
+            self.assertEqual(2, len(calls))
@@ -6,6 +6,7 @@ try:
     from django.conf import settings
     from django.contrib.contenttypes.models import ContentType
     from django.db import connections, DEFAULT_DB_ALIAS
+    from django.db.models.signals import pre_save, post_save
 
     from ..base import CremeTestCase
     from ..fake_models import (FakeContact, FakeOrganisation, FakeSector,
@@ -13,7 +14,7 @@ try:
     from creme.creme_core.models import Relation, CremeEntity
     from creme.creme_core.constants import REL_SUB_HAS
     from creme.creme_core.utils.db import (get_indexes_columns, get_indexed_ordering,
-           build_columns_key, populate_related)  # reorder_instances
+           build_columns_key, populate_related, can_update_in_bulk)  # reorder_instances
 except Exception as e:
     print('Error in <{}>: {}'.format(__name__, e))
 
@@ -420,6 +421,36 @@ class DBTestCase(CremeTestCase):
         with self.assertNumQueries(2):
             populate_related(contacts, ['user__role__name'])
 
+    def test_can_update_in_bulk(self):
+        self.assertTrue(can_update_in_bulk(FakeSector))
+        self.assertTrue(can_update_in_bulk(FakeOrganisation))
+
+        # Specific save() method
+        self.assertFalse(can_update_in_bulk(Relation))
+
+        def _receiver(sender, instance, **kwargs):
+            pass
+
+        # Generic handler (eg: invalidation of caches) => ignored
+        post_save.connect(_receiver)
+
+        try:
+            self.assertTrue(can_update_in_bulk(FakeSector))
+        finally:
+            post_save.disconnect(_receiver)
+
+        # Handlers specific to the model
+        for signal in (pre_save, post_save):
+            signal.connect(_receiver, sender=FakeSector)
+
+            try:
+                self.assertFalse(can_update_in_bulk(FakeSector))
+                self.assertTrue(can_update_in_bulk(FakeCivility))
+            finally:
+                signal.disconnect(_receiver, sender=FakeSector)
+
+        self.assertTrue(can_update_in_bulk(FakeSector))
+
     # def test_reorder_instances01(self):
     #     "Order + 1"
     #     initial_count = FakeSector.objects.count()
@@ -528,6 +528,112 @@ class UnicodeCollationTestCase(CremeTestCase):
                          sort(['hats', 'gloves', 'shoes', 'ĝloves']),
                         )
 
+    def test_uca_lazy_table(self):
+        from creme.creme_core.utils.unicode_collation import _Collator
+
+        collator = _Collator()
+        self.assertIsNone(collator._table)
+
+        collator.sort_key('Spike')
+        self.assertIsNotNone(collator._table)
+
+    def test_uca_cache(self):
+        from creme.creme_core.utils.unicode_collation import _Collator
+
+        collator = _Collator(cache_size=2)
+        self.assertEqual(2, collator.cache_info.maxsize)
+
+        key = collator.sort_key('Café')
+        self.assertEqual(key, collator.sort_key('Café'))
+        self.assertEqual(key, collator._sort_key('Café'))
+
+        info = collator.cache_info
+        self.assertEqual(1, info.hits)
+        self.assertEqual(1, info.misses)
+
+        self.assertEqual(collator.sort_key('12'), collator.sort_key(12))
+
+        collator.clear_cache()
+        self.assertEqual(0, collator.cache_info.currsize)
+
+    def test_uca_table(self):
+        from os import utime
+        from os.path import exists, getmtime
+        from shutil import rmtree
+        from tempfile import mkdtemp
+
+        from creme.creme_core.utils import unicode_collation as uca
+
+        tmp_dir = mkdtemp()
+
+        try:
+            table_path = join(tmp_dir, 'allkeys.pickle')
+            self.assertFalse(exists(table_path))
+
+            # No table => it is built
+            with self.assertLogs(uca.logger, level='WARNING'):
+                single, multi = uca.load_table(uca.DEFAULT_SOURCE, table_path)
+
+            self.assertTrue(exists(table_path))
+            self.assertEqual(uca.parse_table(uca.DEFAULT_SOURCE), (single, multi))
+            self.assertLess(single[ord('a')], single[ord('b')])
+            self.assertIn((0x6C, 0xB7), multi)  # 'l·'
+
+            # Up-to-date table => not rebuilt
+            mtime = getmtime(table_path)
+            self.assertEqual((single, multi), uca.load_table(uca.DEFAULT_SOURCE, table_path))
+            self.assertEqual(mtime, getmtime(table_path))
+
+            # Outdated table => rebuilt
+            utime(table_path, (0, 0))
+
+            with self.assertLogs(uca.logger, level='WARNING'):
+                self.assertEqual((single, multi), uca.load_table(uca.DEFAULT_SOURCE, table_path))
+
+            self.assertNotEqual(0, getmtime(table_path))
+
+            # Table which cannot be written => source is parsed
+            with self.assertLogs(uca.logger, level='WARNING'):
+                self.assertEqual((single, multi),
+                                 uca.load_table(uca.DEFAULT_SOURCE, join(tmp_dir, 'unknown', 'table.pickle'))
+                                )
+
+            collator = uca._Collator(uca.DEFAULT_SOURCE, table_path)
+            self.assertEqual(['Cafard', 'Cafe', 'Café', 'Caff'],
+                             sorted(['Caff', 'Cafe', 'Cafard', 'Café'], key=collator.sort_key)
+                            )
+        finally:
+            rmtree(tmp_dir)
+
+    def test_uca_commands(self):
+        from io import StringIO
+        from os.path import exists
+        from shutil import rmtree
+        from tempfile import mkdtemp
+
+        from django.core.management import call_command
+        from django.core.management.base import CommandError
+
+        tmp_dir = mkdtemp()
+
+        try:
+            table_path = join(tmp_dir, 'allkeys.pickle')
+            stdout = StringIO()
+            call_command('build_collation_table', table=table_path, stdout=stdout)
+            self.assertTrue(exists(table_path))
+            self.assertIn(table_path, stdout.getvalue())
+        finally:
+            rmtree(tmp_dir)
+
+        stdout = StringIO()
+        call_command('creme_collation_benchmark', number=20, distinct=5, stdout=stdout)
+        output = stdout.getvalue()
+        self.assertIn('Loading of the table', output)
+        self.assertIn('Sort with memorisation', output)
+
+        with self.assertRaises(CommandError):
+            call_command('creme_collation_benchmark', number=0)
+
     # NB: keep this comment (until we use the real 'pyuca' lib)
     # def test_uca02(self):
     #     "Original lib"
@@ -17,10 +17,15 @@ try:
     from creme.creme_core.auth.entity_credentials import EntityCredentials
     from creme.creme_core.core.entity_filter import operators, operands
     from creme.creme_core.core.entity_filter.condition_handler import RegularFieldConditionHandler
+    from creme.creme_core.core.batch_process import BatchAction
     from creme.creme_core.core.job import job_type_registry, JobManagerQueue  # Should be a test queue
     from creme.creme_core.creme_jobs.batch_process import batch_process_type
     from creme.creme_core.models import (EntityFilter,  # EntityFilterCondition
-            SetCredentials, Job, EntityJobResult, FakeContact, FakeOrganisation)
+            SetCredentials, Job, EntityJobResult, HistoryLine,
+            FakeContact, FakeOrganisation, FakeActivity)
+    from creme.creme_core.models.history import TYPE_EDITION
+    from creme.creme_core.signals import post_update_in_bulk
+    from creme.creme_core.utils.profiling import CaptureQueriesContext
 except Exception as e:
     print('Error in <{}>: {}'.format(__name__, e))
 
@@ -577,6 +582,161 @@ class BatchProcessViewsTestCase(ViewsTestCase):
             job.stats
         )
 
+    def test_can_update_in_bulk(self):
+        can_update = batch_process_type._can_update_in_bulk
+        build_action = partial(BatchAction, FakeOrganisation, 'name')
+
+        self.assertTrue(can_update(FakeOrganisation, [build_action('suffix', value='-adorée')]))
+        self.assertTrue(can_update(FakeOrganisation, [build_action('rm_end', value='2'),
+                                                      BatchAction(FakeOrganisation, 'capital', 'add_int', value='2'),
+                                                     ]
+                                  )
+                       )
+        self.assertTrue(can_update(FakeOrganisation, [build_action('title', value='')]))
+
+        # Unique field
+        self.assertTrue(can_update(FakeActivity, [BatchAction(FakeActivity, 'place', 'upper', value='')]))
+        self.assertFalse(can_update(FakeActivity, [BatchAction(FakeActivity, 'title', 'upper', value='')]))
+
+    def test_update_in_bulk_case(self):
+        "The exact values computed in Python are written (not re-computed by the DB)."
+        user = self.login()
+
+        create_orga = partial(FakeOrganisation.objects.create, user=user)
+        orga1 = create_orga(name='Straße')
+        orga2 = create_orga(name='İstanbul club')
+
+        response = self.client.post(
+            self._build_add_url(FakeOrganisation), follow=True,
+            data={'actions': self.build_formfield_value(name='name', operator='upper', value='')},
+        )
+        self.assertNoFormError(response)
+        batch_process_type.execute(self._get_job(response))
+
+        self.assertEqual('Straße'.upper(),        self.refresh(orga1).name)
+        self.assertEqual('İstanbul club'.upper(), self.refresh(orga2).name)
+
+    def test_update_in_bulk(self):
+        user = self.login()
+
+        create_orga = partial(FakeOrganisation.objects.create, user=user)
+        orgas = [create_orga(name='Genshiken', capital=100),
+                 create_orga(name='Manga club'),  # capital is NULL
+                 create_orga(name='Anime club',  capital=1000),
+                ]
+        old_modified = orgas[0].modified
+
+        response = self.client.post(
+            self._build_add_url(FakeOrganisation), follow=True,
+            data={
+                'actions': json_dump([
+                    self.build_formfield_entry(name='name',    operator='suffix',  value='-adorée'),
+                    self.build_formfield_entry(name='capital', operator='add_int', value='50'),
+                ]),
+            },
+        )
+        self.assertNoFormError(response)
+        job = self._get_job(response)
+
+        hline_ids = [*HistoryLine.objects.values_list('id', flat=True)]
+        batch_process_type.chunk_size = 2
+        signal_calls = []
+
+        def _receiver(sender, instance_ids, **kwargs):
+            signal_calls.append((sender, instance_ids))
+
+        post_update_in_bulk.connect(_receiver)
+
+        try:
+            batch_process_type.execute(job)
+        finally:
+            del batch_process_type.chunk_size
+            post_update_in_bulk.disconnect(_receiver)
+
+        # The caches (count of entities, graphs...) are invalidated
+        self.assertEqual([FakeOrganisation, FakeOrganisation], [call[0] for call in signal_calls])
+        self.assertSetEqual({o.id for o in orgas},
+                            {e_id for call in signal_calls for e_id in call[1]}
+                           )
+
+        orga1 = self.refresh(orgas[0])
+        self.assertEqual('Genshiken-adorée', orga1.name)
+        self.assertEqual(150,                orga1.capital)
+        self.assertEqual(orga1.name,         orga1.header_filter_search_field)
+        self.assertGreater(orga1.modified, old_modified)
+
+        orga2 = self.refresh(orgas[1])
+        self.assertEqual('Manga club-adorée', orga2.name)
+        self.assertIsNone(orga2.capital)
+
+        self.assertEqual(1050, self.refresh(orgas[2]).capital)
+
+        self.assertSetEqual({*FakeOrganisation.objects.filter(is_deleted=False).values_list('id', flat=True)},
+                            {*EntityJobResult.objects.filter(job=job).values_list('entity_id', flat=True)}
+                           )
+
+        hline = HistoryLine.objects.exclude(id__in=hline_ids).get(entity=orga1.id)
+        self.assertEqual(TYPE_EDITION, hline.type)
+        self.assertEqual(orga1.modified, hline.date)
+        self.assertEqual([['name', 'Genshiken', 'Genshiken-adorée'], ['capital', 100, 150]],
+                         hline.modifications
+                        )
+
+    def test_update_in_bulk_queries(self):
+        "The number of queries depends on the number of chunks, not on the number of entities."
+        user = self.login()
+
+        def execute(count):
+            FakeOrganisation.objects.all().delete()
+            create_orga = partial(FakeOrganisation.objects.create, user=user)
+
+            for i in range(count):
+                create_orga(name='Club #{}'.format(i))
+
+            response = self.client.post(
+                self._build_add_url(FakeOrganisation), follow=True,
+                data={'actions': self.build_formfield_value(name='name', operator='prefix', value='The '),
+                     },
+            )
+            self.assertNoFormError(response)
+
+            job = self._get_job(response)
+
+            with CaptureQueriesContext() as ctxt:
+                batch_process_type.execute(job)
+
+            self.assertEqual(count, FakeOrganisation.objects.filter(name__startswith='The Club #').count())
+
+            return len(ctxt)
+
+        self.assertEqual(execute(3), execute(20))
+
+    def test_update_in_bulk_validation_error(self):
+        "Invalid new values => error result & the other entities are modified."
+        user = self.login()
+
+        create_orga = partial(FakeOrganisation.objects.create, user=user)
+        name1 = 'Genshiken'
+        orga1 = create_orga(name=name1)
+        orga2 = create_orga(name='Manga club')
+
+        response = self.client.post(
+            self._build_add_url(FakeOrganisation), follow=True,
+            data={'actions': self.build_formfield_value(name='name', operator='rm_substr', value=name1)},
+        )
+        self.assertNoFormError(response)
+        job = self._get_job(response)
+
+        batch_process_type.execute(job)
+        self.assertEqual(name1,        self.refresh(orga1).name)
+        self.assertEqual('Manga club', self.refresh(orga2).name)  # Not changed => no result
+
+        jresult = self.get_object_or_fail(EntityJobResult, job=job, entity=orga1)
+        self.assertEqual(['{} => {}'.format(_('Name'), _('This field cannot be blank.'))],
+                         jresult.messages
+                        )
+        self.assertFalse(EntityJobResult.objects.filter(job=job, entity=orga2))
+
     def build_ops_url(self, ct_id, field):
         return reverse('creme_core__batch_process_ops', args=(ct_id, field))
 
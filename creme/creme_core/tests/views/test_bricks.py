@@ -3,13 +3,20 @@
 try:
     from functools import partial
     from json import dumps as json_dump
+    from threading import Barrier, current_thread
+    from unittest import mock
 
+    from django.contrib.sessions.backends.db import SessionStore
+    from django.test import RequestFactory
+    from django.test.utils import override_settings
     from django.urls import reverse
+    from django.utils import translation
 
     from creme.creme_core.auth.entity_credentials import EntityCredentials
     from creme.creme_core.bricks import RelationsBrick
     from creme.creme_core.constants import MODELBRICK_ID
     from creme.creme_core.core.entity_cell import EntityCellRegularField
+    from creme.creme_core.global_info import global_info_scope, get_global_info
     from creme.creme_core.gui.bricks import (brick_registry, Brick,
             InstanceBrickConfigItem, _BrickRegistry, BricksManager)
     from creme.creme_core.models import (SetCredentials, RelationType, Relation, FieldsConfig,
@@ -19,6 +26,8 @@ try:
     from ..fake_models import FakeContact, FakeOrganisation, FakeAddress
 
     from .base import BrickTestCaseMixin
+
+    from creme.creme_core.views.bricks import BricksRenderer
 except Exception as e:
     print('Error in <{}>: {}'.format(__name__, e))
 
@@ -631,6 +640,36 @@ class BrickViewTestCase(CremeTestCase, BrickTestCaseMixin):
         assertBadData({'include': [[]]})
         assertBadData({'exclude': [[]]})
 
+    @override_settings(BRICKS_DEFERRED_RENDERING=True)
+    def test_display_deferred(self):
+        user = self.login()
+        naru = FakeContact.objects.create(user=user, last_name='Narusegawa', first_name='Naru')
+
+        response = self.assertGET200(naru.get_absolute_url())
+        brick_node = self.get_brick_node(self.get_html_tree(response.content), MODELBRICK_ID)
+        self.assertIn('brick-deferred', brick_node.attrib.get('class').split())
+        self.assertEqual('true', brick_node.attrib.get('data-brick-deferred'))
+        self.assertIsNone(brick_node.find('.//div[@data-key="regular_field-last_name"]'))
+
+        # The content is retrieved with the reloading view
+        response = self.assertGET200(reverse('creme_core__reload_detailview_bricks', args=(naru.id,)),
+                                     data={'brick_id': MODELBRICK_ID},
+                                    )
+        content = response.json()
+        self.assertEqual(1, len(content))
+        self.assertEqual(MODELBRICK_ID, content[0][0])
+        self.assertNotIn('data-brick-deferred', content[0][1])
+        self.assertIn(naru.last_name, content[0][1])
+
+    def test_display_not_deferred(self):
+        user = self.login()
+        naru = FakeContact.objects.create(user=user, last_name='Narusegawa', first_name='Naru')
+
+        response = self.assertGET200(naru.get_absolute_url())
+        brick_node = self.get_brick_node(self.get_html_tree(response.content), MODELBRICK_ID)
+        self.assertNotIn('brick-deferred', brick_node.attrib.get('class').split())
+        self.assertIsNotNone(brick_node.find('.//div[@data-key="regular_field-last_name"]'))
+
     def _get_contact_brick_content(self, contact, brick_id):
         response = self.assertGET200(contact.get_absolute_url())
         document = self.get_html_tree(response.content)
@@ -763,3 +802,129 @@ class BrickViewTestCase(CremeTestCase, BrickTestCaseMixin):
         self.assertEqual(naru.last_name,    self.get_brick_tile(content_node, 'regular_field-last_name').text)
         self.assertEqual(naru.address.city, self.get_brick_tile(content_node, 'regular_field-address__city').text)
         self._assertNoBrickTile(content_node, 'regular_field-address__zipcode')
+
+
+class BricksRendererTestCase(CremeTestCase):
+    class TestBricksRenderer(BricksRenderer):
+        @staticmethod
+        def _in_transaction():
+            return False  # NB: the tests are run in a transaction.
+
+    class ThreadBrick(Brick):
+        barrier = None
+
+        def __init__(self, id_):
+            super().__init__()
+            self.id_ = id_
+
+        def detailview_display(self, context):
+            barrier = self.barrier
+            if barrier is not None:
+                barrier.wait()  # Raises an exception if the bricks are not rendered concurrently
+
+            return '{}#{}#{}#{}'.format(self.id_, current_thread().name,
+                                        translation.get_language(), get_global_info('foo'),
+                                       )
+
+    def _render(self, renderer, bricks):
+        return [(brick.id_, brick_render.split('#'))
+                    for brick, brick_render in renderer.render(bricks, context={})
+               ]
+
+    def test_sequential(self):
+        main_thread = current_thread().name
+        bricks = [self.ThreadBrick('brick1'), self.ThreadBrick('brick2')]
+
+        with override_settings(BRICKS_RENDERING_THREADS=0):
+            renderer = self.TestBricksRenderer()
+            self.assertEqual(0, renderer.threads)
+            language = translation.get_language()
+            self.assertEqual([('brick1', ['brick1', main_thread, language, 'None']),
+                              ('brick2', ['brick2', main_thread, language, 'None']),
+                             ],
+                             self._render(renderer, bricks)
+                            )
+
+        with override_settings(BRICKS_RENDERING_THREADS=4):
+            self.assertEqual(4, self.TestBricksRenderer().threads)
+
+    def test_concurrent(self):
+        main_thread = current_thread().name
+        renderer = self.TestBricksRenderer(threads=4)
+
+        barrier = Barrier(3, timeout=5)
+        bricks = [self.ThreadBrick('brick{}'.format(i)) for i in range(3)]
+
+        for brick in bricks:
+            brick.barrier = barrier
+
+        language = 'fr' if translation.get_language() == 'en' else 'en'
+
+        with translation.override(language), global_info_scope(foo='bar'):
+            renders = self._render(renderer, bricks)
+
+        self.assertEqual(['brick0', 'brick1', 'brick2'], [brick_id for brick_id, __ in renders])
+        self.assertEqual(3, len({brick_render[1] for __, brick_render in renders}))
+        self.assertNotIn(main_thread, {brick_render[1] for __, brick_render in renders})
+
+        # Language & global values are the ones of the request
+        self.assertEqual({language}, {brick_render[2] for __, brick_render in renders})
+        self.assertEqual({'bar'},    {brick_render[3] for __, brick_render in renders})
+
+    def test_connections(self):
+        "Each thread of the pool closes its connections once per page, not once per brick."
+        main_thread = current_thread().name
+        bricks = [self.ThreadBrick('brick{}'.format(i)) for i in range(5)]
+
+        with mock.patch('creme.creme_core.views.bricks.close_old_connections') as close_mock:
+            renders = self._render(self.TestBricksRenderer(threads=2), bricks)
+
+        self.assertEqual(['brick{}'.format(i) for i in range(5)], [brick_id for brick_id, __ in renders])
+
+        threads = {brick_render[1] for __, brick_render in renders}
+        self.assertLessEqual(len(threads), 2)
+        self.assertNotIn(main_thread, threads)
+        self.assertEqual(2, close_mock.call_count)
+
+    def test_not_concurrent_brick(self):
+        main_thread = current_thread().name
+        renderer = self.TestBricksRenderer(threads=4)
+
+        brick1 = self.ThreadBrick('brick1')
+        brick2 = self.ThreadBrick('brick2')
+        brick2.concurrent_rendering = False
+
+        renders = dict(self._render(renderer, [brick1, brick2]))
+        self.assertNotEqual(main_thread, renders['brick1'][1])
+        self.assertEqual(main_thread,    renders['brick2'][1])
+
+    def test_transaction(self):
+        "The bricks are rendered by the current thread if a transaction is in progress."
+        main_thread = current_thread().name
+        renders = self._render(BricksRenderer(threads=4),
+                               [self.ThreadBrick('brick1'), self.ThreadBrick('brick2')]
+                              )
+        self.assertEqual({main_thread}, {brick_render[1] for __, brick_render in renders})
+
+    def test_error(self):
+        "Errors are raised in the current thread."
+        class ErrorBrick(self.ThreadBrick):
+            def detailview_display(self, context):
+                raise ValueError('Invalid data')
+
+        with self.assertRaises(ValueError):
+            self.TestBricksRenderer(threads=4).render(
+                [self.ThreadBrick('brick1'), ErrorBrick('brick2')], context={},
+            )
+
+    def test_session_loaded(self):
+        "The session is loaded before the threads are spawned."
+        request = RequestFactory().get('/')
+        request.session = SessionStore()
+        self.assertFalse(hasattr(request.session, '_session_cache'))
+
+        self.TestBricksRenderer(threads=4).render(
+            [self.ThreadBrick('brick1'), self.ThreadBrick('brick2')],
+            context={'request': request},
+        )
+        self.assertTrue(hasattr(request.session, '_session_cache'))
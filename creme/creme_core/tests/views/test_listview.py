@@ -7,6 +7,7 @@ try:
     from json import dumps as json_dump
     from random import shuffle
     import re
+    from unittest.mock import patch
 
     # import html5lib
     from bleach._vendor import html5lib  # Avoid a dependence only for test
@@ -19,12 +20,13 @@ try:
     from django.utils.encoding import force_text
     from django.utils.http import urlquote
     from django.utils.timezone import now
-    from django.utils.translation import gettext as _
+    from django.utils.translation import gettext as _, ngettext
 
     from .base import ViewsTestCase
     from .. import fake_constants
 
     from creme.creme_core.auth.entity_credentials import EntityCredentials
+    from creme.creme_core.core.entities_count import entities_count_cache
     from creme.creme_core.core.entity_cell import (
         EntityCellRegularField,
         EntityCellCustomField,
@@ -1232,6 +1234,13 @@ class ListViewTestCase(ViewsTestCase):
         self.assertEqual(reverse('creme_core__mass_import',   args=(ct_id,)), hrefs[3])
         self.assertEqual(reverse('creme_core__batch_process', args=(ct_id,)), hrefs[4])
 
+        dl_job_uri = data_hrefs[5]
+        self.assertTrue(dl_job_uri.startswith(dl_url),
+                        'URI <{}> does not starts with <{}>'.format(dl_job_uri, dl_url)
+                       )
+        self.assertIn('&as_job=1', dl_job_uri)
+        self.assertIn('&extra_q={}'.format(urlquote(q_filter)), dl_job_uri)
+
     @override_settings(FAST_QUERY_MODE_THRESHOLD=1000000, PAGE_SIZES=[10, 25], DEFAULT_PAGE_SIZE_IDX=1)
     def test_search_regularfields01(self):
         user = self.login()
@@ -2758,6 +2767,68 @@ class ListViewTestCase(ViewsTestCase):
 
         return organisations
 
+    @override_settings(ENTITIES_COUNT_CACHE_TIMEOUT=60, PAGE_SIZES=[10], DEFAULT_PAGE_SIZE_IDX=0)
+    def test_count_cache(self):
+        self.login()
+        entities_count_cache.invalidate(FakeOrganisation)  # NB: values from other tests
+        self._build_orgas()
+        hf = self._build_hf()
+
+        def post():
+            response = self.assertPOST200(self.url, data={'hfilter': hf.id})
+            self.assertFalse(response.context['approximate_count'])
+
+            return response.context['page_obj'].paginator.count
+
+        def count_queries():
+            with CaptureQueriesContext() as ctxt:
+                self.assertEqual(13, post())
+
+            return len([sql for sql in ctxt.captured_sql if 'COUNT(' in sql])
+
+        uncached_count = count_queries()
+        self.assertEqual(uncached_count - 1, count_queries())
+
+        # Invalidation
+        FakeOrganisation.objects.create(user=self.user, name='Red Dragon')
+        self.assertEqual(14, post())
+
+    @override_settings(FAST_QUERY_MODE_THRESHOLD=5,
+                       LISTVIEW_APPROXIMATE_COUNT_THRESHOLD=100,
+                       PAGE_SIZES=[10], DEFAULT_PAGE_SIZE_IDX=0,
+                      )
+    def test_approximate_count(self):
+        self.login()
+        self._build_orgas()
+        hf = self._build_hf()
+
+        with patch('creme.creme_core.views.generic.listview.estimate_count', return_value=150):
+            response = self.assertPOST200(self.url, data={'hfilter': hf.id})
+
+        self.assertTrue(response.context['approximate_count'])
+        self.assertEqual(150, response.context['page_obj'].paginator.count)
+        self.assertContains(response, '~150')
+        self.assertContains(response,
+                            ngettext('About %(entities_count)s recording',
+                                     'About %(entities_count)s recordings',
+                                     150
+                                    ) % {'entities_count': 150}
+                           )
+
+        # Estimation is too small => real count
+        with patch('creme.creme_core.views.generic.listview.estimate_count', return_value=50):
+            response = self.assertPOST200(self.url, data={'hfilter': hf.id})
+
+        self.assertFalse(response.context['approximate_count'])
+        self.assertEqual(13, response.context['page_obj'].paginator.count)
+
+        # DBMS without estimation
+        with patch('creme.creme_core.views.generic.listview.estimate_count', return_value=None):
+            response = self.assertPOST200(self.url, data={'hfilter': hf.id})
+
+        self.assertFalse(response.context['approximate_count'])
+        self.assertEqual(13, response.context['page_obj'].paginator.count)
+
     @override_settings(FAST_QUERY_MODE_THRESHOLD=100000, PAGE_SIZES=[10, 25, 200], DEFAULT_PAGE_SIZE_IDX=0)
     def test_pagination_slow01(self):
         "Paginator with only OFFSET (small number of lines)"
@@ -28,6 +28,7 @@ try:
         FakeInvoice, FakeInvoiceLine,
     )
 
+    from creme.creme_core.core.job import job_type_registry
     from creme.creme_core.core.entity_cell import (
         EntityCellRegularField,
         EntityCellFunctionField,
@@ -42,7 +43,9 @@ try:
         FileRef,
         HeaderFilter,
         EntityFilter,  # EntityFilterCondition
+        Job,
     )
+    from creme.creme_core.creme_jobs import mass_export_type
     from creme.creme_core.models.history import TYPE_EXPORT, HistoryLine
     from creme.creme_core.utils.queries import QSerializer
 except Exception as e:
@@ -73,6 +76,11 @@ class MassExportViewsTestCase(ViewsTestCase):
     #     HeaderFilter.objects.all().delete()
     #     HeaderFilter.objects.bulk_create(cls._hf_backup)
 
+    @staticmethod
+    def _get_csv_lines(response):
+        "CSV responses are streamed."
+        return b''.join(response.streaming_content).splitlines()
+
     def _build_hf_n_contacts(self):
         user = self.user
 
@@ -222,7 +230,7 @@ class MassExportViewsTestCase(ViewsTestCase):
 
         self.assertListEqual(
             [','.join('"{}"'.format(hfi.title) for hfi in cells)],
-            [force_text(line) for line in response.content.splitlines()],
+            [force_text(line) for line in self._get_csv_lines(response)],
         )
         self.assertFalse(HistoryLine.objects.exclude(id__in=existing_hline_ids))
 
@@ -249,7 +257,7 @@ class MassExportViewsTestCase(ViewsTestCase):
         response = self.assertGET200(self._build_contact_dl_url())
 
         # TODO: sort the relations/properties by their verbose_name ??
-        result = response.content.splitlines()
+        result = self._get_csv_lines(response)
         it = (force_text(line) for line in result)
         self.assertEqual(next(it), ','.join('"{}"'.format(hfi.title) for hfi in hf.cells))
         self.assertEqual(next(it), '"","Black","Jet","Bebop",""')
@@ -270,6 +278,7 @@ class MassExportViewsTestCase(ViewsTestCase):
         hline = hlines[0]
         self.assertEqual(self.ct,     hline.entity_ctype)
         self.assertEqual(user,        hline.entity_owner)
+        self.assertEqual(user.username, hline.username)
         self.assertEqual(TYPE_EXPORT, hline.type)
 
         count = len(result) - 1
@@ -287,6 +296,25 @@ class MassExportViewsTestCase(ViewsTestCase):
             hline.get_verbose_modifications(user),
         )
 
+    def test_list_view_export_streaming(self):
+        "The lines are generated while the response is sent."
+        user = self.login()
+        hf = self._build_hf_n_contacts()
+        existing_hline_ids = [*HistoryLine.objects.values_list('id', flat=True)]
+
+        response = self.assertGET200(self._build_contact_dl_url())
+        self.assertTrue(response.streaming)
+        self.assertEqual('attachment; filename=fakecontact.csv', response['Content-Disposition'])
+
+        # The history line is created before the rows are sent
+        hline = self.get_object_or_fail(HistoryLine, type=TYPE_EXPORT, entity_owner=user)
+        self.assertEqual([4, hf.name], hline.modifications)
+        self.assertEqual(user.username, hline.username)
+
+        lines = self._get_csv_lines(response)
+        self.assertEqual(5, len(lines))
+        self.assertEqual(1, HistoryLine.objects.exclude(id__in=existing_hline_ids).count())
+
     def test_list_view_export02(self):
         "scsv."
         self.login()
@@ -295,7 +323,7 @@ class MassExportViewsTestCase(ViewsTestCase):
         response = self.assertGET200(self._build_contact_dl_url(doc_type='scsv'))
 
         # TODO: sort the relations/properties by their verbose_name ??
-        it = (force_text(line) for line in response.content.splitlines())
+        it = (force_text(line) for line in self._get_csv_lines(response))
         self.assertEqual(next(it), ';'.join('"{}"'.format(hfi.title) for hfi in cells))
         self.assertEqual(next(it), '"";"Black";"Jet";"Bebop";""')
         self.assertIn(next(it), ('"";"Spiegel";"Spike";"Bebop/Swordfish";""',
@@ -341,7 +369,7 @@ class MassExportViewsTestCase(ViewsTestCase):
         self.assertTrue(user.has_perm_to_view(organisations['Swordfish']))
 
         response = self.assertGET200(self._build_contact_dl_url())
-        result = [*map(force_text, response.content.splitlines())]
+        result = [*map(force_text, self._get_csv_lines(response))]
         self.assertEqual(result[1], '"","Black","Jet","",""')
         self.assertEqual(result[2], '"","Spiegel","Spike","Swordfish",""')
         self.assertEqual(result[3], '"","Wong","Edward","","is a girl"')
@@ -361,7 +389,7 @@ class MassExportViewsTestCase(ViewsTestCase):
 
         response = self.assertGET200(self._build_contact_dl_url(hfilter_id=hf.id))
 
-        result = [force_text(line) for line in response.content.splitlines()]
+        result = [force_text(line) for line in self._get_csv_lines(response)]
         self.assertEqual(2, len(result))
         self.assertEqual(
             result[1],
@@ -395,7 +423,7 @@ class MassExportViewsTestCase(ViewsTestCase):
         )
 
         response = self.assertGET200(self._build_contact_dl_url(hfilter_id=hf.id))
-        it = (force_text(line) for line in response.content.splitlines()); next(it)
+        it = (force_text(line) for line in self._get_csv_lines(response)); next(it)
 
         self.assertEqual(next(it), '"Black","Jet face","Jet\'s selfie"')
 
@@ -429,7 +457,7 @@ class MassExportViewsTestCase(ViewsTestCase):
                                hfilter_id=hf.id,
                               ),
         )
-        result = [force_text(line) for line in response.content.splitlines()]
+        result = [force_text(line) for line in self._get_csv_lines(response)]
         self.assertEqual(4, len(result))
 
         self.assertEqual(result[1], '"Camp#1","ML#1/ML#2"')
@@ -447,7 +475,7 @@ class MassExportViewsTestCase(ViewsTestCase):
 
         response = self.assertGET200(self._build_contact_dl_url())
 
-        it = (force_text(line) for line in response.content.splitlines())
+        it = (force_text(line) for line in self._get_csv_lines(response))
         self.assertEqual(
             next(it),
             ','.join('"{}"'.format(u)
@@ -464,7 +492,7 @@ class MassExportViewsTestCase(ViewsTestCase):
             self._build_contact_dl_url(extra_q=QSerializer().dumps(Q(last_name='Wong'))),
         )
 
-        result = [force_text(line) for line in response.content.splitlines()]
+        result = [force_text(line) for line in self._get_csv_lines(response)]
         self.assertEqual(2, len(result))
         self.assertEqual('"","Wong","Edward","","is a girl"', result[1])
 
@@ -495,7 +523,7 @@ class MassExportViewsTestCase(ViewsTestCase):
         response = self.assertGET200(
             self._build_contact_dl_url(list_url=url, efilter_id=efilter.id),
         )
-        result = [force_text(line) for line in response.content.splitlines()]
+        result = [force_text(line) for line in self._get_csv_lines(response)]
         self.assertEqual(2, len(result))
 
         self.assertEqual('"","Wong","Edward","","is a girl"', result[1])
@@ -595,6 +623,106 @@ class MassExportViewsTestCase(ViewsTestCase):
         with self.assertRaises(StopIteration):
             next(it)
 
+    def test_export_as_job01(self):
+        "CSV."
+        user = self.login()
+        hf = self._build_hf_n_contacts()
+        existing_hline_ids = [*HistoryLine.objects.values_list('id', flat=True)]
+        existing_fileref_ids = [*FileRef.objects.values_list('id', flat=True)]
+
+        response = self.assertGET200(self._build_contact_dl_url(as_job='true'), follow=True)
+
+        job = self.get_object_or_fail(Job, type_id=mass_export_type.id)
+        self.assertEqual(user, job.user)
+        self.assertEqual(Job.STATUS_WAIT, job.status)
+        self.assertRedirects(response, job.get_absolute_url())
+        self.assertFalse(HistoryLine.objects.exclude(id__in=existing_hline_ids))
+        self.assertEqual([_('Export «{model}»').format(model='Test Contacts')],
+                         job.description
+                        )
+        self.assertIsNone(mass_export_type.get_fileref(job))
+
+        job_type_registry(job.id)
+
+        job = self.refresh(job)
+        self.assertEqual(Job.STATUS_OK, job.status)
+        self.assertIsNone(job.error)
+
+        filerefs = FileRef.objects.exclude(id__in=existing_fileref_ids)
+        self.assertEqual(1, len(filerefs))
+
+        fileref = filerefs[0]
+        self.assertEqual(fileref, mass_export_type.get_fileref(job))
+        self.assertTrue(fileref.temporary)
+        self.assertEqual(user, fileref.user)
+        self.assertEqual('fakecontact.csv', fileref.basename)
+
+        fullpath = fileref.filedata.path
+        self.assertEqual(join(settings.MEDIA_ROOT, 'upload', 'csv'), dirname(fullpath))
+
+        with open(fullpath, encoding='utf-8') as f:
+            lines = f.read().splitlines()
+
+        self.assertEqual(','.join('"{}"'.format(hfi.title) for hfi in hf.cells), lines[0])
+        self.assertEqual('"","Black","Jet","Bebop",""', lines[1])
+        self.assertEqual(5, len(lines))
+
+        hline = self.get_object_or_fail(HistoryLine, type=TYPE_EXPORT, entity_owner=user)
+        self.assertEqual([4, hf.name], hline.modifications)
+
+        response = self.assertGET200(job.get_absolute_url())
+        self.assertContains(response, reverse('creme_core__dl_file', args=(fileref.filedata,)))
+
+    @skipIf(XlsMissing, "Skip tests, couldn't find xlwt or xlrd libs")
+    def test_export_as_job02(self):
+        "XLS + filter."
+        user = self.login()
+        cells = self._build_hf_n_contacts().cells
+        existing_fileref_ids = [*FileRef.objects.values_list('id', flat=True)]
+
+        efilter = EntityFilter.create(
+            'test-filter01', 'Red', FakeContact,
+            user=user, is_custom=False,
+            conditions=[
+                RegularFieldConditionHandler.build_condition(
+                    model=FakeContact,
+                    operator=ISTARTSWITH,
+                    field_name='last_name', values=['Wong'],
+                ),
+            ],
+        )
+
+        self.assertGET200(self._build_contact_dl_url(doc_type='xls', as_job=1, efilter_id=efilter.id),
+                          follow=True,
+                         )
+        job = self.get_object_or_fail(Job, type_id=mass_export_type.id)
+        job_type_registry(job.id)
+        self.assertEqual(Job.STATUS_OK, self.refresh(job).status)
+
+        fileref = self.get_object_or_fail(FileRef, id__gt=max(existing_fileref_ids, default=0))
+        self.assertEqual('fakecontact.xls', fileref.basename)
+        self.assertEqual(user, fileref.user)
+
+        with open(fileref.filedata.path, 'rb') as f:
+            it = iter(XlrdReader(None, file_contents=f.read()))
+
+        self.assertEqual(next(it), [hfi.title for hfi in cells])
+        self.assertEqual(next(it), ['', 'Wong', 'Edward', '', 'is a girl'])
+        with self.assertRaises(StopIteration):
+            next(it)
+
+    @override_settings(MAX_JOBS_PER_USER=1)
+    def test_export_as_job03(self):
+        "Too many jobs."
+        user = self.login()
+        self._build_hf_n_contacts()
+
+        Job.objects.create(user=user, type=mass_export_type, data={'ctype': self.ct.id, 'GET': ''})
+
+        response = self.assertGET200(self._build_contact_dl_url(as_job='true'), follow=True)
+        self.assertRedirects(response, reverse('creme_core__my_jobs'))
+        self.assertEqual(1, Job.objects.filter(type_id=mass_export_type.id).count())
+
     def test_print_integer01(self):
         "No choices"
         user = self.login()
@@ -615,7 +743,7 @@ class MassExportViewsTestCase(ViewsTestCase):
             follow=True,
         )
 
-        lines = {force_text(line) for line in response.content.splitlines()}
+        lines = {force_text(line) for line in self._get_csv_lines(response)}
         self.assertIn('"Bebop","1000"', lines)
         self.assertIn('"Swordfish","20000"', lines)
         self.assertIn('"Redtail",""', lines)
@@ -648,7 +776,7 @@ class MassExportViewsTestCase(ViewsTestCase):
             follow=True,
         )
 
-        lines = {force_text(line) for line in response.content.splitlines()}
+        lines = {force_text(line) for line in self._get_csv_lines(response)}
         self.assertIn('"Bebop","{}"'.format(_('Percent')),    lines)
         self.assertIn('"Swordfish","{}"'.format(_('Amount')), lines)
 
@@ -719,7 +847,7 @@ class MassExportViewsTestCase(ViewsTestCase):
              '"123233","Spiegel","Spike"',
             ],
             # NB: slice to remove the header
-            [force_text(line) for line in response.content.splitlines()[1:]]
+            [force_text(line) for line in self._get_csv_lines(response)[1:]]
         )
 
     @override_settings(PAGE_SIZES=[10], DEFAULT_PAGE_SIZE_IDX=0)
@@ -761,7 +889,7 @@ class MassExportViewsTestCase(ViewsTestCase):
              '"123455","Black","Jet"',
             ],
             # NB: slice to remove the header
-            [force_text(line) for line in response.content.splitlines()[1:]]
+            [force_text(line) for line in self._get_csv_lines(response)[1:]]
         )
 
     def test_distinct(self):
@@ -7,6 +7,8 @@ try:
     from unittest import skipIf
 
     from django.contrib.contenttypes.models import ContentType
+    from django.db import IntegrityError
+    from django.db.models.signals import post_save
     from django.template.defaultfilters import slugify
     from django.test.utils import override_settings
     from django.urls import reverse
@@ -1393,6 +1395,233 @@ class MassImportViewsTestCase(ViewsTestCase, MassImportBaseTestCaseMixin, BrickT
         asuka_line = lines[1]
         self.get_object_or_fail(FakeContact, first_name=asuka_line[0], last_name=asuka_line[1])
 
+    @override_settings(MASS_IMPORT_BATCH_SIZE=2)
+    def test_batch(self):
+        "Lines are processed by groups ; errors & created FK instances."
+        user = self.login()
+
+        pilot = 'Pilot'
+        captain = 'Captain'
+        self.assertFalse(FakePosition.objects.filter(title__in=[pilot, captain]))
+
+        lines = [('Rei',    'Ayanami',   pilot),
+                 ('Asuka',  'Langley',   pilot),
+                 ('Misato', '',          captain),  # Error: no last name
+                 ('Misato', 'Katsuragi', captain),
+                 ('Shinji', 'Ikari',     pilot),
+                ]
+
+        count = FakeContact.objects.count()
+        doc = self._build_csv_doc(lines)
+        response = self.client.post(
+            self._build_import_url(FakeContact), follow=True,
+            data={
+                **self.lv_import_data,
+                'document': doc.id,
+                'user': user.id,
+
+                'position_colselect': 3,
+                'position_subfield': 'title',
+                'position_defval': '',
+                'position_create': True,
+            },
+        )
+        self.assertNoFormError(response)
+
+        job = self._execute_job(response)
+        self.assertEqual(count + 4, FakeContact.objects.count())
+
+        positions = FakePosition.objects.filter(title=pilot)
+        self.assertEqual(1, len(positions))
+        self.assertEqual(1, FakePosition.objects.filter(title=captain).count())
+
+        for first_name, last_name, __ in (lines[0], lines[1], lines[4]):
+            contact = self.get_object_or_fail(FakeContact, first_name=first_name, last_name=last_name)
+            self.assertEqual(positions[0], contact.position)
+
+        misato = self.get_object_or_fail(FakeContact, first_name='Misato', last_name='Katsuragi')
+        self.assertEqual(captain, misato.position.title)
+
+        jresults = self._get_job_results(job)
+        self.assertEqual(5, len(jresults))
+
+        jr_error = jresults[2]
+        self.assertIsNone(jr_error.entity)
+        self.assertTrue(jr_error.messages)
+
+    def test_batch_short_line(self):
+        "A line with missing columns is an error for this line only."
+        user = self.login()
+
+        lines = [('Rei',    'Ayanami',   'Pilot'),
+                 ('Misato', 'Katsuragi'),  # No position column
+                 ('Shinji', 'Ikari',     'Pilot'),
+                ]
+
+        count = FakeContact.objects.count()
+        doc = self._build_csv_doc(lines)
+        response = self.client.post(
+            self._build_import_url(FakeContact), follow=True,
+            data={
+                **self.lv_import_data,
+                'document': doc.id,
+                'user': user.id,
+
+                'position_colselect': 3,
+                'position_subfield': 'title',
+                'position_defval': '',
+                'position_create': True,
+            },
+        )
+        self.assertNoFormError(response)
+
+        job = self._execute_job(response)
+        self.assertEqual(count + 2, FakeContact.objects.count())
+        self.assertFalse(FakeContact.objects.filter(first_name='Misato'))
+
+        for first_name, last_name, position in (lines[0], lines[2]):
+            contact = self.get_object_or_fail(FakeContact, first_name=first_name, last_name=last_name)
+            self.assertEqual(position, contact.position.title)
+
+        jresults = self._get_job_results(job)
+        self.assertEqual(3, len(jresults))
+
+        jr_error = jresults[1]
+        self.assertIsNone(jr_error.entity)
+        self.assertEqual(['list index out of range'], jr_error.messages)
+
+    @override_settings(MASS_IMPORT_BATCH_SIZE=2)
+    def test_batch_relations(self):
+        "The Relations of a group of lines are created together ; lines with error."
+        user = self.login()
+
+        employed, employs = RelationType.create(('persons-subject_employed_by', 'is an employee of'),
+                                                ('persons-object_employed_by',  'employs')
+                                               )
+        nerv = FakeOrganisation.objects.create(user=user, name='Nerv')
+
+        lines = [('Rei',    'Ayanami'),
+                 ('Asuka',  'Langley'),
+                 ('Misato', ''),  # Error: no last name
+                 ('Shinji', 'Ikari'),
+                ]
+
+        doc = self._build_csv_doc(lines)
+        response = self.client.post(
+            self._build_import_url(FakeContact), follow=True,
+            data={
+                **self.lv_import_data,
+                'document': doc.id,
+                'user': user.id,
+                'fixed_relations': self.formfield_value_multi_relation_entity([employed.id, nerv]),
+            },
+        )
+        self.assertNoFormError(response)
+
+        job = self._execute_job(response)
+
+        for first_name, last_name in (lines[0], lines[1], lines[3]):
+            contact = self.get_object_or_fail(FakeContact, first_name=first_name, last_name=last_name)
+            self.assertRelationCount(1, contact, employed.id, nerv)
+            self.assertRelationCount(1, nerv, employs.id, contact)
+
+        self.assertEqual(3, nerv.relations.filter(type=employs).count())
+
+        jresults = self._get_job_results(job)
+        self.assertEqual(4, len(jresults))
+        self.assertIsNone(jresults[2].entity)
+
+    def test_batch_relations_error(self):
+        "The Relations of a group fail => the lines are linked one by one."
+        user = self.login()
+
+        employed = RelationType.create(('persons-subject_employed_by', 'is an employee of'),
+                                       ('persons-object_employed_by',  'employs')
+                                      )[0]
+        nerv = FakeOrganisation.objects.create(user=user, name='Nerv')
+
+        lines = [('Rei',    'Ayanami'),
+                 ('Asuka',  'Langley'),  # Error when linking
+                 ('Shinji', 'Ikari'),
+                ]
+
+        def _relation_error(sender, instance, **kwargs):
+            if instance.type_id == employed.id and \
+               instance.subject_entity.get_real_entity().last_name == 'Langley':
+                raise IntegrityError('Invalid relationship')
+
+        doc = self._build_csv_doc(lines)
+        response = self.client.post(
+            self._build_import_url(FakeContact), follow=True,
+            data={
+                **self.lv_import_data,
+                'document': doc.id,
+                'user': user.id,
+                'fixed_relations': self.formfield_value_multi_relation_entity([employed.id, nerv]),
+            },
+        )
+        self.assertNoFormError(response)
+
+        post_save.connect(_relation_error, sender=Relation)
+
+        try:
+            job = self._execute_job(response)
+        finally:
+            post_save.disconnect(_relation_error, sender=Relation)
+
+        rei    = self.get_object_or_fail(FakeContact, last_name='Ayanami')
+        asuka  = self.get_object_or_fail(FakeContact, last_name='Langley')
+        shinji = self.get_object_or_fail(FakeContact, last_name='Ikari')
+        self.assertRelationCount(1, rei,    employed.id, nerv)
+        self.assertRelationCount(0, asuka,  employed.id, nerv)
+        self.assertRelationCount(1, shinji, employed.id, nerv)
+
+        jresults = self._get_job_results(job)
+        self.assertEqual(3, len(jresults))
+        self.assertIsNone(jresults[0].messages)
+        self.assertEqual(asuka.id, jresults[1].entity_id)
+        self.assertEqual(['Invalid relationship'], jresults[1].messages)
+        self.assertIsNone(jresults[2].messages)
+
+    def test_batch_relations_same_model(self):
+        "A line can be linked to a Contact imported by a previous line of the same group."
+        user = self.login()
+
+        loves = RelationType.create(('test-subject_loves', 'loves'),
+                                    ('test-object_loves',  'is loved by'),
+                                   )[0]
+
+        lines = [('Rei',    'Ayanami', 'Ikari'),  # Error: Ikari is not imported yet
+                 ('Shinji', 'Ikari',   ''),
+                 ('Asuka',  'Langley', 'Ikari'),
+                ]
+
+        doc = self._build_csv_doc(lines)
+        response = self.client.post(
+            self._build_import_url(FakeContact), follow=True,
+            data={
+                **self.lv_import_data,
+                'document': doc.id,
+                'user': user.id,
+                'dyn_relations': self._dyn_relations_value(loves, FakeContact, 3, 'last_name'),
+            },
+        )
+        self.assertNoFormError(response)
+
+        job = self._execute_job(response)
+
+        shinji = self.get_object_or_fail(FakeContact, first_name='Shinji', last_name='Ikari')
+        asuka = self.get_object_or_fail(FakeContact, first_name='Asuka', last_name='Langley')
+        self.assertRelationCount(1, asuka, loves.id, shinji)
+
+        rei = self.get_object_or_fail(FakeContact, first_name='Rei', last_name='Ayanami')
+        self.assertRelationCount(0, rei, loves.id, shinji)
+
+        jresults = self._get_job_results(job)
+        self.assertEqual(3, len(jresults))
+        self.assertTrue(jresults[0].messages)
+        self.assertIsNone(jresults[2].messages)
+
     def _aux_test_dl_errors(self, doc_builder, result_builder, ext, header=False, follow=False):
         "CSV, no header"
         user = self.login()
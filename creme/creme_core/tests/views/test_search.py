@@ -4,10 +4,12 @@ try:
     from functools import partial
 
     from django.contrib.contenttypes.models import ContentType
+    from django.test.utils import override_settings
     from django.urls import reverse
     from django.utils.translation import gettext as _
 
     from creme.creme_core.auth.entity_credentials import EntityCredentials
+    from creme.creme_core.core.search import search_index
     from creme.creme_core.gui.bricks import QuerysetBrick
     from creme.creme_core.models import SearchConfigItem, FieldsConfig, SetCredentials
 
@@ -129,6 +131,33 @@ class SearchViewTestCase(ViewsTestCase, BrickTestCaseMixin):
         self.assertContains(response, self.andrew.get_absolute_url())  # In sector__title
         self.assertNotContains(response, self.alan.get_absolute_url())
 
+    @override_settings(SEARCH_INDEX=True)
+    def test_search_index(self):
+        "Find words prefixes in the search index."
+        self.login()
+        self._setup_contacts()
+        search_index.rebuild(FakeContact)
+
+        response = self._search('linu', self.contact_ct_id)
+        self.assertEqual(200, response.status_code)
+
+        self.assertContains(response, self.linus.get_absolute_url())
+        self.assertContains(response, self.linus2.get_absolute_url())  # Deleted
+        self.assertContains(response, self.andrew.get_absolute_url())  # In sector__title
+        self.assertNotContains(response, self.alan.get_absolute_url())
+
+        response = self._search('orvalds', self.contact_ct_id)
+        self.assertNotContains(response, self.linus.get_absolute_url())
+
+    @override_settings(SEARCH_MAX_RESULTS_PER_MODEL=1)
+    def test_search_max_results(self):
+        self.login()
+        self._setup_contacts()
+
+        response = self._search('linu', self.contact_ct_id)
+        self.assertEqual(200, response.status_code)
+        self.assertContains(response, 'search-count="1"')
+
     def test_search03(self):
         self.login()
         self._setup_contacts()
@@ -485,3 +514,14 @@ class SearchViewTestCase(ViewsTestCase, BrickTestCaseMixin):
             },
             response.json()
         )
+
+    @override_settings(SEARCH_MAX_RESULTS_PER_MODEL=1)
+    def test_light_search_max_results(self):
+        self.login()
+        self._setup_contacts()
+
+        response = self.assertGET200(self.LIGHT_URL, data={'value': 'linu'})
+        results = response.json()['results']
+        self.assertEqual(1, len(results))
+        self.assertEqual(1, results[0]['count'])
+        self.assertEqual(1, len(results[0]['results']))
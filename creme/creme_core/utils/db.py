@@ -29,10 +29,12 @@ from functools import lru_cache
 # import warnings
 
 from django.db import connections, DEFAULT_DB_ALIAS
-from django.db.models import ForeignKey
+from django.db.models import ForeignKey, Model
+from django.db.models.signals import pre_save, post_save
 # from django.db.transaction import atomic
+from django.dispatch.dispatcher import _make_id
 
-from ..models import CaseSensitivity
+from ..models import CaseSensitivity, CremeEntity
 
 from .meta import FieldInfo
 
@@ -310,6 +312,30 @@ def populate_related(instances, field_names):
 #             instance.save(force_update=True, update_fields=(order_field,))
 
 
+def can_update_in_bulk(model):
+    """Can the instances of a model be modified with some UPDATE queries
+    (instead of a .save() per instance) without by-passing business logic ?
+    It's not possible when the model has some business logic in its save()
+    method or in some signal handlers ("pre_save"/"post_save") which are
+    specific to it.
+    The generic signal handlers (eg: the invalidation of caches) are ignored ;
+    the code performing the UPDATE queries must send the signal
+    <creme_core.signals.post_update_in_bulk> for them.
+
+    @param model: Class inheriting <django.db.models.Model>.
+    @return: A boolean.
+    """
+    if model.save not in (Model.save, CremeEntity.save):
+        return False
+
+    model_id = _make_id(model)
+
+    return not any(lookup_key[1] == model_id
+                       for signal in (pre_save, post_save)
+                           for lookup_key, __ in signal.receivers
+                  )
+
+
 # NB: 'maxsize=None' => avoid locking (number of models is small)
 @lru_cache(maxsize=None)
 def is_db_equal_case_sensitive():  # TODO: argument "db" for multi-db env ?
@@ -37,125 +37,252 @@ allkeys.txt (1.6 MB) is available at:
     http://www.unicode.org/Public/UCA/latest/allkeys.txt
 
 but you can always subset this for just the characters you are dealing with.
+
+Parsing allkeys.txt is slow, so a precomputed table (pickled) is built from it
+(see build_table() & the command "build_collation_table", which should be run
+at install time) ; the table is loaded at the first use of the collator.
 """
 
+from functools import lru_cache
+import logging
+from os import replace as replace_file
+from os.path import dirname, join, getmtime
+import pickle
 from re import compile as compile_re
-from logging import info
+from threading import Lock
 
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOURCE = join(dirname(__file__), 'allkeys.txt')
+DEFAULT_TABLE  = join(dirname(__file__), 'allkeys.pickle')
 
-class _Node:
-    __slots__ = ('value', '_children')
+# Increment it when the format of the table changes.
+TABLE_VERSION = 1
 
-    def __init__(self):
-        self.value = None
-        self._children = None  # Memory optimisation: children are created only if needed
 
-    def get_next_node(self, key):
-        next_node = None
-        children = self._children
+def _levels(collation_elements):
+    """Transpose a sequence of collation elements (tuples of 3 or 4 weights)
+    to a tuple of 4 tuples of weights (one per level), without the null weights.
+    """
+    return tuple(
+        tuple(element[level] for element in collation_elements
+                if len(element) > level and element[level]
+             )
+            for level in range(4)
+    )
 
-        if children:
-            next_node = children.get(key)
 
-        return next_node
+def parse_table(filename=DEFAULT_SOURCE):
+    """Build the collation table from a file like allkeys.txt.
 
-    def set_next_node(self, key):
-        children = self._children
+    @param filename: Path of the source file.
+    @return: A tuple (single, multi).
+             - single: dictionary {code_point: weights} for the single code points.
+             - multi: dictionary {tuple_of_code_points: weights} for the contractions.
+             The weights are tuples of 4 tuples (one per level ; see _levels()).
+    """
+    single = {}
+    multi = {}
 
-        if children is None:
-            self._children = children = {}
+    match = compile_re(r'^(?P<charList>[0-9A-F]{4,6}(?:[\s]+[0-9A-F]{4,6})*)[\s]*;[\s]*'
+                       r'(?P<collElement>(?:[\s]*\[(?:[\*|\.][0-9A-F]{4,6}){3,4}\])+)[\s]*'
+                       r'(?:#.*$|$)'
+                      ).match
+    findall_ce = compile_re(r'\[.([^\]]+)\]?').findall  # 'ce' means 'collation element'
 
-        return children.setdefault(key, _Node())
+    with open(filename) as f:
+        for line in f:
+            re_result = match(line)
 
+            if re_result is not None:
+                group = re_result.group
+                key = tuple(int(ch, 16) for ch in group('charList').split())
+                weights = _levels([tuple(int(weight, 16) for weight in coll_element.split('.'))
+                                      for coll_element in findall_ce(group('collElement'))
+                                  ])
 
-class _Collator:
-    def __init__(self, filename=None):
-        self._root = _Node()
+                if len(key) == 1:
+                    single[key[0]] = weights
+                else:
+                    multi[key] = weights
+            elif not line.startswith(('#', '@')) and line.split():
+                logger.info('ERROR in line %s:', line)
 
-        if filename is None:
-            from os.path import dirname, join
-            filename = join(dirname(__file__), 'allkeys.txt')
+    return single, multi
+
+
+def build_table(source=DEFAULT_SOURCE, table=DEFAULT_TABLE):
+    """Parse the source file & write the precomputed table.
+
+    @param source: Path of the source file (like allkeys.txt).
+    @param table: Path of the written table.
+    @return: The table (see parse_table()).
+    """
+    single, multi = data = parse_table(source)
+
+    # NB: the table is written in a temporary file which is renamed, in order
+    #     to avoid that another process reads a partially written file.
+    tmp_path = '{}.tmp'.format(table)
+
+    with open(tmp_path, 'wb') as f:
+        pickle.dump((TABLE_VERSION, single, multi), f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    replace_file(tmp_path, table)
+
+    return data
 
-        # weights = {} #cache of (int, int, int, int) elements
-        match = compile_re(r'^(?P<charList>[0-9A-F]{4,6}(?:[\s]+[0-9A-F]{4,6})*)[\s]*;[\s]*'
-                           r'(?P<collElement>(?:[\s]*\[(?:[\*|\.][0-9A-F]{4,6}){3,4}\])+)[\s]*'
-                           r'(?:#.*$|$)'
-                          ).match
-        findall_ce = compile_re(r'\[.([^\]]+)\]?').findall  # 'ce' means 'collation element'
-        add = self._add
 
-        with open(filename) as f:
-            for line in f:
-                re_result = match(line)
+def load_table(source=DEFAULT_SOURCE, table=DEFAULT_TABLE):
+    """Get the collation table.
+    The precomputed table is used if it's up-to-date ; if it's not the case,
+    the source file is parsed & the table is written (if it's possible).
+
+    @param source: Path of the source file (like allkeys.txt).
+    @param table: Path of the precomputed table, or None.
+    @return: The table (see parse_table()).
+    """
+    if table is None:
+        return parse_table(source)
+
+    try:
+        if getmtime(table) >= getmtime(source):
+            with open(table, 'rb') as f:
+                version, single, multi = pickle.load(f)
+
+            if version == TABLE_VERSION:
+                return single, multi
+    except (OSError, ValueError, pickle.UnpicklingError):
+        pass
+
+    logger.warning('The collation table "%s" is missing or outdated ; you should '
+                   'run the command "build_collation_table".', table,
+                  )
+
+    try:
+        return build_table(source, table)
+    except OSError as e:
+        logger.warning('The collation table cannot be written: %s', e)
+
+        return parse_table(source)
+
+
+class _Collator:
+    """Compute the sort keys of strings.
+
+    The table is loaded at the first call to sort_key(), & the keys of the
+    last used strings are memorised.
+    """
+    cache_size = 4096  # Number of memorised keys (see functools.lru_cache)
+
+    def __init__(self, filename=None, table_filename=None, cache_size=None):
+        """Constructor.
+
+        @param filename: Path of the source file (like allkeys.txt) ;
+               <None> means the default file.
+        @param table_filename: Path of the precomputed table ; <None> means the
+               default table when the default source file is used, & no
+               precomputed table in the other cases.
+        @param cache_size: Number of memorised keys ; <None> means the default
+               size (see the class attribute 'cache_size').
+        """
+        if filename is None:
+            filename = DEFAULT_SOURCE
+
+            if table_filename is None:
+                table_filename = DEFAULT_TABLE
 
-                if re_result is not None:
-                    group = re_result.group
-                    add([int(ch, 16) for ch in group('charList').split()],
-                        [tuple(int(weight, 16) for weight in coll_element.split('.'))
-                            for coll_element in findall_ce(group('collElement'))
-                        ]
-                       )
-                elif not line.startswith(('#', '@')) and line.split():
-                    info('ERROR in line %s:', line)
+        self._source = filename
+        self._table_path = table_filename
+        self._table = None
+        self._lock = Lock()
+        self._cached_sort_key = lru_cache(
+            maxsize=self.cache_size if cache_size is None else cache_size
+        )(self._sort_key)
 
-    def _add(self, key, value):
-        curr_node = self._root
+    def _get_table(self):
+        table = self._table
 
-        for part in key:
-            curr_node = curr_node.set_next_node(part)
+        if table is None:
+            with self._lock:
+                table = self._table
 
-        curr_node.value = value
+                if table is None:
+                    single, multi = load_table(self._source, self._table_path)
 
-    def _find_prefix(self, key):
-        curr_node = self._root
-        step = 0
+                    # Maximum length of the contractions per first code point
+                    starters = {}
+                    for key in multi:
+                        first = key[0]
+                        starters[first] = max(starters.get(first, 0), len(key))
 
-        for part in key:
-            next_node = curr_node.get_next_node(part)
+                    self._table = table = (single, multi, starters)
 
-            if next_node is None:
-                break
+        return table
 
-            curr_node = next_node
-            step += 1
+    @property
+    def cache_info(self):
+        return self._cached_sort_key.cache_info()
 
-        return (curr_node.value, key[step:])
+    def clear_cache(self):
+        self._cached_sort_key.cache_clear()
 
     def sort_key(self, string):
-        find_prefix = self._find_prefix
-        collation_elements = []
-        extend = collation_elements.extend
-
-        lookup_key = [ord(ch) for ch in string]
-        while lookup_key:
-            value, lookup_key = find_prefix(lookup_key)
-            if not value:
-                # Calculate implicit weighting for CJK Ideographs
-                # contributed by David Schneider 2009-07-27
-                # http://www.unicode.org/reports/tr10/#Implicit_Weights
-                key = lookup_key[0]
-                value = [(0xFB40 + (key >> 15), 0x0020, 0x0002, 0x0001),
-                         ((key & 0x7FFF) | 0x8000, 0x0000, 0x0000, 0x0000),
-                        ]
-                lookup_key = lookup_key[1:]
-            extend(value)
-
-        sort_key = []
-        append = sort_key.append
-
-        for level in range(4):
-            if level:
-                append(0)  # Level separator
-
-            for element in collation_elements:
-                try:
-                    ce_l = element[level]
-                    if ce_l:
-                        append(ce_l)
-                except IndexError:
-                    pass
-
-        return tuple(sort_key)
+        """Get the collation key of a string (the result is memorised).
+
+        @param string: A str instance (or an object which can be converted to str).
+        @return: A tuple of integers.
+        """
+        return self._cached_sort_key(str(string))
+
+    def _sort_key(self, string):
+        single, multi, starters = self._get_table()
+        get_single = single.get
+        get_multi = multi.get
+        get_max_length = starters.get
+
+        levels = ([], [], [], [])
+        extend1, extend2, extend3, extend4 = (level.extend for level in levels)
+
+        code_points = [ord(ch) for ch in string]
+        length = len(code_points)
+        i = 0
+
+        while i < length:
+            code_point = code_points[i]
+            weights = None
+            step = 1
+
+            # Contractions (the longest one is used)
+            max_length = get_max_length(code_point)
+            if max_length:
+                for step in range(min(max_length, length - i), 1, -1):
+                    weights = get_multi(tuple(code_points[i:i + step]))
+
+                    if weights is not None:
+                        break
+                else:
+                    step = 1
+
+            if weights is None:
+                weights = get_single(code_point)
+
+                if weights is None:
+                    # Calculate implicit weighting for CJK Ideographs
+                    # contributed by David Schneider 2009-07-27
+                    # http://www.unicode.org/reports/tr10/#Implicit_Weights
+                    weights = _levels([(0xFB40 + (code_point >> 15), 0x0020, 0x0002, 0x0001),
+                                       ((code_point & 0x7FFF) | 0x8000, 0x0000, 0x0000, 0x0000),
+                                      ])
+
+            extend1(weights[0])
+            extend2(weights[1])
+            extend3(weights[2])
+            extend4(weights[3])
+
+            i += step
+
+        # NB: 0 is the separator of levels
+        return (*levels[0], 0, *levels[1], 0, *levels[2], 0, *levels[3])
 
 
 collator = _Collator()
@@ -18,19 +18,25 @@
 #    along with this program.  If not, see <http://www.gnu.org/licenses/>.
 ################################################################################
 
+from collections import deque
 from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
 from json import loads as json_load
 import logging
+from threading import Lock, local
 
+from django.conf import settings
 from django.core.exceptions import PermissionDenied
 from django.http import HttpResponse, Http404
-from django.db import IntegrityError
+from django.db import IntegrityError, connections, close_old_connections
 from django.shortcuts import get_object_or_404
 from django.template.context import make_context
 from django.template.engine import Engine
+from django.utils import timezone, translation
 
 from .. import utils
 from ..auth.decorators import login_required
+from ..global_info import bind_global_info
 from ..gui.bricks import brick_registry, BricksManager
 from ..models import CremeEntity, BrickState
 
@@ -79,6 +85,146 @@ def render_home_brick(brick, context):
     logger.warning('Brick without home_display() : %s (id=%s)', brick.__class__, brick.id_)
 
 
+def render_deferred_brick(brick, context):
+    return brick.deferred_display(context)
+
+
+class BricksRenderer:
+    """Render some bricks, concurrently if it's possible.
+
+    The bricks are rendered by a pool of threads (see settings.BRICKS_RENDERING_THREADS) ;
+    each thread uses its own connections to the DataBase (they are closed, if
+    CONN_MAX_AGE is 0, after the bricks of the page). So the time needed to
+    render the bricks of a page is closer to the time needed by the slowest brick
+    than to the sum of the times of all the bricks.
+
+    The bricks are rendered in the thread of the request when :
+      - the pool has less than 2 threads.
+      - a transaction is in progress (the other connections could not see its changes).
+      - the brick's attribute "concurrent_rendering" is False.
+    """
+    def __init__(self, threads=None):
+        """Constructor.
+
+        @param threads: Maximum number of threads ; <None> means that
+               settings.BRICKS_RENDERING_THREADS is used.
+        """
+        self._threads = threads
+        self._executor = None
+        self._lock = Lock()
+        self._local = local()
+
+    @property
+    def threads(self):
+        threads = self._threads
+        return settings.BRICKS_RENDERING_THREADS if threads is None else threads
+
+    @property
+    def executor(self):
+        with self._lock:
+            executor = self._executor
+
+            if executor is None:
+                self._executor = executor = ThreadPoolExecutor(max_workers=self.threads)
+
+        return executor
+
+    @staticmethod
+    def _in_transaction():
+        return any(conn.in_atomic_block for conn in connections.all())
+
+    def _render_bricks(self, brick_render_function, bricks, context, language, tz):
+        """Render the bricks of a queue (shared by the threads of the pool)
+        until it's empty.
+        @param bricks: <collections.deque> of tuples (index, brick).
+        @return: A list of tuples (index, brick_HTML).
+        """
+        # NB: a brick rendered by the pool renders its own sub-bricks itself
+        #     (waiting for the pool from the pool could cause a dead-lock).
+        self._local.in_pool = True
+        renders = []
+
+        try:
+            with translation.override(language), timezone.override(tz):
+                while True:
+                    try:
+                        index, brick = bricks.popleft()
+                    except IndexError:
+                        break
+
+                    renders.append((index, brick_render_function(brick, context={**context})))
+        finally:
+            # NB: the connections of the thread are managed like the ones of a
+            #     request ; so they are closed (if CONN_MAX_AGE is 0) once per
+            #     page, not once per brick.
+            close_old_connections()
+
+        return renders
+
+    @staticmethod
+    def _prepare(bricks, context):
+        # NB: we load the data which are lazily retrieved & shared by the bricks
+        #     (cache of states, session), in order to avoid race conditions.
+        bricks_manager = context.get(BricksManager.var_name)
+        if bricks_manager is not None:
+            bricks_manager.get_state(bricks[0].id_, context['user'])
+
+        request = context.get('request')
+        if request is not None:
+            # NB: the session is loaded lazily (by the first access to its
+            #     data) ; we force the loading before the threads are spawned,
+            #     so they all use the same data (see BricksManager & the
+            #     contexts of the bricks) instead of loading them concurrently.
+            request.session.keys()
+
+    def render(self, bricks, context, brick_render_function=render_detailview_brick):
+        """Render the bricks.
+
+        @param bricks: Iterable of Bricks instances.
+        @param context: Template context (dictionary) ; each brick gets its own copy.
+        @param brick_render_function: See bricks_render_info().
+        @return A list of tuples (brick, brick_HTML), in the order of 'bricks' ;
+                brick_HTML is None if the brick cannot be rendered with 'brick_render_function'.
+        """
+        bricks = [*bricks]
+
+        if self.threads < 2 or len(bricks) < 2 or \
+           getattr(self._local, 'in_pool', False) or self._in_transaction():
+            return [(brick, brick_render_function(brick, context={**context}))
+                        for brick in bricks
+                   ]
+
+        self._prepare(bricks, context)
+
+        submit = self.executor.submit
+        render = bind_global_info(self._render_bricks)
+        language = translation.get_language()
+        tz = timezone.get_current_timezone()
+
+        # NB: the threads take the bricks from a shared queue ; so each thread
+        #     uses its connection for several bricks, & a slow brick does not
+        #     delay the bricks which follow it.
+        queue = deque((index, brick) for index, brick in enumerate(bricks) if brick.concurrent_rendering)
+        futures = [submit(render, brick_render_function, queue, context, language, tz)
+                       for __ in range(min(self.threads, len(queue)))
+                  ]
+
+        # The not-concurrent bricks are rendered by the current thread, while the pool renders the other ones.
+        renders = [
+            None if brick.concurrent_rendering else brick_render_function(brick, context={**context})
+                for brick in bricks
+        ]
+
+        for future in futures:
+            for index, brick_render in future.result():
+                renders[index] = brick_render
+
+        return [*zip(bricks, renders)]
+
+
+bricks_renderer = BricksRenderer()
+
+
 def bricks_render_info(request, bricks, context=None,
                        brick_render_function=render_detailview_brick, check_permission=False):
     """Build a list of tuples (brick_ID, brick_HTML) which can be serialised to JSON.
@@ -141,12 +287,13 @@ def bricks_render_info(request, bricks, context=None,
         if reloading_info is not None:
             brick.reloading_info = reloading_info
 
-        # brick_render = brick_render_function(brick, context=context)
-        # NB: the context is copied is order to a 'fresh' one for each brick, & so avoid annoying side-effects
-        # Notice that build_context() creates a shared dictionary with the "shared" key in order to explicitly
-        # share data between 2+ bricks.
-        brick_render = brick_render_function(brick, context={**context})
-
+    # brick_render = brick_render_function(brick, context=context)
+    # NB: the context is copied is order to a 'fresh' one for each brick, & so avoid annoying side-effects
+    # Notice that build_context() creates a shared dictionary with the "shared" key in order to explicitly
+    # share data between 2+ bricks.
+    for brick, brick_render in bricks_renderer.render(bricks, context=context,
+                                                      brick_render_function=brick_render_function,
+                                                     ):
         if brick_render is not None:
             brick_renders.append((brick.id_, brick_render))
 
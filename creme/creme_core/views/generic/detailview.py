@@ -23,11 +23,13 @@ from itertools import chain
 import logging
 # import warnings
 
+from django.conf import settings
 from django.db.models import Q
 from django.urls import reverse
 from django.views.generic import DetailView
 
 from creme.creme_core.core import imprint
+from creme.creme_core.core.config_cache import config_cache
 from creme.creme_core.gui.bricks import brick_registry
 from creme.creme_core.gui.last_viewed import LastViewedItem
 from creme.creme_core.models import CremeModel, CremeEntity, BrickDetailviewLocation
@@ -41,18 +43,35 @@ def detailview_bricks(user, entity, registry=brick_registry):
     is_superuser = user.is_superuser
     role = user.role
 
-    role_q = Q(role=None, superuser=True) if is_superuser else Q(role=role, superuser=False)
-    locs = BrickDetailviewLocation.objects.filter(Q(content_type=None) |
-                                                  Q(content_type=entity.entity_type)
-                                                 ) \
-                                          .filter(role_q | Q(role=None, superuser=False)) \
-                                          .order_by('order')
+    role_id = role.id if role else None
+
+    # NB: the locations of all the roles are retrieved (& cached per process) ;
+    #     the ones of the user are selected in Python.
+    cache_key = 'creme_core-detailview_bricks-{}'.format(entity.entity_type_id)
+    all_locs = config_cache.get(cache_key)
+
+    if all_locs is None:
+        all_locs = [*BrickDetailviewLocation.objects.filter(Q(content_type=None) |
+                                                            Q(content_type=entity.entity_type)
+                                                           )
+                                                    .order_by('order')
+                   ]
+        config_cache.set(cache_key, all_locs)
+
+    if is_superuser:
+        role_filter = lambda loc: loc.role_id is None and loc.superuser
+    else:
+        role_filter = lambda loc: loc.role_id == role_id and not loc.superuser
+
+    locs = [loc for loc in all_locs
+                if role_filter(loc) or (loc.role_id is None and not loc.superuser)
+           ]
 
     # We fallback to the default config is there is no config for this content type.
     locs = [loc for loc in locs
             # NB: useless as long as default conf cannot have a related role
             # if loc.content_type_id is not None
-            if loc.superuser == is_superuser and loc.role == role
+            if loc.superuser == is_superuser and loc.role_id == role_id
            ] or [loc for loc in locs if loc.content_type_id is not None] or locs
     loc_map = defaultdict(list)
 
@@ -195,6 +214,19 @@ class EntityDetail(CremeModelDetail):
     def get_bricks(self):
         return detailview_bricks(self.request.user, self.object, registry=self.brick_registry)
 
+    def get_bricks_deferred(self):
+        """Are the bricks of the zones left/right/bottom deferred ?
+        (ie: the client retrieves them with a reloading query after the page
+        has been loaded -- see {% brick_display %}).
+        """
+        return settings.BRICKS_DEFERRED_RENDERING
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['bricks_deferred'] = self.get_bricks_deferred()
+
+        return context
+
     def get_object(self, *args, **kwargs):
         entity = super().get_object(*args, **kwargs)
         request = self.request
@@ -38,6 +38,7 @@ from django.views.generic.list import ListView
 
 from creme.creme_core.auth.entity_credentials import EntityCredentials
 from creme.creme_core.core import sorter
+from creme.creme_core.core.entities_count import entities_count_cache, estimate_count
 from creme.creme_core.core.entity_cell import EntityCellActions
 from creme.creme_core.core.paginator import FlowPaginator  # LastPage
 from creme.creme_core.forms.listview import ListViewSearchForm
@@ -500,6 +501,7 @@ class EntitiesList(base.PermissionsMixin, base.TitleMixin, ListView):
         lv_gui.MassExportHeaderButton,
         lv_gui.MassImportButton,
         lv_gui.BatchProcessButton,
+        lv_gui.MassExportJobButton,
     ]
 
     internal_q = Q()
@@ -524,6 +526,7 @@ class EntitiesList(base.PermissionsMixin, base.TitleMixin, ListView):
 
         self.queryset = None  # We hide voluntarily the class attribute which SHOULD not be used.
         self.count = None
+        self.approximate_count = False
         self.fast_mode = None
         self.ordering = None  # Idem
 
@@ -647,6 +650,7 @@ class EntitiesList(base.PermissionsMixin, base.TitleMixin, ListView):
         context['entity_filters'] = self.entity_filters
 
         context['extra_q'] = self.extra_q
+        context['approximate_count'] = self.approximate_count
         context['search_form'] = self.search_form
 
         # NB: cannot set it within the template because the reloading case needs it too
@@ -667,6 +671,27 @@ class EntitiesList(base.PermissionsMixin, base.TitleMixin, ListView):
     def get_buttons(self):
         return lv_gui.ListViewButtonList(self.button_classes)
 
+    def get_count(self, queryset):
+        """Count the entities of the list.
+        The count is cached (see settings.ENTITIES_COUNT_CACHE_TIMEOUT) ; when
+        it is too big, the estimation of the DBMS can be used instead
+        (see settings.LISTVIEW_APPROXIMATE_COUNT_THRESHOLD).
+
+        @param queryset: QuerySet to count (can be on CremeEntity, see get_unordered_queryset_n_count()).
+        @return: Integer.
+        """
+        threshold = settings.LISTVIEW_APPROXIMATE_COUNT_THRESHOLD
+
+        if threshold:
+            estimation = estimate_count(queryset)
+
+            if estimation is not None and \
+               estimation >= max(threshold, settings.FAST_QUERY_MODE_THRESHOLD):
+                self.approximate_count = True
+                return estimation
+
+        return entities_count_cache.count(self.model, queryset)
+
     def get_entity_filter(self, entity_filters):
         return self.state.set_entityfilter(
             entity_filters,
@@ -852,23 +877,25 @@ class EntitiesList(base.PermissionsMixin, base.TitleMixin, ListView):
         # If the query does not use the real entities' specific fields to filter,
         # we perform a query on CremeEntity & so we avoid a JOIN.
         if filtered:
-            count = qs.count()
+            count = self.get_count(qs)
         else:
             model = self.model
             try:
-                count = EntityCredentials.filter_entities(
+                count_qs = EntityCredentials.filter_entities(
                     user,
                     CremeEntity.objects.filter(
                         is_deleted=False,
                         entity_type=ContentType.objects.get_for_model(model),
                     ),
                     as_model=model,
-                ).count()
+                )
             except EntityCredentials.FilteringError as e:
                 logger.debug('%s.get_unordered_queryset_n_count() : fast count is not possible (%s)',
                              type(self).__name__, e,
                             )
-                count = qs.count()
+                count_qs = qs
+
+            count = self.get_count(count_qs)
 
         return qs, count
 
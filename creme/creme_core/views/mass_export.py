@@ -20,16 +20,19 @@
 
 import logging
 
-from django.http import Http404
-from django.shortcuts import get_object_or_404
+from django.conf import settings
+from django.http import Http404, HttpResponseRedirect
+from django.shortcuts import get_object_or_404, redirect
+from django.urls import reverse
 from django.utils.encoding import smart_str
 
 from ..backends import export_backend_registry
 from ..core import sorter
 from ..core.paginator import FlowPaginator
+from ..creme_jobs import mass_export_type
 from ..forms.listview import ListViewSearchForm
 from ..gui.listview import search_field_registry  # ListViewState
-from ..models import EntityFilter, EntityCredentials, HeaderFilter
+from ..models import EntityFilter, EntityCredentials, HeaderFilter, Job, read_only_instances
 from ..models.history import _HLTEntityExport
 from ..utils import get_from_GET_or_404, bool_from_str_extended
 from ..utils.meta import Order
@@ -40,7 +43,6 @@ from .generic import base
 logger = logging.getLogger(__name__)
 
 
-# TODO: stream response ??
 # TODO: factorise with generic.listview.EntitiesList ?
 class MassExport(base.EntityCTypeRelatedMixin, base.CheckedView):
     ct_id_arg = 'ct_id'
@@ -51,6 +53,7 @@ class MassExport(base.EntityCTypeRelatedMixin, base.CheckedView):
     sort_cellkey_arg = 'sort_key'
     sort_order_arg = 'sort_order'
     extra_q_arg = 'extra_q'
+    as_job_arg = 'as_job'
 
     page_size = 1024
 
@@ -156,85 +159,175 @@ class MassExport(base.EntityCTypeRelatedMixin, base.CheckedView):
 
         return sort_info.field_names
 
-    def get(self, request, *args, **kwargs):
-        user = request.user
+    def get_as_job(self):
+        return get_from_GET_or_404(self.request.GET,
+                                   key=self.as_job_arg,
+                                   cast=bool_from_str_extended,
+                                   default='0',
+                                  )
 
-        header_only = self.get_header_only()
-        backend = self.get_backend()
-        ct = self.get_ctype()
-        model = ct.model_class()
-        hf = self.get_header_filter()
+    def get_entities_queryset(self, *, model, cells, efilter):
+        request = self.request
+        entities_qs = model.objects.filter(is_deleted=False)
+        use_distinct = False
+
+        # ----
+        if efilter is not None:
+            entities_qs = efilter.filter(entities_qs)
+
+        # ----
+        extra_q = request.GET.get(self.extra_q_arg)
+        if extra_q is not None:
+            entities_qs = entities_qs.filter(QSerializer().loads(extra_q))
+            use_distinct = True  # TODO: test + only if needed
+
+        # ----
+        search_form = self.get_search_form(cells=cells)
+        search_q = search_form.search_q
+        if search_q:
+            try:
+                entities_qs = entities_qs.filter(search_q)
+            except Exception as e:
+                logger.exception('Error when building the search queryset with Q=%s (%s).', search_q, e)
+            else:
+                use_distinct = True  # TODO: test + only if needed
 
-        cells = self.get_cells(header_filter=hf)
+        # ----
+        entities_qs = EntityCredentials.filter(request.user, entities_qs)
 
-        writer = backend()
-        writerow = writer.writerow
-        writerow([smart_str(cell.title) for cell in cells])  # Doesn't accept generator expression... ;(
+        if use_distinct:
+            entities_qs = entities_qs.distinct()
 
-        if not header_only:
-            ordering = self.get_ordering(model=model, cells=cells)
+        return entities_qs
 
-            entities_qs = model.objects.filter(is_deleted=False)
-            use_distinct = False
+    def get_rows(self, *, ctype, header_filter, header_only):
+        """Get the rows to export.
+        The arguments from the request are checked immediately (so the
+        HTTP errors are raised before the response is sent), but the entities
+        are retrieved page by page, when the returned iterator is consumed
+        (so it can be used to stream the response).
+        @return: An iterator of lists of strings ; the first one is the header.
+        """
+        model = ctype.model_class()
+        cells = self.get_cells(header_filter=header_filter)
 
-            # ----
+        if header_only:
+            efilter = ordering = entities_qs = None
+        else:
             efilter = self.get_entity_filter()
-            if efilter is not None:
-                entities_qs = efilter.filter(entities_qs)
+            ordering = self.get_ordering(model=model, cells=cells)
+            entities_qs = self.get_entities_queryset(model=model, cells=cells, efilter=efilter)
 
-            # ----
-            extra_q = request.GET.get(self.extra_q_arg)
-            if extra_q is not None:
-                entities_qs = entities_qs.filter(QSerializer().loads(extra_q))
-                use_distinct = True  # TODO: test + only if needed
+            # NB: the export is recorded before the rows are generated, because
+            #     the streamed rows are consumed after the request has left the
+            #     middlewares (so the global info, like the user's name used by
+            #     the history, are not available anymore), and the client can
+            #     stop the download before the last row.
+            _HLTEntityExport.create_line(
+                ctype=ctype, user=self.request.user, count=entities_qs.count(),
+                hfilter=header_filter, efilter=efilter,
+            )
+
+        return self._iter_rows(ctype=ctype, header_filter=header_filter, cells=cells,
+                               efilter=efilter, ordering=ordering, entities_qs=entities_qs,
+                              )
 
-            # ----
-            search_form = self.get_search_form(cells=cells)
-            search_q = search_form.search_q
-            if search_q:
-                try:
-                    entities_qs = entities_qs.filter(search_q)
-                except Exception as e:
-                    logger.exception('Error when building the search queryset with Q=%s (%s).', search_q, e)
-                else:
-                    use_distinct = True  # TODO: test + only if needed
+    def _iter_rows(self, *, ctype, header_filter, cells, efilter, ordering, entities_qs):
+        user = self.request.user
 
-            # ----
-            entities_qs = EntityCredentials.filter(user, entities_qs)
+        yield [smart_str(cell.title) for cell in cells]
 
-            if use_distinct:
-                entities_qs = entities_qs.distinct()
+        if entities_qs is None:
+            return
 
-            paginator = self.get_paginator(queryset=entities_qs,
-                                           ordering=ordering,
-                                          )
+        paginator = self.get_paginator(queryset=entities_qs,
+                                       ordering=ordering,
+                                      )
 
-            total_count = 0
+        pages = paginator.pages()
+
+        while True:
+            # NB: the exported entities (& their related instances) are not
+            #     modified, so no snapshot of their values is kept for the history.
+            with read_only_instances():
+                entities_page = next(pages, None)
+
+                if entities_page is None:
+                    break
 
-            for entities_page in paginator.pages():
                 entities = entities_page.object_list
 
-                hf.populate_entities(entities, user)  # Optimisation time !!!
+                header_filter.populate_entities(entities, user)  # Optimisation time !!!
 
-                for entity in entities:
-                    total_count += 1
-                    line = []
+            for entity in entities:
+                line = []
 
-                    for cell in cells:
-                        try:
-                            res = cell.render_csv(entity, user)
-                        except Exception as e:
-                            logger.debug('Exception in CSV export: %s', e)
-                            res = ''
+                for cell in cells:
+                    try:
+                        res = cell.render_csv(entity, user)
+                    except Exception as e:
+                        logger.debug('Exception in CSV export: %s', e)
+                        res = ''
 
-                        line.append(smart_str(res) if res else '')
+                    line.append(smart_str(res) if res else '')
 
-                    writerow(line)
+                yield line
 
-            _HLTEntityExport.create_line(
-                ctype=ct, user=user, count=total_count, hfilter=hf, efilter=efilter,
-            )
+    def create_job(self, ctype):
+        "Create a Job which generates the file outside the request."
+        request = self.request
+        user = request.user
+
+        if Job.not_finished_jobs(user).count() >= settings.MAX_JOBS_PER_USER:
+            return HttpResponseRedirect(reverse('creme_core__my_jobs'))
+
+        GET = request.GET.copy()
+        GET.pop(self.as_job_arg, None)
+
+        job = Job.objects.create(user=user,
+                                 type=mass_export_type,
+                                 data={'ctype': ctype.id,
+                                       'GET':   GET.urlencode(),
+                                      },
+                                )
+
+        return redirect(job)
+
+    def save_in_file(self):
+        """Export the entities in a temporary file (used by the mass-export job).
+        @return: An instance of creme_core.models.FileRef.
+        """
+        ctype = self.get_ctype()
+
+        return self.get_backend()().save_in_file(
+            rows=self.get_rows(ctype=ctype,
+                               header_filter=self.get_header_filter(),
+                               header_only=False,
+                              ),
+            filename=ctype.model,
+            user=self.request.user,
+        )
+
+    def get(self, request, *args, **kwargs):
+        header_only = self.get_header_only()
+        backend = self.get_backend()
+        ct = self.get_ctype()
+        hf = self.get_header_filter()
+
+        if not header_only and self.get_as_job():
+            return self.create_job(ct)
+
+        writer = backend()
+        rows = self.get_rows(ctype=ct, header_filter=hf, header_only=header_only)
+
+        if writer.streamable:
+            writer.stream(rows, ct.model)
+        else:
+            writerow = writer.writerow
+
+            for row in rows:
+                writerow(row)
 
-        writer.save(ct.model)
+            writer.save(ct.model)
 
         return writer.response
@@ -591,8 +591,8 @@ def add_relations_with_same_type(request):
                        if object_properties else \
                        lambda e: True
 
-    # create_relation = Relation.objects.create
-    create_relation = Relation.objects.safe_create
+    relations = []
+
     for entity in entities:
         if not check_ctype(entity):
             errors[409].append(gettext('Incompatible type for object entity with id={}').format(entity.id))
@@ -601,7 +601,9 @@ def add_relations_with_same_type(request):
         elif not user.has_perm_to_link(entity):
             errors[403].append(gettext('Permission denied to entity with id={}').format(entity.id))
         else:
-            create_relation(subject_entity=subject, type=rtype, object_entity=entity, user=user)
+            relations.append(Relation(subject_entity=subject, type=rtype, object_entity=entity, user=user))
+
+    Relation.objects.bulk_link(relations)
 
     if not errors:
         status = 200
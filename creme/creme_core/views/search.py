@@ -22,6 +22,7 @@ from functools import partial
 from time import time
 from urllib.parse import urlencode
 
+from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
 from django.http import Http404
 from django.utils.translation import gettext_lazy as _, gettext
@@ -92,6 +93,10 @@ class FoundEntitiesBrick(QuerysetBrick):
             qs = model.objects.all()[:1]
         else:
             qs = EntityCredentials.filter(self.user, results)
+            max_results = settings.SEARCH_MAX_RESULTS_PER_MODEL
+
+            if max_results:
+                qs = qs[:max_results]
 
         return self._render(self.get_template_context(
                     context, qs,
@@ -336,6 +341,7 @@ class LightSearch(SearcherMixin, base.CheckedView):
             best_entry = None
 
             get_ct = ContentType.objects.get_for_model
+            max_results = settings.SEARCH_MAX_RESULTS_PER_MODEL
 
             for model in searcher.models:
                 query = searcher.search(model, terms)
@@ -345,6 +351,10 @@ class LightSearch(SearcherMixin, base.CheckedView):
                     query = []
                 else:
                     query = EntityCredentials.filter(user, query)
+
+                    if max_results:
+                        query = query[:max_results]
+
                     count = query.count()
 
                     if limit > 0:
@@ -2,7 +2,7 @@
 
 ################################################################################
 #    Creme is a free/open-source Customer Relationship Management software
-#    Copyright (C) 2009-2018  Hybird
+#    Copyright (C) 2009-2019  Hybird
 #
 #    This program is free software: you can redistribute it and/or modify
 #    it under the terms of the GNU Affero General Public License as published by
@@ -18,12 +18,12 @@
 #    along with this program.  If not, see <http://www.gnu.org/licenses/>.
 ################################################################################
 
+from functools import lru_cache
 from json import loads as json_load
 import logging
-from time import sleep
 
 from django.conf import settings
-from django.core.mail import send_mail, get_connection
+from django.core.mail import send_mail
 from django.db import IntegrityError
 from django.db.models import (ForeignKey, DateTimeField, PositiveSmallIntegerField,
         EmailField, CharField, TextField, ManyToManyField, SET_NULL, CASCADE)
@@ -31,13 +31,15 @@ from django.db.transaction import atomic
 from django.template import Template, Context
 from django.urls import reverse
 from django.utils.formats import date_format
-from django.utils.timezone import localtime
+from django.utils.timezone import localtime, now
 from django.utils.translation import gettext_lazy as _, gettext, pgettext, pgettext_lazy
 
 from creme.creme_core.models import CremeModel, CremeEntity
+from creme.creme_core.utils.chunktools import iter_as_chunk
 
-from ..constants import MAIL_STATUS_NOTSENT, MAIL_STATUS_SENDINGERROR
-from ..utils import generate_id, EMailSender, ImageFromHTMLError
+from ..constants import MAIL_STATUS_NOTSENT, MAIL_STATUS_SENT, MAIL_STATUS_SENDINGERROR
+from ..utils import (generate_id, EMailSender, ImageFromHTMLError,
+        RateLimiter, SMTPConnectionPool)
 
 from .mail import _Email, ID_LENGTH
 from .signature import EmailSignature
@@ -66,6 +68,15 @@ SENDING_STATES = {
     SENDING_STATE_ERROR:      _('Error during sending'),
 }
 
+# The mails of a sending are rendered/sent/updated by chunks of this size.
+MAILS_CHUNK_SIZE = 100
+
+
+@lru_cache(maxsize=32)
+def _get_template(source):
+    "The compiled templates are cached (the mails of a sending use the same ones)."
+    return Template(source)
+
 
 class EmailSending(CremeModel):
     sender        = EmailField(_('Sender address'), max_length=100)
@@ -139,35 +150,27 @@ class EmailSending(CremeModel):
 
             return SENDING_STATE_ERROR
 
-        connection = get_connection(host=settings.EMAILCAMPAIGN_HOST,
-                                    port=settings.EMAILCAMPAIGN_PORT,
-                                    username=settings.EMAILCAMPAIGN_HOST_USER,
-                                    password=settings.EMAILCAMPAIGN_PASSWORD,
-                                    use_tls=settings.EMAILCAMPAIGN_USE_TLS,
-                                   )
-
-        mails_count   = 0
         one_mail_sent = False
-        SENDING_SIZE  = getattr(settings, 'EMAILCAMPAIGN_SIZE', 40)
-        SLEEP_TIME    = getattr(settings, 'EMAILCAMPAIGN_SLEEP_TIME', 2)
-
-        for mail in LightWeightEmail.objects.filter(sending=self):
-            if sender.send(mail, connection=connection):
-                mails_count += 1
-                one_mail_sent = True
-                logger.debug('Mail sent to %s', mail.recipient)
-
-            if mails_count > SENDING_SIZE:
-                logger.debug('Sending: waiting timeout')
-
-                mails_count = 0
-                sleep(SLEEP_TIME)  # Avoiding the mail to be classed as spam
+        # Avoiding the mails to be classed as spam
+        rate_limiter = RateLimiter(rate=getattr(settings, 'EMAILCAMPAIGN_SIZE', 40),
+                                   period=getattr(settings, 'EMAILCAMPAIGN_SLEEP_TIME', 2),
+                                  )
+
+        with SMTPConnectionPool(size=getattr(settings, 'EMAILCAMPAIGN_CONNECTIONS', 1),
+                                rate_limiter=rate_limiter,
+                                host=settings.EMAILCAMPAIGN_HOST,
+                                port=settings.EMAILCAMPAIGN_PORT,
+                                username=settings.EMAILCAMPAIGN_HOST_USER,
+                                password=settings.EMAILCAMPAIGN_PASSWORD,
+                                use_tls=settings.EMAILCAMPAIGN_USE_TLS,
+                               ) as pool:
+            for mails in iter_as_chunk(LightWeightEmail.objects.filter(sending=self), MAILS_CHUNK_SIZE):
+                if sender.send_mails(mails, pool):
+                    one_mail_sent = True
 
         if not one_mail_sent:
             return SENDING_STATE_ERROR
 
-        # TODO: close the connection ??
-
 
 class LightWeightEmail(_Email):
     """Used by campaigns.
@@ -191,7 +194,7 @@ class LightWeightEmail(_Email):
         body = self.body
 
         try:
-            return Template(sending_body).render(Context(json_load(body) if body else {}))
+            return _get_template(sending_body).render(Context(json_load(body) if body else {}))
         except Exception as e:
             logger.debug('Error in LightWeightEmail._render_body(): %s', e)
             return ''
@@ -229,12 +232,47 @@ class LightWeightEmailSender(EMailSender):
                          attachments=sending.attachments.all(),
                         )
         self._sending = sending
-        self._body_template = Template(self._body)
-        self._body_html_template = Template(self._body_html)
+        self._body_template = _get_template(self._body)
+        self._body_html_template = _get_template(self._body_html)
 
     def get_subject(self, mail):
         return self._sending.subject
 
+    def send_mails(self, mails, pool):
+        """Send some mails through a pool of connections, and update their
+        status (with one query).
+        @param mails: Sequence of LightWeightEmails.
+        @param pool: Instance of SMTPConnectionPool.
+        @return: Number of sent mails.
+        """
+        to_send = []
+
+        for mail in mails:
+            if mail.status == MAIL_STATUS_SENT:
+                logger.error('Mail already sent to the recipient')
+            else:
+                to_send.append(mail)
+
+        if not to_send:
+            return 0
+
+        errors = pool.send_messages([self.build_message(mail) for mail in to_send])
+        sending_date = now()
+        sent_count = 0
+
+        for mail, error in zip(to_send, errors):
+            if error is None:
+                mail.status = MAIL_STATUS_SENT
+                mail.sending_date = sending_date
+                sent_count += 1
+                logger.debug('Mail sent to %s', mail.recipient)
+            else:
+                mail.status = MAIL_STATUS_SENDINGERROR
+
+        LightWeightEmail.objects.bulk_update(to_send, ['status', 'sending_date'])
+
+        return sent_count
+
     def _process_bodies(self, mail):
         body = mail.body
         context = Context(json_load(body) if body else {})
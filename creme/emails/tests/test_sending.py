@@ -25,7 +25,7 @@ try:
             Contact, Organisation, EmailCampaign, EmailTemplate, MailingList)
 
     from ..bricks import MailsBrick
-    from ..constants import SETTING_EMAILCAMPAIGN_SENDER, MAIL_STATUS_NOTSENT
+    from ..constants import SETTING_EMAILCAMPAIGN_SENDER, MAIL_STATUS_NOTSENT, MAIL_STATUS_SENT
     from ..creme_jobs import campaign_emails_send_type
     from ..models import EmailSending, EmailRecipient, LightWeightEmail
     from ..models.sending import (SENDING_TYPE_IMMEDIATE, SENDING_TYPE_DEFERRED,
@@ -470,6 +470,49 @@ class SendingsTestCase(_EmailsTestCase):
         self.assertIsNone(job.type.next_wakeup(job, now_value))
         self.assertFalse(queue.refreshed_jobs)  # Other save() in job should not send REFRESH signals
 
+    @skipIfCustomOrganisation
+    @override_settings(EMAILCAMPAIGN_CONNECTIONS=2)
+    def test_create03_connections(self):
+        "Several connections."
+        user = self.login()
+        camp     = EmailCampaign.objects.create(user=user, name='camp01')
+        template = EmailTemplate.objects.create(user=user, name='name', subject='subject',
+                                                body='Hello {{name}}',
+                                               )
+        mlist    = MailingList.objects.create(user=user, name='ml01')
+
+        create_orga = partial(Organisation.objects.create, user=user)
+        orgas = [create_orga(name='Orga #{}'.format(i), email='contact{}@orga.jp'.format(i))
+                    for i in range(5)
+                ]
+
+        camp.mailing_lists.add(mlist)
+        mlist.organisations.add(*orgas)
+
+        response = self.client.post(self._build_add_url(camp),
+                                    data={'sender':   'vicious@reddragons.mrs',
+                                          'type':     SENDING_TYPE_IMMEDIATE,
+                                          'template': template.id,
+                                         },
+                                   )
+        self.assertNoFormError(response)
+
+        self._send_mails()
+
+        sending = self.get_object_or_fail(EmailSending, campaign=camp)
+        self.assertEqual(SENDING_STATE_DONE, sending.state)
+
+        messages = django_mail.outbox
+        self.assertEqual(5, len(messages))
+        self.assertSetEqual({'Hello {}'.format(o.name) for o in orgas},
+                            {m.body for m in messages}
+                           )
+
+        mails = sending.mails_set.all()
+        self.assertEqual(5, len(mails))
+        self.assertTrue(all(mail.status == MAIL_STATUS_SENT for mail in mails))
+        self.assertTrue(all(mail.sending_date is not None for mail in mails))
+
     def test_create04(self):
         "Test deferred"
         user = self.login()
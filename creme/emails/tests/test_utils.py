@@ -4,12 +4,13 @@ try:
     from email.mime.image import MIMEImage
 
     from django.core import mail as django_mail
+    from django.core.mail import EmailMessage
 
     from creme.documents.tests.base import _DocumentsTestCase
 
     from .base import _EmailsTestCase, EntityEmail
     from ..models import EmailSignature
-    from ..utils import get_mime_image, EMailSender
+    from ..utils import get_mime_image, EMailSender, RateLimiter, SMTPConnectionPool
 except Exception as e:
     print('Error in <{}>: {}'.format(__name__, e))
 
@@ -124,3 +125,77 @@ class UtilsTestCase(_EmailsTestCase, _DocumentsTestCase):
         self.assertIsInstance(attachments[1], MIMEImage)
 
     # TODO: test_get_images_from_html03() -> 'attachments' parameter
+
+    def test_rate_limiter01(self):
+        "No limit."
+        sleeps = []
+        limiter = RateLimiter(rate=2, period=0, clock=lambda: 0.0, sleep=sleeps.append)
+
+        for i in range(10):
+            limiter.acquire()
+
+        self.assertFalse(sleeps)
+
+    def test_rate_limiter02(self):
+        "Burst, then waiting."
+        times = [0.0]
+        sleeps = []
+
+        def fake_sleep(duration):
+            sleeps.append(duration)
+            times[0] += duration
+
+        limiter = RateLimiter(rate=2, period=4, clock=lambda: times[0], sleep=fake_sleep)
+        limiter.acquire()
+        limiter.acquire()
+        self.assertFalse(sleeps)
+
+        limiter.acquire()
+        self.assertListEqual([2.0], sleeps)
+
+        times[0] += 1.0
+        limiter.acquire()
+        self.assertListEqual([2.0, 1.0], sleeps)
+
+        times[0] += 10.0  # Tokens are refilled (with a maximum)
+        limiter.acquire()
+        limiter.acquire()
+        self.assertEqual(2, len(sleeps))
+
+    def test_connection_pool01(self):
+        self.assertFalse(django_mail.outbox)
+
+        messages = [
+            EmailMessage('Subject #{}'.format(i), 'Body', 'm.kusanagi@section9.jp', ['bato@section9.jp'])
+                for i in range(5)
+        ]
+
+        with SMTPConnectionPool(size=2) as pool:
+            errors = pool.send_messages(messages)
+
+        self.assertListEqual([None] * 5, errors)
+        self.assertSetEqual({m.subject for m in messages},
+                            {m.subject for m in django_mail.outbox}
+                           )
+
+    def test_connection_pool02(self):
+        "Errors."
+        class FailingMessage(EmailMessage):
+            def send(self, fail_silently=False):
+                raise ValueError('Invalid message')
+
+        messages = [
+            EmailMessage('Subject #1', 'Body', 'm.kusanagi@section9.jp', ['bato@section9.jp']),
+            FailingMessage('Subject #2', 'Body', 'm.kusanagi@section9.jp', ['bato@section9.jp']),
+            EmailMessage('Subject #3', 'Body', 'm.kusanagi@section9.jp', ['bato@section9.jp']),
+        ]
+
+        with SMTPConnectionPool() as pool:
+            errors = pool.send_messages(messages)
+
+        self.assertEqual(3, len(errors))
+        self.assertIsNone(errors[0])
+        self.assertIsInstance(errors[1], ValueError)
+        self.assertIsNone(errors[2])
+
+        self.assertListEqual(['Subject #1', 'Subject #3'], [m.subject for m in django_mail.outbox])
@@ -18,15 +18,18 @@
 #    along with this program.  If not, see <http://www.gnu.org/licenses/>.
 ################################################################################
 
+from concurrent.futures import ThreadPoolExecutor
 from email.mime.image import MIMEImage
 import logging
 from os.path import basename, join
 from random import choice
 from re import compile as re_compile
 from string import ascii_letters, digits
+from threading import Lock, local
+from time import monotonic, sleep
 
 from django.conf import settings
-from django.core.mail import EmailMultiAlternatives
+from django.core.mail import EmailMessage, EmailMultiAlternatives, get_connection
 from django.utils.timezone import now
 
 from .constants import MAIL_STATUS_SENT, MAIL_STATUS_SENDINGERROR
@@ -105,14 +108,50 @@ class EMailSender:
         self._body_html = body_html
 
         self._attachments = attachments
+        self._attachments_data = None
         self._mime_images = mime_images
 
     def get_subject(self, mail):
         raise NotImplementedError
 
+    def _get_attachments_data(self):
+        "@return: List of tuples (filename, content, mimetype) ; files are read only once."
+        attachments_data = self._attachments_data
+
+        if attachments_data is None:
+            MEDIA_ROOT = settings.MEDIA_ROOT
+            reader = EmailMessage()
+
+            for attachment in self._attachments:
+                reader.attach_file(join(MEDIA_ROOT, attachment.filedata.name))
+
+            self._attachments_data = attachments_data = reader.attachments
+
+        return attachments_data
+
     def _process_bodies(self, mail):
         return self._body, self._body_html
 
+    def build_message(self, mail, connection=None):
+        """Build the message to send.
+        @param mail: Object with a class inheriting emails.models.mail._Email
+        @return: Instance of EmailMultiAlternatives.
+        """
+        body, body_html = self._process_bodies(mail)
+
+        msg = EmailMultiAlternatives(self.get_subject(mail), body, mail.sender,
+                                     [mail.recipient], connection=connection,
+                                    )
+        msg.attach_alternative(body_html, 'text/html')
+
+        for image in self._mime_images:
+            msg.attach(image)
+
+        for attachment_data in self._get_attachments_data():
+            msg.attach(*attachment_data)
+
+        return msg
+
     def send(self, mail, connection=None):
         """
         @param mail: Object with a class inheriting emails.models.mail._Email
@@ -123,19 +162,7 @@ class EMailSender:
         if mail.status == MAIL_STATUS_SENT:
             logger.error('Mail already sent to the recipient')
         else:
-            body, body_html = self._process_bodies(mail)
-
-            msg = EmailMultiAlternatives(self.get_subject(mail), body, mail.sender,
-                                         [mail.recipient], connection=connection,
-                                        )
-            msg.attach_alternative(body_html, 'text/html')
-
-            for image in self._mime_images:
-                msg.attach(image)
-
-            MEDIA_ROOT = settings.MEDIA_ROOT
-            for attachment in self._attachments:
-                msg.attach_file(join(MEDIA_ROOT, attachment.filedata.name))
+            msg = self.build_message(mail, connection=connection)
 
             try:
                 msg.send()
@@ -150,3 +177,139 @@ class EMailSender:
             mail.save()
 
         return ok
+
+
+class RateLimiter:
+    """Limit the number of operations per period (token bucket) ; a burst of
+    'rate' operations is allowed, then the operations are spread over the period.
+    It can be shared by several threads.
+    """
+    def __init__(self, rate, period, clock=monotonic, sleep=sleep):
+        """Constructor.
+        @param rate: Maximum number of operations per period.
+        @param period: Duration of the period in seconds ; 0 means "no limit".
+        @param clock: Function returning the current time in seconds.
+        @param sleep: Function used to wait.
+        """
+        self._capacity = max(rate, 1)
+        self._tokens = float(self._capacity)
+        self._fill_rate = self._capacity / period if period > 0 else None
+        self._clock = clock
+        self._sleep = sleep
+        self._last = clock()
+        self._lock = Lock()
+
+    def acquire(self):
+        "Wait until an operation is allowed."
+        fill_rate = self._fill_rate
+        if fill_rate is None:
+            return
+
+        with self._lock:
+            current = self._clock()
+            tokens = min(self._capacity, self._tokens + (current - self._last) * fill_rate)
+
+            if tokens < 1:
+                self._sleep((1 - tokens) / fill_rate)
+                tokens = 1
+                current = self._clock()
+
+            self._tokens = tokens - 1
+            self._last = current
+
+
+class SMTPConnectionPool:
+    """Send emails through several SMTP connections in parallel (one connection
+    per thread) ; the connections stay opened until close() is called.
+
+    Usage:
+        with SMTPConnectionPool(size=4, host='smtp.domain.org') as pool:
+            errors = pool.send_messages(messages)
+    """
+    def __init__(self, size=1, rate_limiter=None, **connection_kwargs):
+        """Constructor.
+        @param size: Number of connections.
+        @param rate_limiter: Instance of RateLimiter, or None.
+        @param connection_kwargs: Arguments for django.core.mail.get_connection().
+        """
+        self._size = max(size, 1)
+        self._rate_limiter = rate_limiter
+        self._connection_kwargs = connection_kwargs
+        self._connections = []
+        self._local = local()
+        self._lock = Lock()
+        self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _get_connection(self):
+        connection = getattr(self._local, 'connection', None)
+
+        if connection is None:
+            self._local.connection = connection = get_connection(**self._connection_kwargs)
+            connection.open()
+
+            with self._lock:
+                self._connections.append(connection)
+
+        return connection
+
+    def _reset_connection(self):
+        "Close the connection of the current thread (a new one will be opened if needed)."
+        connection = getattr(self._local, 'connection', None)
+
+        if connection is not None:
+            self._local.connection = None
+
+            with self._lock:
+                self._connections.remove(connection)
+
+            try:
+                connection.close()
+            except Exception:
+                logger.exception('Sending: error when closing a connection.')
+
+    def _send(self, message):
+        "@return: The exception raised by the sending, or None."
+        if self._rate_limiter is not None:
+            self._rate_limiter.acquire()
+
+        try:
+            message.connection = self._get_connection()
+            message.send()
+        except Exception as e:
+            logger.exception('Sending: error during sending mail.')
+            self._reset_connection()  # The connection may be broken
+
+            return e
+
+    def send_messages(self, messages):
+        """Send some messages.
+        @param messages: Sequence of EmailMessages.
+        @return: List of the errors (exception or None), in the order of the messages.
+        """
+        if self._size == 1:
+            return [*map(self._send, messages)]
+
+        executor = self._executor
+        if executor is None:
+            self._executor = executor = ThreadPoolExecutor(max_workers=self._size)
+
+        return [*executor.map(self._send, messages)]
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+        for connection in self._connections:
+            try:
+                connection.close()
+            except Exception:
+                logger.exception('Sending: error when closing a connection.')
+
+        self._connections.clear()
@@ -1,3 +1,8 @@
 # -*- coding: utf-8 -*-
 
 DEFAULT_SEPARATING_NEIGHBOURS = 10000  # in meters
+
+EARTH_RADIUS = 6371008.8  # Mean radius, in meters
+
+# Length of the geohashes stored in GeoAddress (9 characters ~ cells of 5m x 5m)
+GEOHASH_PRECISION = 9
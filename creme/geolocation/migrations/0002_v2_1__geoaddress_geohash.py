@@ -0,0 +1,26 @@
+from django.db import migrations, models
+
+from creme.geolocation.utils import geohash_encode
+
+
+def fill_geohashes(apps, schema_editor):
+    for geoaddress in apps.get_model('geolocation', 'GeoAddress').objects.filter(latitude__isnull=False,
+                                                                                  longitude__isnull=False,
+                                                                                 ):
+        geoaddress.geohash = geohash_encode(geoaddress.latitude, geoaddress.longitude)
+        geoaddress.save()
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('geolocation', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='geoaddress',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=9, verbose_name='Geohash'),
+        ),
+        migrations.RunPython(fill_geohashes),
+    ]
@@ -18,13 +18,17 @@
 #    along with this program.  If not, see <http://www.gnu.org/licenses/>.
 ################################################################################
 
+from functools import reduce
 from itertools import chain, groupby
+from math import cos, pi, radians, sin
+from operator import or_
 
 from django.conf import settings
 from django.db.models import (Model, FloatField, BooleanField,
     OneToOneField, CharField, SlugField, SmallIntegerField, CASCADE)
 from django.db.transaction import atomic
 
+from django.db.models.functions import Cos, Power, Radians, Sin
 from django.db.models.query_utils import Q
 from django.template.defaultfilters import slugify
 from django.utils.translation import gettext_lazy as _, pgettext_lazy
@@ -32,7 +36,8 @@ from django.utils.translation import gettext_lazy as _, pgettext_lazy
 from creme.creme_core.utils import update_model_instance
 from creme.creme_core.utils.chunktools import iter_as_slices
 
-from .utils import location_bounding_box
+from .constants import EARTH_RADIUS, GEOHASH_PRECISION
+from .utils import geohash_encode, geohash_cells
 
 
 class GeoAddress(Model):
@@ -58,6 +63,10 @@ class GeoAddress(Model):
     status    = SmallIntegerField(verbose_name=pgettext_lazy('geolocation', 'Status'),
                                   choices=STATUS_LABELS.items(), default=UNDEFINED,
                                  )
+    # Geohash of the position (empty if not localized) ; used to search the neighbours.
+    geohash   = CharField(verbose_name=_('Geohash'), max_length=GEOHASH_PRECISION,
+                          blank=True, db_index=True, editable=False,
+                         )
 
     creation_label = pgettext_lazy('geolocation-address', 'Create an address')
 
@@ -71,6 +80,10 @@ class GeoAddress(Model):
         super().__init__(*args, **kwargs)
         self._neighbours = {}
 
+    def save(self, *args, **kwargs):
+        self.update_geohash()
+        super().save(*args, **kwargs)
+
     @property
     def is_complete(self):
         return self.status == self.COMPLETE
@@ -119,6 +132,9 @@ class GeoAddress(Model):
             for geoaddress, town in zip(chain(create, update), towns):
                 geoaddress.set_town_position(town)
 
+            for geoaddress in create:
+                geoaddress.update_geohash()
+
             GeoAddress.objects.bulk_create(create)
 
             # TODO: only if has changed
@@ -137,6 +153,15 @@ class GeoAddress(Model):
             self.longitude = None
             self.status = GeoAddress.UNDEFINED
 
+    def update_geohash(self):
+        "Compute the geohash from the position (called by save())."
+        latitude = self.latitude
+        longitude = self.longitude
+
+        # NB: values can be strings (see update())
+        self.geohash = '' if latitude is None or longitude is None else \
+                       geohash_encode(float(latitude), float(longitude))
+
     def update(self, **kwargs):
         update_model_instance(self, **kwargs)
 
@@ -152,15 +177,31 @@ class GeoAddress(Model):
         latitude = self.latitude
         longitude = self.longitude
 
-        if latitude is None and longitude is None:
+        if latitude is None or longitude is None:
             return GeoAddress.objects.none()
 
-        upper_left, lower_right = location_bounding_box(latitude, longitude, distance)
+        # The indexed geohashes are used to retrieve the positions in the cells
+        # which cover the circle ; then the haversine formula removes the
+        # positions which are outside the circle:
+        #   a = sin²(Δlat/2) + cos(lat1)⋅cos(lat2)⋅sin²(Δlon/2)
+        #   distance = 2R⋅asin(√a)  ==> a <= sin²(distance / 2R)
+        lat1 = radians(latitude)
+        lon1 = radians(longitude)
+        lat2 = Radians('latitude')
+        lon2 = Radians('longitude')
+        angle = distance / (2 * EARTH_RADIUS)
 
         return GeoAddress.objects.exclude(address_id=self.address.pk)\
                                  .exclude(address__object_id=self.address.object_id)\
-                                 .filter(latitude__range=(upper_left[0], lower_right[0]),
-                                         longitude__range=(upper_left[1], lower_right[1]))
+                                 .filter(reduce(or_, (Q(geohash__startswith=cell)
+                                                        for cell in geohash_cells(latitude, longitude, distance)
+                                                     )
+                                               )
+                                        )\
+                                 .annotate(haversine=Power(Sin((lat2 - lat1) / 2), 2) +
+                                                     cos(lat1) * Cos(lat2) * Power(Sin((lon2 - lon1) / 2), 2)
+                                          )\
+                                 .filter(haversine__lte=sin(angle) ** 2 if angle < pi / 2 else 1.0)
 
     def __str__(self):
         return 'GeoAddress(lat={}, lon={}, status={})'.format(self.latitude, self.longitude, self.status)
@@ -9,6 +9,7 @@ try:
             skipIfCustomContact, skipIfCustomOrganisation)
 
     from ..models import GeoAddress, Town
+    from ..utils import geohash_encode
     from .base import GeoLocationBaseTestCase, Address, Organisation, Contact
 except Exception as e:
     print('Error in <{}>: {}'.format(__name__, e))
@@ -42,6 +43,23 @@ class GeoLocationModelsTestCase(GeoLocationBaseTestCase):
                               status=GeoAddress.PARTIAL,
                              )
 
+    def test_geohash(self):
+        town = self.marseille2
+        address = self.create_address(self.orga,  address='La Major',
+                                      zipcode=town.zipcode, town=town.name,
+                                     )
+
+        geoaddress = self.refresh(address).geoaddress
+        self.assertEqual(9, len(geoaddress.geohash))
+        self.assertEqual(geohash_encode(town.latitude, town.longitude), geoaddress.geohash)
+
+        geoaddress.update(latitude='43.301963', longitude='5.462410')
+        self.assertEqual(geohash_encode(43.301963, 5.462410), self.refresh(geoaddress).geohash)
+
+        geoaddress.set_town_position(None)
+        geoaddress.save()
+        self.assertEqual('', self.refresh(geoaddress).geohash)
+
     def test_cache(self):
         town = self.marseille2
         address = self.create_address(self.orga,  address='La Major',
@@ -293,6 +311,11 @@ class GeoLocationModelsTestCase(GeoLocationBaseTestCase):
                               draggable=True, geocoded=False,
                               status=GeoAddress.UNDEFINED,
                              )
+        self.assertEqual('', address.geoaddress.geohash)
+
+        self.assertEqual(geohash_encode(town2.latitude, town2.longitude),
+                         addresses[0].geoaddress.geohash
+                        )
 
         GeoAddress.populate_geoaddresses(addresses)
         self.assertEqual(GeoAddress.objects.count(), 5)
@@ -460,6 +483,34 @@ class GeoLocationModelsTestCase(GeoLocationBaseTestCase):
                              [ST_VICTOR.geoaddress, AUBAGNE.geoaddress]
                             )
 
+    @skipIfCustomContact
+    def test_neighbours_radius(self):
+        "The neighbours are in a circle, not in a rectangle."
+        contact = Contact.objects.create(last_name='Contact 1', user=self.user)
+        orga2   = Organisation.objects.create(name='Orga 2', user=self.user)
+
+        town = self.marseille1
+
+        create_address = self.create_address
+        ST_VICTOR = create_address(self.orga, address='St Victor', zipcode='13007', town=town.name,
+                                   geoloc=(43.290347, 5.365572),
+                                  )
+        # ~8.8 km north & ~8.9 km east => ~12.5 km
+        FAR = create_address(contact, address='Far', zipcode='13011', town=town.name,
+                             geoloc=(43.370347, 5.475572),
+                            )
+        # ~8.8 km north => in the circle
+        NEAR = create_address(orga2, address='Near', zipcode='13011', town=town.name,
+                              geoloc=(43.370347, 5.365572),
+                             )
+
+        self.assertListEqual([*ST_VICTOR.geoaddress.neighbours(distance=10000)],
+                             [NEAR.geoaddress]
+                            )
+        self.assertListEqual([*ST_VICTOR.geoaddress.neighbours(distance=13000)],
+                             [FAR.geoaddress, NEAR.geoaddress]
+                            )
+
     @skipIfCustomContact
     def test_neighbours_with_same_owner(self):
         contact = Contact.objects.create(last_name='Contact 1', user=self.user)
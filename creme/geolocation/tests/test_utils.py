@@ -12,7 +12,8 @@ try:
     from .. import constants, setting_keys
     from ..models import GeoAddress
     from ..utils import (get_radius, get_google_api_key, address_as_dict,
-             addresses_from_persons, location_bounding_box)  # get_setting
+             addresses_from_persons, location_bounding_box,
+             haversine_distance, geohash_encode, geohash_cell_size, geohash_cells)  # get_setting
     from .base import GeoLocationBaseTestCase, Organisation, Contact, Address
 except Exception as e:
     print('Error in <{}>: {}'.format(__name__, e))
@@ -269,3 +270,50 @@ class GeoLocationUtilsTestCase(GeoLocationBaseTestCase):
                          ),
                          location_bounding_box(20.0, 5.0, 10000)
                         )
+
+    def test_haversine_distance(self):
+        self.assertEqual(0, haversine_distance(45.0, 5.0, 45.0, 5.0))
+
+        # 1° of latitude ~ 111.2 km
+        self.assertAlmostEqual(111195, haversine_distance(45.0, 5.0, 46.0, 5.0), delta=1)
+
+        # 1° of longitude ~ 111.2 km ⋅ cos(latitude)
+        self.assertAlmostEqual(78626, haversine_distance(45.0, 5.0, 45.0, 6.0), delta=1)
+
+        self.assertAlmostEqual(7943, haversine_distance(43.290347, 5.365572, 43.301963, 5.462410), delta=1)
+
+    def test_geohash_encode(self):
+        self.assertEqual('u4pruydqqvj', geohash_encode(57.64911, 10.40744, precision=11))
+        self.assertEqual('ezs42',       geohash_encode(42.6, -5.6, precision=5))
+        self.assertEqual(9,             len(geohash_encode(43.295783, 5.565589)))
+
+    def test_geohash_cell_size(self):
+        self.assertEqual((45.0, 45.0), geohash_cell_size(1))
+        self.assertEqual((5.625, 11.25), geohash_cell_size(2))
+
+    def test_geohash_cells(self):
+        latitude, longitude = 43.290347, 5.365572
+        cells = geohash_cells(latitude, longitude, 10000)
+        self.assertLessEqual(len(cells), 9)
+
+        length = len(next(iter(cells)))
+        self.assertTrue(all(len(cell) == length for cell in cells))
+
+        def is_covered(lat, lon):
+            geohash = geohash_encode(lat, lon)
+            return any(geohash.startswith(cell) for cell in cells)
+
+        (min_lat, min_lon), (max_lat, max_lon) = location_bounding_box(latitude, longitude, 10000)
+        self.assertTrue(is_covered(latitude, longitude))
+        self.assertTrue(is_covered(min_lat, min_lon))
+        self.assertTrue(is_covered(min_lat, max_lon))
+        self.assertTrue(is_covered(max_lat, min_lon))
+        self.assertTrue(is_covered(max_lat, max_lon))
+
+        # Anti-meridian
+        cells = geohash_cells(0.0, 179.99, 10000)
+        self.assertIn(geohash_encode(0.0, 179.99)[:len(next(iter(cells)))], cells)
+        self.assertTrue(any(cell.startswith('8') or cell.startswith('2') for cell in cells))
+
+        # Huge circle
+        self.assertSetEqual({''}, geohash_cells(latitude, longitude, 10000000))
@@ -2,7 +2,7 @@
 
 ################################################################################
 #    Creme is a free/open-source Customer Relationship Management software
-#    Copyright (C) 2014-2018  Hybird
+#    Copyright (C) 2014-2019  Hybird
 #
 #    This program is free software: you can redistribute it and/or modify
 #    it under the terms of the GNU Affero General Public License as published by
@@ -18,7 +18,7 @@
 #    along with this program.  If not, see <http://www.gnu.org/licenses/>.
 ################################################################################
 
-from math import cos, radians
+from math import asin, cos, radians, sin, sqrt
 # import warnings
 
 from django.contrib.contenttypes.models import ContentType
@@ -32,7 +32,7 @@ from creme.creme_core.models import SettingValue
 from creme.persons import get_address_model
 
 from . import setting_keys
-from .constants import DEFAULT_SEPARATING_NEIGHBOURS
+from .constants import DEFAULT_SEPARATING_NEIGHBOURS, EARTH_RADIUS, GEOHASH_PRECISION
 
 
 def address_as_dict(address):
@@ -147,3 +147,96 @@ def location_bounding_box(latitude, longitude, distance):
 
     return ((latitude - offset_latitude, longitude - offset_longitude),
             (latitude + offset_latitude, longitude + offset_longitude))
+
+
+def haversine_distance(latitude1, longitude1, latitude2, longitude2):
+    "Distance (in meters) between 2 positions, along the surface of the Earth."
+    lat1 = radians(latitude1)
+    lat2 = radians(latitude2)
+    a = sin((lat2 - lat1) / 2) ** 2 + \
+        cos(lat1) * cos(lat2) * sin(radians(longitude2 - longitude1) / 2) ** 2
+
+    return 2 * EARTH_RADIUS * asin(min(sqrt(a), 1.0))
+
+
+_GEOHASH_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def geohash_encode(latitude, longitude, precision=GEOHASH_PRECISION):
+    """Get the geohash of a position (see https://en.wikipedia.org/wiki/Geohash).
+    The positions in the same cell share the same geohash ; the geohashes of
+    the sub-cells of a cell start with the geohash of this cell.
+    @param precision: Length of the geohash.
+    """
+    lat_interval = [-90.0, 90.0]
+    lon_interval = [-180.0, 180.0]
+    chars = []
+    bits = bits_count = 0
+    even = True  # Longitude bit
+
+    while len(chars) < precision:
+        interval, value = (lon_interval, longitude) if even else (lat_interval, latitude)
+        middle = (interval[0] + interval[1]) / 2
+        bits <<= 1
+
+        if value >= middle:
+            bits |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+
+        even = not even
+        bits_count += 1
+
+        if bits_count == 5:
+            chars.append(_GEOHASH_BASE32[bits])
+            bits = bits_count = 0
+
+    return ''.join(chars)
+
+
+def geohash_cell_size(precision):
+    "@return: Tuple (latitude_degrees, longitude_degrees) ; size of the cells of a precision."
+    bits = 5 * precision
+
+    return 180.0 / 2 ** (bits // 2), 360.0 / 2 ** ((bits + 1) // 2)
+
+
+def geohash_cells(latitude, longitude, distance):
+    """Get the geohashes of the cells which cover a circle.
+    The size of the cells is chosen to get a few cells (9 in the general case).
+    @param distance: Radius of the circle, in meters.
+    @return: A set of geohashes (with the same length) ; a position is in the
+             circle only if its geohash starts with one of them.
+             Notice that the set {''} is returned for the circles which need
+             all the cells (huge circles, circles around a pole).
+    """
+    (min_lat, min_lon), (max_lat, max_lon) = location_bounding_box(latitude, longitude, distance)
+
+    if min_lat <= -90.0 or max_lat >= 90.0 or max_lon - min_lon >= 360.0:  # Pole / all longitudes
+        min_lon, max_lon = -180.0, 180.0
+        min_lat = max(min_lat, -90.0)
+        max_lat = min(max_lat, 90.0)
+
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        lat_size, lon_size = geohash_cell_size(precision)
+
+        # NB: the box is covered by (at most) 3 cells per axis
+        if lat_size * 2 >= max_lat - min_lat and lon_size * 2 >= max_lon - min_lon:
+            break
+    else:
+        return {''}
+
+    def _steps(start, stop, step):
+        i = 0
+        while start + i * step < stop:
+            yield start + i * step
+            i += 1
+
+        yield stop
+
+    # NB: longitudes are normalized in [-180, 180[ (i.e. anti-meridian crossing)
+    return {geohash_encode(lat, (lon + 180.0) % 360.0 - 180.0, precision)
+                for lat in _steps(min_lat, max_lat, lat_size)
+                    for lon in _steps(min_lon, max_lon, lon_size)
+           }
@@ -26,6 +26,7 @@ from creme.creme_core.gui.bricks import Brick, SimpleBrick, QuerysetBrick
 from creme.creme_core.models import InstanceBrickConfigItem
 
 from creme import reports
+from .core.graph_cache import graph_cache
 from .models import Field
 from .report_chart_registry import report_chart_registry
 
@@ -128,6 +129,8 @@ class ReportGraphBrick(Brick):
                     x=x, y=y,
                     error=fetcher.error,
                     volatile_column=fetcher.verbose_volatile_column,
+                    # NB: the date is useless if the results are not cached.
+                    computed_at=fetcher.graph.computed_at if graph_cache.enabled else None,
                     # instance_block_id=self.instance_brick_id,
                     instance_brick_id=self.instance_brick_id,
                     report_charts=report_chart_registry,
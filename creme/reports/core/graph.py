@@ -18,6 +18,7 @@
 #    along with this program.  If not, see <http://www.gnu.org/licenses/>.
 ################################################################################
 
+from collections import defaultdict
 from datetime import timedelta, datetime
 import logging
 
@@ -242,19 +243,21 @@ class ReportGraphHand:
     def verbose_ordinate(self):
         return self._y_calculator.verbose_name
 
-    # TODO: The 'group by' query could be extracted into a common Manager
-    def _aggregate_by_key(self, entities, key, order):
+    @property
+    def _y_value_aggregator(self):
         y_value_func = self._y_calculator
         if isinstance(y_value_func, RGYCAggregation):
-            y_value_aggregator = y_value_func._aggregate_value
-        else:
-            # TMP: meh, we could model count as an aggregation
-            #     (caveat: count is technically *not* aggregating a field here, whereas our aggregation operators do)
-            y_value_aggregator = Count('pk')  # Is there a way to count(*) ?
+            return y_value_func._aggregate_value
+
+        # TMP: meh, we could model count as an aggregation
+        #     (caveat: count is technically *not* aggregating a field here, whereas our aggregation operators do)
+        return Count('pk')  # Is there a way to count(*) ?
 
+    # TODO: The 'group by' query could be extracted into a common Manager
+    def _aggregate_by_key(self, entities, key, order):
         aggregates = entities.extra({'key': key}) \
                              .values('key').order_by('key' if order == 'ASC' else '-key') \
-                             .annotate(value=y_value_aggregator) \
+                             .annotate(value=self._y_value_aggregator) \
                              .values_list('key', 'value')
 
         # print 'query:', aggregates.query, '\n'
@@ -262,6 +265,28 @@ class ReportGraphHand:
 
         return aggregates
 
+    def _aggregate_by_field(self, entities, field_name, **filters):
+        """Compute the Y values of all the groups of entities with a single
+        'GROUP BY' query (instead of a query per group).
+        @param entities: Queryset of CremeEntities.
+        @param field_name: Name of the (related) field used to group the
+               entities (eg: 'relations__object_entity').
+        @param filters: Keyword arguments used to filter the joined instances
+               (eg: relations__type=rtype).
+        @return: Dictionary {value_of_the_field: y_value}.
+        """
+        if entities.query.distinct:
+            # NB: the JOINs used by the filter would multiply the rows in the groups.
+            entities = entities.model.objects.filter(pk__in=entities.values('pk'))
+
+        return {key: value or 0
+                    for key, value in entities.filter(**filters)
+                                              .values(field_name)
+                                              .order_by()
+                                              .annotate(value=self._y_value_aggregator)
+                                              .values_list(field_name, 'value')
+               }
+
 
 class _RGHRegularField(ReportGraphHand):
     def __init__(self, graph):
@@ -551,23 +576,36 @@ class RGHRelation(ReportGraphHand):
         self._rtype = rtype
 
     def _fetch(self, entities, order, user):
-        # TODO: Optimize ! (populate real entities)
         # TODO: sort alphabetically (with header_filter_search_field ?
         #       Queryset is not paginated so we can sort the "list") ?
         # TODO: make listview url for this case
         build_url = self._listview_url_builder()
-        relations = Relation.objects.filter(type=self._rtype, subject_entity__entity_type=self._graph.linked_report.ct)
-        rel_filter = relations.filter
-        ce_objects_get = CremeEntity.objects.get
-        entities_filter = entities.filter
-        y_value_func = self._y_calculator
+        rtype = self._rtype
+
+        subject_ids = defaultdict(list)
+        for subject_id, object_id in Relation.objects \
+                                             .filter(type=rtype,
+                                                     subject_entity__entity_type=self._graph.linked_report.ct,
+                                                    ) \
+                                             .order_by('subject_entity_id') \
+                                             .values_list('subject_entity_id', 'object_entity_id'):
+            subject_ids[object_id].append(subject_id)
+
+        if not subject_ids:
+            return
+
+        y_values = self._aggregate_by_field(entities, 'relations__object_entity',
+                                            relations__type=rtype,
+                                           )
+
+        objects = [*CremeEntity.objects.filter(pk__in=subject_ids.keys()).order_by('id')]
+        CremeEntity.populate_real_entities(objects)
 
-        for obj_id in relations.values_list('object_entity', flat=True).distinct():
-            subj_ids = rel_filter(object_entity=obj_id).order_by('subject_entity__id')\
-                                                       .values_list('subject_entity')
+        for obj in objects:
+            subj_ids = subject_ids[obj.id]
 
-            yield (str(ce_objects_get(pk=obj_id).get_real_entity()),
-                   [y_value_func(entities_filter(pk__in=subj_ids)), build_url({'pk__in': [e[0] for e in subj_ids]})],
+            yield (str(obj.get_real_entity()),
+                   [y_values.get(obj.id, 0), build_url({'pk__in': subj_ids})],
                   )
 
     @property
@@ -779,18 +817,24 @@ class RGHCustomFK(_RGHCustomField):
     verbose_name = _('By values (of custom choices)')
 
     def _fetch(self, entities, order, user):
-        entities_filter = entities.filter
-        y_value_func = self._y_calculator
         build_url = self._listview_url_builder()
-        related_instances = [*CustomFieldEnumValue.objects.filter(custom_field=self._cfield)]
+        cfield = self._cfield
+        related_instances = [*CustomFieldEnumValue.objects.filter(custom_field=cfield)]
+
+        if not related_instances:
+            return
 
         if order == 'DESC':
             related_instances.reverse()
 
-        for instance in related_instances:
-            kwargs = {'customfieldenum__value': instance.id}
+        y_values = self._aggregate_by_field(entities, 'customfieldenum__value',
+                                            customfieldenum__custom_field=cfield,
+                                           )
 
-            yield str(instance), [y_value_func(entities_filter(**kwargs)), build_url(kwargs)]
+        for instance in related_instances:
+            yield str(instance), [y_values.get(instance.id, 0),
+                                  build_url({'customfieldenum__value': instance.id}),
+                                 ]
 
 
 # TODO: use a map/registry of GraphFetcher classes, and use it in get_fetcher_from_instance_brick()
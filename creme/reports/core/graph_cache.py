@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+
+################################################################################
+#    Creme is a free/open-source Customer Relationship Management software
+#    Copyright (C) 2019  Hybird
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+################################################################################
+
+from django.core.exceptions import EmptyResultSet
+from django.utils.timezone import now
+
+from creme.creme_core.core.entities_count import EntityTypeVersionedCache
+from creme.creme_core.models import CustomFieldValue
+
+
+class ReportGraphCache(EntityTypeVersionedCache):
+    """Cache for the results of the ReportGraphs (X & Y values), which can be
+    slow to compute with big tables (see AbstractReportGraph.fetch()).
+
+    The keys of the cached values are built with the graph, the order & the
+    SQL query which retrieves the entities, so they depend on the filter of
+    the report, the credentials of the user & the volatile link (if used).
+    The values related to a type of entity are invalidated when an entity of
+    this type (or one of its Relations/CremeProperties/custom values) is
+    saved/deleted. Changes which do not send signals (eg: QuerySet.update())
+    or which are related to other types of instance (eg: the name of the
+    entities used as abscissa) are taken into account only when the values
+    expire.
+    """
+    key_prefix = 'reports-graph'
+    timeout_setting = 'REPORTS_GRAPH_CACHE_TIMEOUT'
+    related_models = [
+        *EntityTypeVersionedCache.related_models,
+        (CustomFieldValue, 'entity'),
+    ]
+
+    def fetch(self, graph, entities, order, user, compute):
+        """Get the result of a graph.
+
+        @param graph: Instance of <reports.models.AbstractReportGraph>.
+        @param entities: QuerySet of the entities used by the graph.
+        @param order: 'ASC' or 'DESC'.
+        @param user: Instance of <django.contrib.auth.get_user_model()>.
+        @param compute: Callable which takes no argument & returns the result
+               (tuple (X, Y)) ; it's called if the result is not in the cache.
+        @return: A tuple (X, Y, computation_date).
+        """
+        timeout = self.timeout
+
+        if not timeout:
+            return (*compute(), now())
+
+        try:
+            sql, params = entities.query.sql_with_params()
+        except EmptyResultSet:
+            return (*compute(), now())
+
+        key = self.build_key(graph.linked_report.ct_id,
+                             graph.id, graph.modified, order,
+                             user.is_superuser, user.role_id,
+                             entities.db, sql, params,
+                            )
+        cache = self.cache
+        result = cache.get(key)
+
+        if result is None:
+            result = (*compute(), now())
+            cache.set(key, result, timeout)
+
+        return result
+
+
+graph_cache = ReportGraphCache()
@@ -18,12 +18,14 @@
 #    along with this program.  If not, see <http://www.gnu.org/licenses/>.
 ################################################################################
 
+from collections import defaultdict
+from itertools import chain
 import logging
 
 from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
 from django.core.exceptions import ObjectDoesNotExist
-from django.db.models import ManyToManyField, ForeignKey, FieldDoesNotExist
+from django.db.models import ManyToManyField, ForeignKey, FieldDoesNotExist, F
 from django.utils.formats import number_format
 from django.utils.functional import cached_property
 from django.utils.translation import gettext_lazy as _
@@ -88,6 +90,7 @@ class ReportHand:
         self._report_field = report_field
         self._title = title
         self._support_subreport = support_subreport
+        self._related_instances_cache = {}  # See populate_entities()
 
     def _generate_flattened_report(self, entities, user, scope):
         columns = self._report_field.sub_report.columns
@@ -101,8 +104,17 @@ class ReportHand:
     def _get_related_instances(self, entity, user):
         raise NotImplementedError
 
-    def _get_filtered_related_entities(self, entity, user):
-        related_entities = EntityCredentials.filter(user, self._get_related_instances(entity, user))
+    def _get_related_instances_multi(self, entity_ids):
+        """Get the related instances of several entities with a single query
+        (see populate_entities()).
+        @param entity_ids: IDs of CremeEntities.
+        @return: A QuerySet annotated with the field "rh_entity_id" (ID of the
+                 entity related to the instance), or None if it's not supported.
+        """
+        return None
+
+    def _filter_related_entities(self, related_entities, user):
+        related_entities = EntityCredentials.filter(user, related_entities)
         report = self._report_field.sub_report
 
         if report.filter is not None:
@@ -110,6 +122,9 @@ class ReportHand:
 
         return related_entities
 
+    def _get_filtered_related_entities(self, entity, user):
+        return self._filter_related_entities(self._get_related_instances(entity, user), user)
+
     def _get_value(self, entity, user, scope):
         # we are not building 'self._get_value' in __init__() because the
         # report_field.selected can change after the Hand building
@@ -142,19 +157,28 @@ class ReportHand:
         """Used as _get_value() method by subclasses which manage
         sub-reports (flattened sub-report case).
         """
-        return self._generate_flattened_report(self._get_filtered_related_entities(entity, user), user, scope)
+        related_entities = self._related_instances_cache.get(entity.id)
+
+        if related_entities is None:
+            related_entities = self._get_filtered_related_entities(entity, user)
+
+        return self._generate_flattened_report(related_entities, user, scope)
 
     def _get_value_no_subreport(self, entity, user, scope):
         """Used as _get_value() method by subclasses which manage
         sub-reports (no sub-report case).
         """
-        qs = self._get_related_instances(entity, user)
-        extract = self._related_model_value_extractor
+        instances = self._related_instances_cache.get(entity.id)
 
-        if issubclass(qs.model, CremeEntity):
-            qs = EntityCredentials.filter(user, qs)
+        if instances is None:
+            instances = self._get_related_instances(entity, user)
+
+            if issubclass(instances.model, CremeEntity):
+                instances = EntityCredentials.filter(user, instances)
+
+        extract = self._related_model_value_extractor
 
-        return ', '.join(str(extract(instance)) for instance in qs)
+        return ', '.join(str(extract(instance)) for instance in instances)
 
     def _get_value_single(self, entity, user, scope):
         """Used as _get_value() method by subclasses which does not manage
@@ -174,6 +198,48 @@ class ReportHand:
     def _related_model_value_extractor(self, instance):
         return instance
 
+    def populate_entities(self, entities, user):
+        """Retrieve at once the data needed to compute the values of several
+        entities, in order to reduce the number of queries performed by
+        get_value() (the values of other entities are computed as usual).
+        Overload this in sub-classes ; the default implementation retrieves
+        the related instances of the hands which support sub-reports (see
+        _get_related_instances_multi()), excepted for expanded sub-reports
+        (their columns need a QuerySet as scope).
+
+        @param entities: Sequence of CremeEntities (eg: a page of the report).
+        @param user: User instance ; used to compute credentials.
+        """
+        report_field = self._report_field
+        self._related_instances_cache = cache = {}
+
+        if not self._support_subreport or report_field.selected:
+            return
+
+        entity_ids = [entity.id for entity in entities]
+        instances = self._get_related_instances_multi(entity_ids)
+
+        if instances is None:
+            return
+
+        if report_field.sub_report:
+            instances = self._filter_related_entities(instances, user)
+        elif issubclass(instances.model, CremeEntity):
+            instances = EntityCredentials.filter(user, instances)
+
+        instances_per_entity = defaultdict(list)
+        for instance in instances:
+            instances_per_entity[instance.rh_entity_id].append(instance)
+
+        for entity_id in entity_ids:
+            cache[entity_id] = instances_per_entity[entity_id]
+
+        if report_field.sub_report:
+            related_entities = [*chain.from_iterable(instances_per_entity.values())]
+
+            for column in report_field.sub_report.columns:
+                column.populate_entities(related_entities, user)
+
     def get_linkable_ctypes(self):
         """Return the ContentTypes which are compatible, in order to link a sub-report.
         @return A sequence of ContentTypes instances, or None (that means "can not link") ;
@@ -299,6 +365,7 @@ class RHForeignKey(RHRegularField):
                 self._value_extractor = lambda fk_instance, user: str(fk_instance)
 
         self._qs = qs
+        self._fk_instances_cache = {}  # See populate_entities()
         super().__init__(report_field,
                          support_subreport=True,
                          title=str(fk_field.verbose_name) if sub_report else None,
@@ -306,8 +373,18 @@ class RHForeignKey(RHRegularField):
 
     # NB: cannot rename to _get_related_instances() because forbidden entities are filtered instead of outputting '??'
     def _get_fk_instance(self, entity):
+        fk_id = getattr(entity, self._fk_attr_name)
+
+        if fk_id is None:
+            return None
+
+        cache = self._fk_instances_cache
+
+        if fk_id in cache:
+            return cache[fk_id]
+
         try:
-            entity = self._qs.get(pk=getattr(entity, self._fk_attr_name))
+            entity = self._qs.get(pk=fk_id)
         except ObjectDoesNotExist:
             entity = None
 
@@ -331,6 +408,24 @@ class RHForeignKey(RHRegularField):
 
             return self._value_extractor(fk_instance, user)
 
+    def populate_entities(self, entities, user):
+        fk_ids = {getattr(entity, self._fk_attr_name) for entity in entities}
+        fk_ids.discard(None)
+
+        # NB: the instances which do not pass the filter of the sub-report are cached as None
+        self._fk_instances_cache = cache = dict.fromkeys(fk_ids)
+
+        if fk_ids:
+            cache.update((instance.pk, instance) for instance in self._qs.filter(pk__in=fk_ids))
+
+            sub_report = self._report_field.sub_report
+
+            if sub_report:
+                fk_instances = [instance for instance in cache.values() if instance is not None]
+
+                for column in sub_report.columns:
+                    column.populate_entities(fk_instances, user)
+
     def get_linkable_ctypes(self):
         return (ContentType.objects.get_for_model(self._qs.model),) \
                if self._linked2entity else None
@@ -356,6 +451,18 @@ class RHManyToManyField(RHRegularField):
     def _get_related_instances(self, entity, user):
         return getattr(entity, self._field_info[0].name).all()
 
+    def _get_related_instances_multi(self, entity_ids):
+        m2m_field = self._field_info[0]
+
+        if m2m_field.remote_field.is_hidden():
+            return None
+
+        query_name = m2m_field.related_query_name()
+
+        return m2m_field.remote_field.model._default_manager \
+                        .filter(**{'{}__in'.format(query_name): entity_ids}) \
+                        .annotate(rh_entity_id=F(query_name))
+
     def get_linkable_ctypes(self):
         m2m_model = self._field_info[0].remote_field.model
 
@@ -375,6 +482,9 @@ class RHCustomField(ReportHand):
 
         super().__init__(report_field, title=cf.name)
 
+    def populate_entities(self, entities, user):
+        CremeEntity.populate_custom_values(entities, [self._cfield])
+
     def _get_value_single_on_allowed(self, entity, user, scope):
         cvalue = entity.get_custom_value(self._cfield)
         # return str(cvalue.value) if cvalue else ''
@@ -406,6 +516,12 @@ class RHRelation(ReportHand):
                                                   relations__object_entity=entity.id,
                                                  )
 
+    def _get_related_instances_multi(self, entity_ids):
+        return self._related_model.objects.filter(relations__type=self._rtype.symmetric_type,
+                                                  relations__object_entity__in=entity_ids,
+                                                 ) \
+                                          .annotate(rh_entity_id=F('relations__object_entity'))
+
     # TODO: add a feature in base class to retrieved efficiently real entities ??
     # TODO: extract algorithm that retrieve efficiently real entity from CremeEntity.get_related_entities()
     def _get_value_no_subreport(self, entity, user, scope):
@@ -415,6 +531,12 @@ class RHRelation(ReportHand):
                                 if has_perm(e)
                         )
 
+    def populate_entities(self, entities, user):
+        if self._report_field.sub_report:
+            super().populate_entities(entities, user)
+        else:
+            CremeEntity.populate_relations(entities, [self._rtype.id])
+
     def get_linkable_ctypes(self):
         return self._rtype.object_ctypes.all()
 
@@ -437,6 +559,9 @@ class RHFunctionField(ReportHand):
 
         super().__init__(report_field, title=str(funcfield.verbose_name))
 
+    def populate_entities(self, entities, user):
+        self._funcfield.populate_entities(entities, user)
+
     def _get_value_single_on_allowed(self, entity, user, scope):
         return self._funcfield(entity, user).for_csv()
 
@@ -552,6 +677,14 @@ class RHRelated(ReportHand):
     def _get_related_instances(self, entity, user):
         return getattr(entity, self._attr_name).filter(is_deleted=False)
 
+    def _get_related_instances_multi(self, entity_ids):
+        related_field = self._related_field
+        fk_field = related_field.field
+
+        return related_field.related_model._default_manager \
+                            .filter(**{'{}__in'.format(fk_field.name): entity_ids, 'is_deleted': False}) \
+                            .annotate(rh_entity_id=F(fk_field.attname))
+
     def get_linkable_ctypes(self):
         return (ContentType.objects.get_for_model(self._related_field.related_model),)
 
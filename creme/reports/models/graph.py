@@ -49,6 +49,7 @@ class AbstractReportGraph(CremeEntity):
     save_label     = pgettext_lazy('reports-graphs', 'Save the graph')
 
     _hand = None
+    computed_at = None  # Date of the computation of the last result (see fetch())
 
     class Meta:
         abstract = True
@@ -77,6 +78,17 @@ class AbstractReportGraph(CremeEntity):
 
     # TODO: use creme_core.utils.meta.Order
     def fetch(self, user, extra_q=None, order='ASC'):
+        """Compute the X & Y values of the graph.
+        The result can come from a cache (see reports.core.graph_cache) ; the
+        date of its computation is stored in the attribute "computed_at".
+
+        @param user: Instance of User used to compute credentials.
+        @param extra_q: Instance of Q used to filter the entities, or None.
+        @param order: 'ASC' or 'DESC'.
+        @return: A tuple (X, Y) ; see ReportGraphHand.fetch().
+        """
+        from ..core.graph_cache import graph_cache  # Lazy loading
+
         assert order == 'ASC' or order == 'DESC'
 
         report = self.linked_report
@@ -91,7 +103,12 @@ class AbstractReportGraph(CremeEntity):
         if extra_q is not None:
             entities = entities.filter(extra_q)
 
-        return self.hand.fetch(entities=entities, order=order, user=user)
+        x, y, self.computed_at = graph_cache.fetch(
+            graph=self, entities=entities, order=order, user=user,
+            compute=lambda: self.hand.fetch(entities=entities, order=order, user=user),
+        )
+
+        return x, y
 
     # @classmethod
     # def get_fetcher_from_instance_block(cls, instance_block_config):
@@ -30,6 +30,7 @@ from django.utils.translation import gettext_lazy as _
 
 from creme.creme_core.auth.entity_credentials import EntityCredentials
 from creme.creme_core.core.entity_filter import EF_USER
+from creme.creme_core.core.paginator import FlowPaginator
 from creme.creme_core.models import (
     CremeModel, CremeEntity,
     EntityFilter,
@@ -51,6 +52,9 @@ class AbstractReport(CremeEntity):
     creation_label = _('Create a report')
     save_label     = _('Save the report')
 
+    # Number of entities retrieved (& computed by the columns) at once by fetch_all_lines()
+    fetch_page_size = 256
+
     _columns = None
 
     class Meta:
@@ -132,8 +136,13 @@ class AbstractReport(CremeEntity):
 
     # TODO: move 'user' as first argument + no default value ?
     def _fetch(self, limit_to=None, extra_q=None, user=None):
+        """Generator of the values of the root entities.
+        The entities are retrieved by pages ; the columns retrieve the data
+        they need for a whole page at once (see Field.populate_entities()).
+        """
         user = user or get_user_model()(is_superuser=True)
-        entities = EntityCredentials.filter(user, self.ct.model_class().objects.filter(is_deleted=False))
+        model = self.ct.model_class()
+        entities = EntityCredentials.filter(user, model.objects.filter(is_deleted=False))
 
         if self.filter is not None:
             entities = self.filter.filter(entities)
@@ -143,25 +152,50 @@ class AbstractReport(CremeEntity):
 
         fields = self.filtered_columns
 
-        return ([field.get_value(entity, scope=entities, user=user)
-                    for field in fields
-                ] for entity in entities[:limit_to]
-               )
+        # NB: 'id' is used to get a stable order with duplicated values
+        ordering = [*model._meta.ordering, 'id']
+        per_page = self.fetch_page_size
+        paginator = FlowPaginator(
+            queryset=entities.order_by(*ordering),
+            key=ordering[0],
+            # NB: FlowPaginator needs at least 2 entities per page
+            per_page=per_page if limit_to is None else max(min(limit_to, per_page), 2),
+        )
+        count = 0
+
+        for page in paginator.pages():
+            page_entities = page.object_list
+
+            for field in fields:
+                field.populate_entities(page_entities, user)
+
+            for entity in page_entities:
+                yield [field.get_value(entity, scope=entities, user=user) for field in fields]
+
+                count += 1
+                if limit_to is not None and count >= limit_to:
+                    return
 
-    # TODO: transform into generator (--> StreamResponse)
     def fetch_all_lines(self, limit_to=None, extra_q=None, user=None):
+        """Generator of the lines of the report (lists of strings).
+        @param limit_to: Maximum number of lines (it can be exceeded with the
+               lines of an expanded sub-report) ; <None> means "no limit".
+        @param extra_q: Instance of Q used to filter the entities, or None.
+        @param user: Instance of User used to compute credentials ; <None>
+               means a super-user.
+        """
         from ..core.report import ExpandableLine  # Lazy loading
 
-        lines = []
+        count = 0
 
         for values in self._fetch(limit_to=limit_to, extra_q=extra_q, user=user):
-            lines.extend(ExpandableLine(values).get_lines())
+            lines = ExpandableLine(values).get_lines()
+            yield from lines
 
-            if limit_to is not None and len(lines) >= limit_to:  # Meh
+            count += len(lines)
+            if limit_to is not None and count >= limit_to:  # Meh
                 break  # TODO: test
 
-        return lines
-
     def get_children_fields_flat(self):
         return chain.from_iterable(f.get_children_fields_flat() for f in self.filtered_columns)
 
@@ -284,6 +318,14 @@ class Field(CremeModel):
 
         return children
 
+    def populate_entities(self, entities, user):
+        """Retrieve at once the data needed to compute the values of several
+        entities (see get_value()).
+        @param entities: Sequence of CremeEntities.
+        @param user: User instance, used to check credentials.
+        """
+        self.hand.populate_entities(entities, user)
+
     def get_value(self, entity, user, scope):
         """Return the value of the cell for this entity.
         @param entity CremeEntity instance, or None.
@@ -18,9 +18,27 @@
 #    along with this program.  If not, see <http://www.gnu.org/licenses/>.
 ################################################################################
 
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 
-from creme.creme_core.signals import pre_uninstall_flush
+from creme.creme_core.models import CremeEntity
+from creme.creme_core.signals import pre_uninstall_flush, post_update_in_bulk
+
+from .core.graph_cache import graph_cache
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def _invalidate_graph_cache(sender, instance, using=None, **kwargs):
+    if graph_cache.timeout:
+        # NB: the results are invalidated again when the transaction is committed.
+        graph_cache.invalidate_4_instance(instance, using=using)
+
+
+@receiver(post_update_in_bulk)
+def _invalidate_graph_cache_4_bulk(sender, **kwargs):
+    if graph_cache.timeout and issubclass(sender, CremeEntity):
+        graph_cache.invalidate(sender)
 
 
 @receiver(pre_uninstall_flush)
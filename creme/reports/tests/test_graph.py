@@ -24,6 +24,7 @@ try:
     )  # EntityFilterCondition
     from creme.creme_core.tests import fake_constants
     from creme.creme_core.tests.views.base import BrickTestCaseMixin
+    from creme.creme_core.utils.profiling import CaptureQueriesContext
     from creme.creme_core.utils.queries import QSerializer
 
     from .base import (
@@ -2025,6 +2026,50 @@ class ReportGraphTestCase(BaseReportsTestCase, BrickTestCaseMixin):
                          hand.abscissa_error
                         )
 
+    def test_fetch_by_relation05(self):
+        "The number of queries does not depend on the number of related entities."
+        user = self.login()
+        rtype = RelationType.create(
+            ('reports-subject_obeys',   'obeys to', [FakeOrganisation]),
+            ('reports-object_commands', 'commands', [FakeContact]),
+        )[0]
+        report = self._create_simple_organisations_report()
+        rgraph = ReportGraph.objects.create(user=user, linked_report=report,
+                                            name='Capital by lords',
+                                            abscissa=rtype.id,
+                                            type=RGT_RELATION,
+                                            ordinate='capital__sum',
+                                            is_count=False,
+                                           )
+
+        create_orga = partial(FakeOrganisation.objects.create, user=user)
+        create_contact = partial(FakeContact.objects.create, user=user)
+        create_rel = partial(Relation.objects.create, user=user, type=rtype)
+
+        def add_lords(*names):
+            for name in names:
+                create_rel(subject_entity=create_orga(name='House {}'.format(name), capital=10),
+                           object_entity=create_contact(first_name='Lord', last_name=name),
+                          )
+
+        def fetch():
+            hand = ReportGraph.objects.get(id=rgraph.id).hand
+
+            with CaptureQueriesContext() as ctxt:
+                x, y = hand.fetch(FakeOrganisation.objects.all(), 'ASC', user)
+
+            return x, y, len(ctxt.captured_queries)
+
+        add_lords('Stark', 'Lannister')
+        x_asc, y_asc, queries = fetch()
+        self.assertEqual(['Lord Stark', 'Lord Lannister'], x_asc)
+        self.assertEqual([10, 10], [y[0] for y in y_asc])
+
+        add_lords('Tully', 'Arryn', 'Tyrell')
+        x_asc, y_asc, queries2 = fetch()
+        self.assertEqual(5, len(x_asc))
+        self.assertEqual(queries, queries2)
+
     def test_fetch_with_customfk_01(self):
         user = self.login()
         report = self._create_simple_contacts_report()
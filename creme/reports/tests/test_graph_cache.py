@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+
+try:
+    from datetime import datetime
+
+    from django.db import connection
+    from django.test.utils import override_settings
+
+    from creme.creme_core.models import (
+        BrickHomeLocation,
+        RelationType, Relation,
+        CremePropertyType, CremeProperty,
+        FakeOrganisation, FakeContact,
+    )
+    from creme.creme_core.signals import post_update_in_bulk
+    from creme.creme_core.tests.views.base import BrickTestCaseMixin
+
+    from .base import (
+        BaseReportsTestCase,
+        skipIfCustomReport, skipIfCustomRGraph,
+        ReportGraph,
+    )
+
+    from ..constants import RGT_YEAR
+    from ..core.graph_cache import ReportGraphCache, graph_cache
+except Exception as e:
+    print('Error in <{}>: {}'.format(__name__, e))
+
+
+@skipIfCustomReport
+@skipIfCustomRGraph
+class ReportGraphCacheTestCase(BaseReportsTestCase, BrickTestCaseMixin):
+    def setUp(self):
+        super().setUp()
+        self.user = user = self.login()
+        self.rgraph = ReportGraph.objects.create(
+            user=user,
+            linked_report=self._create_simple_organisations_report(),
+            name='Number of organisations created / year',
+            abscissa='creation_date', type=RGT_YEAR,
+            ordinate='', is_count=True,
+        )
+
+        graph_cache.invalidate(FakeOrganisation)  # NB: values from other tests
+
+    def _create_orga(self, name, creation_date='2013-06-01'):
+        return FakeOrganisation.objects.create(user=self.user, name=name, creation_date=creation_date)
+
+    def _fetch(self, rgraph_cache, order='ASC'):
+        calls = []
+        rgraph = self.rgraph
+
+        def compute():
+            calls.append(order)
+            return rgraph.hand.fetch(entities=FakeOrganisation.objects.filter(is_deleted=False),
+                                     order=order, user=self.user,
+                                    )
+
+        x, y, computed_at = rgraph_cache.fetch(graph=rgraph,
+                                               entities=FakeOrganisation.objects.filter(is_deleted=False),
+                                               order=order, user=self.user, compute=compute,
+                                              )
+        self.assertIsInstance(computed_at, datetime)
+
+        return x, [v[0] for v in y], len(calls)
+
+    @override_settings(REPORTS_GRAPH_CACHE_TIMEOUT=0)
+    def test_settings(self):
+        self.assertEqual(0, ReportGraphCache().timeout)
+
+        with override_settings(REPORTS_GRAPH_CACHE_TIMEOUT=120):
+            self.assertEqual(120, ReportGraphCache().timeout)
+
+    def test_no_cache(self):
+        self._create_orga('Bebop')
+        rgraph_cache = self.build_versioned_cache(ReportGraphCache, timeout=0)
+
+        self.assertEqual((['2013'], [1], 1), self._fetch(rgraph_cache))
+        self.assertEqual((['2013'], [1], 1), self._fetch(rgraph_cache))
+
+    def test_cache(self):
+        self._create_orga('Bebop')
+        rgraph_cache = self.build_versioned_cache(ReportGraphCache)
+
+        self.assertEqual((['2013'], [1], 1), self._fetch(rgraph_cache))
+        self.assertEqual((['2013'], [1], 0), self._fetch(rgraph_cache))
+
+        # Other order => other value
+        self.assertEqual((['2013'], [1], 1), self._fetch(rgraph_cache, order='DESC'))
+
+        self._create_orga('Swordfish', creation_date='2014-02-12')
+        self.assertEqual((['2013'], [1], 0), self._fetch(rgraph_cache))  # Not invalidated
+
+        rgraph_cache.invalidate(FakeOrganisation)
+        self.assertEqual((['2013', '2014'], [1, 1], 1), self._fetch(rgraph_cache))
+        self.assertEqual((['2014', '2013'], [1, 1], 1), self._fetch(rgraph_cache, order='DESC'))
+
+    def test_cache_graph_modified(self):
+        "The graph is a part of the key."
+        self._create_orga('Bebop')
+        rgraph_cache = self.build_versioned_cache(ReportGraphCache)
+        self.assertEqual(1, self._fetch(rgraph_cache)[2])
+
+        rgraph = self.rgraph
+        rgraph.name = 'Created organisations / year'
+        rgraph.save()
+        self.assertEqual(1, self._fetch(rgraph_cache)[2])
+
+    def test_invalidate_4_instance(self):
+        orga = self._create_orga('Bebop')
+        rgraph_cache = self.build_versioned_cache(ReportGraphCache)
+
+        def assertInvalidated(instance):
+            self._fetch(rgraph_cache)
+            rgraph_cache.invalidate_4_instance(instance)
+            self.assertEqual(1, self._fetch(rgraph_cache)[2])
+
+        def assertNotInvalidated(instance):
+            self._fetch(rgraph_cache)
+            rgraph_cache.invalidate_4_instance(instance)
+            self.assertEqual(0, self._fetch(rgraph_cache)[2])
+
+        assertInvalidated(orga)
+
+        contact = FakeContact.objects.create(user=self.user, first_name='Spike', last_name='Spiegel')
+        assertNotInvalidated(contact)
+
+        rtype = RelationType.create(('test-subject_owns', 'owns'),
+                                    ('test-object_owns',  'is owned by'),
+                                   )[0]
+        relation = Relation.objects.create(user=self.user, subject_entity=contact,
+                                           type=rtype, object_entity=orga,
+                                          )
+        assertInvalidated(Relation.objects.get(id=relation.symmetric_relation_id))  # Subject not retrieved
+        assertNotInvalidated(relation)
+
+        ptype = CremePropertyType.create(str_pk='test-prop_ship', text='is a ship')
+        assertInvalidated(CremeProperty.objects.create(type=ptype, creme_entity=orga))
+
+        assertNotInvalidated(ptype)
+
+    @override_settings(REPORTS_GRAPH_CACHE_TIMEOUT=60)
+    def test_graph_fetch(self):
+        self._create_orga('Bebop')
+        rgraph = self.rgraph
+        self.assertIsNone(rgraph.computed_at)
+
+        x, y = rgraph.fetch(self.user)
+        self.assertEqual(['2013'], x)
+        self.assertEqual(1, y[0][0])
+
+        computed_at = rgraph.computed_at
+        self.assertIsInstance(computed_at, datetime)
+
+        rgraph.fetch(self.user)
+        self.assertEqual(computed_at, rgraph.computed_at)
+
+        # Invalidated by the signals
+        self._create_orga('Swordfish', creation_date='2014-02-12')
+        x, y = rgraph.fetch(self.user)
+        self.assertEqual(['2013', '2014'], x)
+        self.assertGreater(rgraph.computed_at, computed_at)
+
+    @override_settings(REPORTS_GRAPH_CACHE_TIMEOUT=60)
+    def test_graph_fetch_transaction(self):
+        "The results are invalidated again when the transaction is committed."
+        self._create_orga('Bebop')
+        rgraph = self.rgraph
+        self.assertEqual(['2013'], rgraph.fetch(self.user)[0])
+
+        # NB: the tests are run in a transaction
+        callbacks_count = len(connection.run_on_commit)
+        self._create_orga('Swordfish', creation_date='2014-02-12')
+        callbacks = connection.run_on_commit[callbacks_count:]
+        self.assertTrue(callbacks)
+
+        # Another request caches the result (computed before the commit) with the new version
+        rgraph.fetch(self.user)
+        computed_at = rgraph.computed_at
+        rgraph.fetch(self.user)
+        self.assertEqual(computed_at, rgraph.computed_at)
+
+        for __, callback in callbacks:
+            callback()
+
+        rgraph.fetch(self.user)
+        self.assertGreater(rgraph.computed_at, computed_at)
+
+    @override_settings(REPORTS_GRAPH_CACHE_TIMEOUT=60)
+    def test_graph_fetch_update_in_bulk(self):
+        "Invalidated by the set-based modifications of the jobs."
+        orga = self._create_orga('Bebop')
+        rgraph = self.rgraph
+        self.assertEqual(['2013'], rgraph.fetch(self.user)[0])
+
+        FakeOrganisation.objects.filter(id=orga.id).update(creation_date='2014-02-12')
+        self.assertEqual(['2013'], rgraph.fetch(self.user)[0])
+
+        post_update_in_bulk.send(sender=FakeOrganisation, instance_ids=[orga.id])
+        self.assertEqual(['2014'], rgraph.fetch(self.user)[0])
+
+    @override_settings(REPORTS_GRAPH_CACHE_TIMEOUT=60)
+    def test_graph_fetch_credentials(self):
+        "The credentials of the user are a part of the key."
+        orga = self._create_orga('Bebop')
+        orga.user = self.other_user
+        orga.save()
+
+        rgraph = self.rgraph
+        self.assertEqual(['2013'], rgraph.fetch(self.user)[0])
+
+        other_user = self.other_user
+        other_user.role = self.role
+        other_user.is_superuser = False
+        other_user.save()
+        self.assertEqual([], rgraph.fetch(other_user)[0])
+
+    @override_settings(REPORTS_GRAPH_CACHE_TIMEOUT=60)
+    def test_brick(self):
+        self._create_orga('Bebop')
+        item = self.rgraph.create_instance_brick_config_item()
+
+        BrickHomeLocation.objects.all().delete()
+        BrickHomeLocation.objects.create(brick_id=item.brick_id, order=1)
+
+        response = self.assertGET200('/')
+        brick_node = self.get_brick_node(self.get_html_tree(response.content), item.brick_id)
+        self.assertIsNotNone(brick_node.find(".//div[@class='graph-computed-at']"))
+
+    @override_settings(REPORTS_GRAPH_CACHE_TIMEOUT=0)
+    def test_brick_no_cache(self):
+        "The date of computation is not displayed if the cache is disabled."
+        self._create_orga('Bebop')
+        item = self.rgraph.create_instance_brick_config_item()
+
+        BrickHomeLocation.objects.all().delete()
+        BrickHomeLocation.objects.create(brick_id=item.brick_id, order=1)
+
+        response = self.assertGET200('/')
+        brick_node = self.get_brick_node(self.get_html_tree(response.content), item.brick_id)
+        self.assertIsNone(brick_node.find(".//div[@class='graph-computed-at']"))
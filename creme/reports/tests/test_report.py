@@ -37,7 +37,8 @@ try:
         HeaderFilter, EntityFilter,  # EntityFilterCondition
         CustomField, CustomFieldInteger,
         FieldsConfig,
-        FakeContact, FakeOrganisation, FakeLegalForm, FakePosition,
+        Language,
+        FakeContact, FakeOrganisation, FakeLegalForm, FakePosition, FakeSector,
         FakeImage, FakeImageCategory,
         FakeEmailCampaign, FakeMailingList,
         FakeInvoice,
@@ -50,6 +51,7 @@ try:
         FAKE_REL_OBJ_EMPLOYED_BY,
         FAKE_REL_OBJ_BILL_ISSUED,
     )
+    from creme.creme_core.utils.profiling import CaptureQueriesContext
 
     from .base import BaseReportsTestCase, skipIfCustomReport, Report
 
@@ -1913,7 +1915,7 @@ class ReportTestCase(BaseReportsTestCase):
         self.assertEqual([[ln] for ln in FakeContact.objects.filter(is_deleted=False)
                                                         .values_list('last_name', flat=True)
                           ],
-                         report.fetch_all_lines()
+                         [*report.fetch_all_lines()]
                         )
 
     def test_fetch_field_02(self):
@@ -1945,7 +1947,7 @@ class ReportTestCase(BaseReportsTestCase):
             [[self.lannisters.name, username, '',          ''],
              [starks.name,          username, lform.title, date_format(starks.creation_date, 'DATE_FORMAT')],
             ],
-            report.fetch_all_lines()
+            [*report.fetch_all_lines()]
         )
 
     def test_fetch_field_03(self):
@@ -1979,12 +1981,12 @@ class ReportTestCase(BaseReportsTestCase):
             [self.lannisters.name, lannisters_img.name],
             [self.starks.name,     starks_img.name],
         ]
-        self.assertEqual(lines, fetch_all_lines())
-        self.assertEqual(lines, fetch_all_lines(user=self.other_user))  # Super user
+        self.assertEqual(lines, [*fetch_all_lines()])
+        self.assertEqual(lines, [*fetch_all_lines(user=self.other_user)])  # Super user
 
         lines.pop(0)
         lines[0][1] = settings.HIDDEN_VALUE  # 'lannisters_img' not visible
-        self.assertEqual(lines, fetch_all_lines(user=user))
+        self.assertEqual(lines, [*fetch_all_lines(user=user)])
 
     def _aux_test_fetch_documents(self, efilter=None, selected=True):
         create_field = partial(Field.objects.create, selected=False, sub_report=None, type=RFT_FIELD)
@@ -2020,7 +2022,7 @@ class ReportTestCase(BaseReportsTestCase):
             [[doc1.title,      doc1.description, self.folder1.title, ''],
              [self.doc2.title, '',               folder2.title,      folder2.description],
             ],
-            self.doc_report.fetch_all_lines()
+            [*self.doc_report.fetch_all_lines()]
         )
 
     def test_fetch_fk_02(self):
@@ -2050,7 +2052,7 @@ class ReportTestCase(BaseReportsTestCase):
             [[doc1.title,      doc1.description, self.folder1.title, ''],
              [self.doc2.title, '',               '',                 ''],
             ],
-            self.doc_report.fetch_all_lines()
+            [*self.doc_report.fetch_all_lines()]
         )
 
     def test_fetch_fk_03(self):
@@ -2064,7 +2066,7 @@ class ReportTestCase(BaseReportsTestCase):
             [[doc1.title,      doc1.description, fmt % (self.folder1.title, '')],
              [self.doc2.title, '',               fmt % (folder2.title,      folder2.description)],
             ],
-            self.doc_report.fetch_all_lines()
+            [*self.doc_report.fetch_all_lines()]
         )
 
     def test_fetch_fk_04(self):
@@ -2090,7 +2092,7 @@ class ReportTestCase(BaseReportsTestCase):
         self.assertEqual([[self.lannisters.name, '',          user_str],
                           [starks.name,          lform.title, user_str],
                          ],
-                         report.fetch_all_lines()
+                         [*report.fetch_all_lines()]
                         )
 
     def test_fetch_fk_05(self):
@@ -2118,7 +2120,7 @@ class ReportTestCase(BaseReportsTestCase):
         self.assertEqual([[doc1.title, cat.name],
                           [doc2.title, ''],
                          ],
-                         report.fetch_all_lines()
+                         [*report.fetch_all_lines()]
                         )
 
     def test_fetch_fk_06(self):
@@ -2177,7 +2179,7 @@ class ReportTestCase(BaseReportsTestCase):
                           [faye.last_name,  cat2.name + '/' + cat1.name],
                           [ed.last_name,    ''],
                          ],
-                         report.fetch_all_lines()
+                         [*report.fetch_all_lines()]
                         )
 
     def test_fetch_cf_01(self):
@@ -2224,7 +2226,7 @@ class ReportTestCase(BaseReportsTestCase):
                           [ned.first_name,  '190'],
                           [robb.first_name, ''],
                          ],
-                         report.fetch_all_lines()
+                         [*report.fetch_all_lines()]
                         )
 
     def test_fetch_cf_02(self):
@@ -2259,12 +2261,68 @@ class ReportTestCase(BaseReportsTestCase):
                  [self.ned.first_name,  ned_face.name,  '190'],
                  [self.robb.first_name, '',             ''],
                 ]
-        self.assertEqual(lines, report_contact.fetch_all_lines())
+        self.assertEqual(lines, [*report_contact.fetch_all_lines()])
 
         lines.pop()  # 'robb' is not visible
         ned_line = lines[1]
         ned_line[1] = ned_line[2] = settings.HIDDEN_VALUE  # 'ned_face' is not visible
-        self.assertEqual(lines, report_contact.fetch_all_lines(user=user))
+        self.assertEqual(lines, [*report_contact.fetch_all_lines(user=user)])
+
+    def test_fetch_batched(self):
+        "The values of the columns are retrieved by pages of entities."
+        user = self.login()
+
+        cf = CustomField.objects.create(content_type=self.ct_contact,
+                                        name='HP', field_type=CustomField.INT,
+                                       )
+        ptype = CremePropertyType.create(str_pk='test-prop_kawaii', text='Kawaii')
+        sector = FakeSector.objects.create(title='Piloting')
+        language = Language.objects.create(name='Japanese', code='JP')
+        nerv = FakeOrganisation.objects.create(user=user, name='Nerv')
+
+        report = Report.objects.create(user=user, name='Pilots', ct=self.ct_contact)
+        create_field = partial(Field.objects.create, report=report, type=RFT_FIELD)
+        create_field(name='last_name',       order=1)
+        create_field(name='sector__title',   order=2)
+        create_field(name='languages__name', order=3)
+        create_field(name=cf.id,             order=4, type=RFT_CUSTOM)
+        create_field(name=FAKE_REL_SUB_EMPLOYED_BY, order=5, type=RFT_RELATION)
+        create_field(name='get_pretty_properties',  order=6, type=RFT_FUNCTION)
+
+        def create_pilots(*last_names):
+            for last_name in last_names:
+                pilot = FakeContact.objects.create(user=user, first_name='Pilot',
+                                                   last_name=last_name, sector=sector,
+                                                  )
+                pilot.languages.set([language])
+                CustomFieldInteger.objects.create(custom_field=cf, entity=pilot, value=len(last_name))
+                Relation.objects.create(user=user, subject_entity=pilot,
+                                        type_id=FAKE_REL_SUB_EMPLOYED_BY, object_entity=nerv,
+                                       )
+                CremeProperty.objects.create(type=ptype, creme_entity=pilot)
+
+        def fetch_lines():
+            with CaptureQueriesContext() as ctxt:
+                lines = [*report.fetch_all_lines()]
+
+            return lines, len(ctxt.captured_queries)
+
+        create_pilots('Ayanami', 'Ikari')
+        fetch_lines()  # NB: the columns are built
+        lines, queries = fetch_lines()
+        self.assertEqual(['Ayanami', 'Piloting', 'Japanese', '7', str(nerv), ptype.text],
+                         lines[0]
+                        )
+
+        create_pilots('Langley', 'Nagisa', 'Suzuhara')
+        lines, queries2 = fetch_lines()
+        self.assertEqual(5, len(lines))
+        self.assertEqual(queries, queries2)
+
+        # Several pages
+        report.fetch_page_size = 2
+        self.assertEqual(lines, [*report.fetch_all_lines()])
+        self.assertEqual(lines[:3], [*report.fetch_all_lines(limit_to=3)])
 
     def test_fetch_m2m_01(self):
         "No sub report"
@@ -2290,7 +2348,7 @@ class ReportTestCase(BaseReportsTestCase):
         self.assertEqual([[name1, 'ML#1, ML#2'],
                           [name2, 'ML#3'],
                          ],
-                         report.fetch_all_lines()
+                         [*report.fetch_all_lines()]
                         )
 
     def _aux_test_fetch_m2m(self):
@@ -2352,12 +2410,12 @@ class ReportTestCase(BaseReportsTestCase):
              [name2, ml3.name],
              [name3, ''],
             ],
-            report_camp.fetch_all_lines()
+            [*report_camp.fetch_all_lines()]
         )
 
         self.assertEqual(
             [[ml1.name, ptype1.text], [ml2.name, ptype2.text], [ml3.name, '']],
-            report_ml.fetch_all_lines()
+            [*report_ml.fetch_all_lines()]
         )
 
         # Let's go for the sub-report
@@ -2378,7 +2436,7 @@ class ReportTestCase(BaseReportsTestCase):
                           [name2, ml3.name, ''],
                           [name3, '',       ''],
                          ],
-                         report_camp.fetch_all_lines()
+                         [*report_camp.fetch_all_lines()]
                         )
 
     def test_fetch_m2m_03(self):
@@ -2404,7 +2462,7 @@ class ReportTestCase(BaseReportsTestCase):
              [self.camp2.name, fmt % (self.ml3.name, '')],
              [self.camp3.name, ''],
             ],
-            report_camp.fetch_all_lines()
+            [*report_camp.fetch_all_lines()]
         )
 
     def test_fetch_m2m_04(self):
@@ -2439,7 +2497,7 @@ class ReportTestCase(BaseReportsTestCase):
             [[img1.name, img1.description, cats_str, cats_str],
              [img2.name, '',               '',       ''],
             ],
-            report.fetch_all_lines()
+            [*report.fetch_all_lines()]
         )
 
     def test_fetch_m2m_05(self):
@@ -2477,7 +2535,7 @@ class ReportTestCase(BaseReportsTestCase):
              [guild3.name, ''],
              [guild1.name, '{}, {}, '.format(leader.title, side_kick.title)],
             ],
-            report.fetch_all_lines()
+            [*report.fetch_all_lines()]
         )
 
     def _aux_test_fetch_related(self, select_doc_report=None, invalid_one=False):
@@ -2518,10 +2576,10 @@ class ReportTestCase(BaseReportsTestCase):
         lines = [[self.folder1.title, '{}, {}'.format(doc11, doc12)],
                  [self.folder2.title, str(self.doc21)],
                 ]
-        self.assertEqual(lines, fetch())
+        self.assertEqual(lines, [*fetch()])
 
         lines[0][1] = str(doc11)
-        self.assertEqual(lines, fetch(user=self.user))
+        self.assertEqual(lines, [*fetch(user=self.user)])
 
     def test_fetch_related_02(self):
         "Sub-report (expanded)"
@@ -2538,10 +2596,10 @@ class ReportTestCase(BaseReportsTestCase):
                  [self.folder2.title, self.doc21.title, ''],
                 ]
         fetch = self.folder_report.fetch_all_lines
-        self.assertEqual(lines, fetch())
+        self.assertEqual(lines, [*fetch()])
 
         lines.pop(2)  # doc12
-        self.assertEqual(lines, fetch(user=user))
+        self.assertEqual(lines, [*fetch(user=user)])
 
     def test_fetch_related_03(self):
         "Sub-report (not expanded)"
@@ -2558,10 +2616,10 @@ class ReportTestCase(BaseReportsTestCase):
                  [self.folder2.title, fmt % (self.doc21.title, '')],
                 ]
         fetch = self.folder_report.fetch_all_lines
-        self.assertEqual(lines, fetch())
+        self.assertEqual(lines, [*fetch()])
 
         lines[1][1] = doc11_str
-        self.assertEqual(lines, fetch(user=user))
+        self.assertEqual(lines, [*fetch(user=user)])
 
     def test_fetch_funcfield_01(self):
         self.login()
@@ -2585,7 +2643,7 @@ class ReportTestCase(BaseReportsTestCase):
         self.assertEqual([[self.lannisters.name, ''],
                           [self.starks.name,     ptype.text],
                          ],
-                         report.fetch_all_lines()
+                         [*report.fetch_all_lines()]
                         )
 
     def test_fetch_funcfield_02(self):
@@ -2622,12 +2680,12 @@ class ReportTestCase(BaseReportsTestCase):
                  [self.ned.first_name,  ned_face.name,  ptype.text],
                  [self.robb.first_name, '',             ''],
                 ]
-        self.assertEqual(lines, report_contact.fetch_all_lines())
+        self.assertEqual(lines, [*report_contact.fetch_all_lines()])
 
         lines.pop()  # 'robb' is not visible
         ned_line = lines[1]
         ned_line[1] = ned_line[2] = settings.HIDDEN_VALUE  # 'ned_face' is not visible
-        self.assertEqual(lines, report_contact.fetch_all_lines(user=user))
+        self.assertEqual(lines, [*report_contact.fetch_all_lines(user=user)])
 
     def test_fetch_relation_01(self):
         "No sub-report."
@@ -2654,10 +2712,10 @@ class ReportTestCase(BaseReportsTestCase):
         lines = [[self.lannisters.name, str(self.tyrion)],
                  [self.starks.name,     '{}, {}'.format(ned, self.robb)],
                 ]
-        self.assertEqual(lines, fetch())
+        self.assertEqual(lines, [*fetch()])
 
         lines[1][1] = str(self.robb)
-        self.assertEqual(lines, fetch(user=self.user))
+        self.assertEqual(lines, [*fetch(user=self.user)])
 
     def test_fetch_relation_02(self):
         "Sub-report (expanded)."
@@ -2681,10 +2739,10 @@ class ReportTestCase(BaseReportsTestCase):
                  [starks.name,          ned.last_name,    ned.first_name],
                  [starks.name,          robb.last_name,   robb.first_name],
                 ]
-        self.assertEqual(lines, report.fetch_all_lines())
+        self.assertEqual(lines, [*report.fetch_all_lines()])
 
         lines.pop()  # 'robb' line removed
-        self.assertEqual(lines, report.fetch_all_lines(user=self.user))
+        self.assertEqual(lines, [*report.fetch_all_lines(user=self.user)])
 
     def test_fetch_relation_03(self):
         "Sub-report (not expanded)."
@@ -2732,10 +2790,10 @@ class ReportTestCase(BaseReportsTestCase):
                                         fmt % (robb.last_name, robb.first_name, '', '')
                  ],
                 ]
-        self.assertEqual(lines, report_orga.fetch_all_lines())
+        self.assertEqual(lines, [*report_orga.fetch_all_lines()])
 
         lines[1][1] = ned_str
-        self.assertEqual(lines, report_orga.fetch_all_lines(user=self.user))
+        self.assertEqual(lines, [*report_orga.fetch_all_lines(user=self.user)])
 
     def test_fetch_relation_04(self):
         "Sub-report (expanded) with a filter."
@@ -2779,7 +2837,7 @@ class ReportTestCase(BaseReportsTestCase):
             [[self.lannisters.name, tyrion.last_name, tyrion.first_name, tyrion_face.name, ''],
              [self.starks.name,     '',               '',                '',               ''],
             ],
-            report.fetch_all_lines()
+            [*report.fetch_all_lines()]
         )
 
     def test_fetch_relation_05(self):
@@ -2822,7 +2880,7 @@ class ReportTestCase(BaseReportsTestCase):
 
              [starks.name,          robb.last_name,   robb.first_name,   '',         '']
             ],
-            report_orga.fetch_all_lines()
+            [*report_orga.fetch_all_lines()]
         )
 
     def _aux_test_fetch_aggregate(self, invalid_ones=False):
@@ -2873,7 +2931,7 @@ class ReportTestCase(BaseReportsTestCase):
                 [lannisters.name, '1500', '500'],
                 [starks.name,     '1500', '500'],
             ],
-            report.fetch_all_lines()
+            [*report.fetch_all_lines()]
         )
 
     def test_fetch_aggregate_02(self):
@@ -2884,7 +2942,7 @@ class ReportTestCase(BaseReportsTestCase):
                 [self.lannisters.name, '0', '0'],
                 [self.starks.name,     '0', '0'],
             ],
-            self.report_orga.fetch_all_lines()
+            [*self.report_orga.fetch_all_lines()]
         )
 
     def test_fetch_aggregate_03(self):
@@ -2928,7 +2986,7 @@ class ReportTestCase(BaseReportsTestCase):
                 [lannisters.name, invoice3.name, total_lannisters],
                 [starks.name,     invoice1.name, total_starks],
             ],
-            report.fetch_all_lines()
+            [*report.fetch_all_lines()]
         )
 
     def test_fetch_aggregate_04(self):
@@ -2956,5 +3014,5 @@ class ReportTestCase(BaseReportsTestCase):
                 [lannisters.name, agg_value],
                 [starks.name,     agg_value],
             ],
-            report.fetch_all_lines()
+            [*report.fetch_all_lines()]
         )
@@ -72,7 +72,7 @@ class Preview(generic.EntityDetail):
 
                 if not EntityCredentials.filter(user, ct.model_class().objects.all()).exists():
                     empty_message = _('You can see no «{model}»').format(model=ct)
-                elif report.filter and not report.fetch_all_lines(limit_to=1, user=user):
+                elif report.filter and next(report.fetch_all_lines(limit_to=1, user=user), None) is None:
                     empty_message = _('No «{model}» matches the filter «{filter}»').format(
                         model=ct,
                         filter=report.filter,
@@ -85,11 +85,11 @@ class Preview(generic.EntityDetail):
         return empty_message
 
     def get_lines(self, form):
-        return self.object.fetch_all_lines(limit_to=_PREVIEW_LIMIT_COUNT,
-                                           extra_q=form.get_q(),
-                                           user=self.request.user,
-                                          ) \
-               if form.is_valid() else []
+        return [*self.object.fetch_all_lines(limit_to=_PREVIEW_LIMIT_COUNT,
+                                             extra_q=form.get_q(),
+                                             user=self.request.user,
+                                            )
+               ] if form.is_valid() else []
 
 
 class ExportFilterURL(generic.EntityEditionPopup):